@@ -41,6 +41,8 @@ class EventBus(object):
         self.subscriptions = {}  # topic -> list of _Subscription objects
                                  # topic None holds regexp based topic subs.
         self.subs_topic_map = {} # to aid fast lookup when unsubscribing
+        self.published = 0  # messages published, for diagnostics
+        self.delivered = 0  # callbacks invoked, for diagnostics
 
     def list_subscribers(self, topic=None):
         if topic is None:
@@ -98,8 +100,12 @@ class EventBus(object):
             except Exception, e:
                 return False  # failed predicate function treated as no match
 
-        # lookup subscribers with explicit topic subscriptions
-        subscribers = self.subscriptions.get(topic, [])
+        self.published += 1
+
+        # lookup subscribers with explicit topic subscriptions (copied, so
+        # that neither the regexp subscribers added below nor subscriptions
+        # made from within the callbacks end up in the registered list)
+        subscribers = list(self.subscriptions.get(topic, []))
 
         # add matching regexp topic subscribers
         subscribers.extend(s for s in self.subscriptions.get(None, [])
@@ -108,6 +114,7 @@ class EventBus(object):
         for candidate in subscribers:
             predicate = candidate.predicate
             if predicate is None or passes(msg, predicate):
+                self.delivered += 1
                 try:
                     candidate.callback(topic, msg)
                 except Exception, e:
@@ -40,9 +40,12 @@ from scapy.data import ETH_P_ALL
 from twisted.internet import reactor
 from zope.interface import implementer
 
+from common.structlog_setup import log_debug_enabled
 from voltha.registry import IComponent
 
 if sys.platform.startswith('linux'):
+    from common.frameio import kernel_filter
+    from common.frameio.batch_recv import BatchReceiver, recvmmsg_supported
     from common.frameio.third_party.oftest import afpacket, netutils
 elif sys.platform == 'darwin':
     from scapy.arch import pcapdnet, BIOCIMMEDIATE, dnet
@@ -93,8 +96,17 @@ class BpfProgramFilter(object):
         'vlan 1000'
         'vlan 1000 and ip src host 10.10.10.10'
         """
+        self.program_string = program_string
         self.bpf = BPFProgram(program_string)
 
+    def instructions(self):
+        """
+        Return the compiled program as a list of (code, jt, jf, k) tuples,
+        or None if the installed pcapy cannot expose it.
+        """
+        get_bpf = getattr(self.bpf, 'get_bpf', None)
+        return get_bpf() if get_bpf is not None else None
+
     def __call__(self, frame):
         """
         Return 1 if frame passes filter.
@@ -114,19 +126,82 @@ class FrameIOPort(object):
     ETH_P_ALL = 0x03
     RCV_TIMEOUT = 10000
 
-    def __init__(self, iface_name):
+    def __init__(self, iface_name, kernel_filter=False):
         self.iface_name = iface_name
         self.proxies = []
         self.socket = self.open_socket(self.iface_name)
         log.debug('socket-opened', fn=self.fileno(), iface=iface_name)
         self.received = 0
         self.discarded = 0
+        self.kernel_filter = kernel_filter
+        self.kernel_filter_attached = False
+        self.kernel_received = 0
+        self.kernel_dropped = 0
 
     def add_proxy(self, proxy):
         self.proxies.append(proxy)
+        self.update_kernel_filter()
 
     def del_proxy(self, proxy):
         self.proxies = [p for p in self.proxies if p.name != proxy.name]
+        self.update_kernel_filter()
+
+    def update_kernel_filter(self):
+        """
+        If enabled, push the union of the proxy filters into the kernel, so
+        that frames none of the proxies want never reach user space. This is
+        only possible when every proxy has a BpfProgramFilter; otherwise all
+        frames must come up. The per-proxy filters are still evaluated in
+        user space to demultiplex the frames that do come up.
+
+        As the kernel runs the program on the frames with their 802.1Q tag
+        taken out, the program is first adapted to that (see
+        kernel_filter.kernel_program); the few it cannot be adapted are
+        filtered in user space only.
+        """
+        if not self.kernel_filter:
+            return
+        instructions = None
+        filters = [p.filter for p in self.proxies]
+        if filters and all(isinstance(f, BpfProgramFilter) for f in filters):
+            union = BpfProgramFilter(' or '.join(
+                '({})'.format(f.program_string) for f in filters))
+            instructions = union.instructions()
+            if instructions is not None:
+                instructions = self.kernel_program(instructions)
+                if instructions is None:
+                    log.warn('kernel-filter-not-attached',
+                             iface=self.iface_name,
+                             reason='filters-not-adaptable-to-untagged-frames',
+                             filter=union.program_string)
+        try:
+            if instructions is not None:
+                self.attach_filter(instructions)
+                self.kernel_filter_attached = True
+            elif self.kernel_filter_attached:
+                self.detach_filter()
+                self.kernel_filter_attached = False
+            log.debug('kernel-filter-updated', iface=self.iface_name,
+                      attached=self.kernel_filter_attached)
+        except Exception as e:
+            log.exception('kernel-filter-error', iface=self.iface_name, e=e)
+
+    def kernel_program(self, instructions):
+        """
+        Return the program the kernel must run to filter as pcapy does, or
+        None if there is none
+        """
+        return instructions
+
+    def attach_filter(self, instructions):
+        raise NotImplementedError('to be implemented by derived class')
+
+    def detach_filter(self):
+        raise NotImplementedError('to be implemented by derived class')
+
+    def kernel_statistics(self):
+        """Return (received, dropped) as counted by the kernel, if known"""
+        return None
 
     def open_socket(self, iface_name):
         raise NotImplementedError('to be implemented by derived class')
@@ -144,7 +219,9 @@ class FrameIOPort(object):
         return self.socket.fileno()
 
     def _dispatch(self, proxy, frame):
-        log.debug('calling-publisher', proxy=proxy.name, frame=hexify(frame))
+        if log_debug_enabled():
+            log.debug('calling-publisher', proxy=proxy.name,
+                      frame=hexify(frame))
         try:
             proxy.callback(proxy, frame)
         except Exception as e:
@@ -152,10 +229,22 @@ class FrameIOPort(object):
                           explanation='Callback failed while processing frame',
                           e=e)
 
+    def _dispatch_batch(self, batch):
+        """Called on the reactor thread with a list of (proxy, frame)"""
+        for proxy, frame in batch:
+            self._dispatch(proxy, frame)
+
+    def rcv_frames(self):
+        """
+        Return the list of frames pending on the socket. Unless overridden by
+        a derived class supporting burst receive, this reads a single frame.
+        """
+        return [self.rcv_frame()]
+
     def recv(self):
-        """Called on the select thread when a packet arrives"""
+        """Called on the select thread when frames arrive"""
         try:
-            frame = self.rcv_frame()
+            frames = self.rcv_frames()
         except RuntimeError as e:
             # we observed this happens sometimes right after the socket was
             # attached to a newly created veth interface. So we log it, but
@@ -163,19 +252,28 @@ class FrameIOPort(object):
             log.warn('afpacket-recv-error', code=-1)
             return
 
-        log.debug('frame-received', iface=self.iface_name, len=len(frame),
-                  hex=hexify(frame))
-        self.received +=1
-        dispatched = False
-        for proxy in self.proxies:
-            if proxy.filter is None or proxy.filter(frame):
-                log.debug('frame-dispatched')
-                dispatched = True
-                reactor.callFromThread(self._dispatch, proxy, frame)
-
-        if not dispatched:
-            self.discarded += 1
-            log.debug('frame-discarded')
+        debug = log_debug_enabled()
+        self.received += len(frames)
+        batch = []
+        for frame in frames:
+            if debug:
+                log.debug('frame-received', iface=self.iface_name,
+                          len=len(frame), hex=hexify(frame))
+            dispatched = False
+            for proxy in self.proxies:
+                if proxy.filter is None or proxy.filter(frame):
+                    dispatched = True
+                    proxy.received += 1
+                    batch.append((proxy, frame))
+
+            if not dispatched:
+                self.discarded += 1
+                if debug:
+                    log.debug('frame-discarded')
+
+        if batch:
+            # a single hop to the reactor thread for the whole burst
+            reactor.callFromThread(self._dispatch_batch, batch)
 
     def send(self, frame):
         log.debug('sending', len=len(frame), iface=self.iface_name)
@@ -203,22 +301,63 @@ class FrameIOPort(object):
         return self
 
     def statistics(self):
-        return self.received, self.discarded
+        """
+        :return: dict with the number of frames received and discarded in
+        user space, the number of frames delivered to each proxy, and, where
+        the platform provides them, the number of frames the kernel passed
+        up and dropped for lack of buffer space
+        """
+        kernel_stats = self.kernel_statistics()
+        if kernel_stats is not None:
+            self.kernel_received += kernel_stats[0]
+            self.kernel_dropped += kernel_stats[1]
+        return dict(
+            received=self.received,
+            discarded=self.discarded,
+            proxies=dict((p.name, p.received) for p in self.proxies),
+            kernel_filter=self.kernel_filter_attached,
+            kernel_received=self.kernel_received,
+            kernel_dropped=self.kernel_dropped
+        )
 
 
 class LinuxFrameIOPort(FrameIOPort):
 
+    RCV_BATCH_SIZE = 64
+
     def open_socket(self, iface_name):
         s = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
         afpacket.enable_auxdata(s)
         s.bind((self.iface_name, self.ETH_P_ALL))
         netutils.set_promisc(s, iface_name)
         s.settimeout(self.RCV_TIMEOUT)
+        if recvmmsg_supported():
+            self.receiver = BatchReceiver(s, self.RCV_SIZE_DEFAULT,
+                                          self.RCV_BATCH_SIZE)
+        else:
+            self.receiver = None
         return s
 
     def rcv_frame(self):
         return afpacket.recv(self.socket, self.RCV_SIZE_DEFAULT)
 
+    def rcv_frames(self):
+        if self.receiver is None:
+            return [self.rcv_frame()]
+        return self.receiver.recv()
+
+    def kernel_program(self, instructions):
+        return kernel_filter.kernel_program(instructions)
+
+    def attach_filter(self, instructions):
+        kernel_filter.attach_filter(self.socket, instructions)
+
+    def detach_filter(self):
+        kernel_filter.detach_filter(self.socket)
+
+    def kernel_statistics(self):
+        return kernel_filter.packet_statistics(self.socket)
+
 
 class DarwinFrameIOPort(FrameIOPort):
 
@@ -237,6 +376,12 @@ class DarwinFrameIOPort(FrameIOPort):
     def send_frame(self, frame):
         return self.sout.send(frame)
 
+    def attach_filter(self, instructions):
+        raise NotImplementedError('kernel filters are only supported on linux')
+
+    def detach_filter(self):
+        pass
+
     def rcv_frame(self):
         pkt = self.socket.next()
         if pkt is not None:
@@ -261,6 +406,7 @@ class FrameIOPortProxy(object):
         self.callback = callback
         self.filter = filter
         self.name = uuid.uuid4().hex[:12] if name is None else name
+        self.received = 0
 
     @property
     def iface_name(self):
@@ -287,9 +433,16 @@ class FrameIOManager(Thread):
     Packet/Frame IO manager that can be used to send/receive raw frames
     on a set of network interfaces.
     """
-    def __init__(self):
+    def __init__(self, config=None):
+        """
+        :param config: optional dict; if 'kernel_filters' is set, the filters
+        of the proxies sharing an interface are attached to its socket (see
+        FrameIOPort.update_kernel_filter)
+        """
         super(FrameIOManager, self).__init__()
 
+        config = config or {}
+        self.kernel_filters = config.get('kernel_filters', False)
         self.ports = {}  # iface_name -> ActiveFrameReceiver
         self.queue = {}  # iface_name -> TODO
 
@@ -344,7 +497,7 @@ class FrameIOManager(Thread):
 
         port = self.ports.get(iface_name)
         if port is None:
-            port = _FrameIOPort(iface_name)
+            port = _FrameIOPort(iface_name, self.kernel_filters)
             self.ports[iface_name] = port
             self.ports_changed = True
             self.waker.notify()
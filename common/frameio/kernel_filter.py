@@ -0,0 +1,177 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Attach classic BPF programs to sockets (SO_ATTACH_FILTER), so frames that
+no one is interested in are dropped by the kernel instead of being copied
+to user space and evaluated in Python, and read the kernel's AF_PACKET
+receive statistics.
+"""
+
+import socket
+import struct
+from ctypes import Structure, addressof, c_uint8, c_uint16, c_uint32
+
+SO_ATTACH_FILTER = 26
+SO_DETACH_FILTER = 27
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+# classic BPF instruction fields (linux/bpf_common.h, linux/filter.h)
+BPF_LD = 0x00
+BPF_LDX = 0x01
+BPF_JMP = 0x05
+BPF_W = 0x00
+BPF_H = 0x08
+BPF_B = 0x10
+BPF_IMM = 0x00
+BPF_ABS = 0x20
+BPF_IND = 0x40
+BPF_LEN = 0x80
+BPF_MSH = 0xa0
+BPF_JA = 0x00
+BPF_JEQ = 0x10
+BPF_K = 0x00
+BPF_SIZES = {BPF_W: 4, BPF_H: 2, BPF_B: 1}
+BPF_MAXINSNS = 4096
+SKF_AD_OFF = 0xfffff000  # -0x1000: loads of ancillary data, not of the frame
+SKF_AD_VLAN_TAG = 44
+SKF_AD_VLAN_TAG_PRESENT = 48
+
+# the 802.1Q tag, right after the MAC addresses, as put back in user space
+# (see batch_recv)
+VLAN_TAG_OFFSET = 12
+VLAN_HLEN = 4
+ETH_P_8021Q = 0x8100
+
+
+class struct_sock_filter(Structure):
+    _fields_ = [
+        ("code", c_uint16),
+        ("jt", c_uint8),
+        ("jf", c_uint8),
+        ("k", c_uint32),
+    ]
+
+
+def attach_filter(sk, instructions):
+    """
+    Attach a compiled BPF program to a socket, replacing any previous one.
+    :param sk: socket
+    :param instructions: list of (code, jt, jf, k) tuples, as returned by
+    pcapy's BPFProgram.get_bpf()
+    """
+    program = (struct_sock_filter * len(instructions))(*instructions)
+    # struct sock_fprog { unsigned short len; struct sock_filter *filter; }
+    # the kernel copies the program, so it only needs to live for the call
+    fprog = struct.pack('HL', len(instructions), addressof(program))
+    sk.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def reads_past_mac_addresses(instructions):
+    """
+    Tell whether a BPF program looks at the frame past the MAC addresses,
+    e.g. at the ethertype or into a VLAN tag, or at its length, where tagged
+    frames differ between the kernel and user space (see kernel_program).
+    :param instructions: list of (code, jt, jf, k) tuples
+    """
+    for code, _, _, k in instructions:
+        cls, mode = code & 0x07, code & 0xe0
+        if cls in (BPF_LD, BPF_LDX) and mode == BPF_LEN:
+            return True
+        if cls == BPF_LD:
+            if mode == BPF_IND:
+                return True  # offset only known at run time
+            if mode == BPF_ABS and k < SKF_AD_OFF and \
+                    k + BPF_SIZES.get(code & 0x18, 4) > VLAN_TAG_OFFSET:
+                return True
+        elif cls == BPF_LDX and mode == BPF_MSH and k >= VLAN_TAG_OFFSET:
+            return True
+    return False
+
+
+def _untagged(instruction):
+    """
+    Return the instruction reading, in a frame with its 802.1Q tag taken
+    out, what the given instruction reads in the frame with the tag, or None
+    if that takes more than one instruction.
+    """
+    code, jt, jf, k = instruction
+    cls, mode, size = code & 0x07, code & 0xe0, code & 0x18
+    if cls == BPF_LDX and mode == BPF_MSH:
+        mode, size = BPF_ABS, BPF_B
+    elif cls not in (BPF_LD, BPF_LDX) or \
+            mode not in (BPF_ABS, BPF_IND, BPF_LEN):
+        return instruction
+    if mode == BPF_LEN:
+        return None  # the frame is VLAN_HLEN shorter
+    if mode == BPF_ABS and k >= SKF_AD_OFF:
+        return instruction
+    if mode == BPF_ABS and k + BPF_SIZES[size] <= VLAN_TAG_OFFSET:
+        return instruction
+    if k >= VLAN_TAG_OFFSET + VLAN_HLEN:
+        return code, jt, jf, k - VLAN_HLEN
+    if mode == BPF_ABS and size == BPF_H and k == VLAN_TAG_OFFSET:
+        return BPF_LD | BPF_IMM, jt, jf, ETH_P_8021Q
+    if mode == BPF_ABS and size == BPF_H and k == VLAN_TAG_OFFSET + 2:
+        return code, jt, jf, SKF_AD_OFF + SKF_AD_VLAN_TAG
+    return None  # part of the tag, or an offset only known at run time
+
+
+def kernel_program(instructions):
+    """
+    Adapt a BPF program, compiled for the frames as seen in user space, to
+    the kernel, which takes the 802.1Q tag out of the frames before running
+    the filter of an AF_PACKET socket (the tag comes back as auxiliary data
+    and is put back in user space, see batch_recv).
+
+    Programs that do not look past the MAC addresses are kept as they are.
+    Others are run as they are on the untagged frames, and on the tagged ones
+    with the reads of the tag turned into loads of the VLAN_TAG ancillary
+    data and the later offsets shifted back by VLAN_HLEN.
+    :param instructions: list of (code, jt, jf, k) tuples
+    :return: the program to attach, or None if it cannot be adapted (e.g.
+    it reads single bytes of the tag, or the frame length)
+    """
+    if not reads_past_mac_addresses(instructions):
+        return instructions
+    tagged = [_untagged(instruction) for instruction in instructions]
+    if None in tagged or 3 + 2 * len(instructions) > BPF_MAXINSNS:
+        return None
+    return [
+        (BPF_LD | BPF_B | BPF_ABS, 0, 0, SKF_AD_OFF + SKF_AD_VLAN_TAG_PRESENT),
+        (BPF_JMP | BPF_JEQ | BPF_K, 1, 0, 0),  # untagged: skip the next
+        (BPF_JMP | BPF_JA, 0, 0, len(instructions)),  # tagged: skip the copy
+    ] + list(instructions) + tagged
+
+
+def detach_filter(sk):
+    """Remove the BPF program attached to a socket, if any"""
+    try:
+        sk.setsockopt(socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
+    except socket.error:
+        pass  # nothing was attached
+
+
+def packet_statistics(sk):
+    """
+    Read (and reset) the kernel statistics of an AF_PACKET socket.
+    :return: tuple (received, dropped); received only counts frames that
+    passed the attached filter, dropped are frames lost to a full receive
+    buffer
+    """
+    return struct.unpack('II', sk.getsockopt(SOL_PACKET, PACKET_STATISTICS,
+                                             8))
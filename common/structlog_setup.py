@@ -111,3 +111,12 @@ def setup_logging(log_config, instance_id, verbosity_adjust=0, fluentd=None):
     log = structlog.get_logger()
     log.info("first-line")
     return log
+
+
+def log_debug_enabled():
+    """
+    Tell whether debug entries make it through to the logging backend, so
+    that hot paths can skip building expensive debug-only arguments (hex
+    dumps, decoded packets) when nobody is going to see them.
+    """
+    return logging.root.isEnabledFor(logging.DEBUG)
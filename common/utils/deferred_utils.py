@@ -41,3 +41,48 @@ class DeferredWithTimeout(Deferred):
         except AlreadyCalled:
             pass
 
+
+
+class DeferredCounter(object):
+    """
+    Count the Deferreds created and fired while installed, so that the number
+    of pending ones can be told at any time without walking the heap (which
+    stalls the reactor once the heap gets large). Only Deferreds created
+    after install() are accounted for; the ones garbage collected without
+    ever firing remain counted as pending, which is usually a leak anyway.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.fired = 0
+        self._originals = None
+
+    @property
+    def pending(self):
+        return self.created - self.fired
+
+    def install(self):
+        if self._originals is not None:
+            return
+        init = Deferred.__init__
+        start_run_callbacks = Deferred._startRunCallbacks
+        counter = self
+
+        def __init__(d, *args, **kw):
+            init(d, *args, **kw)
+            d._counted = True
+            counter.created += 1
+
+        def _startRunCallbacks(d, result):
+            if not d.called and d.__dict__.pop('_counted', False):
+                counter.fired += 1
+            return start_run_callbacks(d, result)
+
+        self._originals = (init, start_run_callbacks)
+        Deferred.__init__ = __init__
+        Deferred._startRunCallbacks = _startRunCallbacks
+
+    def uninstall(self):
+        if self._originals is not None:
+            Deferred.__init__, Deferred._startRunCallbacks = self._originals
+            self._originals = None
@@ -0,0 +1,131 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Bounded, thread safe queue that hands messages over from the Twisted thread
+to a streaming gRPC thread (or the other way around) in batches.
+"""
+from collections import deque
+from threading import Condition
+
+
+class FairBatchQueue(object):
+    """
+    Messages are queued per key (e.g., the logical device id) and drained in
+    round robin order, one message per key at a time, so a single busy key
+    cannot starve the others. Each key holds at most max_per_key messages;
+    messages arriving to a full key are dropped and counted.
+
+    Consumers block in get_batch() on a condition variable until there is
+    something to read. Note that we deliberately never wait with a timeout:
+    on python 2 that is implemented by polling. Instead, close() and wake()
+    are used to release the consumers.
+    """
+
+    def __init__(self, max_per_key=1024):
+        self.max_per_key = max_per_key
+        self.condition = Condition()
+        self.queues = {}  # key -> deque of messages
+        self.ready = deque()  # keys with pending messages, in serving order
+        self.dropped = {}  # key -> number of messages dropped
+        self.generation = 0  # bumped by wake()
+        self.closed = False
+
+    def __len__(self):
+        with self.condition:
+            return sum(len(q) for q in self.queues.itervalues())
+
+    def put(self, key, message):
+        """
+        Queue a message, waking up a consumer if needed.
+        :return: False if the message was dropped, True otherwise
+        """
+        with self.condition:
+            if self.closed:
+                return False
+            queue = self.queues.get(key)
+            if queue is None:
+                queue = self.queues[key] = deque()
+                self.ready.append(key)
+            elif len(queue) >= self.max_per_key:
+                self.dropped[key] = self.dropped.get(key, 0) + 1
+                return False
+            queue.append(message)
+            self.condition.notify()
+            return True
+
+    def get_batch(self, max_messages=64, cancelled=None):
+        """
+        Block until at least one message is available and return up to
+        max_messages of them, taking turns between the keys.
+        :param cancelled: optional predicate telling whether the consumer is
+        gone (e.g. its stream was cancelled), checked under the lock before
+        each wait, so that the wake() issued when it goes away cannot be
+        missed, even if it came before this call
+        :return: list of messages; empty if the queue was closed, the
+        consumers were released with wake() or the consumer was cancelled
+        """
+        with self.condition:
+            generation = self.generation
+            while not self.ready:
+                if self.closed or self.generation != generation or \
+                        (cancelled is not None and cancelled()):
+                    return []
+                self.condition.wait()
+
+            batch = []
+            ready = self.ready
+            queues = self.queues
+            while ready and len(batch) < max_messages:
+                key = ready.popleft()
+                queue = queues[key]
+                batch.append(queue.popleft())
+                if queue:
+                    ready.append(key)
+                else:
+                    del queues[key]
+            return batch
+
+    def wake(self):
+        """
+        Release all blocked consumers with an empty batch, e.g., to let them
+        notice that their stream has been cancelled.
+        """
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def close(self):
+        """Drop all pending messages and release all consumers for good"""
+        with self.condition:
+            self.closed = True
+            self.queues.clear()
+            self.ready.clear()
+            self.condition.notify_all()
+
+    def statistics(self):
+        """
+        :return: dict with the number of queued and dropped messages, total
+        and per key
+        """
+        with self.condition:
+            queued = dict((key, len(q)) for key, q in self.queues.iteritems())
+            return dict(
+                queued=sum(queued.itervalues()),
+                dropped=sum(self.dropped.itervalues()),
+                queued_per_key=queued,
+                dropped_per_key=dict(self.dropped),
+            )
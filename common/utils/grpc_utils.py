@@ -21,6 +21,7 @@ import structlog
 from concurrent.futures import Future
 from twisted.internet import reactor
 from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
 from twisted.python.threadable import isInIOThread
 
 
@@ -107,3 +108,36 @@ def twisted_async(func):
     return in_thread_wrapper
 
 
+def future_to_deferred(future):
+    """
+    The client side counterpart of twisted_async: bridge a gRPC future, as
+    returned by the future() flavor of a stub method, to a Deferred which
+    fires on the twisted thread with the outcome of the call. This lets
+    Twisted code issue gRPC calls without blocking the reactor while the
+    server responds. Cancelling the Deferred cancels the call.
+
+    Example usage:
+
+        @inlineCallbacks
+        def get_spam(self, request):
+            stub = SpamServiceStub(self.channel)
+            spam = yield future_to_deferred(stub.GetSpam.future(request))
+            returnValue(spam)
+
+    """
+    d = Deferred(lambda _: future.cancel())
+
+    def fire(fn, value):
+        if not d.called:  # unless cancelled already
+            fn(value)
+
+    def done(f):
+        try:
+            result = f.result()
+        except Exception:
+            reactor.callFromThread(fire, d.errback, Failure())
+        else:
+            reactor.callFromThread(fire, d.callback, result)
+
+    future.add_done_callback(done)
+    return d
@@ -0,0 +1,133 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Import time report, along the lines of python3's -X importtime, to find out
+what makes a component slow to start. For example:
+
+    python -m common.utils.import_timer voltha.main
+    python -m common.utils.import_timer -p ofagent -t 20 main
+
+Only modules imported from the file system are timed; builtin modules are
+not listed and their (small) cost is included in the importing module's.
+"""
+import argparse
+import os
+import pkgutil
+import sys
+import time
+
+
+class ImportTimer(object):
+    """
+    Meta path finder timing the loading of each module. It locates modules
+    the same way the default import machinery does and wraps their loader.
+    """
+
+    def __init__(self):
+        self.records = []  # (depth, name, self time, cumulative time)
+        self.stack = []  # time spent in nested imports, per active import
+        self.depth = 0
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        sys.meta_path.remove(self)
+
+    def find_module(self, fullname, path=None):
+        for entry in (sys.path if path is None else path):
+            importer = pkgutil.get_importer(entry)
+            if importer is None:
+                continue
+            try:
+                loader = importer.find_module(fullname)
+            except ImportError:
+                continue
+            if loader is not None:
+                return _TimedLoader(self, loader)
+        return None
+
+    def load(self, fullname, loader):
+        record = [self.depth, fullname, 0.0, 0.0]
+        self.records.append(record)
+        self.depth += 1
+        self.stack.append(0.0)
+        t0 = time.time()
+        try:
+            return loader.load_module(fullname)
+        finally:
+            elapsed = time.time() - t0
+            nested = self.stack.pop()
+            self.depth -= 1
+            if self.stack:
+                self.stack[-1] += elapsed
+            record[2] = elapsed - nested
+            record[3] = elapsed
+
+    def report(self, out=sys.stderr, top=None):
+        out.write('import time: self [us] | cumulative | imported package\n')
+        for depth, name, self_time, cumulative in self.records:
+            out.write('import time: %9d | %10d | %s%s\n' % (
+                self_time * 1e6, cumulative * 1e6, '  ' * depth, name))
+        if top:
+            out.write('\ntop %d modules by self time:\n' % top)
+            for _, name, self_time, cumulative in sorted(
+                    self.records, key=lambda r: r[2], reverse=True)[:top]:
+                out.write('  %8.1f ms  %s\n' % (self_time * 1e3, name))
+        total = sum(r[3] for r in self.records if r[0] == 0)
+        out.write('\n%d modules imported in %.1f ms\n' % (
+            len(self.records), total * 1e3))
+
+
+class _TimedLoader(object):
+
+    def __init__(self, timer, loader):
+        self.timer = timer
+        self.loader = loader
+
+    def load_module(self, fullname):
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+        return self.timer.load(fullname, self.loader)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('modules', nargs='+',
+                        help='modules to import, in order')
+    parser.add_argument('-p', '--path', action='append', default=[],
+                        help='directory to prepend to sys.path (the '
+                             'component\'s working directory, e.g. ofagent)')
+    parser.add_argument('-t', '--top', type=int, default=10,
+                        help='list the slowest N modules (default: 10)')
+    args = parser.parse_args()
+
+    for path in reversed(args.path):
+        sys.path.insert(0, os.path.abspath(path))
+
+    timer = ImportTimer()
+    timer.install()
+    try:
+        for module in args.modules:
+            __import__(module)
+    finally:
+        timer.uninstall()
+        timer.report(top=args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Decoding of the KpiEvents read from Kafka (as JSON) back into slices, for the
+consumers of the voltha.kpis topic. This does not depend on the protos,
+so that it can be used by the likes of shovel and dashd.
+"""
+import structlog
+
+log = structlog.get_logger()
+
+
+class KpiDecoder(object):
+    """
+    Turn KpiEvent dicts into KPI slices, i.e. dicts of type, ts and prefixes,
+    the latter mapping prefixes to dicts of metrics to values.
+
+    Slices pass through as they are. The time-series events (see
+    voltha/northbound/kafka/kpi_compactor.py) are expanded to one slice per
+    time-stamp, given the schemas they refer to were seen before, in the
+    same event or a previous one of the same source. The series of unknown
+    schemas, as when joining while a source is running, are dropped until
+    their schema is sent again.
+    """
+
+    def __init__(self):
+        self.schemas = {}  # (source, schema id) -> (prefix, metric names)
+        self.dropped = 0  # samples dropped, for lack of their schema
+
+    def decode(self, msg):
+        """
+        :param msg: KpiEvent as a dict
+        :return: list of slices, oldest first
+        """
+        type = msg.get('type')
+        if type == 'slice':
+            return [msg]
+        if type != 'ts':
+            raise ValueError('Unknown format')
+
+        source = self._learn(msg)
+        slices = {}  # ts -> prefixes
+        for series in msg.get('series', ()):
+            schema = self.schemas.get((source, series.get('schema', 0)))
+            samples = series.get('samples', ())
+            if schema is None:
+                self.dropped += len(samples)
+                log.debug('unknown-kpi-schema', source=source,
+                          schema=series.get('schema'))
+                continue
+            prefix, metrics = schema
+            values = None
+            for sample in samples:
+                values = self._apply(metrics, values, sample)
+                if values is None:
+                    break  # malformed, skip the rest of the series
+                slices.setdefault(sample.get('ts', 0), {})[prefix] = {
+                    'metrics': dict(zip(metrics, values))}
+
+        return [{'type': 'slice', 'ts': ts, 'prefixes': slices[ts]}
+                for ts in sorted(slices)]
+
+    def prefixes(self, msg):
+        """
+        Cheaper than decode() when the values are of no interest.
+        :param msg: KpiEvent as a dict
+        :return: dict of the prefixes of the message to their metric names
+        """
+        type = msg.get('type')
+        if type == 'slice':
+            prefixes = msg.get('prefixes', {})
+            return dict((prefix, pairs.get('metrics', {}).keys())
+                        for prefix, pairs in prefixes.iteritems())
+        if type != 'ts':
+            raise ValueError('Unknown format')
+
+        source = self._learn(msg)
+        prefixes = {}
+        for series in msg.get('series', ()):
+            schema = self.schemas.get((source, series.get('schema', 0)))
+            if schema is not None:
+                prefix, metrics = schema
+                prefixes[prefix] = metrics
+        return prefixes
+
+    def _learn(self, msg):
+        source = msg.get('source', '')
+        for schema in msg.get('schemas', ()):
+            self.schemas[(source, schema.get('id', 0))] = (
+                schema.get('prefix', ''), schema.get('metrics', []))
+        return source
+
+    def _apply(self, metrics, previous, sample):
+        values = sample.get('values', [])
+        changed = sample.get('changed', [])
+        if changed:
+            if previous is None or len(changed) != len(values) or \
+                    max(changed) >= len(metrics):
+                return None
+            current = list(previous)
+            for i, value in zip(changed, values):
+                current[i] = value
+            return current
+        if len(values) == len(metrics):
+            return list(values)
+        if not values and previous is not None:
+            return previous
+        return None
@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 
 from structlog import get_logger
-from twisted.internet.defer import DeferredList, inlineCallbacks
-import requests
+import json
+import re
 import sys
 #
 # This file contains the dashboard template information. It gets pulled into
@@ -10,13 +10,90 @@ import sys
 # be to put each of these in an individual text file and read them in when the
 # dashd process starts. There isn't much advantage to doing so at this time.
 #
-# TODO: The creation of a template from Grafana is currently incomplete.
+# A template dashboard defined in Grafana replaces the built in one, as long
+# as it has a single row, with %port% in its title (see apply_template).
 
 log = get_logger()
 
+# The parameters of the template strings
+PARAMETERS = re.compile(r'%(port|device|deviceId)%')
+
+# Target reference ids of a panel
+REF_IDS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def parameterize(text):
+    # Split the text around its parameters, the odd items being the names of
+    # the parameters, for render() to join the parts back with their values
+    return PARAMETERS.split(text)
+
+
+def render(parts, params):
+    if len(parts) == 1:
+        return parts[0]
+    return ''.join(params[part] if i % 2 else part
+                   for i, part in enumerate(parts))
+
+
+class CompiledTemplate(object):
+    """
+    The dashboard template, parsed and parameterized once, to render the
+    dashboards of the devices without parsing JSON or running regular
+    expressions per port, row, panel and data point.
+    """
+
+    def __init__(self, template):
+        self.board = json.loads(template.dashBoard)
+        self.row = json.loads(template.dashRow)
+        self.panel = json.loads(template.dashPanel)
+        self.rows = [parameterize(row['title']) for row in template.rows]
+        # (title, [(metric, target)] in metric order) per panel
+        self.panels = [
+            (parameterize(panel['title']),
+             sorted((metric, parameterize(target))
+                    for metric, target in panel.iteritems()
+                    if metric != 'title'))
+            for panel in template.panels]
+
+    def render(self, device, device_id, ports):
+        """
+        Return the dashboard of a device, to be posted to Grafana.
+        :param ports: dict of the ports of the device to their metric names
+        """
+        # Only the parts that differ between dashboards are copied, the rest
+        # of the template is shared
+        board = dict(self.board)
+        dashboard = board['dashboard'] = dict(board['dashboard'])
+        dashboard['title'] = device + '.' + device_id
+        dashboard['rows'] = rows = []
+        # The port is the main grouping attribute
+        for port in sorted(ports):
+            metrics = set(ports[port])
+            params = dict(port=port, device=device, deviceId=device_id)
+            title_params = dict(params, port=port.upper())
+            for row_title in self.rows:
+                row = dict(self.row)
+                row['title'] = render(row_title, params)
+                row['panels'] = []
+                for panel_id, (title, targets) in enumerate(self.panels, 1):
+                    panel = dict(self.panel)
+                    panel['id'] = panel_id
+                    panel['title'] = render(title, title_params)
+                    panel['targets'] = [
+                        dict(refId=REF_IDS[i], target=render(target, params))
+                        for i, target in enumerate(
+                            target for metric, target in targets
+                            if metric in metrics)]
+                    row['panels'].append(panel)
+                rows.append(row)
+        return board
+
+
 class DashTemplate(object):
     def __init__(self, grafana_url):
         self.grafana_url = grafana_url
+        self.version = None  # of the template dashboard last applied
+        self._compiled = None
 
         self.rowSelector = '%port%' # Not currently used
         self.rows = [
@@ -247,43 +324,67 @@ class DashTemplate(object):
         }
         '''
 
-    #TODO This functionality is a work in progress and needs to be completed.
-    def apply_template(self, tplt_info):
-        # The tplt_info is the record returned by Grafana as a result of a
-        # search request. This includes the id, title, uri, and other fields
-        # of no interest to us. The URI provides the key to access the
-        # dashboard definition from which we'll create a template.
+    def compiled(self):
+        # Compiled on first use, and again once a new template is applied
+        if self._compiled is None:
+            self._compiled = CompiledTemplate(self)
+        return self._compiled
+
+    def apply_template(self, db):
+        # The db is the template dashboard as returned by Grafana, that the
+        # caller looked up with a search request. Returns whether the
+        # template changed since last applied, in which case the dashboards
+        # need to be recreated.
         try:
-            r = requests.get(self.grafana_url + "/dashboards/" + \
-                             tplt_info['uri'])
-            db = r.json()
             # We don't need all the meta-data so just keep the dashboard
             # definition
             db = db['dashboard']
-            # We need to null out the id to create new dashboards with the
-            # template.
-            db['id'] = None
+            if db.get('version') == self.version:
+                return False
+            self.version = db.get('version')
             # Extract the rows and empty them from the template
             rows = db['rows']
-            db['rows']=[]
             # Determine if the rows are wildcarded or fixed, if wildcarded they
-            # need to map to the port which will create one row per port if
-            # they're not wildcarded then the title will be used as the port id
-            # and the same fixed number of rows will be used for every
-            # dashboard.
-            # Wildcarding implies a single row so check that first.
-            if len(rows) == 1:
-                # We might have wildcarding, search for it in the row titile
-                match = re.search(r'%port%',rows[0]['title'])
-                if match:
-                    # Yes there is a wildcard, flag it
-                    log.info("Wildcard found in template row") #debug
-                else:
-                    log.info("No wildcard found in template row") #debug
-            else:
-                # We don't have wildcarding
-                log.info("No wildcard possible in multi-row template") #debug
+            # need to map to the port which will create one row per port.
+            # Wildcarding implies a single row, with %port% in its title; the
+            # fixed rows are not supported (yet), the dashboards are then
+            # left as they are.
+            if len(rows) != 1 or not re.search(r'%port%', rows[0]['title']):
+                log.warning("template-not-applied",
+                            reason="a-single-row-with-%port%-is-required")
+                return False
+            row = dict(rows[0])
+            panels = row.pop('panels', [])
+            if not panels:
+                log.warning("template-not-applied", reason="no-panels")
+                return False
+
+            # Each panel keeps the targets of a port metric, the first
+            # panel serving as the model of all the panels
+            self.panels = []
+            for panel in panels:
+                targets = dict(title=panel['title'])
+                for target in panel.get('targets', []):
+                    match = re.search(r'%port%\.(\w+)', target['target'])
+                    if match:
+                        targets[match.group(1)] = target['target']
+                    else:
+                        log.warning("template-target-ignored",
+                                    target=target['target'])
+                self.panels.append(targets)
+            self.rows = [dict(title=row['title'])]
+            self.dashRow = json.dumps(row)
+            self.dashPanel = json.dumps(dict(panels[0], targets=[]))
+            # We need to null out the id to create new dashboards with the
+            # template.
+            self.dashBoard = json.dumps(dict(dashboard=dict(
+                db, id=None, rows=[], overwrite=True)))
+            self._compiled = None
+            log.info("template-applied", version=self.version,
+                     panels=len(self.panels))
+            return True
 
         except:
             e = sys.exc_info()
-            print("ERROR: ", e)
+            log.error("template-error", error=e)
+            return False
@@ -70,17 +70,20 @@ from afkak.common import (
     OFFSET_LATEST)
 from afkak.consumer import Consumer
 from twisted.internet import reactor
-from twisted.internet.defer import DeferredList, inlineCallbacks
+from twisted.internet.defer import DeferredList, inlineCallbacks, \
+    returnValue
 from twisted.python.failure import Failure
 from twisted.internet.task import LoopingCall
 
+from common.utils.asleep import asleep
 from common.utils.consulhelpers import get_endpoint_from_consul
-import requests
+from common.utils.kpi_decoder import KpiDecoder
 import json
 import re
 import sys
 import time
 from dashd.dash_template import DashTemplate
+from dashd.grafana_client import GrafanaClient
 
 log = get_logger()
 
@@ -97,7 +100,16 @@ class DashDaemon(object):
         self.timer_duration = 600
         self.topic = topic
         self.dash_template = DashTemplate(grafana_url)
+        self.kpi_decoder = KpiDecoder()
         self.grafana_url = grafana_url
+        self.grafana = GrafanaClient(grafana_url)
+        # KPI prefix -> (device, device id, port), or None if of no interest
+        self.prefix_cache = {}
+        # Ids of the devices which dashboards need to be (re)created, and of
+        # those being posted
+        self.dirty = set()
+        self.posting = set()
+        self.publishing = None
         self.kafka_endpoint = None
         self.consul_endpoint = consul_endpoint
         retrys = 10
@@ -164,41 +176,19 @@ class DashDaemon(object):
         # they'll be deleted. If they are valid then they'll persist.
         #print("Starting main loop")
         try:
-            retrys = 10
-            while True:
-                r = requests.get(self.grafana_url + "/datasources")
-                if r.status_code == requests.codes.ok:
-                    break
-                else:
-                    retrys -= 1
-                    if retrys == 0:
-                        log.error("unable-to-communicate-with-grafana")
-                        self.stop()
-                    time.sleep(10)
-            j = r.json()
+            j = yield self.get_with_retries("/datasources")
             data_source = False
             for i in j:
                 if i["name"] == "Voltha Stats":
                      data_source = True
                      break
             if not data_source:
-                r = requests.post(self.grafana_url + "/datasources",
-                data = {"name":"Voltha Stats","type":"graphite",
-                        "access":"proxy","url":"http://localhost:81"})
-                log.info('data-source-added',status=r.status_code, text=r.text)
-
-            retrys = 10
-            while True:
-                r = requests.get(self.grafana_url + "/search?")
-                if r.status_code == requests.codes.ok:
-                    break
-                else:
-                    retrys -= 1
-                    if retrys == 0:
-                        log.error("unable-to-communicate-with-grafana")
-                        self.stop()
-                    time.sleep(10)
-            j = r.json()
+                r = yield self.grafana.post("/datasources",
+                {"name":"Voltha Stats","type":"graphite",
+                 "access":"proxy","url":"http://localhost:81"})
+                log.info('data-source-added', result=r)
+
+            j = yield self.get_with_retries("/search?")
             for i in j:
                 # Look for dashboards that have a title of *olt.[[:hexidgit:]].
                 # These will be the ones of interest. Others should just be left
@@ -237,6 +227,9 @@ class DashDaemon(object):
                             log.info("FIXME:-Should-delete-the-dashboard-here",
                                      dashboard=dashboard)
                             pass
+                    # Retry the dashboards that failed to be posted
+                    if self.dirty:
+                        self.schedule_publish()
                 except:
                     e = sys.exc_info()
                     log.error("error", error=e)
@@ -252,11 +245,17 @@ class DashDaemon(object):
                     # convenient) to check if a template dashboard has been defined
                     # in Grafana. If it has been, replace the built in template
                     # with the one provided
-                    r = requests.get(self.grafana_url + "/search?query=template")
-                    db = r.json()
+                    db = yield self.grafana.get("/search?query=template")
                     if len(db) == 1:
-                        # Apply the template
-                        yield self.dash_template.apply_template(db[0])
+                        # Apply the template, and if it changed recreate the
+                        # dashboards with it
+                        template = yield self.grafana.get(
+                            "/dashboards/" + db[0]['uri'])
+                        if self.dash_template.apply_template(template):
+                            self.dirty.update(
+                                device_id for device_id, meta in
+                                self.dash_meta.iteritems() if meta['ports'])
+                            self.schedule_publish()
                     elif len(db) != 0:
                         # This is an error, log it.
                         log.warning("More-than-one-template-provided-ignoring")
@@ -301,123 +300,143 @@ class DashDaemon(object):
 
         dl.addBoth(_stop_reactor)
 
+    @inlineCallbacks
+    def get_with_retries(self, path):
+        retrys = 10
+        while True:
+            try:
+                result = yield self.grafana.get(path)
+                returnValue(result)
+            except Exception, e:
+                retrys -= 1
+                if retrys == 0:
+                    log.error("unable-to-communicate-with-grafana", error=e)
+                    self.stop()
+                    raise
+                yield asleep(10)
+
+    def parse_prefix(self, key):
+        # Returns the (device, device id, port) of a KPI prefix of an olt,
+        # looking the prefix up with a regular expression only once
+        try:
+            return self.prefix_cache[key]
+        except KeyError:
+            pass
+        if len(self.prefix_cache) >= 100000:
+            self.prefix_cache.clear()
+        match = re.search(r'voltha\.(.*olt)\.([0-9a-zA-Z]+)\.(.*)',key)
+        parsed = self.prefix_cache[key] = match.groups() if match else None
+        return parsed
+
     def check_for_dashboard(self, msg):
         need_dash = {}
-        done = {}
+        done = set()
         # Extract the ids for all olt(s) in the message and do one of 2
         # things. If it exists, reset the meta_data timer for the dashboard and
-        # if it doesn't exist add it to the array of needed dashboards.
-        metrics = json.loads(getattr(msg.message,'value'))['prefixes']
-        for key in metrics.keys():
-            match = re.search(r'voltha\.(.*olt)\.([0-9a-zA-Z]+)\.(.*)',key)
-            if match and match.lastindex > 1:
-                if match.group(2) in self.dash_meta and match.group(2) not in done:
-                    # Update the delete countdown timer
-                    self.dash_meta[match.group(2)]['timer'] = self.timer_duration
-                    done[match.group(2)] = True
-                    # Issue a log if the reset if somewhat relevant.
-                    if self.dash_meta[match.group(2)]['timer'] < \
-                    self.timer_duration - self.timer_resolution:
-                        log.info("reset-timer",device=match.group(2))
-                    #print("reset timer for: %s" %match.group(2))
-                else:
-                    # No dahsboard exists,
-                    need_dash[key] = metrics[key]
+        # if it doesn't exist or it has new ports or metrics add it to the
+        # array of needed dashboards.
+        metrics = self.kpi_decoder.prefixes(
+            json.loads(getattr(msg.message,'value')))
+        for key, names in metrics.iteritems():
+            parsed = self.parse_prefix(key)
+            if parsed is None:
+                continue
+            device, device_id, port = parsed
+            meta = self.dash_meta.get(device_id)
+            if meta is None:
+                # No dahsboard exists,
+                need_dash[key] = sorted(names)
+                continue
+            if device_id not in done:
+                # Issue a log if the reset if somewhat relevant.
+                if meta['timer'] < \
+                self.timer_duration - self.timer_resolution:
+                    log.info("reset-timer",device=device_id)
+                # Update the delete countdown timer
+                meta['timer'] = self.timer_duration
+                done.add(device_id)
+            names = sorted(names)
+            if meta['ports'].get(port) != names:
+                need_dash[key] = names
         return need_dash
 
+    def schedule_publish(self):
+        # The dashboards are (re)created once per reactor turn, so that the
+        # changes brought by a batch of messages get posted once
+        if self.publishing is None:
+            self.publishing = reactor.callLater(0, self.publish_dashboards)
+
+    def publish_dashboards(self):
+        self.publishing = None
+        # A dashboard being posted is posted again once done with
+        createList = self.dirty.difference(self.posting)
+        self.dirty.intersection_update(self.posting)
+        if len(createList) != 0:
+            self.create_dashboards(createList)
+
     def create_dashboards(self, createList):
-        dataIds = "ABCDEFGHIJKLMNOP"
+        # Render the dashboards from the compiled template and post them,
+        # without waiting for Grafana
+        template = self.dash_template.compiled()
         for dash in createList:
-            #log.info("creating a dashboard for: %s" % self.dash_meta[dash])
-            # Create one row per "interface"
-            # Create one panel per metric type for the time being it's one
-            # panel for byte stats and one panel for packet stats.
-            newDash = json.loads(self.dash_template.dashBoard)
-            newDash['dashboard']['title'] = self.dash_meta[dash]['device'] + \
-                    '.' + dash
-            # The port is the main grouping attribute
-            for port in self.dash_meta[dash]['ports']:
-                # Add in the rows for the port specified by the template
-                for row in self.dash_template.rows:
-                    r = json.loads(self.dash_template.dashRow)
-                    r['title'] = re.sub(r'%port%',port, row['title'])
-                    p = {}
-                    # Add the panels to the row per the template
-                    panelId = 1
-                    for panel in self.dash_template.panels:
-                        p = json.loads(self.dash_template.dashPanel)
-                        p['id'] = panelId
-                        panelId += 1
-                        p['title'] = re.sub(r'%port%', port.upper(), panel['title'])
-                        t = {}
-                        dataId = 0
-                        # Add the targets to the panel
-                        for dpoint in sorted(self.dash_meta[dash]['ports'][port]):
-                            if dpoint in panel:
-                                t['refId'] = dataIds[dataId]
-                                db = re.sub(r'%port%',port,panel[dpoint])
-                                db = re.sub(r'%device%',
-                                            self.dash_meta[dash]['device'],db)
-                                db = re.sub(r'%deviceId%', dash,db)
-                                t['target'] = db
-                                p['targets'].append(t.copy())
-                                dataId += 1
-                        r['panels'].append(p.copy())
-                    newDash['dashboard']['rows'].append(r.copy())
-            #print("NEW DASHBOARD: ",json.dumps(newDash))
-            #print(r.json())
-            r = \
-            requests.post(self.grafana_url + "/dashboards/db",
-                          json=newDash)
-            self.dash_meta[dash]['slug'] = r.json()['slug']
+            meta = self.dash_meta.get(dash)
+            if meta is None or not meta['ports']:
+                continue
+            newDash = template.render(meta['device'], dash, meta['ports'])
+            self.posting.add(dash)
+            d = self.grafana.post("/dashboards/db", newDash)
+            d.addCallbacks(self._dashboard_created, self._dashboard_failed,
+                           callbackArgs=(dash,), errbackArgs=(dash,))
+
+    def _dashboard_created(self, result, dash):
+        self.posting.discard(dash)
+        if dash in self.dash_meta:
+            self.dash_meta[dash]['slug'] = result['slug']
             self.dash_meta[dash]['created'] = True
-            log.info("created-dashboard", slug=self.dash_meta[dash]['slug'])
+            log.info("created-dashboard", slug=result['slug'])
+        if dash in self.dirty:
+            self.schedule_publish()
+
+    def _dashboard_failed(self, failure, dash):
+        # Retried by the countdown processor
+        self.posting.discard(dash)
+        self.dirty.add(dash)
+        log.error("failed-to-create-dashboard", dashboard=dash,
+                  error=failure.getErrorMessage())
 
     def msg_processor(self, consumer, msglist):
         try:
-            createList = []
             for msg in msglist:
                 # Reset the timer for existing dashboards and get back a dict
-                # of of dashboards to create if any.
+                # of the ports of dashboards to create or update if any.
                 need_dash = self.check_for_dashboard(msg)
-                # Now populate the meta data for all missing dashboards
-                for key in need_dash.keys():
-                    match = re.search(r'voltha\.(.*olt)\.([0-9a-zA-Z]+)\.(.*)',key)
-                    if match and match.lastindex > 2:
-                        if match.group(2) in self.dash_meta:
-                            # The entry will have been created when the first
-                            # port in the record was encountered so just
-                            # populate the metrics and port info.
-                            # TODO: The keys below are the names of the metrics
-                            # that are in the Kafka record. This auto-discovery
-                            # is fine if all that's needed are raw metrics. If
-                            # metrics are "cooked" by a downstream process and
-                            # subsequently fed to graphite/carbon without being
-                            # re-posted to Kafka, discovery becomes impossible.
-                            # In those cases and in cases where finer grain
-                            # control of what's displayed is required, a config
-                            # file would be necessary.
-                            self.dash_meta[match.group(2)]['ports'][match.group(3)] = \
-                            need_dash[key]['metrics'].keys()
-                        else:
-                            # Not there, create a meta-data record for the
-                            # device and add this port.
-                            #print("Adding meta data for", match.group(1),
-                            #      match.group(2))
-                            createList.append(match.group(2))
-                            self.dash_meta[match.group(2)] = {}
-                            self.dash_meta[match.group(2)]['timer'] = 600
-                            self.dash_meta[match.group(2)]['device'] = match.group(1)
-                            self.dash_meta[match.group(2)]['created'] = False
-                            self.dash_meta[match.group(2)]['ports'] = {}
-                            #print("Adding port", match.group(3), "to", match.group(1),
-                            #      match.group(2))
-                            self.dash_meta[match.group(2)]['ports'][match.group(3)] = \
-                            need_dash[key]['metrics'].keys()
+                # Now populate the meta data for them
+                for key, names in need_dash.iteritems():
+                    device, device_id, port = self.parse_prefix(key)
+                    if device_id not in self.dash_meta:
+                        # Not there, create a meta-data record for the
+                        # device.
+                        self.dash_meta[device_id] = {
+                            'timer': self.timer_duration,
+                            'device': device,
+                            'created': False,
+                            'ports': {}
+                        }
+                    # TODO: The keys below are the names of the metrics
+                    # that are in the Kafka record. This auto-discovery
+                    # is fine if all that's needed are raw metrics. If
+                    # metrics are "cooked" by a downstream process and
+                    # subsequently fed to graphite/carbon without being
+                    # re-posted to Kafka, discovery becomes impossible.
+                    # In those cases and in cases where finer grain
+                    # control of what's displayed is required, a config
+                    # file would be necessary.
+                    self.dash_meta[device_id]['ports'][port] = names
+                    self.dirty.add(device_id)
             # Now go ahead and create the dashboards using the meta data that
-            # wwas just populated for them.
-            if len(createList) != 0: # Create any missing dashboards.
-                   self.create_dashboards(createList)
+            # was just populated for them.
+            if self.dirty:
+                self.schedule_publish()
         except:
             e = sys.exc_info()
             log.error("error", error=e)
@@ -22,16 +22,19 @@ semantics are derived from the recovered schema.
 
 import os
 import sys
-from zlib import decompress
+from collections import OrderedDict
+from time import time
 
 import grpc
 from grpc._channel import _Rendezvous
 from structlog import get_logger
-from twisted.internet import reactor
-from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet import reactor, threads
+from twisted.internet.defer import inlineCallbacks, returnValue, \
+    DeferredSemaphore
 from werkzeug.exceptions import ServiceUnavailable
 
 from common.utils.asleep import asleep
+from common.utils.grpc_utils import future_to_deferred
 from netconf.protos import third_party
 from netconf.protos.schema_pb2 import SchemaServiceStub
 from google.protobuf.empty_pb2 import Empty
@@ -41,6 +44,7 @@ from common.utils.consulhelpers import get_endpoint_from_consul
 # from google.protobuf import empty_pb2
 # from google.protobuf.json_format import MessageToDict, ParseDict
 from nc_rpc_mapper import get_nc_rpc_mapper_instance
+from schema_compiler import SchemaCompiler
 from google.protobuf import descriptor
 import base64
 import math
@@ -66,10 +70,30 @@ class GrpcClient(object):
     """
     RETRY_BACKOFF = [0.05, 0.1, 0.2, 0.5, 1, 2, 5]
 
+    # responses of the methods with this prefix are cached for a little
+    # while; these are idempotent and a NETCONF <get> often results in the
+    # same few of them being called over and over
+    CACHED_METHOD_PREFIX = 'List'
+
     def __init__(self, consul_endpoint, work_dir,
                  grpc_endpoint='localhost:50055',
                  reconnect_callback=None,
-                 on_start_callback=None):
+                 on_start_callback=None,
+                 config=None):
+        """
+        :param config: optional dict with:
+            max_concurrent_calls: the maximum number of outstanding calls to
+                voltha, any further call waits for one of them to complete
+            deadline: the default deadline of a call, in seconds
+            deadlines: the deadlines of specific methods, by method name
+            cache_ttl: how long to keep the responses of the List methods,
+                in seconds (0 disables the cache)
+            max_cached_responses: the maximum number of cached responses
+            compile_workers: the number of proto files compiled at once
+            max_compiled_cached: the maximum number of compiled proto files
+                kept in the work directory, for the schemas to come
+        """
+        config = config or {}
         self.consul_endpoint = consul_endpoint
         self.grpc_endpoint = grpc_endpoint
         self.work_dir = work_dir
@@ -78,6 +102,10 @@ class GrpcClient(object):
 
         self.plugin_dir = os.path.abspath(os.path.join(
             os.path.dirname(__file__), '../protoc_plugins'))
+        self.schema_compiler = SchemaCompiler(
+            work_dir, self.plugin_dir,
+            max_workers=config.get('compile_workers', 4),
+            max_cached=config.get('max_compiled_cached', 256))
 
         self.yang_schemas = set()
 
@@ -88,6 +116,13 @@ class GrpcClient(object):
         self.shutting_down = False
         self.connected = False
 
+        self.calls = DeferredSemaphore(config.get('max_concurrent_calls', 8))
+        self.deadline = config.get('deadline', 10)
+        self.deadlines = config.get('deadlines', {})
+        self.cache_ttl = config.get('cache_ttl', 2)
+        self.max_cached_responses = config.get('max_cached_responses', 256)
+        self.response_cache = OrderedDict()  # key -> (expiry, response)
+
     def start(self):
         log.debug('starting')
         if not self.connected:
@@ -143,9 +178,12 @@ class GrpcClient(object):
                 self.channel = grpc.insecure_channel(
                     '{}:{}'.format(host, port))
 
-                yang_from = self._retrieve_schema()
-                log.info('proto-to-yang-schema', file=yang_from)
-                self._compile_proto_files(yang_from)
+                schemas = self._retrieve_schema()
+                log.info('proto-to-yang-schema', file=schemas.yang_from)
+                # compiled off the reactor thread, as it may take a while
+                changed = yield threads.deferToThread(
+                    self.schema_compiler.update, schemas)
+                self._load_modules(changed)
                 self._set_yang_schemas()
 
                 self._clear_backoff()
@@ -187,97 +225,20 @@ class GrpcClient(object):
 
     def _retrieve_schema(self):
         """
-        Retrieve schema from gRPC end-point, and save all *.proto files in
-        the work directory.
+        Retrieve schema from gRPC end-point.
         """
         assert isinstance(self.channel, grpc.Channel)
         stub = SchemaServiceStub(self.channel)
-        # try:
-        schemas = stub.GetSchema(Empty())
-        # except _Rendezvous, e:
-        #     if e.code == grpc.StatusCode.UNAVAILABLE:
-        #
-        #     else:
-        #         raise e
-
-        os.system('mkdir -p %s' % self.work_dir)
-        os.system('rm -fr /tmp/%s/*' %
-                  self.work_dir.replace('/tmp/', ''))  # safer
-
-        for proto_file in schemas.protos:
-            proto_fname = proto_file.file_name
-            # TODO: Do we need to process a set of files using a prefix
-            # instead of just one?
-            proto_content = proto_file.proto
-            log.info('saving-proto', fname=proto_fname, dir=self.work_dir,
-                     length=len(proto_content))
-            with open(os.path.join(self.work_dir, proto_fname), 'w') as f:
-                f.write(proto_content)
-
-            desc_content = decompress(proto_file.descriptor)
-            desc_fname = proto_fname.replace('.proto', '.desc')
-            log.info('saving-descriptor', fname=desc_fname, dir=self.work_dir,
-                     length=len(desc_content))
-            with open(os.path.join(self.work_dir, desc_fname), 'wb') as f:
-                f.write(desc_content)
-        return schemas.yang_from
-
-    def _compile_proto_files(self, yang_from):
+        return stub.GetSchema(Empty())
+
+    def _load_modules(self, changed):
         """
-        For each *.proto file in the work directory, compile the proto
-        file into the respective *_pb2.py file as well as generate the
-        corresponding yang schema.
-        :return: None
+        Load the generated modules, unless they are loaded already and did
+        not change, as when reconnecting to the same (version of) voltha.
         """
-        log.info('start')
-        google_api_dir = os.path.abspath(os.path.join(
-            os.path.dirname(__file__), '../protos/third_party'
-        ))
-
-        log.info('google-api', api_dir=google_api_dir)
-
-        netconf_base_dir = os.path.abspath(os.path.join(
-            os.path.dirname(__file__), '../..'
-        ))
-        log.info('netconf-dir', dir=netconf_base_dir)
-
-        for fname in [f for f in os.listdir(self.work_dir)
-                      if f.endswith('.proto')]:
-            log.info('filename', file=fname)
-
-            need_yang = fname == yang_from
-            log.debug('compiling',
-                      file=fname,
-                      yang_schema_required=need_yang)
-            cmd = (
-                'cd %s && '
-                'env PATH=%s PYTHONPATH=%s '
-                'python -m grpc.tools.protoc '
-                '-I. '
-                '-I%s '
-                '--python_out=. '
-                '--grpc_python_out=. '
-                '--plugin=protoc-gen-gw=%s/rpc_gw_gen.py '
-                '--gw_out=. '
-                '--plugin=protoc-gen-custom=%s/proto2yang.py '
-                '%s'
-                '%s' % (
-                    self.work_dir,
-                    ':'.join([os.environ['PATH'], self.plugin_dir]),
-                    ':'.join([google_api_dir, netconf_base_dir]),
-                    google_api_dir,
-                    self.plugin_dir,
-                    self.plugin_dir,
-                    '--custom_out=. ' if need_yang else '',
-                    fname)
-            )
-            log.debug('executing', cmd=cmd, file=fname)
-            os.system(cmd)
-            log.info('compiled', file=fname)
-
-        # Load the generated modules
         mapper = get_nc_rpc_mapper_instance(self.work_dir, self)
-        mapper.load_modules()
+        if changed or not mapper.loaded:
+            mapper.load_modules()
 
     def _set_yang_schemas(self):
         if self.work_dir not in sys.path:
@@ -313,24 +274,12 @@ class GrpcClient(object):
             # and method
             fields = mapper.get_fields_from_yang_defs(service, method)
 
-            # Check if this represents a List and whether the field name is
-            # items.  In the response (a dictionary), if a list named 'items'
-            # is returned then 'items' can either:
-            # 1) represent a list of items being returned where 'items' is just
-            # a name to represent a list. In this case, this name will be
-            # discarded
-            # 2) represent the actual field name as defined in the proto
-            # definitions.  If this is the case then we need to preserve the
-            # name
-            list_item_name = ''
-            if fields: # if the return type is empty then fields will be None
-                if len(fields) == 1:
-                    if fields[0]['name'] == 'items':
-                        list_item_name = 'items'
+            list_item_name = self._get_list_item_name(fields)
 
             # Rearrange the dictionary response as specified by the YANG
             # definitions
-            rearranged_response = self.rearrange_dict(mapper, response, fields)
+            rearranged_response = self.rearrange_dict(
+                response, mapper.get_field_plan_from_yang_defs(service, method))
 
             log.info('rpc-result', service=service, method=method,
                      response=response,
@@ -343,35 +292,82 @@ class GrpcClient(object):
             log.exception('rpc-failure', service=service, method=method,
                           params=params, e=e)
 
-    def rearrange_dict(self, mapper, orig_dict, fields):
-        log.debug('rearranging-dict', fields=fields)
+    @inlineCallbacks
+    def invoke_voltha_rpc_message(self, service, method, params,
+                                  metadata=None):
+        """
+        Same as invoke_voltha_rpc(), except that the response is returned as
+        is, as a protobuf message, along with the (module, message name) of
+        its YANG type, for it to be serialized by the YangXmlWriter.
+        :return: None if the generated modules do not support it, in which
+        case invoke_voltha_rpc() has to be used
+        """
+        mapper = get_nc_rpc_mapper_instance()
+        func = mapper.get_message_function(service, method)
+        return_type = mapper.get_return_type(service, method)
+        if func is None or return_type is None:
+            returnValue(None)
+
+        response = yield func(self, params, metadata)
+
+        xml_tag = mapper.get_xml_tag(service, method)
+        list_item_name = self._get_list_item_name(
+            mapper.get_fields_from_yang_defs(service, method))
+
+        log.info('rpc-result', service=service, method=method,
+                 xml_tag=xml_tag, list_item_name=list_item_name)
+
+        returnValue((response, return_type, (xml_tag, list_item_name)))
+
+    @staticmethod
+    def _get_list_item_name(fields):
+        # Check if this represents a List and whether the field name is
+        # items.  In the response (a dictionary), if a list named 'items'
+        # is returned then 'items' can either:
+        # 1) represent a list of items being returned where 'items' is just
+        # a name to represent a list. In this case, this name will be
+        # discarded
+        # 2) represent the actual field name as defined in the proto
+        # definitions.  If this is the case then we need to preserve the
+        # name
+        list_item_name = ''
+        if fields:  # if the return type is empty then fields will be None
+            if len(fields) == 1:
+                if fields[0]['name'] == 'items':
+                    list_item_name = 'items'
+        return list_item_name
+
+    def rearrange_dict(self, orig_dict, plan):
+        """
+        Only used with the generated modules lacking the get_message_*
+        functions, see invoke_voltha_rpc_message()
+        :param plan: the field plan of the type of orig_dict, as returned by
+        NetconfRPCMapper.get_field_plan()
+        :return: an OrderedDict of the YANG fields of orig_dict, in YANG
+        order, the nested messages being rearranged likewise
+        """
         result = collections.OrderedDict()
-        if len(orig_dict) == 0 or not fields:
+        if not orig_dict or not plan:
             return result
-        for f in fields:
-            if orig_dict.has_key(f['name']):
-                if f['type_ref']:
-                    # Get the fields for that type
-                    sub_fields = mapper.get_fields_from_type_name(f['module'],
-                                                                  f['type'])
-                    if f['repeated']:
-                        result[f['name']] = []
-                        for d in orig_dict[f['name']]:
-                            result[f['name']].append(self.rearrange_dict(
-                                mapper, d, sub_fields))
-                    else:
-                        result[f['name']] = self.rearrange_dict(mapper,
-                                                                orig_dict[
-                                                                    f['name']],
-                                                                sub_fields)
-                else:
-                    result[f['name']] = orig_dict[f['name']]
+        rearrange = self.rearrange_dict
+        for name, repeated, sub_plan, _ in plan:
+            if name not in orig_dict:
+                continue
+            value = orig_dict[name]
+            if sub_plan is None:
+                result[name] = value
+            elif repeated:
+                result[name] = [rearrange(d, sub_plan) for d in value]
+            else:
+                result[name] = rearrange(value, sub_plan)
         return result
 
     @inlineCallbacks
     def invoke(self, stub, method_name, request, metadata, retry=1):
         """
         Invoke a gRPC call to the remote server and return the response.
+        The call does not block the reactor; the responses of the List
+        methods may come from the cache.
         :param stub: Reference to the *_pb2 service stub
         :param method_name: The method name inside the service stub
         :param request: The request protobuf message
@@ -382,10 +378,26 @@ class GrpcClient(object):
         if not self.connected:
             raise ServiceUnavailable()
 
+        cache_key = None
+        if self.cache_ttl and method_name.startswith(
+                self.CACHED_METHOD_PREFIX):
+            cache_key = (stub.__name__, method_name,
+                         request.SerializeToString(), tuple(metadata or ()))
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                returnValue(cached)
+        else:
+            # anything else may change the state of voltha
+            self.response_cache.clear()
+
         try:
             method = getattr(stub(self.channel), method_name)
-            response, rendezvous = method.with_call(request, metadata=metadata)
-            returnValue((response, rendezvous.trailing_metadata()))
+            response = yield self.calls.run(
+                self._call, method, request, metadata,
+                self.deadlines.get(method_name, self.deadline))
+            if cache_key is not None:
+                self._cache_response(cache_key, response)
+            returnValue(response)
 
         except grpc._channel._Rendezvous, e:
             code = e.code()
@@ -401,6 +413,9 @@ class GrpcClient(object):
                                                      retry=retry - 1)
                         returnValue(response)
 
+            elif code == grpc.StatusCode.DEADLINE_EXCEEDED:
+                log.warn('grpc-deadline-exceeded', method=method_name)
+
             elif code in (
                     grpc.StatusCode.NOT_FOUND,
                     grpc.StatusCode.INVALID_ARGUMENT,
@@ -413,6 +428,29 @@ class GrpcClient(object):
 
             raise e
 
+    @staticmethod
+    def _call(method, request, metadata, timeout):
+        future = method.future(request, metadata=metadata, timeout=timeout)
+        d = future_to_deferred(future)
+        d.addCallback(lambda response: (response, future.trailing_metadata()))
+        return d
+
+    def _get_cached_response(self, key):
+        entry = self.response_cache.get(key)
+        if entry is None:
+            return None
+        expiry, response = entry
+        if expiry < time():
+            del self.response_cache[key]
+            return None
+        return response
+
+    def _cache_response(self, key, response):
+        self.response_cache.pop(key, None)
+        while len(self.response_cache) >= self.max_cached_responses:
+            self.response_cache.popitem(last=False)  # the oldest one
+        self.response_cache[key] = (time() + self.cache_ttl, response)
+
     # Below is an adaptation of Google's MessageToDict() which includes
     # protobuf options extensions
 
@@ -34,6 +34,9 @@ class NetconfRPCMapper:
         self.grpc_client = grpc_client
         self.rpc_map = {}
         self.yang_defs = {}
+        self.message_definitions = {}  # '<module>-<message>' -> fields
+        self.field_plans = {}  # (module, message) -> field plan
+        self.loaded = False
 
     def _add_rpc_map(self, func_name, func_ref):
         if not self.rpc_map.has_key(func_name):
@@ -59,6 +62,17 @@ class NetconfRPCMapper:
         if self.work_dir not in sys.path:
             sys.path.insert(0, self.work_dir)
 
+        # Forget the modules of a previous schema, for them to be loaded anew
+        self.rpc_map = {}
+        self.yang_defs = {}
+        self.message_definitions = {}
+        self.field_plans = {}
+        work_dir = os.path.abspath(self.work_dir)
+        for modname, m in sys.modules.items():
+            path = getattr(m, '__file__', None)
+            if path and os.path.dirname(os.path.abspath(path)) == work_dir:
+                del sys.modules[modname]
+
         for fname in [f for f in os.listdir(self.work_dir)
                       if f.endswith('_rpc_gw.py')]:
             modname = fname[:-len('.py')]
@@ -77,12 +91,24 @@ class NetconfRPCMapper:
                 m = __import__(modname)
                 for name, ref in self.list_functions(m):
                     self.yang_defs[name] = ref
+                self.message_definitions.update(
+                    getattr(m, 'message_definitions', {}))
             except Exception, e:
                 log.exception('loading-yang-module-exception', modname=modname,
                               e=e)
 
-    def get_fields_from_yang_defs(self, service, method):
-        # Get the return type of that method
+        # Plan the field order of all the message types now, rather than
+        # while serializing the responses
+        for full_name in self.message_definitions:
+            self.get_field_plan(*full_name.split('-', 1))
+        log.info('field-plans', count=len(self.field_plans))
+        self.loaded = True
+
+    def get_return_type(self, service, method):
+        """
+        :return: the (package, message name) of the type returned by a method,
+        or None if unknown
+        """
         func_name = self._get_function_name(service, method)
         return_type_func_name = ''.join(['get_return_type_', func_name])
         if self.rpc_map.has_key(return_type_func_name):
@@ -93,22 +119,63 @@ class NetconfRPCMapper:
                 # Type name is in the form "<package-name>_pb2".<message_name>
                 name = type_name.split('.')
                 if len(name) == 2:
-                    package = name[0][:-len('_pb2')]
-                    message_name = name[1]
-                    if self.yang_defs.has_key('get_fields'):
-                        return self.yang_defs['get_fields'](package,
-                                                            message_name)
+                    return name[0][:-len('_pb2')], name[1]
                 else:
                     log.info('Incorrect-type-format', type_name=type_name,
                              service=service,
                              method=method)
         return None
 
+    def get_fields_from_yang_defs(self, service, method):
+        # Get the return type of that method
+        return_type = self.get_return_type(service, method)
+        if return_type is not None:
+            return self.get_fields_from_type_name(*return_type)
+        return None
+
     def get_fields_from_type_name(self, module_name, type_name):
         if self.yang_defs.has_key('get_fields'):
             return self.yang_defs['get_fields'](module_name,
                                                 type_name)
 
+    def get_field_plan_from_yang_defs(self, service, method):
+        return_type = self.get_return_type(service, method)
+        if return_type is not None:
+            return self.get_field_plan(*return_type)
+        return None
+
+    def get_field_plan(self, module_name, type_name):
+        """
+        :return: the fields of a message type, in YANG order, as a list of
+        (name, repeated, plan, module) where plan is the field plan of the
+        type of the field if it is a message (empty if unknown), else None;
+        None if the message type is unknown. The plans are those the
+        YangXmlWriter lays out the responses with.
+        """
+        key = (module_name, type_name)
+        if key in self.field_plans:
+            return self.field_plans[key]
+        fields = self._get_fields(module_name, type_name)
+        if fields is None:
+            self.field_plans[key] = None
+            return None
+        # registered before planning the fields, for the recursive types
+        plan = self.field_plans[key] = []
+        for f in fields:
+            sub_plan = None
+            if f['type_ref']:
+                sub_plan = self.get_field_plan(f['module'], f['type'])
+                if sub_plan is None:
+                    sub_plan = []
+            plan.append((f['name'], f['repeated'], sub_plan, f['module']))
+        return plan
+
+    def _get_fields(self, module_name, type_name):
+        full_name = ''.join([module_name, '-', type_name])
+        if full_name in self.message_definitions:
+            return self.message_definitions[full_name]
+        return self.get_fields_from_type_name(module_name, type_name)
+
     def get_function(self, service, method):
 
         func_name = self._get_function_name(service, method)
@@ -118,6 +185,14 @@ class NetconfRPCMapper:
         else:
             return None
 
+    def get_message_function(self, service, method):
+        """
+        :return: the function invoking a method and returning its protobuf
+        response as is, or None if the generated module does not have it
+        """
+        func_name = self._get_function_name(service, method)
+        return self.rpc_map.get(''.join(['get_message_', func_name]))
+
     def get_xml_tag(self, service, method):
         func_name = self._get_function_name(service, method)
         xml_tag_func_name = ''.join(['get_xml_tag_', func_name])
@@ -0,0 +1,226 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Compilation of the proto files of the schema of voltha into the python
+modules and yang schemas of netconf, with a cache of the outputs.
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from hashlib import sha1
+from zlib import decompress
+
+from concurrent.futures import ThreadPoolExecutor
+from structlog import get_logger
+
+log = get_logger()
+
+IMPORT = re.compile(r'^\s*import\s+(?:public\s+|weak\s+)?"([^"]+)"\s*;',
+                    re.MULTILINE)
+
+
+class SchemaCompiler(object):
+    """
+    Write the proto files of a schema, as returned by GetSchema, along with
+    what they compile into, to the work directory.
+
+    The outputs of each proto file are kept under .cache in the work
+    directory, by a hash of the proto file, of those it imports and of the
+    protoc plugins. Only the files not compiled before, under any schema
+    seen, get compiled, in parallel. When the schema is the one already in
+    the work directory, nothing is written at all.
+    """
+
+    CACHE_DIR = '.cache'
+    KEY_FILE = '.schema-key'
+
+    def __init__(self, work_dir, plugin_dir, max_workers=4, max_cached=256):
+        self.work_dir = work_dir
+        self.cache_dir = os.path.join(work_dir, self.CACHE_DIR)
+        self.plugin_dir = plugin_dir
+        self.max_workers = max_workers
+        self.max_cached = max_cached  # compiled proto files
+
+        self.google_api_dir = os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../protos/third_party'))
+        self.netconf_base_dir = os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../..'))
+        self.netconf_protos_dir = os.path.abspath(os.path.join(
+            os.path.dirname(__file__), '../protos'))
+
+        # a change to the plugins invalidates what they generated
+        digest = sha1()
+        for fname in sorted(os.listdir(plugin_dir)):
+            if fname.endswith('.py'):
+                with open(os.path.join(plugin_dir, fname), 'rb') as f:
+                    digest.update(fname + '\0' + f.read())
+        self.fingerprint = digest.hexdigest()
+
+    def update(self, schemas):
+        """
+        :param schemas: Schemas, as returned by SchemaService.GetSchema
+        :return: whether the content of the work directory changed
+        """
+        protos = dict((p.file_name, p.proto) for p in schemas.protos)
+        keys = dict((fname, self._file_key(fname, protos, schemas.yang_from))
+                    for fname in protos)
+        digest = sha1()
+        for fname in sorted(keys):
+            digest.update(fname + '\0' + keys[fname] + '\0')
+        schema_key = digest.hexdigest()
+
+        if self._read_key() == schema_key:
+            log.info('schema-unchanged', key=schema_key)
+            return False
+
+        self._clear_work_dir()
+        for proto_file in schemas.protos:
+            proto_fname = proto_file.file_name
+            log.debug('saving-proto', fname=proto_fname, dir=self.work_dir,
+                      length=len(proto_file.proto))
+            with open(os.path.join(self.work_dir, proto_fname), 'w') as f:
+                f.write(proto_file.proto)
+            desc_fname = proto_fname.replace('.proto', '.desc')
+            with open(os.path.join(self.work_dir, desc_fname), 'wb') as f:
+                f.write(decompress(proto_file.descriptor))
+
+        missing = [fname for fname, key in keys.iteritems()
+                   if not os.path.isdir(self._cached(key))]
+        log.info('compiling', files=missing, cached=len(keys) - len(missing))
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            compiled = list(executor.map(
+                lambda fname: self._compile(
+                    fname, keys[fname], fname == schemas.yang_from),
+                missing))
+        finally:
+            executor.shutdown()
+
+        for key in keys.itervalues():
+            cached = self._cached(key)
+            if not os.path.isdir(cached):
+                continue  # failed to compile
+            os.utime(cached, None)
+            self._copy(cached, self.work_dir)
+
+        # what failed to compile is tried again on the next update
+        if all(compiled):
+            with open(os.path.join(self.work_dir, self.KEY_FILE), 'w') as f:
+                f.write(schema_key)
+        self._prune(set(keys.itervalues()))
+        return True
+
+    def _file_key(self, fname, protos, yang_from):
+        # the proto file and those it imports from the schema, in a stable
+        # order, as they all shape what the plugins generate
+        needed, pending = set(), [fname]
+        while pending:
+            name = pending.pop()
+            if name in needed or name not in protos:
+                continue
+            needed.add(name)
+            pending.extend(IMPORT.findall(protos[name]))
+        digest = sha1(self.fingerprint)
+        digest.update('yang' if fname == yang_from else 'no-yang')
+        for name in sorted(needed):
+            digest.update('\0' + name + '\0' + protos[name])
+        return digest.hexdigest()
+
+    def _cached(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_key(self):
+        try:
+            with open(os.path.join(self.work_dir, self.KEY_FILE)) as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def _clear_work_dir(self):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        for fname in os.listdir(self.work_dir):
+            if fname == self.CACHE_DIR:
+                continue
+            path = os.path.join(self.work_dir, fname)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    def _copy(self, src, dst):
+        # the plugins also generate files for the imported protos, in
+        # sub-directories shared with other proto files
+        for fname in os.listdir(src):
+            path = os.path.join(src, fname)
+            if os.path.isdir(path):
+                target = os.path.join(dst, fname)
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                self._copy(path, target)
+            else:
+                shutil.copyfile(path, os.path.join(dst, fname))
+
+    def _compile(self, fname, key, need_yang):
+        # into a directory of its own, renamed into the cache once complete
+        out_dir = tempfile.mkdtemp(prefix='tmp-', dir=self.cache_dir)
+        cmd = [
+            sys.executable, '-m', 'grpc.tools.protoc',
+            '-I.',
+            '-I%s' % self.google_api_dir,
+            '--python_out=%s' % out_dir,
+            '--grpc_python_out=%s' % out_dir,
+            '--plugin=protoc-gen-gw=%s/rpc_gw_gen.py' % self.plugin_dir,
+            '--gw_out=%s' % out_dir,
+            '--plugin=protoc-gen-custom=%s/proto2yang.py' % self.plugin_dir
+        ]
+        if need_yang:
+            cmd.append('--custom_out=%s' % out_dir)
+        cmd.append(fname)
+        env = dict(os.environ)
+        env['PATH'] = ':'.join([os.path.dirname(sys.executable),
+                                os.environ.get('PATH', ''), self.plugin_dir])
+        # the plugins import yang_options_pb2 as a top level module
+        env['PYTHONPATH'] = ':'.join([self.google_api_dir,
+                                      self.netconf_base_dir,
+                                      self.netconf_protos_dir])
+        log.debug('executing', cmd=cmd, file=fname)
+        process = subprocess.Popen(cmd, cwd=self.work_dir, env=env,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            log.error('compile-failed', file=fname, output=output)
+            shutil.rmtree(out_dir, ignore_errors=True)
+            return False
+        os.rename(out_dir, self._cached(key))
+        log.info('compiled', file=fname)
+        return True
+
+    def _prune(self, keep):
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            if key.startswith('tmp-'):  # left over by a crash
+                shutil.rmtree(self._cached(key), ignore_errors=True)
+            elif key not in keep:
+                entries.append((os.path.getmtime(self._cached(key)), key))
+        entries.sort(reverse=True)
+        for _, key in entries[max(self.max_cached - len(keep), 0):]:
+            shutil.rmtree(self._cached(key), ignore_errors=True)
@@ -273,7 +273,8 @@ class Main(object):
         args = self.args
 
         self.grpc_client = yield \
-            GrpcClient(args.consul, args.work_dir, args.grpc_endpoint)
+            GrpcClient(args.consul, args.work_dir, args.grpc_endpoint,
+                       config=self.config.get('grpc_client', {}))
 
         self.nc_server =  yield \
                 NCServer(args.netconf_port,
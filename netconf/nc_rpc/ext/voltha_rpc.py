@@ -47,7 +47,22 @@ class VolthaRpc(Rpc):
         log.info('voltha-rpc-request', session=self.session.session_id,
                  request=self.request)
 
-        # Execute the request
+        # Execute the request, getting the response as a protobuf message
+        # to stream the reply when the generated modules allow it
+        result = yield self.grpc_client.invoke_voltha_rpc_message(
+            service=self.service,
+            method=self.method,
+            params=self.request['params'],
+            metadata=self.metadata)
+        if result is not None:
+            message, return_type, yang_options = result
+            self.rpc_response.node = \
+                self.rpc_response.build_yang_response_stream(
+                    message, return_type, self.request,
+                    yang_options=yang_options, custom_rpc=True)
+            self.rpc_response.is_error = False
+            returnValue(self.rpc_response)
+
         res_dict, yang_options = yield self.grpc_client.invoke_voltha_rpc(
             service=self.service,
             method=self.method,
@@ -19,9 +19,14 @@
 import structlog
 from lxml import etree
 import netconf.nc_common.error as ncerror
+from netconf.nc_rpc.yang_xml_writer import get_yang_xml_writer_instance, \
+    IGNORE
 
 log = structlog.get_logger()
 
+# Placeholder for the content of a streamed reply
+STREAM_MARKER = 'voltha-netconf-stream-content'
+
 
 class RpcResponse():
     def __init__(self, capabilities):
@@ -32,6 +37,9 @@ class RpcResponse():
         self.close_session = False
         self.capabilities = capabilities
         self.custom_rpc = False
+        # when set, the reply content is generated by this iterable and
+        # reply_node only holds STREAM_MARKER in its place
+        self.stream = None
 
     def build_xml_response(self, request, voltha_response, custom_rpc=False):
         if request is None:
@@ -223,3 +231,40 @@ class RpcResponse():
             self.rpc_response.is_error = True
             self.rpc_response.node = ncerror.BadMsg(request)
             return
+
+    def build_yang_response_stream(self, message, return_type, request,
+                                   yang_options=None, custom_rpc=False):
+        """
+        Streamed counterpart of build_yang_response(), for a response still
+        in protobuf form: the content is only generated as the reply is sent.
+        :return: the reply node, with STREAM_MARKER in place of the content
+        """
+        self.custom_rpc = custom_rpc
+        writer = get_yang_xml_writer_instance()
+        module, type_name = return_type
+        xml_tag = yang_options[0]
+        list_items_name = yang_options[1]
+
+        # Same special case as in to_yang_xml() for the responses
+        # holding nothing but a list
+        list_tag = None
+        if writer.is_list_response(message, module, type_name):
+            if custom_rpc:
+                if list_items_name == 'items':
+                    list_tag = 'items'
+                else:
+                    list_tag = xml_tag or IGNORE
+            elif request.has_key('subclass'):
+                list_tag = request['subclass']
+                # remove the subclass element in request to avoid duplicate tag
+                del request['subclass']
+            elif list_items_name == 'items':
+                list_tag = xml_tag
+            else:
+                list_tag = IGNORE
+
+        self.stream = writer.iter_response(message, module, type_name,
+                                           list_tag)
+        placeholder = etree.Element('yang')
+        placeholder.text = STREAM_MARKER
+        return self.build_xml_response(request, placeholder, custom_rpc)
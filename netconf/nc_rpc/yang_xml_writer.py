@@ -0,0 +1,267 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Serialization of the protobuf responses of voltha straight to YANG XML text.
+
+This replaces, for the large replies, the protobuf -> dict -> rearranged
+dict -> dicttoxml -> lxml -> text pipeline of RpcResponse with a single walk
+of the protobuf message, which yields the XML one top level item (e.g., one
+device or one flow) at a time so that it can be sent as it is produced.
+"""
+import base64
+import math
+from xml.sax.saxutils import escape
+
+import structlog
+from google.protobuf import descriptor
+
+from netconf.grpc_client.nc_rpc_mapper import get_nc_rpc_mapper_instance
+
+log = structlog.get_logger()
+
+FD = descriptor.FieldDescriptor
+
+_FLOAT_TYPES = frozenset([FD.CPPTYPE_FLOAT, FD.CPPTYPE_DOUBLE])
+
+# Tag of the elements whose content is moved up to their parent (see
+# RpcResponse.to_yang_xml())
+IGNORE = 'ignore'
+
+# Field plan of the message types missing from the YANG definitions
+_NO_FIELDS = ()
+
+
+class YangField(object):
+    """How to find and serialize one YANG field of a protobuf message"""
+
+    __slots__ = ('name', 'inline', 'fd', 'repeated', 'is_map', 'is_message',
+                 'presence', 'module', 'plan')
+
+    def __init__(self, name, inline, fd, module, plan):
+        self.name = name
+        self.inline = inline  # name of the yang_inline_node field, if any
+        self.fd = fd
+        self.repeated = fd.label == FD.LABEL_REPEATED
+        self.is_map = self.repeated and YangXmlWriter.is_map_entry(fd)
+        self.is_message = fd.cpp_type == FD.CPPTYPE_MESSAGE
+        # as for the dict based serialization, singular messages and oneof
+        # members are only serialized when set, the other fields always are
+        self.presence = not self.repeated and (
+            self.is_message or fd.containing_oneof is not None)
+        self.module = module
+        self.plan = plan  # field plan of the message type, if a message
+
+
+class YangXmlWriter(object):
+    """
+    Serialize protobuf messages to XML, with the fields laid out as per
+    the YANG definitions the NETCONF client was given. The field layout of
+    each message type binds its field plan, as planned by the
+    NetconfRPCMapper when loading the generated modules, to the protobuf
+    descriptor, once.
+    """
+
+    instance = None
+
+    def __init__(self, mapper):
+        self.mapper = mapper
+        self.layouts = {}  # (message full name, id(plan)) -> [YangField]
+        self.field_plans = None  # those the layouts come from
+
+    @staticmethod
+    def is_map_entry(fd):
+        return (fd.type == FD.TYPE_MESSAGE and
+                fd.message_type.has_options and
+                fd.message_type.GetOptions().map_entry)
+
+    @staticmethod
+    def is_inline_node(fd):
+        for option, _ in fd.GetOptions().ListFields():
+            if option.full_name == 'voltha.yang_inline_node':
+                return True
+        return False
+
+    def plan(self, module, type_name):
+        """:return: the field plan of a YANG message type"""
+        return self.mapper.get_field_plan(module, type_name) or _NO_FIELDS
+
+    def layout(self, message_descriptor, plan):
+        """
+        :return: the list of YangField to serialize for a message, in YANG
+        order
+        """
+        if self.mapper.field_plans is not self.field_plans:
+            # the mapper loaded the modules of another schema
+            self.layouts = {}
+            self.field_plans = self.mapper.field_plans
+        # the plans live as long as the field_plans of the mapper
+        key = (message_descriptor.full_name, id(plan))
+        layout = self.layouts.get(key)
+        if layout is None:
+            layout = self.layouts[key] = \
+                self._make_layout(message_descriptor, plan)
+        return layout
+
+    def _make_layout(self, message_descriptor, plan):
+        if not plan:
+            return []
+
+        # The fields of a yang_inline_node field show up in the YANG
+        # definitions as fields of the message holding it
+        inline_fds = [fd for fd in message_descriptor.fields
+                      if fd.label != FD.LABEL_REPEATED and
+                      fd.cpp_type == FD.CPPTYPE_MESSAGE and
+                      self.is_inline_node(fd)]
+
+        layout = []
+        for name, _, sub_plan, module in plan:
+            inline = None
+            fd = message_descriptor.fields_by_name.get(name)
+            if fd is None:
+                for inline_fd in inline_fds:
+                    fd = inline_fd.message_type.fields_by_name.get(name)
+                    if fd is not None:
+                        inline = inline_fd.name
+                        break
+            if fd is None:
+                log.debug('yang-field-not-in-message', field=name,
+                          message=message_descriptor.full_name)
+                continue
+            layout.append(YangField(name, inline, fd, module, sub_plan))
+        return layout
+
+    def present_fields(self, message, layout):
+        """:return: the (field, message holding it) pairs to serialize"""
+        present = []
+        for field in layout:
+            holder = message
+            if field.inline is not None:
+                if not message.HasField(field.inline):
+                    continue
+                holder = getattr(message, field.inline)
+            if field.presence and not holder.HasField(field.fd.name):
+                continue
+            present.append((field, holder))
+        return present
+
+    def write_message(self, out, tag, message, plan):
+        """
+        Append the XML of a message to the out list. Its fields are written
+        without any enclosing element if the tag is IGNORE.
+        """
+        if tag != IGNORE:
+            out.append('<%s>' % tag)
+        mark = len(out)
+        layout = self.layout(message.DESCRIPTOR, plan)
+        for field, holder in self.present_fields(message, layout):
+            self.write_field(out, field.name, field,
+                             getattr(holder, field.fd.name))
+        if tag != IGNORE:
+            if len(out) == mark:
+                out[-1] = '<%s/>' % tag
+            else:
+                out.append('</%s>' % tag)
+
+    def write_field(self, out, tag, field, value):
+        if field.is_map:
+            key_fd = field.fd.message_type.fields_by_name['key']
+            value_fd = field.fd.message_type.fields_by_name['value']
+            for key in sorted(value):
+                out.append('<%s>' % tag)
+                self.write_scalar(out, 'key', key_fd, key)
+                if value_fd.cpp_type == FD.CPPTYPE_MESSAGE:
+                    self.write_message(out, 'value', value[key], self.plan(
+                        field.module, value_fd.message_type.name))
+                else:
+                    self.write_scalar(out, 'value', value_fd, value[key])
+                out.append('</%s>' % tag)
+        elif field.repeated:
+            for item in value:
+                self.write_item(out, tag, field, item)
+        else:
+            self.write_item(out, tag, field, value)
+
+    def write_item(self, out, tag, field, value):
+        if field.is_message:
+            self.write_message(out, tag, value, field.plan)
+        else:
+            self.write_scalar(out, tag, field.fd, value)
+
+    @staticmethod
+    def write_scalar(out, tag, fd, value):
+        text = YangXmlWriter.to_text(fd, value)
+        if text:
+            out.append('<%s>%s</%s>' % (tag, text, tag))
+        else:
+            out.append('<%s/>' % tag)
+
+    @staticmethod
+    def to_text(fd, value):
+        """Same conversions as GrpcClient.convertToDict() and dicttoxml"""
+        cpp_type = fd.cpp_type
+        if cpp_type == FD.CPPTYPE_STRING:
+            if fd.type == FD.TYPE_BYTES:
+                return base64.b64encode(value)
+            return escape(value)
+        if cpp_type == FD.CPPTYPE_BOOL:
+            return 'true' if value else 'false'
+        if cpp_type == FD.CPPTYPE_ENUM:
+            enum_value = fd.enum_type.values_by_number.get(value)
+            return enum_value.name if enum_value is not None else str(value)
+        if cpp_type in _FLOAT_TYPES:
+            if math.isinf(value):
+                return '-Infinity' if value < 0.0 else 'Infinity'
+            if math.isnan(value):
+                return 'NaN'
+        return str(value)
+
+    def is_list_response(self, message, module, type_name):
+        """:return: whether a response message holds nothing but a list"""
+        present = self.present_fields(message, self.layout(
+            message.DESCRIPTOR, self.plan(module, type_name)))
+        return len(present) == 1 and present[0][0].repeated and \
+            not present[0][0].is_map
+
+    def iter_response(self, message, module, type_name, list_tag=None):
+        """
+        Generate the XML of a response message as a sequence of strings, one
+        per top level item.
+        :param list_tag: for a list response (see is_list_response()), the
+        tag to use for its items instead of the name of the list, IGNORE to
+        flatten them
+        """
+        layout = self.layout(message.DESCRIPTOR, self.plan(module, type_name))
+        for field, holder in self.present_fields(message, layout):
+            tag = field.name
+            if list_tag is not None and (field.is_message or
+                                         list_tag != IGNORE):
+                tag = list_tag
+            value = getattr(holder, field.fd.name)
+            if field.repeated and not field.is_map:
+                for item in value:
+                    out = []
+                    self.write_item(out, tag, field, item)
+                    yield ''.join(out)
+            else:
+                out = []
+                self.write_field(out, tag, field, value)
+                yield ''.join(out)
+
+def get_yang_xml_writer_instance():
+    if YangXmlWriter.instance is None:
+        YangXmlWriter.instance = YangXmlWriter(get_nc_rpc_mapper_instance())
+    return YangXmlWriter.instance
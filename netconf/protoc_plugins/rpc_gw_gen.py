@@ -51,7 +51,7 @@ log = get_logger()
 {% for method in methods %}
 {% set method_name = method['service'].rpartition('.')[2] + '_' + method['method'] %}
 @inlineCallbacks
-def {{ method_name }}(grpc_client, params, metadata, **kw):
+def get_message_{{ method_name }}(grpc_client, params, metadata, **kw):
     log.info('{{ method_name }}', params=params, metadata=metadata, **kw)
     data = params
     data.update(kw)
@@ -63,6 +63,12 @@ def {{ method_name }}(grpc_client, params, metadata, **kw):
     res, _ = yield grpc_client.invoke(
         {{ type_map[method['service']] }}Stub,
         '{{ method['method'] }}', req, metadata)
+    returnValue(res)
+
+@inlineCallbacks
+def {{ method_name }}(grpc_client, params, metadata, **kw):
+    res = yield get_message_{{ method_name }}(grpc_client, params, metadata,
+                                              **kw)
     try:
         out_data = grpc_client.convertToDict(res)
     except AttributeError, e:
@@ -18,6 +18,7 @@ import structlog
 from hexdump import hexdump
 from twisted.internet import protocol
 from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.task import cooperate
 from common.utils.message_queue import MessageQueue
 from netconf.constants import Constants as C
 import re
@@ -82,6 +83,60 @@ class NetconfConnection(protocol.Protocol):
             # out = hexdump(chunk, result='return')
             self.transport.write('{}\n'.format(chunk))
 
+    def send_msg_stream(self, pieces, new_framing):
+        """
+        Send a message produced piece by piece, without ever holding all of
+        it: pieces are buffered until there is enough of them for a chunk,
+        and each chunk is written from its own reactor iteration so that
+        large messages do not hold other sessions up.
+        :param pieces: iterable of the (unicode) pieces of the message
+        :return: Deferred fired once the message is fully written
+        """
+        assert self.connected
+        return cooperate(self._write_chunks(pieces, new_framing)).whenDone()
+
+    def _write_chunks(self, pieces, new_framing):
+        maxsend = self.max_chunk - 64
+        buf = []
+        size = 0
+        sent = 0
+        for piece in pieces:
+            if isinstance(piece, unicode):
+                piece = piece.encode('utf-8')
+            buf.append(piece)
+            size += len(piece)
+            if size < maxsend:
+                continue
+            data = ''.join(buf)
+            while len(data) >= maxsend:
+                if not self.connected:
+                    return
+                self._write_chunk(data[:maxsend], new_framing)
+                sent += maxsend
+                data = data[maxsend:]
+                yield None
+            buf = [data]
+            size = len(data)
+
+        if not self.connected:
+            return
+        if size:
+            self._write_chunk(''.join(buf), new_framing)
+            sent += size
+        if new_framing:
+            self.transport.write('\n##\n')
+        else:
+            self.transport.write(C.DELIMITER)
+        log.info('sent-stream', size=sent,
+                 framing="1.1" if new_framing else "1.0")
+
+    def _write_chunk(self, data, new_framing):
+        log.debug('sending-chunk', size=len(data))
+        if new_framing:
+            # RFC 6242 chunked framing
+            self.transport.write('\n#{}\n'.format(len(data)))
+        self.transport.write(data)
+
     @inlineCallbacks
     def receive_msg_any(self, new_framing):
         assert self.connected
@@ -16,6 +16,7 @@
 #
 import structlog
 import io
+from itertools import chain
 from lxml import etree
 from lxml.builder import E
 from twisted.internet.defer import inlineCallbacks, returnValue, Deferred
@@ -23,7 +24,7 @@ from netconf.nc_rpc.rpc_factory import get_rpc_factory_instance
 from netconf.constants import Constants as C
 from netconf.nc_common.utils import qmap, ns, elm
 import netconf.nc_common.error as ncerror
-from netconf.nc_rpc.rpc_response import RpcResponse
+from netconf.nc_rpc.rpc_response import RpcResponse, STREAM_MARKER
 
 log = structlog.get_logger()
 
@@ -63,7 +64,7 @@ class NetconfProtocolHandler:
         msg = msg.decode('utf-8')
         self.send_message(msg)
 
-    def send_rpc_reply(self, rpc_reply, origmsg):
+    def _rpc_reply(self, rpc_reply, origmsg):
         reply = etree.Element(qmap(C.NC) + C.RPC_REPLY, attrib=origmsg.attrib,
                               nsmap=origmsg.nsmap)
         try:
@@ -71,21 +72,46 @@ class NetconfProtocolHandler:
             reply.append(rpc_reply)
         except AttributeError:
             reply.extend(rpc_reply)
-        ucode = etree.tounicode(reply, pretty_print=True)
-        log.info("RPC-Reply", reply=ucode)
-        self.send_message(ucode)
+        return reply
 
-    def send_custom_rpc_reply(self, rpc_reply, origmsg):
+    def _custom_rpc_reply(self, rpc_reply, origmsg):
         reply = etree.Element(qmap(C.NC) + C.RPC_REPLY, attrib=origmsg.attrib,
                               nsmap=rpc_reply.nsmap)
         try:
             reply.extend(rpc_reply.getchildren())
         except AttributeError:
             reply.extend(rpc_reply)
-        ucode = etree.tounicode(reply, pretty_print=True)
+        return reply
+
+    def send_rpc_reply(self, rpc_reply, origmsg):
+        ucode = etree.tounicode(self._rpc_reply(rpc_reply, origmsg),
+                                pretty_print=True)
+        log.info("RPC-Reply", reply=ucode)
+        self.send_message(ucode)
+
+    def send_custom_rpc_reply(self, rpc_reply, origmsg):
+        ucode = etree.tounicode(self._custom_rpc_reply(rpc_reply, origmsg),
+                                pretty_print=True)
         log.info("Custom-RPC-Reply", reply=ucode)
         self.send_message(ucode)
 
+    def send_rpc_reply_stream(self, response, origmsg):
+        """
+        Send the reply of a response with a streamed content (see
+        RpcResponse.build_yang_response_stream())
+        :return: Deferred fired once the reply is sent
+        """
+        if response.custom_rpc:
+            reply = self._custom_rpc_reply(response.node, origmsg)
+            reply.text = response.node.text  # the marker
+        else:
+            reply = self._rpc_reply(response.node, origmsg)
+        head, tail = etree.tounicode(reply).split(STREAM_MARKER)
+        log.info("RPC-Reply-stream", head=head, tail=tail)
+        return self.conn.send_msg_stream(
+            chain([C.XML_HEADER, head], response.stream, [tail]),
+            self.new_framing)
+
     def set_framing_version(self):
         if C.NETCONF_BASE_11 in self.capabilities.client_caps:
             self.new_framing = True
@@ -193,7 +219,17 @@ class NetconfProtocolHandler:
                              custom_rpc=response.custom_rpc,
                              response=response)
                     if not response.is_error:
-                        if response.custom_rpc:
+                        if response.stream is not None:
+                            try:
+                                yield self.send_rpc_reply_stream(response,
+                                                                 rpc)
+                            except Exception as e:
+                                # part of the reply may be out already, there
+                                # is no way to recover the framing
+                                log.exception('rpc-reply-stream-failure', e=e)
+                                self.close()
+                                return
+                        elif response.custom_rpc:
                             self.send_custom_rpc_reply(response.node, rpc)
                         else:
                             self.send_rpc_reply(response.node, rpc)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+We use this module to measure how fast the OpenFlow agent can frame, parse
+and build OpenFlow messages.
+
+The pack/unpack fast paths of loxi.of13.fastpath are timed against the
+generated code for the message types that dominate our traffic. Then a
+controller session
+(as raw bytes, e.g. the controller-to-agent half of a TCP stream saved with
+wireshark's "Follow TCP Stream") is replayed in transport sized chunks,
+both through the original string concatenating framer and through
+OpenFlowConnection. Without a recording, a synthetic session made of flow
+mods, packet outs, multipart requests and barriers is used. Run it with
+env.sh sourced:
+
+    python ofagent/benchmark.py [-r RECORDING] [-c CHUNK] [-n REPEAT]
+"""
+import argparse
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import loxi
+import loxi.of13 as ofp
+from loxi.of13 import fastpath
+from of_connection import OpenFlowConnection, OpenFlowFramer
+
+
+def mk_flow_add(i):
+    port = 16 + i
+    return ofp.message.flow_add(
+        xid=i, priority=1000, cookie=i, buffer_id=ofp.OFP_NO_BUFFER,
+        match=ofp.match([ofp.oxm.in_port(port), ofp.oxm.vlan_vid(0x1000),
+                         ofp.oxm.eth_type(0x800), ofp.oxm.ip_proto(17),
+                         ofp.oxm.udp_src(68), ofp.oxm.udp_dst(67)]),
+        instructions=[ofp.instruction.apply_actions([
+            ofp.action.push_vlan(ethertype=0x8100),
+            ofp.action.set_field(ofp.oxm.vlan_vid(0x1000 | (1000 + i))),
+            ofp.action.output(port=0)])])
+
+
+def mk_codec_samples():
+    flow_add = mk_flow_add(1)
+    stats_entries = []
+    for i in xrange(100):
+        flow = mk_flow_add(i)
+        stats_entries.append(ofp.flow_stats_entry(
+            priority=flow.priority, cookie=flow.cookie, match=flow.match,
+            instructions=flow.instructions, packet_count=i, byte_count=i))
+    return [
+        ('flow_add', flow_add),
+        ('packet_in', ofp.message.packet_in(
+            xid=1, buffer_id=ofp.OFP_NO_BUFFER, total_len=300,
+            reason=ofp.OFPR_ACTION, cookie=1,
+            match=ofp.match([ofp.oxm.in_port(16)]), data='\x00' * 300)),
+        ('packet_out', ofp.message.packet_out(
+            xid=1, buffer_id=ofp.OFP_NO_BUFFER, in_port=ofp.OFPP_CONTROLLER,
+            actions=[ofp.action.output(port=16)], data='\x00' * 300)),
+        ('flow_stats[100]', ofp.message.flow_stats_reply(
+            xid=1, entries=stats_entries)),
+    ]
+
+
+def timeit(fun, n):
+    t0 = time.time()
+    for _ in xrange(n):
+        fun()
+    return (time.time() - t0) / n
+
+
+def bench_codecs(n):
+    print 'pack/unpack, generated code vs fast path (usec per message):'
+    for name, msg in mk_codec_samples():
+        buf = msg.pack()
+        results = []
+        for install in (fastpath.uninstall, fastpath.install):
+            install()
+            assert msg.pack() == buf
+            results.append((
+                timeit(msg.pack, n),
+                timeit(lambda: ofp.message.parse_message(buf), n)))
+        (gen_pack, gen_unpack), (fast_pack, fast_unpack) = results
+        print '  %-16s pack %8.1f -> %8.1f (%4.1fx)  ' \
+            'unpack %8.1f -> %8.1f (%4.1fx)' % (
+                name, gen_pack * 1e6, fast_pack * 1e6, gen_pack / fast_pack,
+                gen_unpack * 1e6, fast_unpack * 1e6,
+                gen_unpack / fast_unpack)
+
+
+def mk_session(onus, size):
+    """A controller session provisioning the given number of ONUs"""
+    msgs = [ofp.message.hello(), ofp.message.features_request(),
+            ofp.message.port_desc_stats_request(),
+            ofp.message.flow_stats_request(
+                table_id=ofp.OFPTT_ALL, out_port=ofp.OFPP_ANY,
+                out_group=ofp.OFPG_ANY, match=ofp.match())]
+    for i in xrange(onus):
+        port = 16 + i
+        vid = 0x1000 | (1000 + i)
+        msgs.append(ofp.message.flow_add(
+            priority=1000, cookie=i, buffer_id=ofp.OFP_NO_BUFFER,
+            match=ofp.match([ofp.oxm.in_port(port), ofp.oxm.vlan_vid(0x1000)]),
+            instructions=[ofp.instruction.apply_actions([
+                ofp.action.set_field(ofp.oxm.vlan_vid(vid)),
+                ofp.action.output(port=0)])]))
+        msgs.append(ofp.message.flow_add(
+            priority=1000, cookie=i, buffer_id=ofp.OFP_NO_BUFFER,
+            match=ofp.match([ofp.oxm.in_port(0), ofp.oxm.vlan_vid(vid)]),
+            instructions=[ofp.instruction.apply_actions([
+                ofp.action.set_field(ofp.oxm.vlan_vid(0x1000)),
+                ofp.action.output(port=port)])]))
+        msgs.append(ofp.message.packet_out(
+            buffer_id=ofp.OFP_NO_BUFFER, in_port=ofp.OFPP_CONTROLLER,
+            actions=[ofp.action.output(port=port)], data='\x00' * size))
+        msgs.append(ofp.message.barrier_request())
+    for xid, msg in enumerate(msgs):
+        msg.xid = xid + 1
+    return ''.join(msg.pack() for msg in msgs), len(msgs)
+
+
+class LegacyFramer(object):
+    """The framing loop OpenFlowConnection.dataReceived used to have"""
+
+    def __init__(self, parse=True):
+        self.read_buffer = None
+        self.received = 0
+        self.parse = parse
+
+    def dataReceived(self, data):
+        buf = self.read_buffer
+        if buf:
+            buf += data
+        else:
+            buf = data
+
+        offset = 0
+        while offset < len(buf):
+            if offset + 8 > len(buf):
+                break
+            _version, _type, _len, _xid = \
+                ofp.message.parse_header(buf[offset:])
+            protocol = loxi.protocol(_version)
+            if (offset + _len) > len(buf):
+                break
+            rawmsg = buf[offset: offset + _len]
+            offset += _len
+            if self.parse:
+                protocol.message.parse_message(rawmsg)
+            self.received += 1
+
+        if offset == len(buf):
+            self.read_buffer = None
+        else:
+            self.read_buffer = buf[offset:]
+
+
+class FramingOnly(object):
+
+    def __init__(self):
+        self.framer = OpenFlowFramer()
+        self.received = 0
+
+    def dataReceived(self, data):
+        self.received += len(self.framer.feed(data))
+
+
+class CountingQueue(object):
+
+    def __init__(self):
+        self.received = 0
+
+    def put(self, msg):
+        self.received += 1
+
+
+def replay(name, receiver, chunks, count):
+    total = sum(len(chunk) for chunk in chunks)
+    t0 = time.time()
+    for chunk in chunks:
+        receiver.dataReceived(chunk)
+    elapsed = time.time() - t0
+    received = receiver.received if hasattr(receiver, 'received') \
+        else receiver.rx.received
+    assert received == count, (received, count)
+    print '%-14s %7d msgs in %.3fs: %8.0f msgs/s, %6.2f MB/s' % (
+        name, received, elapsed, received / elapsed,
+        total / elapsed / 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--recording',
+                        help='raw controller-to-agent byte stream to replay '
+                             '(default: synthetic session)')
+    parser.add_argument('-o', '--onus', type=int, default=512,
+                        help='ONUs provisioned by the synthetic session '
+                             '(default: 512)')
+    parser.add_argument('-c', '--chunk', type=int, default=65536,
+                        help='bytes per dataReceived call (default: 65536)')
+    parser.add_argument('-s', '--size', type=int, default=300,
+                        help='packet out payload size of the synthetic '
+                             'session (default: 300)')
+    parser.add_argument('-n', '--repeat', type=int, default=4,
+                        help='times to replay the session (default: 4)')
+    parser.add_argument('-i', '--iterations', type=int, default=2000,
+                        help='iterations per codec micro benchmark '
+                             '(default: 2000)')
+    args = parser.parse_args()
+
+    bench_codecs(args.iterations)
+
+    if args.recording:
+        with open(args.recording, 'rb') as f:
+            session = f.read()
+        count = 0
+        offset = 0
+        while offset + 8 <= len(session):
+            offset += ofp.message.parse_header(session[offset:])[2]
+            count += 1
+        session = session[:offset]
+    else:
+        session, count = mk_session(args.onus, args.size)
+
+    stream = session * args.repeat
+    count *= args.repeat
+    chunks = [stream[i:i + args.chunk]
+              for i in xrange(0, len(stream), args.chunk)]
+    print 'replaying %d bytes in %d chunks of up to %d bytes' % (
+        len(stream), len(chunks), args.chunk)
+
+    replay('legacy-framing', LegacyFramer(parse=False), chunks, count)
+    replay('framing', FramingOnly(), chunks, count)
+    replay('legacy', LegacyFramer(), chunks, count)
+    connection = OpenFlowConnection(agent=None)
+    connection.rx = CountingQueue()
+    replay('connection', connection, chunks, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,21 +17,16 @@ import os
 
 import sys
 
-from twisted.internet import reactor
-from twisted.internet.defer import Deferred, inlineCallbacks, returnValue
+from twisted.internet.defer import Deferred
 
-from common.utils.asleep import asleep
 from common.utils.consulhelpers import get_endpoint_from_consul
 from structlog import get_logger
 import grpc
-from grpc import StatusCode
-from grpc._channel import _Rendezvous
 from ofagent.protos import third_party
-from protos import voltha_pb2
+from protos.voltha_pb2 import LogicalDeviceEvent
 from grpc_client import GrpcClient
 
 from agent import Agent
-from google.protobuf.empty_pb2 import Empty
 
 
 log = get_logger()
@@ -40,7 +35,7 @@ log = get_logger()
 class ConnectionManager(object):
 
     def __init__(self, consul_endpoint, voltha_endpoint, controller_endpoint,
-                 voltha_retry_interval=0.5, devices_refresh_interval=5):
+                 voltha_retry_interval=0.5):
 
         log.info('init-connection-manager')
         self.controller_endpoint = controller_endpoint
@@ -54,7 +49,6 @@ class ConnectionManager(object):
         self.device_id_to_datapath_id_map = {}
 
         self.voltha_retry_interval = voltha_retry_interval
-        self.devices_refresh_interval = devices_refresh_interval
 
         self.running = False
 
@@ -70,12 +64,10 @@ class ConnectionManager(object):
         # Get voltha grpc endpoint
         self.channel = self.get_grpc_channel_with_voltha()
 
-        # Create shared gRPC API object
+        # Create shared gRPC API object, which also starts watching logical
+        # devices, see handle_logical_device_event
         self.grpc_client = GrpcClient(self, self.channel).start()
 
-        # Start monitoring logical devices and manage agents accordingly
-        reactor.callLater(0, self.monitor_logical_devices)
-
         log.info('started')
 
         return self
@@ -120,30 +112,6 @@ class ConnectionManager(object):
         log.info('Acquired a grpc channel to voltha')
         return channel
 
-    @inlineCallbacks
-    def get_list_of_logical_devices_from_voltha(self):
-
-        while True:
-            log.info('Retrieve devices from voltha')
-            try:
-                stub = voltha_pb2.VolthaLocalServiceStub(self.channel)
-                devices = stub.ListLogicalDevices(Empty()).items
-                for device in devices:
-                    log.info("Devices {} -> {}".format(device.id,
-                                                       device.datapath_id))
-                returnValue(devices)
-
-            except _Rendezvous, e:
-                if e.code() == StatusCode.UNAVAILABLE:
-                    os.system("kill -15 {}".format(os.getpid()))
-
-            except Exception as e:
-                log.error('Failure to retrieve devices from '
-                               'voltha: {}'.format(repr(e)))
-
-            log.info('reconnect', after_delay=self.voltha_retry_interval)
-            yield asleep(self.voltha_retry_interval)
-
     def refresh_agent_connections(self, devices):
         """
         Based on the new device list, update the following state in the class:
@@ -195,21 +163,27 @@ class ConnectionManager(object):
         del self.agent_map[datapath_id]
         del self.device_id_to_datapath_id_map[device_id]
 
-    @inlineCallbacks
-    def monitor_logical_devices(self):
-        while True:
-            # should change to a gRPC streaming call
-            # see https://jira.opencord.org/browse/CORD-821
+    def handle_logical_device_event(self, event):
+        """
+        Start and stop agents as logical devices come and go, as reported by
+        the WatchLogicalDevices stream.
+        :param event: LogicalDeviceEvent
+        :return: None
+        """
+        if event.type == LogicalDeviceEvent.SNAPSHOT:
+            self.refresh_agent_connections(event.logical_devices)
 
-            # get current list from Voltha
-            devices = yield self.get_list_of_logical_devices_from_voltha()
+        elif event.type == LogicalDeviceEvent.ADDED:
+            for device in event.logical_devices:
+                if device.datapath_id not in self.agent_map:
+                    self.create_agent(device)
 
-            # update agent list and mapping tables as needed
-            self.refresh_agent_connections(devices)
+        elif event.type == LogicalDeviceEvent.REMOVED:
+            for device in event.logical_devices:
+                if device.datapath_id in self.agent_map:
+                    self.delete_agent(device.datapath_id)
 
-            # wait before next poll
-            yield asleep(self.devices_refresh_interval)
-            log.info('Monitor connections')
+        log.debug('updated-agent-list', count=len(self.agent_map))
 
     def forward_packet_in(self, device_id, ofp_packet_in):
         datapath_id = self.device_id_to_datapath_id_map.get(device_id, None)
@@ -17,8 +17,8 @@
 """
 The gRPC client layer for the OpenFlow agent
 """
-from Queue import Queue, Empty
 import os
+import time
 
 from grpc import StatusCode
 from grpc._channel import _Rendezvous
@@ -27,13 +27,21 @@ from twisted.internet import reactor
 from twisted.internet import threads
 from twisted.internet.defer import inlineCallbacks, returnValue, DeferredQueue
 
+from common.utils.fair_queue import FairBatchQueue
 from protos.voltha_pb2 import ID, VolthaLocalServiceStub, FlowTableUpdate, \
-    FlowGroupTableUpdate, PacketOut
+    FlowGroupTableUpdate, PacketOut, PacketsOut, WatchLogicalDevicesRequest, \
+    FlowTableBulkUpdate, FlowTableMod, ofp_flow_mod
 from google.protobuf import empty_pb2
 
 
 log = get_logger()
 
+# max number of packet-outs queued per logical device before dropping them
+PACKET_OUT_QUEUE_DEPTH = 1024
+
+# max number of packets carried by a single PacketsOut message
+PACKET_OUT_BATCH_SIZE = 64
+
 
 class GrpcClient(object):
 
@@ -45,16 +53,15 @@ class GrpcClient(object):
 
         self.stopped = False
 
-        self.packet_out_queue = Queue()  # queue to send out PacketOut msgs
-        self.packet_in_queue = DeferredQueue()  # queue to receive PacketIn
+        # queue to send out PacketOut msgs, read by the packet stream thread
+        self.packet_out_queue = FairBatchQueue(PACKET_OUT_QUEUE_DEPTH)
         self.change_event_queue = DeferredQueue()  # queue change events
 
     def start(self):
         log.debug('starting')
-        self.start_packet_out_stream()
-        self.start_packet_in_stream()
+        self.start_packet_stream()
         self.start_change_event_in_stream()
-        reactor.callLater(0, self.packet_in_forwarder_loop)
+        self.start_logical_device_watch()
         reactor.callLater(0, self.change_event_processing_loop)
         log.info('started')
         return self
@@ -62,47 +69,30 @@ class GrpcClient(object):
     def stop(self):
         log.debug('stopping')
         self.stopped = True
+        self.packet_out_queue.close()
         log.info('stopped')
 
-    def start_packet_out_stream(self):
+    def start_packet_stream(self):
 
         def packet_generator():
             while 1:
-                try:
-                    packet = self.packet_out_queue.get(block=True, timeout=1.0)
-                except Empty:
-                    if self.stopped:
-                        return
-                else:
-                    yield packet
-
-        def stream_packets_out():
-            generator = packet_generator()
-            try:
-                self.local_stub.StreamPacketsOut(generator)
-            except _Rendezvous, e:
-                if e.code() == StatusCode.UNAVAILABLE:
-                    os.system("kill -15 {}".format(os.getpid()))
-
-        reactor.callInThread(stream_packets_out)
-
-    def start_packet_in_stream(self):
-
-        def receive_packet_in_stream():
-            streaming_rpc_method = self.local_stub.ReceivePacketsIn
-            iterator = streaming_rpc_method(empty_pb2.Empty())
+                packets = self.packet_out_queue.get_batch(
+                    PACKET_OUT_BATCH_SIZE)
+                if not packets:
+                    return  # we are stopping
+                yield PacketsOut(items=packets)
+
+        def stream_packets():
+            iterator = self.local_stub.StreamPackets(packet_generator())
             try:
-                for packet_in in iterator:
-                    reactor.callFromThread(self.packet_in_queue.put,
-                                           packet_in)
-                    log.debug('enqued-packet-in',
-                              packet_in=packet_in,
-                              queue_len=len(self.packet_in_queue.pending))
+                for packets_in in iterator:
+                    reactor.callFromThread(self.forward_packets_in,
+                                           packets_in.items)
             except _Rendezvous, e:
                 if e.code() == StatusCode.UNAVAILABLE:
                     os.system("kill -15 {}".format(os.getpid()))
 
-        reactor.callInThread(receive_packet_in_stream)
+        reactor.callInThread(stream_packets)
 
     def start_change_event_in_stream(self):
 
@@ -121,6 +111,32 @@ class GrpcClient(object):
 
         reactor.callInThread(receive_change_events)
 
+    def start_logical_device_watch(self):
+
+        def watch_logical_devices():
+            resync_token = ''
+            while not self.stopped:
+                request = WatchLogicalDevicesRequest(resync_token=resync_token)
+                try:
+                    for event in self.local_stub.WatchLogicalDevices(request):
+                        resync_token = event.resync_token
+                        reactor.callFromThread(
+                            self.connection_manager.handle_logical_device_event,
+                            event)
+                except _Rendezvous, e:
+                    if e.code() == StatusCode.UNAVAILABLE:
+                        os.system("kill -15 {}".format(os.getpid()))
+                    log.error('logical-device-watch-failed', e=e)
+
+                # the stream also ends when we fall behind; watch again,
+                # picking up from the last event we got
+                log.info('rewatch-logical-devices',
+                         resync_token=resync_token,
+                         after_delay=self.connection_manager.voltha_retry_interval)
+                time.sleep(self.connection_manager.voltha_retry_interval)
+
+        reactor.callInThread(watch_logical_devices)
+
     @inlineCallbacks
     def change_event_processing_loop(self):
         while True:
@@ -133,19 +149,15 @@ class GrpcClient(object):
             if self.stopped:
                 break
 
-    @inlineCallbacks
-    def packet_in_forwarder_loop(self):
-        while True:
-            packet_in = yield self.packet_in_queue.get()
-            device_id = packet_in.id
-            ofp_packet_in = packet_in.packet_in
-            self.connection_manager.forward_packet_in(device_id, ofp_packet_in)
-            if self.stopped:
-                break
+    def forward_packets_in(self, packets_in):
+        for packet_in in packets_in:
+            self.connection_manager.forward_packet_in(packet_in.id,
+                                                      packet_in.packet_in)
 
     def send_packet_out(self, device_id, packet_out):
         packet_out = PacketOut(id=device_id, packet_out=packet_out)
-        self.packet_out_queue.put(packet_out)
+        if not self.packet_out_queue.put(device_id, packet_out):
+            log.debug('packet-out-dropped', device_id=device_id)
 
     @inlineCallbacks
     def get_port_list(self, device_id):
@@ -181,6 +193,24 @@ class GrpcClient(object):
             self.local_stub.UpdateLogicalDeviceFlowGroupTable, req)
         returnValue(res)
 
+    @inlineCallbacks
+    def update_flow_tables(self, device_id, mods):
+        """
+        Apply flow and group mods in one call
+        :param mods: list of ofp_flow_mod and ofp_group_mod, applied in order
+        :return: Deferred firing once the core has applied them all
+        """
+        req = FlowTableBulkUpdate(
+            id=device_id,
+            mods=[FlowTableMod(flow_mod=mod)
+                  if isinstance(mod, ofp_flow_mod)
+                  else FlowTableMod(group_mod=mod)
+                  for mod in mods]
+        )
+        res = yield threads.deferToThread(
+            self.local_stub.UpdateLogicalDeviceFlowTableBulk, req)
+        returnValue(res)
+
     @inlineCallbacks
     def list_flows(self, device_id):
         req = ID(id=device_id)
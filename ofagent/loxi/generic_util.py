@@ -9,6 +9,7 @@ Utility functions independent of the protocol version
 # Automatically generated by LOXI from template generic_util.py
 # Do not modify
 
+import importlib
 import loxi
 import struct
 
@@ -31,6 +32,30 @@ def pad_to(alignment, length):
     """
     return "\x00" * ((length + alignment - 1)/alignment*alignment - length)
 
+# Compiled Struct objects, keyed by format string. The set of formats used
+# by the generated parsers is small and fixed, so this never needs pruning.
+_structs = {}
+
+def get_struct(fmt):
+    st = _structs.get(fmt)
+    if st is None:
+        st = _structs[fmt] = struct.Struct(fmt)
+    return st
+
+class LazyModule(object):
+    """
+    Placeholder for a module that is imported on first attribute access.
+    The import replaces the placeholder in its parent package.
+    """
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._lazy_name), attr)
+
+    def __repr__(self):
+        return "<lazy module '%s'>" % self._lazy_name
+
 class OFReader(object):
     """
     Cursor over a read-only buffer
@@ -56,7 +81,10 @@ class OFReader(object):
         self.offset = 0
 
     def read(self, fmt):
-        st = struct.Struct(fmt)
+        return self.read_struct(_structs.get(fmt) or get_struct(fmt))
+
+    def read_struct(self, st):
+        """Like read, but takes a compiled struct.Struct"""
         if self.offset + st.size > self.length:
             raise loxi.ProtocolError("Buffer too short")
         result = st.unpack_from(self.buf, self.start+self.offset)
@@ -65,12 +93,17 @@ class OFReader(object):
 
     def read_all(self):
         s = self.buf[(self.start+self.offset):(self.start+self.length)]
+        if isinstance(s, memoryview):
+            s = s.tobytes()
         assert(len(s) == self.length - self.offset)
         self.offset = self.length
         return s
 
     def peek(self, fmt, offset=0):
-        st = struct.Struct(fmt)
+        return self.peek_struct(_structs.get(fmt) or get_struct(fmt), offset)
+
+    def peek_struct(self, st, offset=0):
+        """Like peek, but takes a compiled struct.Struct"""
         if self.offset + offset + st.size > self.length:
             raise loxi.ProtocolError("Buffer too short")
         result = st.unpack_from(self.buf, self.start + self.offset + offset)
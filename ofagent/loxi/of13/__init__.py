@@ -7,7 +7,6 @@
 # Do not modify
 
 import const
-import bsn_tlv
 import meter_band
 import instruction
 import oxm
@@ -19,3 +18,12 @@ import action_id
 from const import *
 from common import *
 from loxi import ProtocolError
+
+# Not generated: the BSN TLVs are only used by a few experimenter messages,
+# so they are imported on first use
+import loxi.generic_util
+bsn_tlv = loxi.generic_util.LazyModule('loxi.of13.bsn_tlv')
+
+# Not generated: faster pack/unpack of the most frequently used classes
+import fastpath
+fastpath.install()
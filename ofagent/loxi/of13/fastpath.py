@@ -0,0 +1,347 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Hand written pack/unpack for the OpenFlow 1.3 objects that dominate the
+agent's traffic: flow mods, packet ins/outs, flow stats entries, matches and
+the OXM TLVs within them.
+
+The generated code packs every field with its own struct.pack call and
+joins the pieces, and reads every field through OFReader.read. The versions
+below pack and unpack each fixed part of an object with a single
+precompiled Struct. They are not generated by LOXI; install() swaps them
+into the generated classes when loxi.of13 is imported, and the wire format
+and resulting objects are identical to those of the generated code.
+"""
+
+import struct
+
+import loxi
+from loxi.generic_util import OFReader, pack_list, unpack_list
+
+import sys
+ofp = sys.modules['loxi.of13']
+
+OFPXMC_OPENFLOW_BASIC = 0x8000
+
+_type_len = struct.Struct('!L')
+_match_header = struct.Struct('!HH')
+
+# version, type, length, xid, cookie, cookie_mask, table_id, command,
+# idle_timeout, hard_timeout, priority, buffer_id, out_port, out_group, flags
+_flow_mod = struct.Struct('!BBHLQQBBHHHLLLH2x')
+
+# version, type, length, xid, buffer_id, total_len, reason, table_id, cookie
+_packet_in = struct.Struct('!BBHLLHBBQ')
+
+# version, type, length, xid, buffer_id, in_port, actions_len
+_packet_out = struct.Struct('!BBHLLLH6x')
+
+# length, table_id, duration_sec, duration_nsec, priority, idle_timeout,
+# hard_timeout, flags, cookie, packet_count, byte_count
+_flow_stats_entry = struct.Struct('!HBxLLHHHH4xQQQ')
+
+_pad = ['\x00' * i for i in xrange(8)]
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ OXM TLVs ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# The payload of every basic OXM is a single field (two with a mask) whose
+# representation follows from its size.
+_oxm_value_formats = {1: 'B', 2: 'H', 4: 'L', 6: '6B', 8: 'Q', 16: '16s'}
+
+
+class OxmCodec(object):
+    """Pack/unpack of one OXM class with a single Struct"""
+
+    __slots__ = ('cls', 'struct', 'masked', 'mac')
+
+    def __init__(self, cls):
+        has_mask = (cls.type_len >> 8) & 1
+        size = (cls.type_len & 0xff) >> has_mask
+        fmt = _oxm_value_formats[size]
+        self.cls = cls
+        self.struct = struct.Struct('!L' + fmt * (1 + has_mask))
+        self.masked = bool(has_mask)
+        self.mac = fmt == '6B'
+
+    def unpack_from(self, buf, pos):
+        obj = self.cls.__new__(self.cls)
+        values = self.struct.unpack_from(buf, pos)
+        if self.mac:
+            obj.value = list(values[1:7])
+            if self.masked:
+                obj.value_mask = list(values[7:])
+        elif self.masked:
+            obj.value, obj.value_mask = values[1:]
+        else:
+            obj.value = values[1]
+        return obj
+
+    def pack(self, obj):
+        if self.mac:
+            if self.masked:
+                return self.struct.pack(obj.type_len, *(obj.value +
+                                                        obj.value_mask))
+            return self.struct.pack(obj.type_len, *obj.value)
+        if self.masked:
+            return self.struct.pack(obj.type_len, obj.value, obj.value_mask)
+        return self.struct.pack(obj.type_len, obj.value)
+
+
+_oxm_codecs = {}  # type_len -> OxmCodec
+
+
+def unpack_oxm_list(buf, pos, end):
+    oxms = []
+    codecs = _oxm_codecs
+    while pos < end:
+        if pos + 4 > end:
+            raise loxi.ProtocolError("Buffer too short")
+        type_len, = _type_len.unpack_from(buf, pos)
+        codec = codecs.get(type_len)
+        if codec is not None:
+            next_pos = pos + codec.struct.size
+            if next_pos > end:
+                raise loxi.ProtocolError("Buffer too short")
+            oxms.append(codec.unpack_from(buf, pos))
+        else:
+            reader = OFReader(buf, pos, end - pos)
+            oxms.append(ofp.oxm.oxm.unpack(reader))
+            next_pos = pos + reader.offset
+        pos = next_pos
+    return oxms
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ match ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def pack_match(self):
+    oxms = ''.join([oxm.pack() for oxm in self.oxm_list])
+    length = 4 + len(oxms)
+    return _match_header.pack(self.type, length) + oxms + \
+        _pad[-length & 7]
+
+
+def unpack_match(reader):
+    _type, length = reader.peek_struct(_match_header)
+    assert(_type == 1)
+    if length < 4 or reader.offset + length > reader.length:
+        raise loxi.ProtocolError("Buffer too short")
+    pos = reader.start + reader.offset
+    obj = ofp.common.match_v3.__new__(ofp.common.match_v3)
+    obj.oxm_list = unpack_oxm_list(reader.buf, pos + 4, pos + length)
+    reader.offset += length
+    reader.skip_align()
+    return obj
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ messages ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def pack_flow_mod(self):
+    body = self.match.pack() + pack_list(self.instructions)
+    return _flow_mod.pack(
+        self.version, self.type, _flow_mod.size + len(body), self.xid,
+        self.cookie, self.cookie_mask, self.table_id, self._command,
+        self.idle_timeout, self.hard_timeout, self.priority, self.buffer_id,
+        self.out_port, self.out_group, self.flags) + body
+
+
+def unpack_flow_mod(reader):
+    (_version, _type, _length, xid, cookie, cookie_mask, table_id, command,
+     idle_timeout, hard_timeout, priority, buffer_id, out_port, out_group,
+     flags) = reader.peek_struct(_flow_mod)
+    assert(_version == 4)
+    assert(_type == 14)
+    cls = ofp.message.flow_mod.subtypes.get(command, ofp.message.flow_mod)
+    reader = reader.slice(_length)
+    reader.skip(_flow_mod.size)
+    obj = cls.__new__(cls)
+    obj.xid = xid
+    obj.cookie = cookie
+    obj.cookie_mask = cookie_mask
+    obj.table_id = table_id
+    if cls is ofp.message.flow_mod:
+        obj._command = command
+    obj.idle_timeout = idle_timeout
+    obj.hard_timeout = hard_timeout
+    obj.priority = priority
+    obj.buffer_id = buffer_id
+    obj.out_port = out_port
+    obj.out_group = out_group
+    obj.flags = flags
+    obj.match = unpack_match(reader)
+    obj.instructions = unpack_list(reader,
+                                   ofp.instruction.instruction.unpack)
+    return obj
+
+
+def pack_packet_in(self):
+    body = self.match.pack() + '\x00\x00' + self.data
+    return _packet_in.pack(
+        self.version, self.type, _packet_in.size + len(body), self.xid,
+        self.buffer_id, self.total_len, self.reason, self.table_id,
+        self.cookie) + body
+
+
+def unpack_packet_in(reader):
+    (_version, _type, _length, xid, buffer_id, total_len, reason, table_id,
+     cookie) = reader.peek_struct(_packet_in)
+    assert(_version == 4)
+    assert(_type == 10)
+    reader = reader.slice(_length)
+    reader.skip(_packet_in.size)
+    obj = ofp.message.packet_in.__new__(ofp.message.packet_in)
+    obj.xid = xid
+    obj.buffer_id = buffer_id
+    obj.total_len = total_len
+    obj.reason = reason
+    obj.table_id = table_id
+    obj.cookie = cookie
+    obj.match = unpack_match(reader)
+    reader.skip(2)
+    obj.data = str(reader.read_all())
+    return obj
+
+
+def pack_packet_out(self):
+    actions = pack_list(self.actions)
+    return _packet_out.pack(
+        self.version, self.type,
+        _packet_out.size + len(actions) + len(self.data), self.xid,
+        self.buffer_id, self.in_port, len(actions)) + actions + self.data
+
+
+def unpack_packet_out(reader):
+    (_version, _type, _length, xid, buffer_id, in_port,
+     _actions_len) = reader.peek_struct(_packet_out)
+    assert(_version == 4)
+    assert(_type == 13)
+    reader = reader.slice(_length)
+    reader.skip(_packet_out.size)
+    obj = ofp.message.packet_out.__new__(ofp.message.packet_out)
+    obj.xid = xid
+    obj.buffer_id = buffer_id
+    obj.in_port = in_port
+    obj.actions = unpack_list(reader.slice(_actions_len),
+                              ofp.action.action.unpack)
+    obj.data = str(reader.read_all())
+    return obj
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ flow stats ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def pack_flow_stats_entry(self):
+    body = self.match.pack() + pack_list(self.instructions)
+    return _flow_stats_entry.pack(
+        _flow_stats_entry.size + len(body), self.table_id,
+        self.duration_sec, self.duration_nsec, self.priority,
+        self.idle_timeout, self.hard_timeout, self.flags, self.cookie,
+        self.packet_count, self.byte_count) + body
+
+
+def unpack_flow_stats_entry(reader):
+    (_length, table_id, duration_sec, duration_nsec, priority, idle_timeout,
+     hard_timeout, flags, cookie, packet_count,
+     byte_count) = reader.peek_struct(_flow_stats_entry)
+    reader = reader.slice(_length)
+    reader.skip(_flow_stats_entry.size)
+    obj = ofp.common.flow_stats_entry.__new__(ofp.common.flow_stats_entry)
+    obj.table_id = table_id
+    obj.duration_sec = duration_sec
+    obj.duration_nsec = duration_nsec
+    obj.priority = priority
+    obj.idle_timeout = idle_timeout
+    obj.hard_timeout = hard_timeout
+    obj.flags = flags
+    obj.cookie = cookie
+    obj.packet_count = packet_count
+    obj.byte_count = byte_count
+    obj.match = unpack_match(reader)
+    obj.instructions = unpack_list(reader,
+                                   ofp.instruction.instruction.unpack)
+    return obj
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ install ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _replace(cls, pack, unpack):
+    # keep the generated code on the class, so it can be restored and
+    # compared against (see uninstall)
+    cls._generated = (cls.__dict__['pack'], cls.__dict__['unpack'])
+    cls.pack = pack
+    cls.unpack = staticmethod(unpack)
+
+
+def _mk_oxm_pack(codec):
+    return lambda self: codec.pack(self)
+
+
+def _mk_oxm_unpack(codec):
+    def unpack(reader):
+        if reader.offset + codec.struct.size > reader.length:
+            raise loxi.ProtocolError("Buffer too short")
+        pos = reader.start + reader.offset
+        assert(_type_len.unpack_from(reader.buf, pos)[0] ==
+               codec.cls.type_len)
+        obj = codec.unpack_from(reader.buf, pos)
+        reader.offset += codec.struct.size
+        return obj
+    return unpack
+
+
+def _replaced():
+    for type_len, cls in ofp.oxm.oxm.subtypes.iteritems():
+        if type_len >> 16 == OFPXMC_OPENFLOW_BASIC:
+            yield cls
+    yield ofp.common.match_v3
+    yield ofp.common.flow_stats_entry
+    yield ofp.message.flow_mod
+    for cls in ofp.message.flow_mod.subtypes.itervalues():
+        yield cls
+    yield ofp.message.packet_in
+    yield ofp.message.packet_out
+
+
+def installed():
+    return '_generated' in ofp.common.match_v3.__dict__
+
+
+def install():
+    if installed():
+        return
+
+    for type_len, cls in ofp.oxm.oxm.subtypes.iteritems():
+        if type_len >> 16 == OFPXMC_OPENFLOW_BASIC:
+            codec = _oxm_codecs[type_len] = OxmCodec(cls)
+            _replace(cls, _mk_oxm_pack(codec), _mk_oxm_unpack(codec))
+
+    _replace(ofp.common.match_v3, pack_match, unpack_match)
+    _replace(ofp.common.flow_stats_entry, pack_flow_stats_entry,
+             unpack_flow_stats_entry)
+    _replace(ofp.message.flow_mod, pack_flow_mod, unpack_flow_mod)
+    for cls in ofp.message.flow_mod.subtypes.itervalues():
+        _replace(cls, pack_flow_mod, unpack_flow_mod)
+    _replace(ofp.message.packet_in, pack_packet_in, unpack_packet_in)
+    _replace(ofp.message.packet_out, pack_packet_out, unpack_packet_out)
+
+
+def uninstall():
+    """Restore the generated code (for tests and benchmarks)"""
+    if not installed():
+        return
+    for cls in _replaced():
+        cls.pack, cls.unpack = cls._generated
+        del cls._generated
@@ -13,15 +13,76 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from struct import Struct
+
 import structlog
 from hexdump import hexdump
 from twisted.internet import protocol
 
-import loxi.of14
+import loxi
+from common.structlog_setup import log_debug_enabled
 from common.utils.message_queue import MessageQueue
 
 log = structlog.get_logger()
 
+_of_header = Struct('!BBHL')
+
+
+class OpenFlowFramer(object):
+    """
+    Splits the byte stream of an OpenFlow connection into messages.
+
+    Chunks are parsed in place: complete messages are handed out as
+    memoryview slices of the buffer they arrived in, and only the incomplete
+    tail of a chunk is copied into a bytearray, which is extended until it
+    holds the rest of the message(s). This avoids the repeated concatenation
+    and slicing of ever growing strings when large messages span many TCP
+    segments.
+    """
+
+    def __init__(self):
+        self.pending = bytearray()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def feed(self, data):
+        """
+        Consume a chunk of the stream.
+        :param data: str as received from the transport
+        :return: list of (version, memoryview) tuples, one per complete
+        message
+        """
+        pending = self.pending
+        if pending:
+            pending.extend(data)
+            buf = pending
+        else:
+            buf = data
+
+        view = memoryview(buf)
+        length = len(buf)
+        messages = []
+        offset = 0
+        while offset + 8 <= length:
+            version, _, msg_len, _ = _of_header.unpack_from(buf, offset)
+            if msg_len < 8:
+                raise loxi.ProtocolError(
+                    'invalid message length {}'.format(msg_len))
+            if offset + msg_len > length:
+                break  # not enough data to cover whole message
+            messages.append((version, view[offset:offset + msg_len]))
+            offset += msg_len
+
+        if buf is pending:
+            if offset:
+                # leave the buffer the messages point into alone and start
+                # a new one with the incomplete tail (if any)
+                self.pending = bytearray(view[offset:])
+        elif offset < length:
+            pending.extend(view[offset:])
+        return messages
+
 
 class OpenFlowConnection(protocol.Protocol):
 
@@ -30,7 +91,7 @@ class OpenFlowConnection(protocol.Protocol):
                             # and agent.enter_connected() methods to indicate
                             # when state change is necessary
         self.next_xid = 1
-        self.read_buffer = None
+        self.framer = OpenFlowFramer()
         self.rx = MessageQueue()
 
     def connectionLost(self, reason):
@@ -40,46 +101,27 @@ class OpenFlowConnection(protocol.Protocol):
         self.agent.enter_connected()
 
     def dataReceived(self, data):
-        log.debug('data-received', len=len(data),
-                  received=hexdump(data, result='return'))
+        debug = log_debug_enabled()
+        if debug:
+            log.debug('data-received', len=len(data),
+                      received=hexdump(data, result='return'))
 
         assert len(data)  # connection close shall be handled by the protocol
-        buf = self.read_buffer
-        if buf:
-            buf += data
-        else:
-            buf = data
-
-        offset = 0
-        while offset < len(buf):
-            if offset + 8 > len(buf):
-                break  # not enough data for the OpenFlow header
-
-            # parse the header to get type
-            _version, _type, _len, _xid = \
-                loxi.of14.message.parse_header(buf[offset:])
-
-            ofp = loxi.protocol(_version)
-
-            if (offset + _len) > len(buf):
-                break  # not enough data to cover whole message
-
-            rawmsg = buf[offset : offset + _len]
-            offset += _len
-
+        for version, rawmsg in self.framer.feed(data):
+            ofp = loxi.protocol(version)
             msg = ofp.message.parse_message(rawmsg)
             if not msg:
                 log.warn('could-not-parse',
-                         data=hexdump(rawmsg, result='return'))
-            log.debug('received-msg', module=type(msg).__module__,
-                  name=type(msg).__name__, xid=msg.xid, len=len(buf))
+                         data=hexdump(rawmsg.tobytes(), result='return'))
+                continue
+            if debug:
+                log.debug('received-msg', module=type(msg).__module__,
+                          name=type(msg).__name__, xid=msg.xid,
+                          len=len(rawmsg))
             self.rx.put(msg)
 
-        if offset == len(buf):
-            self.read_buffer = None
-        else:
-            self.read_buffer = buf[offset:]
-            log.debug('remaining', len=len(self.read_buffer))
+        if debug and len(self.framer):
+            log.debug('remaining', len=len(self.framer))
 
     def send_raw(self, buf):
         """
@@ -105,7 +147,8 @@ class OpenFlowConnection(protocol.Protocol):
         log.debug('sending', module=type(msg).__module__,
                   name=type(msg).__name__, xid=msg.xid, len=len(buf))
         self.transport.write(buf)
-        log.debug('data-sent', sent=hexdump(buf, result='return'))
+        if log_debug_enabled():
+            log.debug('data-sent', sent=hexdump(buf, result='return'))
 
     def recv(self, predicate):
         assert self.connected
@@ -14,13 +14,19 @@
 # limitations under the License.
 #
 import structlog
-from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, returnValue, DeferredLock
 
 import loxi.of13 as ofp
 from converter import to_loxi, pb2dict, to_grpc
 
 log = structlog.get_logger()
 
+# flow and group mods are sent to voltha in batches, when a barrier request
+# comes in, when that many have accumulated, or this long after the first one
+MOD_BATCH_SIZE = 256
+MOD_BATCH_DELAY = 0.02  # seconds
+
 
 class OpenFlowProtocolError(Exception): pass
 
@@ -43,6 +49,10 @@ class OpenFlowProtocolHandler(object):
         self.cxn = cxn
         self.rpc = rpc
 
+        self.pending_mods = []  # flow and group mods not yet sent to voltha
+        self.flush_timer = None
+        self.flush_lock = DeferredLock()  # to apply batches one at a time
+
     @inlineCallbacks
     def start(self):
         """A new call is made after a fresh reconnect"""
@@ -76,9 +86,42 @@ class OpenFlowProtocolHandler(object):
 
     def stop(self):
         log.debug('stopping')
-        pass  # nothing to do yet
+        self.flush_mods()
         log.info('stopped')
 
+    def queue_mod(self, mod):
+        """
+        Queue a flow or group mod (in its grpc form) for the next batch
+        """
+        self.pending_mods.append(mod)
+        if len(self.pending_mods) >= MOD_BATCH_SIZE:
+            self.flush_mods()
+        elif self.flush_timer is None:
+            self.flush_timer = reactor.callLater(MOD_BATCH_DELAY,
+                                                 self.flush_mods)
+
+    def flush_mods(self):
+        """
+        Send the queued flow and group mods to voltha in one call. Batches
+        are applied one after the other, in the order they were flushed.
+        :return: Deferred firing once voltha has applied this batch and all
+        the previous ones
+        """
+        if self.flush_timer is not None:
+            if self.flush_timer.active():
+                self.flush_timer.cancel()
+            self.flush_timer = None
+        mods, self.pending_mods = self.pending_mods, []
+        return self.flush_lock.run(self._apply_mods, mods)
+
+    @inlineCallbacks
+    def _apply_mods(self, mods):
+        if mods:
+            try:
+                yield self.rpc.update_flow_tables(self.device_id, mods)
+            except Exception, e:
+                log.exception('failed-to-apply-mods', count=len(mods), e=e)
+
     def handle_echo_request(self, req):
         self.cxn.send(ofp.message.echo_reply(xid=req.xid))
 
@@ -99,9 +142,11 @@ class OpenFlowProtocolHandler(object):
             raise OpenFlowProtocolError(
                 'Cannot handle stats request type "{}"'.format(req.stats_type))
 
+    @inlineCallbacks
     def handle_barrier_request(self, req):
-        # not really doing barrier yet, but we respond
-        # see https://jira.opencord.org/browse/CORD-823
+        # reply only once all flow and group mods received so far have been
+        # applied by voltha
+        yield self.flush_mods()
         self.cxn.send(ofp.message.barrier_reply(xid=req.xid))
 
     def handle_experimenter_request(self, req):
@@ -113,7 +158,7 @@ class OpenFlowProtocolHandler(object):
         except Exception, e:
             log.exception('failed-to-convert', e=e)
         else:
-            return self.rpc.update_flow_table(self.device_id, grpc_req)
+            self.queue_mod(grpc_req)
 
     def handle_get_async_request(self, req):
         raise NotImplementedError()
@@ -124,9 +169,8 @@ class OpenFlowProtocolHandler(object):
             miss_send_len=ofp.OFPCML_NO_BUFFER
         ))
 
-    @inlineCallbacks
     def handle_group_mod_request(self, req):
-        yield self.rpc.update_group_table(self.device_id, to_grpc(req))
+        self.queue_mod(to_grpc(req))
 
     def handle_meter_mod_request(self, req):
         raise NotImplementedError()
@@ -173,6 +217,7 @@ class OpenFlowProtocolHandler(object):
 
     @inlineCallbacks
     def handle_flow_stats_request(self, req):
+        yield self.flush_mods()  # so queued mods are reflected
         try:
             flow_stats = yield self.rpc.list_flows(self.device_id)
             self.cxn.send(ofp.message.flow_stats_reply(
@@ -182,12 +227,14 @@ class OpenFlowProtocolHandler(object):
 
     @inlineCallbacks
     def handle_group_stats_request(self, req):
+        yield self.flush_mods()  # so queued mods are reflected
         group_stats = yield self.rpc.list_groups(self.device_id)
         self.cxn.send(ofp.message.group_stats_reply(
             xid=req.xid, entries=[to_loxi(g.stats) for g  in group_stats]))
 
     @inlineCallbacks
     def handle_group_descriptor_request(self, req):
+        yield self.flush_mods()  # so queued mods are reflected
         group_stats = yield self.rpc.list_groups(self.device_id)
         self.cxn.send(ofp.message.group_desc_stats_reply(
             xid=req.xid, entries=[to_loxi(g.desc) for g  in group_stats]))
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+We use this module to measure how many frames per second the PON simulator
+can move. Run it with env.sh sourced:
+
+    python ponsim/benchmark.py [-o ONUS] [-n FRAMES]
+"""
+import argparse
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scapy.layers.inet import IP, UDP
+from scapy.layers.l2 import Ether, Dot1Q
+
+from classifier import FlowClassifier
+from ponsim import PonSim
+from voltha.protos import third_party
+from voltha.core.flow_decomposer import *
+
+_ = third_party
+
+
+def mk_olt_flows(onus):
+    flows = [
+        mk_flow_stat(
+            priority=2000,
+            match_fields=[in_port(1), eth_type(0x888e)],
+            actions=[push_vlan(0x8100), set_field(vlan_vid(4096 + 4000)),
+                     output(2)]
+        ),
+        mk_flow_stat(
+            priority=1000,
+            match_fields=[in_port(1), eth_type(0x800), ip_proto(17),
+                          udp_dst(67)],
+            actions=[push_vlan(0x8100), set_field(vlan_vid(4096 + 4000)),
+                     output(2)]
+        ),
+        mk_flow_stat(
+            priority=1000,
+            match_fields=[in_port(2), vlan_vid(4096 + 140)],
+            actions=[pop_vlan(), output(1)]
+        ),
+        mk_flow_stat(
+            priority=500,
+            match_fields=[in_port(2), vlan_vid(4096 + 1000)],
+            actions=[pop_vlan(), output(1)]
+        ),
+    ]
+    for i in xrange(onus):
+        flows.append(mk_flow_stat(
+            priority=500,
+            match_fields=[in_port(1), vlan_vid(4096 + 128 + i)],
+            actions=[push_vlan(0x8100), set_field(vlan_vid(4096 + 1000)),
+                     output(2)]
+        ))
+    return flows
+
+
+def mk_upstream_frames(onus):
+    kw = dict(src='00:00:00:11:11:11', dst='00:00:00:22:22:22')
+    return [str(Ether(**kw) / Dot1Q(vlan=128 + i) / IP() /
+                UDP(sport=1024, dport=80) / ('\x00' * 64))
+            for i in xrange(onus)]
+
+
+def timeit(fun, frames, n):
+    count = 0
+    t0 = time.time()
+    while count < n:
+        for frame in frames:
+            fun(frame)
+        count += len(frames)
+    return count / (time.time() - t0)
+
+
+def bench_classifier(onus, n):
+    classifier = FlowClassifier(mk_olt_flows(onus))
+    frames = mk_upstream_frames(onus)
+    fps = timeit(lambda frame: classifier.classify(1, frame), frames, n)
+    print 'classifier: %d flows, %d frames: %.0f frames/s' % (
+        len(classifier), n, fps)
+
+
+def mk_onu_flows(port_no):
+    return [
+        mk_flow_stat(
+            priority=500,
+            match_fields=[in_port(2), vlan_vid(4096 + 0)],
+            actions=[set_field(vlan_vid(4096 + port_no)), output(1)]
+        ),
+        mk_flow_stat(
+            priority=500,
+            match_fields=[in_port(1), vlan_vid(4096 + port_no)],
+            actions=[set_field(vlan_vid(4096 + 0)), output(2)]
+        ),
+    ]
+
+
+def mk_pon(onus):
+    egressed = [0]
+
+    def egress(port, frame):
+        egressed[0] += 1
+
+    pon = PonSim(onus, egress, dict(simulation=False))
+    pon.lc.stop()
+    pon.olt_install_flows(mk_olt_flows(onus))
+    for port_no in pon.get_ports()[1:]:
+        pon.onu_install_flows(port_no, mk_onu_flows(port_no))
+    return pon, egressed
+
+
+def bench_upstream(onus, n):
+    """ONU ingress -> ONU -> OLT -> NNI egress, raw frames in and out"""
+    pon, egressed = mk_pon(onus)
+    kw = dict(src='00:00:00:11:11:11', dst='00:00:00:22:22:22')
+    frame = str(Ether(**kw) / Dot1Q(vlan=0) / IP() /
+                UDP(sport=1024, dport=80) / ('\x00' * 64))
+    ports = pon.get_ports()[1:]
+    frames = [(port, frame) for port in ports]
+    fps = timeit(lambda (port, frame): pon.ingress(port, frame), frames, n)
+    assert egressed[0] >= n
+    print 'upstream: %d onus, %d frames: %.0f frames/s' % (onus, n, fps)
+
+
+def bench_downstream(onus, n):
+    """NNI ingress -> OLT -> PON demux -> ONU -> UNI egress"""
+    pon, egressed = mk_pon(onus)
+    kw = dict(src='00:00:00:11:11:11', dst='00:00:00:22:22:22')
+    frames = [(0, str(Ether(**kw) / Dot1Q(vlan=1000) / Dot1Q(vlan=port) /
+                      IP() / UDP(sport=80, dport=1024) / ('\x00' * 64)))
+              for port in pon.get_ports()[1:]]
+    fps = timeit(lambda (port, frame): pon.ingress(port, frame), frames, n)
+    assert egressed[0] >= n
+    print 'downstream: %d onus, %d frames: %.0f frames/s' % (onus, n, fps)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--onus', type=int, default=128,
+                        help='number of simulated ONUs (default: 128)')
+    parser.add_argument('-n', '--frames', type=int, default=100000,
+                        help='number of frames per run (default: 100000)')
+    args = parser.parse_args()
+    bench_classifier(args.onus, args.frames)
+    bench_upstream(args.onus, args.frames)
+    bench_downstream(args.onus, args.frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Compiled flow classifier for the PON simulator.
+
+Instead of walking the flow list and re-dissecting the frame with scapy for
+every flow, the installed flows are compiled once into an index keyed by
+(in_port, vlan, eth_type). The header fields a flow may match on are pulled
+out of the raw frame bytes in a single pass, and the remaining match fields
+of each candidate flow are checked with a precompiled getter/value pair.
+"""
+from operator import itemgetter
+from struct import Struct
+
+from voltha.protos import third_party
+from voltha.core.flow_decomposer import *
+
+_ = third_party
+
+ETH_TYPE_DOT1Q = 0x8100
+ETH_TYPE_DOT1AD = 0x88a8
+ETH_TYPE_IPV4 = 0x0800
+IP_PROTO_UDP = 17
+
+_ushort = Struct('!H')
+_vlan_tag = Struct('!HH')
+_ipv4_header = Struct('!BxxxxxHxBxxxxxxI')
+_udp_ports = Struct('!HH')
+
+# Positions of the individual fields in the header tuple
+(H_ETH_TYPE, H_VLAN, H_VLAN_PCP, H_IP_PROTO, H_IPV4_DST, H_UDP_SRC,
+ H_UDP_DST) = range(7)
+
+_NO_HEADERS = (None, 0, None, None, None, None, None)
+
+
+class FlowMatchMask(object):
+    """
+    Enum of mask values based on flow match priority. For instance, a port
+    match has higher priority when match that a UDP match.
+    """
+    UDP_DST = 1
+    UDP_SRC = 2
+    IPV4_DST = 4
+    VLAN_PCP = 8
+    VLAN_VID = 16
+    IP_PROTO = 34
+    ETH_TYPE = 64
+    IN_PORT = 128
+
+
+def extract_headers(frame):
+    """
+    Extract the fields the classifier matches on from the raw bytes of an
+    Ethernet frame. The result is a tuple indexed by the H_* constants:
+
+    - eth_type: the ether type following the first 802.1Q tag, or the ether
+      type of the frame itself if it is untagged
+    - vlan: 0x1000 | vid of the first 802.1Q tag, 0 if untagged (the same
+      encoding OpenFlow uses for the VLAN_VID match field)
+    - vlan_pcp, ip_proto, ipv4_dst, udp_src, udp_dst: None if absent
+
+    :param frame: str or bytearray holding the frame
+    :return: header tuple
+    """
+    length = len(frame)
+    if length < 14:
+        return _NO_HEADERS
+
+    eth_type, = _ushort.unpack_from(frame, 12)
+    non_shim_eth_type = eth_type
+    vlan = 0
+    vlan_pcp = None
+    offset = 14
+
+    # walk the (possibly stacked) tags; only the first 802.1Q tag is used
+    # for matching, 802.1ad tags are skipped over
+    while (eth_type == ETH_TYPE_DOT1Q or eth_type == ETH_TYPE_DOT1AD) and \
+            offset + 4 <= length:
+        tci, inner_type = _vlan_tag.unpack_from(frame, offset)
+        if eth_type == ETH_TYPE_DOT1Q and vlan_pcp is None:
+            vlan = 0x1000 | (tci & 0xfff)
+            vlan_pcp = tci >> 13
+            non_shim_eth_type = inner_type
+        eth_type = inner_type
+        offset += 4
+
+    if eth_type != ETH_TYPE_IPV4 or offset + 20 > length:
+        return (non_shim_eth_type, vlan, vlan_pcp, None, None, None, None)
+
+    ver_ihl, flags_frag, ip_proto, ipv4_dst = \
+        _ipv4_header.unpack_from(frame, offset)
+    udp_src = udp_dst = None
+    if ip_proto == IP_PROTO_UDP and not flags_frag & 0x1fff:
+        offset += (ver_ihl & 0x0f) << 2
+        if offset + 4 <= length:
+            udp_src, udp_dst = _udp_ports.unpack_from(frame, offset)
+
+    return (non_shim_eth_type, vlan, vlan_pcp, ip_proto, ipv4_dst,
+            udp_src, udp_dst)
+
+
+class CompiledFlow(object):
+    """
+    A flow reduced to what the classifier needs at frame arrival: its index
+    key, a precompiled check for the remaining match fields and the match
+    mask it contributes when all fields match.
+    """
+
+    __slots__ = ('flow', 'position', 'priority', 'key', 'mask', 'getter',
+                 'expected', 'unsupported')
+
+    def __init__(self, flow, position):
+        self.flow = flow
+        self.position = position
+        self.priority = flow.priority
+        self.mask = 0
+        self.unsupported = None
+
+        in_port = vlan = eth_type = None
+        fields = []  # (header index, expected value)
+
+        for field in get_ofb_fields(flow):
+
+            if field.type == IN_PORT:
+                if in_port is None:
+                    in_port = field.port
+                elif in_port != field.port:
+                    self.mask = 0
+                    self.key = None
+                    return  # can never match
+                self.mask |= FlowMatchMask.IN_PORT
+
+            elif field.type == ETH_TYPE:
+                if eth_type is None:
+                    eth_type = field.eth_type
+                else:
+                    fields.append((H_ETH_TYPE, field.eth_type))
+                self.mask |= FlowMatchMask.ETH_TYPE
+
+            elif field.type == VLAN_VID:
+                # an untagged match ignores the vid bits altogether
+                expected = field.vlan_vid & 0x1fff \
+                    if field.vlan_vid & 0x1000 else 0
+                if vlan is None:
+                    vlan = expected
+                else:
+                    fields.append((H_VLAN, expected))
+                self.mask |= FlowMatchMask.VLAN_VID
+
+            elif field.type == IP_PROTO:
+                fields.append((H_IP_PROTO, field.ip_proto))
+                self.mask |= FlowMatchMask.IP_PROTO
+
+            elif field.type == VLAN_PCP:
+                fields.append((H_VLAN_PCP, field.vlan_pcp))
+                self.mask |= FlowMatchMask.VLAN_PCP
+
+            elif field.type == IPV4_DST:
+                fields.append((H_IPV4_DST, field.ipv4_dst))
+                self.mask |= FlowMatchMask.IPV4_DST
+
+            elif field.type == UDP_SRC:
+                fields.append((H_UDP_SRC, field.udp_src))
+                self.mask |= FlowMatchMask.UDP_SRC
+
+            elif field.type == UDP_DST:
+                fields.append((H_UDP_DST, field.udp_dst))
+                self.mask |= FlowMatchMask.UDP_DST
+
+            elif field.type == METADATA:
+                pass  # safe to ignore
+
+            elif self.unsupported is None:
+                self.unsupported = field.type
+
+        self.key = (in_port, vlan, eth_type)
+
+        if not fields:
+            self.getter = self.expected = None
+        elif len(fields) == 1:
+            self.getter = itemgetter(fields[0][0])
+            self.expected = fields[0][1]
+        else:
+            self.getter = itemgetter(*(i for i, _ in fields))
+            self.expected = tuple(v for _, v in fields)
+
+    def matches(self, headers):
+        if self.unsupported is not None:
+            raise NotImplementedError('field.type=%d' % self.unsupported)
+        return self.getter is None or self.getter(headers) == self.expected
+
+
+class FlowClassifier(object):
+    """
+    Priority-ordered flow table compiled for fast lookup. Among the flows of
+    the highest priority that match a frame, the one matching on the most
+    significant set of fields (see FlowMatchMask) wins; a flow without any
+    match field never matches.
+    """
+
+    def __init__(self, flows=()):
+        # store flows in precedence order so we can roll down on frame arrival
+        self.flows = sorted(flows, key=lambda fm: fm.priority, reverse=True)
+        self.index = dict()  # (in_port, vlan, eth_type) -> [CompiledFlow]
+        patterns = set()
+        for position, flow in enumerate(self.flows):
+            compiled = CompiledFlow(flow, position)
+            if not compiled.mask:
+                continue
+            self.index.setdefault(compiled.key, []).append(compiled)
+            patterns.add(tuple(k is not None for k in compiled.key))
+        # only probe for the wildcard combinations the flows actually use
+        self.patterns = sorted(patterns, reverse=True)
+
+    def __len__(self):
+        return len(self.flows)
+
+    def vlans_for_port(self, in_port):
+        """
+        The vlan keys (see extract_headers) of the frames arriving on a port
+        that may match any flow.
+        :return: set of vlan keys, or None if some flow on that port does not
+        match on vlan at all
+        """
+        vlans = set()
+        for port, vlan, _ in self.index:
+            if port is None or port == in_port:
+                if vlan is None:
+                    return None
+                vlans.add(vlan)
+        return vlans
+
+    def candidates(self, in_port, headers):
+        vlan = headers[H_VLAN]
+        eth_type = headers[H_ETH_TYPE]
+        index = self.index
+        candidates = None
+        merge = False
+        for with_port, with_vlan, with_eth_type in self.patterns:
+            bucket = index.get((
+                in_port if with_port else None,
+                vlan if with_vlan else None,
+                eth_type if with_eth_type else None))
+            if bucket is not None:
+                if candidates is None:
+                    candidates = bucket
+                else:
+                    if not merge:
+                        candidates = list(candidates)
+                        merge = True
+                    candidates.extend(bucket)
+        if merge:
+            candidates.sort(key=lambda c: c.position)
+        return candidates or ()
+
+    def classify(self, in_port, frame):
+        """
+        Find the flow to apply to a frame.
+        :param in_port: port the frame arrived on
+        :param frame: raw frame (str or bytearray)
+        :return: the matching ofp_flow_stats or None
+        """
+        matched = self.lookup(in_port, frame)
+        return matched.flow if matched is not None else None
+
+    def lookup(self, in_port, frame):
+        """
+        Same as classify, but returns the CompiledFlow; its position is the
+        index of the flow in self.flows.
+        """
+        headers = extract_headers(frame)
+        matched = None
+        for candidate in self.candidates(in_port, headers):
+            if matched is not None:
+                if candidate.priority < matched.priority:
+                    break
+                if candidate.mask <= matched.mask:
+                    continue
+            if candidate.matches(headers):
+                matched = candidate
+        return matched
@@ -23,10 +23,13 @@ import structlog
 import random
 import arrow
 import json
-from scapy.layers.inet import IP, UDP, TCP, Raw
+from collections import OrderedDict
+from scapy.layers.inet import IP, TCP, Raw
 from scapy.layers.l2 import Ether, Dot1Q
-from scapy.packet import Packet
 
+from classifier import FlowClassifier
+import rawframe
+from common.structlog_setup import log_debug_enabled
 from voltha.protos import third_party
 from voltha.protos.ponsim_pb2 import PonSimMetrics, PonSimPortMetrics, \
     PonSimPacketCounter
@@ -39,28 +42,8 @@ from twisted.internet import reactor
 _ = third_party
 
 
-def ipv4int2str(ipv4int):
-    return '{}.{}.{}.{}'.format(
-        (ipv4int >> 24) & 0xff,
-        (ipv4int >> 16) & 0xff,
-        (ipv4int >> 8) & 0xff,
-        ipv4int & 0xff
-    )
-
-
-class _FlowMatchMask(object):
-    """
-    Enum of mask values based on flow match priority. For instance, a port
-    match has higher priority when match that a UDP match.
-    """
-    UDP_DST = 1
-    UDP_SRC = 2
-    IPV4_DST = 4
-    VLAN_PCP = 8
-    VLAN_VID = 16
-    IP_PROTO = 34
-    ETH_TYPE = 64
-    IN_PORT = 128
+def _not_implemented(frame, what):
+    raise NotImplementedError(what)
 
 
 class FrameIOCounter(object):
@@ -96,7 +79,6 @@ class FrameIOCounter(object):
         )
 
     def count_rx_frame(self, port, size):
-        log.info("counting-rx-frame", size=size, port=port)
         for k, v in self.rx_counters.iteritems():
             if size >= v.min and size <= v.max:
                 self.rx_counters[k].value[port - 1] += 1
@@ -232,6 +214,8 @@ class SimDevice(object):
         self.logical_port_no = logical_port_no
         self.links = dict()
         self.flows = list()
+        self.classifier = FlowClassifier()
+        self.flow_actions = list()
         self.log = structlog.get_logger(name=name,
                                         logical_port_no=logical_port_no)
         self.counter = FrameIOCounter(name)
@@ -240,158 +224,64 @@ class SimDevice(object):
         self.links.setdefault(port, []).append(egress_fun)
 
     def ingress(self, port, frame):
-        self.log.debug('ingress', ingress_port=port, name=self.name)
-        self.counter.count_rx_frame(port, len(frame["Ether"].payload))
+        debug = log_debug_enabled()
+        if debug:
+            self.log.debug('ingress', ingress_port=port, name=self.name,
+                           frame=Ether(str(frame)).summary())
+        self.counter.count_rx_frame(port, rawframe.payload_length(frame))
         outcome = self.process_frame(port, frame)
         if outcome is not None:
             egress_port, egress_frame = outcome
             forwarded = 0
             links = self.links.get(egress_port)
             if links is not None:
-                self.counter.count_tx_frame(egress_port,
-                                            len(egress_frame["Ether"].payload))
-                for fun in links:
+                self.counter.count_tx_frame(
+                    egress_port, rawframe.payload_length(egress_frame))
+                last = len(links) - 1
+                for i, fun in enumerate(links):
                     forwarded += 1
-                    self.log.debug('forwarding', egress_port=egress_port)
-                    fun(egress_port, egress_frame)
-            if not forwarded:
+                    if debug:
+                        self.log.debug('forwarding', egress_port=egress_port)
+                    # every receiver gets a frame of its own to modify
+                    fun(egress_port, egress_frame if i == last
+                                     else bytearray(egress_frame))
+            if not forwarded and debug:
                 self.log.debug('no-one-to-forward-to', egress_port=egress_port)
-        else:
+        elif debug:
             self.log.debug('dropped')
 
     def install_flows(self, flows):
-        # store flows in precedence order so we can roll down on frame arrival
-        self.flows = sorted(flows, key=lambda fm: fm.priority, reverse=True)
+        self.classifier = FlowClassifier(flows)
+        self.flows = self.classifier.flows
+        self.flow_actions = [self.compile_actions(flow) for flow in self.flows]
 
     def process_frame(self, ingress_port, ingress_frame):
-        matched_mask = 0
-        highest_priority = 0
-        matched_flow = None
-        for flow in self.flows:
-            # flows are sorted by highest priority.
-            if matched_flow and flow.priority < highest_priority:
-                break
-
-            highest_priority = flow.priority
-            current_mask = self.is_match(flow, ingress_port, ingress_frame)
-            if current_mask > matched_mask:
-                matched_mask = current_mask
-                matched_flow = flow
-
-        if matched_flow:
-            egress_port, egress_frame = self.process_actions(
-                matched_flow, ingress_frame)
-            return egress_port, egress_frame
+        matched = self.classifier.lookup(ingress_port, ingress_frame)
+        if matched is not None:
+            egress_port, ops = self.flow_actions[matched.position]
+            for fun, args in ops:
+                fun(ingress_frame, *args)
+            return egress_port, ingress_frame
         return None
 
     @staticmethod
-    def is_match(flow, ingress_port, frame):
-        matched_mask = 0
-
-        def get_non_shim_ether_type(f):
-            if f.haslayer(Dot1Q):
-                f = f.getlayer(Dot1Q)
-            return f.type
-
-        def get_vlan_pcp(f):
-            if f.haslayer(Dot1Q):
-                return f.getlayer(Dot1Q).prio
-
-        def get_ip_proto(f):
-            if f.haslayer(IP):
-                return f.getlayer(IP).proto
-
-        def get_ipv4_dst(f):
-            if f.haslayer(IP):
-                return f.getlayer(IP).dst
-
-        def get_udp_src(f):
-            if f.haslayer(UDP):
-                return f.getlayer(UDP).sport
-
-        def get_udp_dst(f):
-            if f.haslayer(UDP):
-                return f.getlayer(UDP).dport
-
-        for field in get_ofb_fields(flow):
-
-            if field.type == IN_PORT:
-                if field.port != ingress_port:
-                    return 0
-                matched_mask |= _FlowMatchMask.IN_PORT
-
-            elif field.type == ETH_TYPE:
-                if field.eth_type != get_non_shim_ether_type(frame):
-                    return 0
-                matched_mask |= _FlowMatchMask.ETH_TYPE
-
-            elif field.type == IP_PROTO:
-                if field.ip_proto != get_ip_proto(frame):
-                    return 0
-                matched_mask |= _FlowMatchMask.IP_PROTO
-
-            elif field.type == VLAN_VID:
-                expected_vlan = field.vlan_vid
-                tagged = frame.haslayer(Dot1Q)
-                if bool(expected_vlan & 4096) != bool(tagged):
-                    return 0
-                if tagged:
-                    actual_vid = frame.getlayer(Dot1Q).vlan
-                    if actual_vid != expected_vlan & 4095:
-                        return 0
-                matched_mask |= _FlowMatchMask.VLAN_VID
-
-            elif field.type == VLAN_PCP:
-                if field.vlan_pcp != get_vlan_pcp(frame):
-                    return 0
-                matched_mask |= _FlowMatchMask.VLAN_PCP
-
-            elif field.type == IPV4_DST:
-                if ipv4int2str(field.ipv4_dst) != get_ipv4_dst(frame):
-                    return 0
-                matched_mask |= _FlowMatchMask.IPV4_DST
-
-            elif field.type == UDP_SRC:
-                if field.udp_src != get_udp_src(frame):
-                    return 0
-                matched_mask |= _FlowMatchMask.UDP_SRC
-
-            elif field.type == UDP_DST:
-                if field.udp_dst != get_udp_dst(frame):
-                    return 0
-                matched_mask |= _FlowMatchMask.UDP_DST
-
-            elif field.type == METADATA:
-                pass  # safe to ignore
-
-            else:
-                raise NotImplementedError('field.type=%d' % field.type)
-
-        return matched_mask
-
-    @staticmethod
-    def process_actions(flow, frame):
+    def compile_actions(flow):
+        """
+        Translate the actions of a flow into its egress port and the list of
+        (function, args) operations to apply, in place, to the raw frame.
+        """
         egress_port = None
+        ops = []
         for action in get_actions(flow):
 
             if action.type == OUTPUT:
                 egress_port = action.output.port
 
             elif action.type == POP_VLAN:
-                if frame.haslayer(Dot1Q):
-                    shim = frame.getlayer(Dot1Q)
-                    frame = Ether(
-                        src=frame.src,
-                        dst=frame.dst,
-                        type=shim.type) / shim.payload
+                ops.append((rawframe.pop_vlan, ()))
 
             elif action.type == PUSH_VLAN:
-                frame = (
-                    Ether(src=frame.src, dst=frame.dst,
-                          type=action.push.ethertype) /
-                    Dot1Q(type=frame.type) /
-                    frame.payload
-                )
+                ops.append((rawframe.push_vlan, (action.push.ethertype,)))
 
             elif action.type == SET_FIELD:
                 assert (action.set_field.field.oxm_class ==
@@ -399,21 +289,61 @@ class SimDevice(object):
                 field = action.set_field.field.ofb_field
 
                 if field.type == VLAN_VID:
-                    shim = frame.getlayer(Dot1Q)
-                    shim.vlan = field.vlan_vid & 4095
+                    ops.append((rawframe.set_vlan_vid,
+                                (field.vlan_vid & 4095,)))
 
                 elif field.type == VLAN_PCP:
-                    shim = frame.getlayer(Dot1Q)
-                    shim.prio = field.vlan_pcp
+                    ops.append((rawframe.set_vlan_pcp, (field.vlan_pcp,)))
 
                 else:
-                    raise NotImplementedError('set_field.field.type=%d'
-                                              % field.type)
+                    ops.append((_not_implemented, (
+                        'set_field.field.type=%d' % field.type,)))
 
             else:
-                raise NotImplementedError('action.type=%d' % action.type)
+                ops.append((_not_implemented, (
+                    'action.type=%d' % action.type,)))
+
+        return egress_port, ops
+
+
+class PonDemux(object):
+    """
+    The simulated PON medium between the OLT and its ONUs. Rather than
+    broadcasting each downstream frame to every ONU and letting each one's
+    flow table drop what is not addressed to it, frames are delivered only to
+    the ONUs that have a PON-side flow for the (customer) VLAN of the frame,
+    plus the ONUs with PON-side flows not keyed on VLAN (multicast or other
+    catch-all flows), which still see everything.
+    """
 
-        return egress_port, frame
+    def __init__(self):
+        self.onus = OrderedDict()  # port_no -> SimDevice, in port order
+        self.vlans = dict()  # port_no -> set of vlan keys, None for all
+        self.targets = dict()  # vlan key -> list of ONUs, lazily built
+
+    def add_onu(self, port_no, onu):
+        self.onus[port_no] = onu
+        self.update(port_no)
+
+    def update(self, port_no):
+        """Refresh the demux after the flows of an ONU changed"""
+        self.vlans[port_no] = \
+            self.onus[port_no].classifier.vlans_for_port(1)
+        self.targets.clear()
+
+    def get_targets(self, vlan):
+        targets = self.targets.get(vlan)
+        if targets is None:
+            targets = self.targets[vlan] = [
+                onu for port_no, onu in self.onus.iteritems()
+                if self.vlans[port_no] is None or vlan in self.vlans[port_no]]
+        return targets
+
+    def __call__(self, _, frame):
+        targets = self.get_targets(rawframe.get_vlan(frame))
+        last = len(targets) - 1
+        for i, onu in enumerate(targets):
+            onu.ingress(1, frame if i == last else bytearray(frame))
 
 
 class PonSim(object):
@@ -423,20 +353,18 @@ class PonSim(object):
         self.log = structlog.get_logger()
         # Create OLT and hook NNI port up for egress
         self.olt = SimDevice('olt', 0)
-        self.olt.link(2, lambda _, frame: self.egress_fun(0, frame))
+        self.olt.link(2, lambda _, frame: self.egress_fun(0, str(frame)))
         self.devices = dict()
         self.devices[0] = self.olt
         # TODO: This can be removed, it's for debugging purposes
         self.lc = LoopingCall(self.olt.counter.log_counts)
         self.lc.start(90)  # To correlate with Kafka
+        self.demux = PonDemux()
 
         # Create ONUs of the requested number and hook them up with OLT
         # and with egress fun
         def mk_egress_fun(port_no):
-            return lambda _, frame: self.egress_fun(port_no, frame)
-
-        def mk_onu_ingress(onu):
-            return lambda _, frame: onu.ingress(1, frame)
+            return lambda _, frame: self.egress_fun(port_no, str(frame))
 
         for i in range(onus):
             port_no = 128 + i
@@ -445,8 +373,10 @@ class PonSim(object):
                                                           frame))  # Send to the OLT
             onu.link(2,
                      mk_egress_fun(port_no))  # Send from the ONU to the world
-            self.olt.link(1, mk_onu_ingress(onu))  # Internal send to the ONU
+            self.demux.add_onu(port_no, onu)
             self.devices[port_no] = onu
+        # Internal send to the ONUs, only to those that can accept the frame
+        self.olt.link(1, self.demux)
         for d in self.devices:
             self.log.info("pon-sim-init", port=d, name=self.devices[d].name,
                           links=self.devices[d].links)
@@ -466,8 +396,11 @@ class PonSim(object):
 
     def onu_install_flows(self, onu_port, flows):
         self.devices[onu_port].install_flows(flows)
+        self.demux.update(onu_port)
 
     def ingress(self, port, frame):
-        if not isinstance(frame, Packet):
-            frame = Ether(frame)
-        self.devices[port].ingress(2, frame)
+        """
+        Inject a frame (str or scapy packet) into the simulator at the given
+        external port. Frames leave the simulator as str.
+        """
+        self.devices[port].ingress(2, rawframe.to_frame(frame))
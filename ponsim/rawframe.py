@@ -0,0 +1,120 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+In-place manipulation of Ethernet frames held in a bytearray, so frames can
+cross the simulated PON without being parsed into (and rebuilt from) scapy
+packets at every hop. The semantics follow what the equivalent scapy
+operations did on the Ether/Dot1Q layers.
+"""
+from struct import Struct
+
+ETH_HEADER_LEN = 14
+ETH_TYPE_OFFSET = 12
+ETH_TYPE_DOT1Q = 0x8100
+ETH_TYPE_DOT1AD = 0x88a8
+
+# scapy's Dot1Q defaults to vlan=1, so a freshly pushed tag carries it too
+DEFAULT_TCI = 0x0001
+
+_ushort = Struct('!H')
+_push_header = Struct('!HH')
+
+
+def to_frame(frame):
+    """
+    Return a mutable copy of a frame given as str or scapy packet.
+    """
+    return bytearray(str(frame))
+
+
+def payload_length(frame):
+    """Length of the Ethernet payload, i.e. len(Ether(frame).payload)"""
+    return len(frame) - ETH_HEADER_LEN
+
+
+def find_dot1q(frame):
+    """
+    Locate the first 802.1Q tag of the frame, skipping 802.1ad tags.
+    :return: offset of the ether type field announcing the tag (12 for an
+    outer tag), or None if the frame carries no 802.1Q tag
+    """
+    offset = ETH_TYPE_OFFSET
+    length = len(frame)
+    while offset + 6 <= length:
+        eth_type, = _ushort.unpack_from(frame, offset)
+        if eth_type == ETH_TYPE_DOT1Q:
+            return offset
+        if eth_type != ETH_TYPE_DOT1AD:
+            return None
+        offset += 4
+    return None
+
+
+def get_vlan(frame):
+    """
+    :return: 0x1000 | vid of the first 802.1Q tag, or 0 if the frame has
+    none (the same encoding OpenFlow uses for the VLAN_VID match field)
+    """
+    offset = find_dot1q(frame)
+    if offset is None:
+        return 0
+    tci, = _ushort.unpack_from(frame, offset + 2)
+    return 0x1000 | (tci & 0xfff)
+
+
+def pop_vlan(frame):
+    """
+    Remove the first 802.1Q tag (and any 802.1ad tag in front of it). The
+    frame is modified in place; it is returned for convenience.
+    """
+    offset = find_dot1q(frame)
+    if offset is not None:
+        del frame[ETH_TYPE_OFFSET:offset + 4]
+    return frame
+
+
+def push_vlan(frame, ethertype):
+    """
+    Insert a new outermost tag with the given TPID in place.
+    """
+    frame[ETH_TYPE_OFFSET:ETH_TYPE_OFFSET] = _push_header.pack(ethertype,
+                                                               DEFAULT_TCI)
+    return frame
+
+
+def set_vlan_vid(frame, vid):
+    """
+    Rewrite the vid of the first 802.1Q tag in place. Frames without such
+    tag are left untouched.
+    """
+    offset = find_dot1q(frame)
+    if offset is not None:
+        tci, = _ushort.unpack_from(frame, offset + 2)
+        _ushort.pack_into(frame, offset + 2, (tci & 0xf000) | (vid & 0xfff))
+    return frame
+
+
+def set_vlan_pcp(frame, pcp):
+    """
+    Rewrite the priority code point of the first 802.1Q tag in place.
+    """
+    offset = find_dot1q(frame)
+    if offset is not None:
+        tci, = _ushort.unpack_from(frame, offset + 2)
+        _ushort.pack_into(frame, offset + 2,
+                          (tci & 0x1fff) | ((pcp & 7) << 13))
+    return frame
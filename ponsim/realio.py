@@ -14,11 +14,11 @@
 # limitations under the License.
 #
 import structlog
-from scapy.layers.l2 import Ether
 from scapy.packet import Packet
 from twisted.internet.defer import inlineCallbacks, returnValue
 
 from common.frameio.frameio import FrameIOManager, hexify
+from common.structlog_setup import log_debug_enabled
 
 log = structlog.get_logger()
 
@@ -58,15 +58,16 @@ class RealIo(object):
 
     def ingress(self, io_port, frame):
         port = self.iface_name_to_port.get(io_port.iface_name)
-        log.debug('ingress', port=port, iface_name=io_port.iface_name,
-                  frame=hexify(frame))
-        decoded_frame = Ether(frame)
+        if log_debug_enabled():
+            log.debug('ingress', port=port, iface_name=io_port.iface_name,
+                      frame=hexify(frame))
         if self.ponsim is not None:
-            self.ponsim.ingress(port, decoded_frame)
+            self.ponsim.ingress(port, frame)
 
     def egress(self, port, frame):
         if isinstance(frame, Packet):
             frame = str(frame)
         io_port = self.io_ports[port]
-        log.debug('sending', port=port, frame=hexify(frame))
+        if log_debug_enabled():
+            log.debug('sending', port=port, frame=hexify(frame))
         io_port.send(frame)
@@ -0,0 +1,129 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from scapy.layers.inet import IP, UDP, TCP
+from scapy.layers.l2 import Ether, Dot1Q, Dot1AD
+
+from classifier import extract_headers, FlowClassifier
+from voltha.protos import third_party
+from voltha.core.flow_decomposer import *
+_ = third_party
+
+
+class TestExtractHeaders(TestCase):
+
+    def test_untagged_non_ip(self):
+        self.assertEqual(extract_headers(str(Ether(type=0x888e))),
+                         (0x888e, 0, None, None, None, None, None))
+
+    def test_runt_frame(self):
+        self.assertEqual(extract_headers('\x00' * 10)[:3], (None, 0, None))
+
+    def test_single_tagged_udp(self):
+        frame = Ether() / Dot1Q(vlan=128, prio=5) / \
+                IP(dst='228.1.1.2') / UDP(sport=68, dport=67)
+        self.assertEqual(extract_headers(str(frame)),
+                         (0x800, 0x1000 | 128, 5, 17, 0xe4010102, 68, 67))
+
+    def test_double_tagged_uses_outer_tag(self):
+        frame = Ether() / Dot1Q(vlan=1000) / Dot1Q(vlan=128) / \
+                IP(dst='1.2.3.4')
+        self.assertEqual(extract_headers(str(frame)),
+                         (0x8100, 0x1000 | 1000, 0, 0, 0x01020304, None,
+                          None))
+
+    def test_dot1ad_outer_tag_is_skipped(self):
+        frame = Ether() / Dot1AD(vlan=10) / Dot1Q(vlan=20) / IP() / TCP()
+        self.assertEqual(extract_headers(str(frame))[:4],
+                         (0x800, 0x1000 | 20, 0, 6))
+
+    def test_ip_options_and_fragments(self):
+        frame = Ether() / IP(options='\x01' * 4) / UDP(sport=1, dport=2)
+        self.assertEqual(extract_headers(str(frame))[5:], (1, 2))
+        frame = Ether() / IP(frag=10, proto=17) / ('\x00' * 8)
+        self.assertEqual(extract_headers(str(frame))[5:], (None, None))
+
+
+class TestFlowClassifier(TestCase):
+
+    def setUp(self):
+        self.flows = [
+            mk_flow_stat(
+                priority=1000,
+                match_fields=[in_port(1), eth_type(0x800), ip_proto(17),
+                              udp_dst(67)],
+                actions=[output(2)]
+            ),
+            mk_flow_stat(
+                priority=1000,
+                match_fields=[in_port(1), eth_type(0x800)],
+                actions=[output(3)]
+            ),
+            mk_flow_stat(
+                priority=500,
+                match_fields=[in_port(1), vlan_vid(4096 + 128)],
+                actions=[output(4)]
+            ),
+            mk_flow_stat(
+                priority=500,
+                match_fields=[vlan_vid(0)],
+                actions=[output(5)]
+            ),
+            mk_flow_stat(
+                priority=100,
+                match_fields=[],
+                actions=[output(6)]
+            ),
+        ]
+        self.classifier = FlowClassifier(self.flows)
+
+    def classify(self, port, frame):
+        flow = self.classifier.classify(port, str(frame))
+        return get_out_port(flow) if flow is not None else None
+
+    def test_most_specific_match_wins_within_priority(self):
+        self.assertEqual(
+            self.classify(1, Ether() / IP() / UDP(sport=68, dport=67)), 2)
+        self.assertEqual(
+            self.classify(1, Ether() / IP() / UDP(sport=68, dport=68)), 3)
+
+    def test_higher_priority_wins(self):
+        self.assertEqual(
+            self.classify(1, Ether() / Dot1Q(vlan=128) / IP()), 3)
+        self.assertEqual(
+            self.classify(1, Ether() / Dot1Q(vlan=128) / TCP()), 4)
+
+    def test_wildcard_in_port(self):
+        self.assertEqual(self.classify(7, Ether(type=0x888e)), 5)
+        self.assertEqual(self.classify(7, Ether() / Dot1Q(vlan=128)), None)
+
+    def test_flow_without_match_fields_never_matches(self):
+        self.assertEqual(self.classify(7, Ether() / Dot1Q(vlan=12)), None)
+
+    def test_vlans_for_port(self):
+        self.assertEqual(self.classifier.vlans_for_port(2), set([0]))
+        self.assertEqual(self.classifier.vlans_for_port(1), None)
+        self.assertEqual(FlowClassifier(self.flows[2:]).vlans_for_port(1),
+                         set([0, 0x1000 | 128]))
+
+    def test_empty_table(self):
+        self.assertEqual(FlowClassifier().classify(1, str(Ether())), None)
+
+
+if __name__ == '__main__':
+    main()
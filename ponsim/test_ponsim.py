@@ -33,7 +33,8 @@ class TestPonSim(TestCase):
     def setUp(self):
         self.output = []
         self.pon = PonSim(onus=2, egress_fun=lambda port, frame:
-            self.output.append((port, frame)))
+            self.output.append((port, frame)),
+                          alarm_config=dict(simulation=False))
 
     def reset_output(self):
         while self.output:
@@ -94,7 +95,7 @@ class TestPonSim(TestCase):
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP()
 
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(128, out_frame)])
+        self.assertEqual(self.output, [(128, str(out_frame))])
 
     def test_upstream_unicast_forwarding(self):
 
@@ -130,7 +131,7 @@ class TestPonSim(TestCase):
         out_frame = Ether(**kw) / Dot1Q(vlan=1000) / Dot1Q(vlan=128) / IP()
 
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(0, out_frame)])
+        self.assertEqual(self.output, [(0, str(out_frame))])
 
 
     def setup_all_flows(self):
@@ -261,7 +262,8 @@ class TestPonSim(TestCase):
         out_frame1 = Ether(**kw) / Dot1Q(vlan=4000) / Dot1Q(vlan=128) / EAPOL(type=1)
         out_frame2 = Ether(**kw) / Dot1Q(vlan=4000) / Dot1Q(vlan=129) / EAPOL(type=1)
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(0, out_frame1), (0, out_frame2)])
+        self.assertEqual(self.output,
+                         [(0, str(out_frame1)), (0, str(out_frame2))])
 
     def test_eapol_out(self):
         self.setup_all_flows()
@@ -271,7 +273,8 @@ class TestPonSim(TestCase):
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / EAPOL(type=1)
         self.ingress_frame(in_frame1)
         self.ingress_frame(in_frame2)
-        self.assertEqual(self.output, [(128, out_frame), (129, out_frame)])
+        self.assertEqual(self.output,
+                         [(128, str(out_frame)), (129, str(out_frame))])
 
     def test_igmp_in(self):
         self.setup_all_flows()
@@ -287,7 +290,8 @@ class TestPonSim(TestCase):
         out_frame2 = Ether(**kw) / Dot1Q(vlan=4000) / Dot1Q(vlan=129) /\
                      in_frame.payload.copy()
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(0, out_frame1), (0, out_frame2)])
+        self.assertEqual(self.output,
+                         [(0, str(out_frame1)), (0, str(out_frame2))])
 
     def test_igmp_out(self):
         self.setup_all_flows()
@@ -300,7 +304,8 @@ class TestPonSim(TestCase):
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP() / mq.copy()
         self.ingress_frame(in_frame1)
         self.ingress_frame(in_frame2)
-        self.assertEqual(self.output, [(128, out_frame), (129, out_frame)])
+        self.assertEqual(self.output,
+                         [(128, str(out_frame)), (129, str(out_frame))])
 
     def test_combo_downstream_unicast_onu1(self):
         self.setup_all_flows()
@@ -309,7 +314,7 @@ class TestPonSim(TestCase):
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP()
         self.reset_output()
         self.ingress_frame(in_frame, ports=0)
-        self.assertEqual(self.output, [(128, out_frame)])
+        self.assertEqual(self.output, [(128, str(out_frame))])
 
     def test_combo_downstream_unicast_onu2(self):
         self.setup_all_flows()
@@ -318,7 +323,41 @@ class TestPonSim(TestCase):
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP()
         self.reset_output()
         self.ingress_frame(in_frame, ports=0)
-        self.assertEqual(self.output, [(129, out_frame)])
+        self.assertEqual(self.output, [(129, str(out_frame))])
+
+    def rx_frames(self, port):
+        return sum(sum(c.value)
+                   for c in self.pon.devices[port].counter.rx_counters.values())
+
+    def test_downstream_unicast_only_reaches_addressed_onu(self):
+        self.pon.olt_install_flows([
+            mk_flow_stat(
+                match_fields=[in_port(2), vlan_vid(4096 + 1000)],
+                actions=[pop_vlan(), output(1)]
+            )
+        ])
+        for port in (128, 129):
+            self.pon.onu_install_flows(port, [
+                mk_flow_stat(
+                    match_fields=[in_port(1), vlan_vid(4096 + port)],
+                    actions=[set_field(vlan_vid(4096 + 0)), output(2)]
+                )
+            ])
+        kw = dict(src='00:00:00:11:11:11', dst='00:00:00:22:22:22')
+        in_frame = Ether(**kw) / Dot1Q(vlan=1000) / Dot1Q(vlan=129) / IP()
+        out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP()
+        self.ingress_frame(in_frame, ports=0)
+        self.assertEqual(self.output, [(129, str(out_frame))])
+        self.assertEqual(self.rx_frames(128), 0)
+        self.assertEqual(self.rx_frames(129), 1)
+
+    def test_downstream_multicast_reaches_catch_all_onus(self):
+        self.setup_all_flows()
+        kw = dict(src='00:00:00:11:11:11', dst='00:00:00:22:22:22')
+        in_frame = Ether(**kw) / Dot1Q(vlan=140) / IP(dst='228.1.1.4')
+        self.ingress_frame(in_frame, ports=0)
+        self.assertEqual(self.rx_frames(128), 1)
+        self.assertEqual(self.rx_frames(129), 1)
 
     def test_combo_upstream_unicast_onu1(self):
         self.setup_all_flows()
@@ -326,7 +365,7 @@ class TestPonSim(TestCase):
         in_frame = Ether(**kw) / Dot1Q(vlan=1000) / Dot1Q(vlan=128) / IP()
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP()
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(128, out_frame)])
+        self.assertEqual(self.output, [(128, str(out_frame))])
 
     def test_combo_upstream_unicast_onu2(self):
         self.setup_all_flows()
@@ -334,7 +373,7 @@ class TestPonSim(TestCase):
         in_frame = Ether(**kw) / Dot1Q(vlan=1000) / Dot1Q(vlan=129) / IP()
         out_frame = Ether(**kw) / Dot1Q(vlan=0) / IP()
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(129, out_frame)])
+        self.assertEqual(self.output, [(129, str(out_frame))])
 
     def test_combo_multicast_stream1(self):
         self.setup_all_flows()
@@ -349,7 +388,7 @@ class TestPonSim(TestCase):
         in_frame = Ether(**kw) / Dot1Q(vlan=140) / IP(dst='228.1.1.2')
         out_frame = Ether(**kw) / IP(dst='228.1.1.2')
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(128, out_frame),])
+        self.assertEqual(self.output, [(128, str(out_frame)),])
 
     def test_combo_multicast_stream3(self):
         self.setup_all_flows()
@@ -357,7 +396,7 @@ class TestPonSim(TestCase):
         in_frame = Ether(**kw) / Dot1Q(vlan=140) / IP(dst='228.1.1.3')
         out_frame = Ether(**kw) / IP(dst='228.1.1.3')
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(129, out_frame),])
+        self.assertEqual(self.output, [(129, str(out_frame)),])
 
     def test_combo_multicast_stream4(self):
         self.setup_all_flows()
@@ -365,7 +404,8 @@ class TestPonSim(TestCase):
         in_frame = Ether(**kw) / Dot1Q(vlan=140) / IP(dst='228.1.1.4')
         out_frame = Ether(**kw) / IP(dst='228.1.1.4')
         self.ingress_frame(in_frame)
-        self.assertEqual(self.output, [(128, out_frame), (129, out_frame)])
+        self.assertEqual(self.output,
+                         [(128, str(out_frame)), (129, str(out_frame))])
 
 
 if __name__ == '__main__':
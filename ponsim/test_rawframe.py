@@ -0,0 +1,78 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from unittest import TestCase, main
+
+from scapy.layers.inet import IP
+from scapy.layers.l2 import Ether, Dot1Q, Dot1AD
+
+import rawframe
+
+kw = dict(src='00:00:00:11:11:11', dst='00:00:00:22:22:22')
+
+
+class TestRawFrame(TestCase):
+
+    def assertFrameEqual(self, frame, packet):
+        self.assertEqual(str(frame), str(packet))
+
+    def test_payload_length(self):
+        packet = Ether(**kw) / Dot1Q(vlan=10) / IP()
+        self.assertEqual(rawframe.payload_length(rawframe.to_frame(packet)),
+                         len(packet.payload))
+
+    def test_pop_vlan(self):
+        frame = rawframe.to_frame(
+            Ether(**kw) / Dot1Q(vlan=1000) / Dot1Q(vlan=128) / IP())
+        rawframe.pop_vlan(frame)
+        self.assertFrameEqual(frame, Ether(**kw) / Dot1Q(vlan=128) / IP())
+        rawframe.pop_vlan(frame)
+        self.assertFrameEqual(frame, Ether(**kw) / IP())
+        rawframe.pop_vlan(frame)
+        self.assertFrameEqual(frame, Ether(**kw) / IP())
+
+    def test_pop_vlan_behind_dot1ad(self):
+        frame = rawframe.to_frame(
+            Ether(**kw) / Dot1AD(vlan=10) / Dot1Q(vlan=20) / IP())
+        rawframe.pop_vlan(frame)
+        self.assertFrameEqual(frame, Ether(**kw) / IP())
+
+    def test_push_vlan(self):
+        frame = rawframe.to_frame(Ether(**kw) / Dot1Q(vlan=128) / IP())
+        rawframe.push_vlan(frame, 0x8100)
+        self.assertFrameEqual(
+            frame, Ether(**kw) / Dot1Q() / Dot1Q(vlan=128) / IP())
+
+    def test_set_vid_and_pcp(self):
+        frame = rawframe.to_frame(
+            Ether(**kw) / Dot1Q(vlan=1000, prio=3) / Dot1Q(vlan=128) / IP())
+        rawframe.set_vlan_vid(frame, 4000)
+        self.assertFrameEqual(
+            frame,
+            Ether(**kw) / Dot1Q(vlan=4000, prio=3) / Dot1Q(vlan=128) / IP())
+        rawframe.set_vlan_pcp(frame, 6)
+        self.assertFrameEqual(
+            frame,
+            Ether(**kw) / Dot1Q(vlan=4000, prio=6) / Dot1Q(vlan=128) / IP())
+
+    def test_set_vid_on_untagged_frame(self):
+        frame = rawframe.to_frame(Ether(**kw) / IP())
+        rawframe.set_vlan_vid(frame, 4000)
+        self.assertFrameEqual(frame, Ether(**kw) / IP())
+
+
+if __name__ == '__main__':
+    main()
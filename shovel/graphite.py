@@ -0,0 +1,291 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Batched writing of data points to one or more graphite/carbon servers over
+their pickle protocol, off the thread reading from Kafka.
+"""
+import pickle
+import select
+import socket
+import struct
+import time
+from bisect import bisect
+from collections import deque
+from hashlib import md5
+from threading import Condition, Thread
+
+import structlog
+
+log = structlog.get_logger()
+
+
+def pickle_batch(batch):
+    """Pickle (path, (timestamp, value)) tuples into graphite format."""
+    payload = pickle.dumps(batch, protocol=2)
+    header = struct.pack("!L", len(payload))
+    return header + payload
+
+
+def parse_endpoint(endpoint, default_port=2004):
+    """host[:port] -> (host, port)"""
+    host, _, port = endpoint.partition(':')
+    return host, int(port) if port else default_port
+
+
+class ConsistentHash(object):
+    """
+    Map keys (metric paths) to nodes such that adding or removing a node
+    only moves the keys of that node, as carbon-relay does, so that each
+    series keeps landing on the same server.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.ring = sorted(
+            (self._hash('{}:{}'.format(node, i)), node)
+            for node in nodes for i in xrange(replicas))
+        self.hashes = [h for h, _ in self.ring]
+
+    @staticmethod
+    def _hash(key):
+        return int(md5(key).hexdigest()[:8], 16)
+
+    def get(self, key):
+        i = bisect(self.hashes, self._hash(key)) % len(self.ring)
+        return self.ring[i][1]
+
+
+class GraphiteSender(Thread):
+    """
+    Send the pickled batches queued for one graphite server, from a thread
+    of its own, (re)connecting with exponential backoff as needed. At most
+    max_queued batches wait for the server; the oldest ones are dropped when
+    it cannot keep up, rather than holding up the Kafka consumer.
+    """
+
+    def __init__(self, host, port, max_queued=64, timeout=10, delay=1,
+                 max_delay=30):
+        Thread.__init__(self, name='graphite-{}:{}'.format(host, port))
+        self.daemon = True
+        self.host = host
+        self.port = port
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.delay = delay
+        self.max_delay = max_delay
+
+        self.condition = Condition()
+        self.queue = deque()  # of (message, number of points)
+        self.conn = None
+        self.connected = False  # at least once
+        self.stopping = False
+
+        self.sent = 0  # points
+        self.sent_bytes = 0
+        self.dropped = 0  # points
+        self.reconnects = 0
+
+    def put(self, message, points):
+        with self.condition:
+            if len(self.queue) >= self.max_queued:
+                _, lost = self.queue.popleft()
+                self.dropped += lost
+            self.queue.append((message, points))
+            self.condition.notify()
+
+    def queued(self):
+        with self.condition:
+            return sum(points for _, points in self.queue)
+
+    def stop(self, timeout=None):
+        """Stop once the queued batches are sent, or after timeout"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.join(timeout)
+        self._close()
+
+    def run(self):
+        delay = self.delay
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopping:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                message, points = self.queue[0]
+
+            try:
+                if self.conn is not None and self._hung_up():
+                    self._close()
+                if self.conn is None:
+                    self._connect()
+                self.conn.sendall(message)
+            except socket.error, e:
+                log.warn('graphite-send-failed', host=self.host,
+                         port=self.port, e=e, retry_in=delay)
+                self._close()
+                with self.condition:
+                    if self.stopping:
+                        return
+                    self.condition.wait(delay)
+                delay = min(delay * 2, self.max_delay)
+                continue
+
+            delay = self.delay
+            with self.condition:
+                # unless dropped meanwhile
+                if self.queue and self.queue[0][0] is message:
+                    self.queue.popleft()
+                self.sent += points
+                self.sent_bytes += len(message)
+
+    def _connect(self):
+        self.conn = socket.create_connection((self.host, self.port),
+                                             self.timeout)
+        if self.connected:
+            self.reconnects += 1
+        self.connected = True
+        log.info('connected-to-graphite', host=self.host, port=self.port)
+
+    def _hung_up(self):
+        # graphite never writes back, so a readable socket means it closed
+        # the connection (e.g. on restart); sendall would not tell, the data
+        # going to the kernel buffer and being lost
+        readable, _, _ = select.select([self.conn], [], [], 0)
+        if readable:
+            log.info('graphite-hung-up', host=self.host, port=self.port)
+        return bool(readable)
+
+    def _close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except socket.error:
+                pass
+            self.conn = None
+
+
+class GraphiteWriter(object):
+    """
+    Batch the data points across Kafka records and hand them over to the
+    sender of the graphite server of their path. A batch is sent when it
+    has max_batch points, or when its oldest point has waited for
+    max_delay seconds, as checked by poll().
+    """
+
+    def __init__(self, endpoints, max_batch=500, max_delay=1.0,
+                 max_queued=64, **sender_kw):
+        """
+        :param endpoints: list of (host, port) of the graphite servers, the
+        data points being sharded over them by path
+        """
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.senders = dict(
+            ('{}:{}'.format(host, port),
+             GraphiteSender(host, port, max_queued, **sender_kw))
+            for host, port in endpoints)
+        self.hash = ConsistentHash(sorted(self.senders))
+        self.batches = dict((endpoint, []) for endpoint in self.senders)
+        self.since = {}  # endpoint -> time its batch got its first point
+
+        self.received = 0  # points
+        self.started_at = time.time()
+
+    def start(self):
+        for sender in self.senders.itervalues():
+            sender.start()
+        return self
+
+    def stop(self, timeout=10):
+        self.flush()
+        for sender in self.senders.itervalues():
+            sender.stop(timeout)
+
+    def add(self, points):
+        """:param points: list of (path, (timestamp, value))"""
+        self.received += len(points)
+        if len(self.senders) == 1:
+            endpoint, = self.batches
+            self._extend(endpoint, points)
+            return
+        shards = {}
+        for point in points:
+            shards.setdefault(self.hash.get(point[0]), []).append(point)
+        for endpoint, shard in shards.iteritems():
+            self._extend(endpoint, shard)
+
+    def poll(self, now=None):
+        """Send the batches that waited long enough"""
+        now = time.time() if now is None else now
+        for endpoint, since in self.since.items():
+            if now - since >= self.max_delay:
+                self._send(endpoint)
+
+    def flush(self):
+        for endpoint in self.since.keys():
+            self._send(endpoint)
+
+    def statistics(self):
+        """
+        Return the points received and sent per second since the previous
+        call, and the points dropped, queued and reconnections per server.
+        """
+        now = time.time()
+        elapsed = max(now - self.started_at, 1e-6)
+        stats = {
+            'received-per-sec': self.received / elapsed,
+            'sent-per-sec': 0.0,
+            'sent-bytes-per-sec': 0.0,
+            'dropped': 0,
+            'queued': 0,
+            'reconnects': 0
+        }
+        for sender in self.senders.itervalues():
+            with sender.condition:
+                stats['sent-per-sec'] += sender.sent / elapsed
+                stats['sent-bytes-per-sec'] += sender.sent_bytes / elapsed
+                stats['dropped'] += sender.dropped
+                stats['reconnects'] += sender.reconnects
+                sender.sent = sender.sent_bytes = sender.dropped = \
+                    sender.reconnects = 0
+            stats['queued'] += sender.queued()
+        self.received = 0
+        self.started_at = now
+        return stats
+
+    def _extend(self, endpoint, points):
+        batch = self.batches[endpoint]
+        if not batch:
+            self.since[endpoint] = time.time()
+        batch.extend(points)
+        if len(batch) >= self.max_batch:
+            # send the full batches, the rest waits for more
+            full = len(batch) - len(batch) % self.max_batch
+            self._send(endpoint, full)
+
+    def _send(self, endpoint, size=None):
+        batch = self.batches[endpoint]
+        size = len(batch) if size is None else size
+        self.batches[endpoint] = batch[size:]
+        if self.batches[endpoint]:
+            self.since[endpoint] = time.time()
+        else:
+            self.since.pop(endpoint, None)
+        for i in xrange(0, size, self.max_batch):
+            chunk = batch[i:min(i + self.max_batch, size)]
+            self.senders[endpoint].put(pickle_batch(chunk), len(chunk))
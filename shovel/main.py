@@ -16,116 +16,30 @@ from optparse import OptionParser
 import simplejson
 import structlog
 from kafka import KafkaConsumer
-import pickle
-import struct
-import socket
 import sys
 import time
 
-from kafka.consumer.fetcher import ConsumerRecord
 from kafka.errors import KafkaError
 
 from common.utils.consulhelpers import get_endpoint_from_consul
+from common.utils.kpi_decoder import KpiDecoder
+from shovel.graphite import GraphiteWriter, parse_endpoint
 
 
 log = structlog.get_logger()
 
+# keeps the schemas of the time-series KpiEvents
+decoder = KpiDecoder()
 
-class Graphite:
-
-    def __init__(self, host='localhost', port=2004, retry=5, delay=3,
-                 backoff=2, timeout=10):
-        self.host = host
-        self.port = port
-        self.retry = retry
-        self.delay = delay
-        self.backoff = backoff
-        self.timeout = timeout
-
-        # Create initial socket
-        self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.conn.settimeout(self.timeout)
-        # Initiate connection
-        self.connect()
-
-
-    def _backoff(self, retry, delay, backoff):
-        """Exponential backoff."""
-        retry -= 1
-        if retry == 0:
-            raise Exception('Timeout')
-        time.sleep(delay)
-        delay *= backoff
-        return retry, delay, backoff
-
-
-    def _retry(self, exception, func, *args):
-        """
-        Retry calling the func catching a tuple of exceptions with backoff.
-        """
-        retry = self.retry
-        delay = self.delay
-        backoff = self.backoff
-        while retry > 0:
-            try:
-                return func(*args)
-            except exception, e:
-                retry, delay, backoff = self._backoff(retry, delay, backoff)
-
-
-    def connect(self):
-        """Connect to graphite."""
-        retry = self.retry
-        backoff = self.backoff
-        delay = self.delay
-        while retry > 0:
-            try:
-                # Attempt to connect to Graphite, break if success
-                self.conn.connect((self.host, self.port))
-                break
-            except socket.error, e:
-                # Ditch this socket. Create a new one
-                self.conn.close()
-                self.conn.connect()
-                retry, delay, backoff = self._backoff(retry, delay, backoff)
-
-
-    def close(self):
-        """Close connection go Graphite."""
-        self.conn.close()
-
-
-    def send(self, data, retry=3):
-        """Send data to graphite."""
-        retry = self.retry
-        backoff = self.backoff
-        delay = self.delay
-        # Attempt to send any data in the queue
-        while retry > 0:
-            # Check socket
-            if not self.conn:
-                # Attempt to restablish connection
-                self.close()
-                self.connect()
-                retry, delay, backoff = self._backoff(retry, delay, backoff)
-                continue
-            try:
-                # Send data to socket
-                self.conn.sendall(data)
-                break
-            except socket.error, e:
-                self.close()
-                self.connect()
-                retry, delay, backoff = self._backoff(retry, delay, backoff)
-                continue
-
-
-def _pickle(batch):
-    """Pickle metrics into graphite format."""
-    payload = pickle.dumps(batch)
-    header = struct.pack("!L", len(payload))
-    message = header + payload
-    return message
+
+def _lag(consumer):
+    """Messages of the assigned partitions not consumed yet"""
+    lag = 0
+    for partition in consumer.assignment():
+        highwater = consumer.highwater(partition)
+        if highwater is not None:
+            lag += max(highwater - consumer.position(partition), 0)
+    return lag
 
 
 def _convert(msg):
@@ -138,16 +52,11 @@ def _convert(msg):
                 yield (path, ts, value)
 
     assert isinstance(msg, dict)
-    type = msg.get('type')
-    if type == 'slice':
-        extractor, kw = extract_slice, dict(ts=msg['ts'],
-                                            prefixes=msg['prefixes'])
-    else:
-        raise Exception('Unknown format')
-
     batch = []
-    for path, timestamp, value in extractor(**kw):
-        batch.append((path, (timestamp, value)))
+    for slice in decoder.decode(msg):
+        for path, timestamp, value in extract_slice(slice['ts'],
+                                                    slice['prefixes']):
+            batch.append((path, (timestamp, value)))
     return batch
 
 
@@ -162,9 +71,23 @@ if __name__ == "__main__":
                            "with '@kafka' value)")
     parser.add_option("-t", "--topic", dest="topic", help="Kafka topic")
     parser.add_option("-H", "--host", dest="graphite_host",
-                      default="localhost", help="Graphite host")
+                      default="localhost",
+                      help="Graphite host, or comma separated host[:port] "
+                           "list to shard the metrics over")
     parser.add_option("-p", "--port", dest="graphite_port", type=int,
                       default=2004, help="Graphite port")
+    parser.add_option("-b", "--max-batch", dest="max_batch", type=int,
+                      default=500, help="Data points per graphite message")
+    parser.add_option("-d", "--max-delay", dest="max_delay", type=float,
+                      default=1.0,
+                      help="Seconds a data point may wait for its batch")
+    parser.add_option("-q", "--max-queued", dest="max_queued", type=int,
+                      default=64,
+                      help="Messages queued per graphite host before "
+                           "dropping the oldest")
+    parser.add_option("-s", "--stats-interval", dest="stats_interval",
+                      type=float, default=60,
+                      help="Seconds between statistics logs")
 
     (options, args) = parser.parse_args()
 
@@ -172,19 +95,14 @@ if __name__ == "__main__":
     kafka = options.kafka
     consul = options.consul
     topic = options.topic
-    host = options.graphite_host
-    port = options.graphite_port
+    endpoints = [parse_endpoint(endpoint, options.graphite_port)
+                 for endpoint in options.graphite_host.split(',')]
 
-    # Connect to Graphite
-    try:
-        graphite = Graphite(host, port)
-    except socket.error, e:
-        print "Could not connect to graphite host %s:%s" % (host, port)
-        sys.exit(1)
-    except socket.gaierror, e:
-        print "Invalid hostname for graphite host %s" % (host)
-        sys.exit(1)
-    log.info('Connected to graphite at {}:{}'.format(host, port))
+    # Senders (re)connect to Graphite in the background
+    writer = GraphiteWriter(endpoints, max_batch=options.max_batch,
+                            max_delay=options.max_delay,
+                            max_queued=options.max_queued).start()
+    log.info('graphite-writer-started', endpoints=endpoints)
 
     # Resolve Kafka value if it is based on consul lookup
     if kafka.startswith('@'):
@@ -198,20 +116,38 @@ if __name__ == "__main__":
         log.error('failed-to-connect-to-kafka', kafka=kafka, e=e)
         sys.exit(1)
 
-    # Consume Kafka topic
+    # Consume Kafka topic, in chunks of records, sending the data points in
+    # batches across records
     log.info('start-loop', topic=topic)
-    for record in consumer:
-        assert isinstance(record, ConsumerRecord)
-        msg = record.value
-
-        try:
-            batch = _convert(simplejson.loads(msg))
-        except Exception, e:
-            log.warn('unknown-format', msg=msg)
-            continue
-
-        pickled = _pickle(batch)
-        graphite.send(pickled)
-        log.debug('sent', batch_len=len(batch))
+    records = 0
+    stats_due = time.time() + options.stats_interval
+    try:
+        while True:
+            chunk = consumer.poll(
+                timeout_ms=int(options.max_delay * 1000), max_records=1000)
+            for partition_records in chunk.itervalues():
+                for record in partition_records:
+                    msg = record.value
+                    records += 1
+                    try:
+                        batch = _convert(simplejson.loads(msg))
+                    except Exception, e:
+                        log.warn('unknown-format', msg=msg)
+                        continue
+                    writer.add(batch)
+            writer.poll()
+
+            now = time.time()
+            if now >= stats_due:
+                log.info('statistics', lag=_lag(consumer),
+                         records_per_sec=records / options.stats_interval,
+                         **dict((k.replace('-', '_'), v) for k, v in
+                                writer.statistics().iteritems()))
+                records = 0
+                stats_due = now + options.stats_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.stop()
 
     log.info('exited')
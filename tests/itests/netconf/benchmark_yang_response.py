@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+We use this module to time the reply of the netconf server to a
+ListDeviceFlows VolthaRpc: the response streamed in YANG order by the
+YangXmlWriter (RpcResponse.build_yang_response_stream), with the field plans
+the NetconfRPCMapper makes when loading the generated modules, and, for
+reference, the legacy path of the generated modules lacking the
+get_message_* functions (protobuf -> dict -> rearranged dict -> dicttoxml ->
+lxml -> text).
+
+The YANG message definitions are derived from the descriptors of
+openflow_13.proto, in the form generated by proto2yang, so that no voltha
+is needed.
+
+Usage (from the top level directory, with the protos compiled):
+
+    env PYTHONPATH=.:voltha/protos/third_party \\
+        python tests/itests/netconf/benchmark_yang_response.py -f 10000
+"""
+
+import argparse
+import time
+
+import dicttoxml
+import structlog
+from google.protobuf.descriptor import FieldDescriptor as FD
+from lxml import etree
+
+from netconf.grpc_client.grpc_client import GrpcClient
+from netconf.grpc_client.nc_rpc_mapper import get_nc_rpc_mapper_instance
+from netconf.nc_rpc.rpc_response import RpcResponse
+from voltha.core.flow_decomposer import mk_flow_stat, in_port, vlan_vid, \
+    eth_type, output, push_vlan, set_field
+from voltha.protos import third_party
+from voltha.protos import openflow_13_pb2 as ofp
+
+_ = third_party
+
+log = structlog.get_logger()
+
+
+def message_definitions(file_descriptor):
+    module = file_descriptor.name[:-len('.proto')]
+    definitions = {}
+
+    def type_name(descriptor):
+        return descriptor.full_name[len(file_descriptor.package) + 1:] \
+            .replace('.', '-')
+
+    def add(descriptor):
+        definitions['{}-{}'.format(module, type_name(descriptor))] = [
+            {'name': fd.name, 'module': module,
+             'type': type_name(fd.message_type)
+             if fd.type == FD.TYPE_MESSAGE else fd.type,
+             'type_ref': fd.type == FD.TYPE_MESSAGE,
+             'repeated': fd.label == FD.LABEL_REPEATED}
+            for fd in descriptor.fields]
+        for nested in descriptor.nested_types:
+            add(nested)
+
+    for descriptor in file_descriptor.message_types_by_name.itervalues():
+        add(descriptor)
+    return definitions
+
+
+def flows(n):
+    return ofp.Flows(items=[
+        mk_flow_stat(
+            priority=1000 + i % 100,
+            match_fields=[in_port(i % 64 + 1), vlan_vid(4096 + i % 4000),
+                          eth_type(0x800)],
+            actions=[push_vlan(0x8100), set_field(vlan_vid(4096 + 1000)),
+                     output(100)])
+        for i in xrange(n)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--flows', type=int, default=10000)
+    parser.add_argument('-r', '--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+
+    definitions = message_definitions(ofp.DESCRIPTOR)
+
+    def get_fields(package, type_name, **kw):
+        log.info('fields-request', type=type_name, package=package, **kw)
+        full_name = ''.join([package, '-', type_name])
+        if definitions.has_key(full_name):
+            return definitions[full_name]
+        else:
+            return None
+
+    mapper = get_nc_rpc_mapper_instance(None, None)
+    mapper.yang_defs['get_fields'] = get_fields
+    t0 = time.time()
+    mapper.message_definitions = definitions
+    for full_name in definitions:
+        mapper.get_field_plan(*full_name.split('-', 1))
+    print 'planned {} message types in {:.1f}ms'.format(
+        len(mapper.field_plans), (time.time() - t0) * 1000)
+
+    client = GrpcClient(None, '/tmp')
+    message = flows(args.flows)
+    return_type = ('openflow_13', 'Flows')
+    yang_options = ('flows', 'items')
+    request = {'command': 'VolthaLocalService-ListDeviceFlows'}
+
+    def streamed():
+        response = RpcResponse(None)
+        response.build_yang_response_stream(message, return_type, request,
+                                            yang_options, custom_rpc=True)
+        return ''.join(response.stream)
+
+    def legacy():
+        response = client.rearrange_dict(client.convertToDict(message),
+                                          mapper.get_field_plan(*return_type))
+        root = etree.fromstring(dicttoxml.dicttoxml(response, attr_type=True))
+        node = RpcResponse(None).build_yang_response(
+            root, request, yang_options, custom_rpc=True)
+        return etree.tostring(node)
+
+    def best(f):
+        timings = []
+        for _ in xrange(args.rounds):
+            t0 = time.time()
+            result = f()
+            timings.append(time.time() - t0)
+        return min(timings), result
+
+    stream_time, result = best(streamed)
+    legacy_time, expected = best(legacy)
+    assert result.count('<items>') == expected.count('<items>') == args.flows
+
+    print '{} flows, best of {}'.format(args.flows, args.rounds)
+    print '{:<16} {:>10}'.format('reply', 'ms')
+    print '{:<16} {:>10.1f}'.format('streamed', stream_time * 1000)
+    print '{:<16} {:>10.1f}'.format('legacy (dicts)', legacy_time * 1000)
+
+
+if __name__ == '__main__':
+    main()
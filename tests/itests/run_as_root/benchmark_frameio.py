@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measure the receive rate (frames per second) of the frameio receive paths
+over a veth pair. Run this inside a docker container using the following
+syntax:
+
+docker run -ti --rm -v $(pwd):/voltha  --privileged cord/voltha-base \\
+    env PYTHONPATH=/voltha python \\
+    /voltha/tests/itests/run_as_root/benchmark_frameio.py
+"""
+
+import argparse
+import os
+import select
+import socket
+import time
+from multiprocessing import Process
+
+from scapy.layers.inet import IP, UDP
+from scapy.layers.l2 import Ether, Dot1Q
+
+from common.frameio.batch_recv import BatchReceiver
+from common.frameio.third_party.oftest import afpacket
+
+TX_IFACE = 'vethbench0'
+RX_IFACE = 'vethbench1'
+ETH_P_ALL = 0x03
+BUFSIZE = 4096
+
+
+def make_veth_pair():
+    if os.system('ip link show {} >/dev/null 2>&1'.format(TX_IFACE)) != 0:
+        os.system('ip link add {} type veth peer name {}'.format(
+            TX_IFACE, RX_IFACE))
+    os.system('ip link set {} up'.format(TX_IFACE))
+    os.system('ip link set {} up'.format(RX_IFACE))
+
+
+def delete_veth_pair():
+    os.system('ip link del {}'.format(TX_IFACE))
+
+
+def open_socket(iface_name):
+    s = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    afpacket.enable_auxdata(s)
+    s.bind((iface_name, ETH_P_ALL))
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    s.setblocking(0)
+    return s
+
+
+def blast(n):
+    frame = str(Ether(src='00:00:00:11:11:11', dst='00:00:00:22:22:22') /
+                Dot1Q(vlan=1000) / IP() / UDP() / ('\x00' * 64))
+    s = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    s.bind((TX_IFACE, ETH_P_ALL))
+    for _ in xrange(n):
+        s.send(frame)
+    s.close()
+
+
+def measure(name, rx_socket, receive, n):
+    """
+    Send n frames and receive them with receive(), which must return the
+    list of frames read after select signalled rx_socket readable.
+    """
+    sender = Process(target=blast, args=(n,))
+    received = 0
+    t0 = t1 = time.time()
+    sender.start()
+    while True:
+        _in, _, _ = select.select([rx_socket], [], [], 0.5)
+        if not _in:
+            break  # sender done and socket drained
+        received += len(receive())
+        t1 = time.time()
+    elapsed = t1 - t0
+    sender.join()
+    print '%-12s received %d/%d frames: %.0f frames/s' % (
+        name, received, n, received / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--frames', type=int, default=200000,
+                        help='number of frames to send (default: 200000)')
+    parser.add_argument('-b', '--batch-size', type=int, default=64,
+                        help='recvmmsg batch size (default: 64)')
+    args = parser.parse_args()
+
+    make_veth_pair()
+    try:
+        s = open_socket(RX_IFACE)
+        measure('recvmsg', s, lambda: [afpacket.recv(s, BUFSIZE)],
+                args.frames)
+        s.close()
+
+        s = open_socket(RX_IFACE)
+        receiver = BatchReceiver(s, BUFSIZE, args.batch_size)
+        measure('recvmmsg', s, receiver.recv, args.frames)
+        s.close()
+    finally:
+        delete_veth_pair()
+
+
+if __name__ == '__main__':
+    main()
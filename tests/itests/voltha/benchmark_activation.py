@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+We use this module to measure how long it takes to bring up the ONUs of a
+rack of OLTs, say after the OLTs rebooted, through the activation scheduler
+of the core, depending on its concurrency limits.
+
+The ONUs are activated by the real simulated_onu adapter, against stand-ins
+for the adapter agent and for the simulated_olt proxied message channel,
+which echoes the messages back after 0.2s like simulated_olt does, but only
+serves --olt-channels of them at a time per OLT. Everything runs on a
+simulated clock, so the times reported are those the activations would
+take, not the time the benchmark takes to run. A share of the ONUs can be
+made to fail their activation, to see the retries at work.
+
+Usage (from the top level directory, with the protos compiled):
+
+    env PYTHONPATH=.:voltha/protos/third_party \\
+        python tests/itests/voltha/benchmark_activation.py -o 4 -n 128
+"""
+
+import argparse
+import random
+
+import structlog
+from twisted.internet.task import Clock, deferLater
+
+from voltha.adapters.simulated_onu import simulated_onu
+from voltha.adapters.simulated_onu.simulated_onu import SimulatedOnuAdapter
+from voltha.core import activation_scheduler
+from voltha.core.activation_scheduler import ActivationScheduler
+from voltha.protos import third_party
+from voltha.protos.common_pb2 import OperStatus
+from voltha.protos.device_pb2 import Device
+
+_ = third_party
+
+clock = Clock()
+
+
+def asleep(dt):
+    return deferLater(clock, dt, lambda: None)
+
+
+class OltChannel(object):
+    """Proxied message channel of an OLT, serving so many at a time"""
+
+    def __init__(self, channels, latency=0.2):
+        self.free = channels
+        self.latency = latency
+        self.waiting = []
+
+    def send(self, callback):
+        if self.free:
+            self.free -= 1
+            clock.callLater(self.latency, self._done, callback)
+        else:
+            self.waiting.append(callback)
+
+    def _done(self, callback):
+        if self.waiting:
+            clock.callLater(self.latency, self._done, self.waiting.pop(0))
+        else:
+            self.free += 1
+        callback()
+
+
+class AdapterAgent(object):
+    """The parts of the adapter agent the simulated_onu adapter uses"""
+
+    def __init__(self, scheduler, olt_channels, failure_rate):
+        self.scheduler = scheduler
+        self.olt_channels = olt_channels
+        self.failure_rate = failure_rate
+        self.adapter = SimulatedOnuAdapter(self, {})
+        self.devices = {}
+        self.channels = {}  # olt id -> OltChannel
+        self.active_at = {}  # device id -> time it got active
+
+    def add_olt(self, olt_id):
+        self.devices[olt_id] = Device(
+            id=olt_id, root=True, parent_id='ld-' + olt_id,
+            oper_status=OperStatus.ACTIVE)
+        self.channels[olt_id] = OltChannel(self.olt_channels)
+
+    def get_device(self, device_id):
+        device = Device()
+        device.CopyFrom(self.devices[device_id])
+        return device
+
+    def update_device(self, device):
+        if device.oper_status == OperStatus.ACTIVE:
+            if random.random() < self.failure_rate:
+                device.oper_status = OperStatus.FAILED
+            else:
+                self.active_at[device.id] = clock.seconds()
+        self.devices[device.id] = device
+        # as done by the device agent of the device
+        self.scheduler.device_updated(device)
+
+    def add_port(self, device_id, port):
+        pass
+
+    def add_logical_port(self, logical_device_id, port):
+        pass
+
+    def register_for_proxied_messages(self, proxy_address):
+        pass
+
+    def send_proxied_message(self, proxy_address, msg):
+        self.channels[proxy_address.device_id].send(
+            lambda: self.adapter.receive_proxied_message(proxy_address, msg))
+
+    def adopt(self, device_id):
+        # as done by the device agent of the device
+        device = self.get_device(device_id)
+        device.oper_status = OperStatus.ACTIVATING
+        self.update_device(device)
+        return self.adapter.adopt_device(device)
+
+
+def run(args, max_per_parent):
+    scheduler = ActivationScheduler(dict(
+        max_per_parent=max_per_parent, max_per_adapter=args.max_per_adapter,
+        timeout=args.timeout, max_retries=args.max_retries))
+    agent = AdapterAgent(scheduler, args.olt_channels, args.failure_rate)
+    random.seed(1)
+    done = []
+
+    start = clock.seconds()
+    recovering = set()
+    for olt in xrange(args.olts):
+        olt_id = 'olt%d' % olt
+        agent.add_olt(olt_id)
+        for onu in xrange(args.onus):
+            device = Device(
+                id='%s-onu%d' % (olt_id, onu), parent_id=olt_id,
+                parent_port_no=1, proxy_address=Device.ProxyAddress(
+                    device_id=olt_id, channel_id=onu + 1))
+            # the ONUs the OLT knew about come back ACTIVE from the store
+            if random.random() < args.recovering:
+                device.oper_status = OperStatus.ACTIVE
+                recovering.add(device.id)
+            agent.devices[device.id] = device
+            scheduler.submit(
+                device, 'simulated_onu',
+                lambda device_id=device.id: agent.adopt(device_id)
+            ).addBoth(done.append)
+
+    total = args.olts * args.onus
+    while len(done) < total and clock.getDelayedCalls():
+        clock.advance(min(c.getTime() for c in clock.getDelayedCalls()) -
+                      clock.seconds())
+    elapsed = clock.seconds() - start
+    for call in clock.getDelayedCalls():
+        call.cancel()
+
+    def mean_time_to_active(ids):
+        times = [agent.active_at[i] - start for i in ids
+                 if i in agent.active_at]
+        return sum(times) / len(times) if times else 0.0
+
+    stats = scheduler.statistics()
+    print '{:>14} {:>9.1f} {:>8} {:>7} {:>8} {:>14.1f} {:>12.1f}'.format(
+        max_per_parent, elapsed, stats['activated'], stats['failed'],
+        stats['retries'], mean_time_to_active(recovering),
+        mean_time_to_active(set(agent.devices).difference(recovering)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--olts', type=int, default=4)
+    parser.add_argument('-n', '--onus', type=int, default=128,
+                        help='ONUs per OLT')
+    parser.add_argument('-c', '--olt-channels', type=int, default=8,
+                        help='proxied messages served at once per OLT')
+    parser.add_argument('-p', '--max-per-parent', type=int, action='append',
+                        help='concurrency per OLT to try (repeatable)')
+    parser.add_argument('-a', '--max-per-adapter', type=int, default=64)
+    parser.add_argument('-f', '--failure-rate', type=float, default=0.02)
+    parser.add_argument('-r', '--recovering', type=float, default=0.5,
+                        help='share of ONUs that were active before')
+    parser.add_argument('-t', '--timeout', type=float, default=60)
+    parser.add_argument('--max-retries', type=int, default=3)
+    args = parser.parse_args()
+
+    # logging every activation step would be most of the run time
+    structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+    activation_scheduler.reactor = clock
+    simulated_onu.reactor = clock
+    simulated_onu.asleep = asleep
+
+    print '{} OLTs x {} ONUs, {} ONU proxied messages at once per ' \
+          'OLT'.format(args.olts, args.onus, args.olt_channels)
+    print '{:>14} {:>9} {:>8} {:>7} {:>8} {:>14} {:>12}'.format(
+        'max-per-parent', 'total-s', 'active', 'failed', 'retries',
+        'recovering-s', 'new-s')
+    for max_per_parent in args.max_per_parent or [1, 4, 16, 64]:
+        run(args, max_per_parent)
+
+
+if __name__ == '__main__':
+    main()
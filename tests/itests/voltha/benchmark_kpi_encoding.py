@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+We use this module to compare the volume of KPIs sent to Kafka as slices (one
+KpiEvent per collection) and as time-series (see kpi_compactor.py), in bytes
+per metric value, both as protobuf and as the JSON actually published.
+
+The KPIs are those of ponsim-like OLTs: one prefix for the NNI and one per PON
+port, with the metrics of ponsim_olt, over so many collection intervals. Only
+a share of the counters (--active) move between two intervals, like on a
+lightly loaded PON.
+
+Usage (from the top level directory, with the protos compiled):
+
+    env PYTHONPATH=.:voltha/protos/third_party \\
+        python tests/itests/voltha/benchmark_kpi_encoding.py -o 4 -p 16
+"""
+
+import argparse
+import random
+import time
+
+import structlog
+from google.protobuf.json_format import MessageToDict
+from simplejson import dumps
+
+from common.utils.kpi_decoder import KpiDecoder
+from voltha.northbound.kafka.kpi_compactor import KpiCompactor
+from voltha.protos import third_party
+from voltha.protos.events_pb2 import KpiEvent, KpiEventType, \
+    MetricValuePairs
+
+_ = third_party
+
+METRICS = ['rx_64', 'rx_65_127', 'rx_128_255', 'rx_256_511', 'rx_512_1023',
+           'rx_1024_1518', 'rx_1519_9k', 'rx_bytes', 'rx_packets',
+           'tx_64', 'tx_65_127', 'tx_128_255', 'tx_256_511', 'tx_512_1023',
+           'tx_1024_1518', 'tx_1519_9k', 'tx_bytes', 'tx_packets']
+
+
+def slices(args):
+    random.seed(1)
+    counters = {}
+    for olt in xrange(args.olts):
+        device_id = '0001%08x' % random.getrandbits(32)
+        for port in ['nni'] + ['pon%d' % i for i in xrange(args.pons)]:
+            prefix = 'voltha.ponsim_olt.{}.{}'.format(device_id, port)
+            counters[prefix] = dict((name, 0.0) for name in METRICS)
+    ts = int(time.time())
+    for _ in xrange(args.intervals):
+        for metrics in counters.itervalues():
+            for name in metrics:
+                if random.random() < args.active:
+                    metrics[name] += random.randint(1, 1000)
+        yield KpiEvent(type=KpiEventType.slice, ts=ts, prefixes=dict(
+            (prefix, MetricValuePairs(metrics=metrics))
+            for prefix, metrics in counters.iteritems()))
+        ts += args.interval
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--olts', type=int, default=4)
+    parser.add_argument('-p', '--pons', type=int, default=16,
+                        help='PON ports per OLT')
+    parser.add_argument('-n', '--intervals', type=int, default=240)
+    parser.add_argument('-i', '--interval', type=int, default=15,
+                        help='collection interval (s)')
+    parser.add_argument('-a', '--active', type=float, default=0.3,
+                        help='share of the counters moving per interval')
+    parser.add_argument('-m', '--max-samples', type=int, action='append',
+                        help='samples per series and event (repeatable)')
+    args = parser.parse_args()
+
+    structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+    values = args.intervals * args.olts * (args.pons + 1) * len(METRICS)
+
+    def report(name, events):
+        pb = sum(event.ByteSize() for event in events)
+        js = sum(len(dumps(MessageToDict(event, True, True)))
+                 for event in events)
+        print '{:<16} {:>8} {:>14.2f} {:>14.2f}'.format(
+            name, len(events), float(pb) / values, float(js) / values)
+
+    print '{} OLTs x {} PONs, {} intervals, {:.0%} of the counters ' \
+          'moving'.format(args.olts, args.pons, args.intervals, args.active)
+    print '{:<16} {:>8} {:>14} {:>14}'.format(
+        'encoding', 'events', 'protobuf-B/val', 'json-B/val')
+    report('slice', list(slices(args)))
+    for max_samples in args.max_samples or [1, 4, 8, 16]:
+        events = []
+        compactor = KpiCompactor(events.append, dict(
+            max_samples=max_samples, schema_refresh=10))
+        for kpi_event in slices(args):
+            compactor.add(kpi_event)
+        compactor.flush()
+        report('ts/{}'.format(max_samples), events)
+
+        # check the way back
+        decoder = KpiDecoder()
+        decoded = sum(len(decoder.decode(MessageToDict(event, True, True)))
+                      for event in events)
+        assert decoded == args.intervals, decoded
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+We use this module to measure the throughput (packets per second) and the
+latency of the control packet path between the voltha core and the ofagent.
+Both ends run in this process and talk gRPC over the loopback interface:
+the core side is the real LocalHandler (with stand-ins for the core and the
+logical device agents), the ofagent side mimics GrpcClient.
+
+Two packet paths are compared:
+
+    legacy: one packet per gRPC message, ReceivePacketsIn/StreamPacketsOut
+            reading queues with timeouts, one reactor hop per packet
+    stream: StreamPackets, batches of packets per gRPC message, event
+            driven queues, one reactor hop per batch
+
+Usage (from the top level directory, with the protos compiled):
+
+    env PYTHONPATH=.:voltha/protos/third_party \\
+        python tests/itests/voltha/benchmark_packet_stream.py -n 20000
+"""
+
+import argparse
+import struct
+import time
+from Queue import Queue, Empty
+from threading import Thread, Event
+
+import grpc
+from concurrent import futures
+from google.protobuf.empty_pb2 import Empty as EmptyMessage
+from twisted.internet import reactor
+
+from common.utils.fair_queue import FairBatchQueue
+from common.utils.grpc_utils import twisted_async
+from voltha.core.local_handler import LocalHandler
+from voltha.protos.openflow_13_pb2 import PacketIn, PacketOut, PacketsOut, \
+    ofp_packet_in, ofp_packet_out
+from voltha.protos.voltha_pb2 import \
+    add_VolthaLocalServiceServicer_to_server, VolthaLocalServiceStub
+
+TIMESTAMP = struct.Struct('!d')
+BATCH_SIZE = 64
+
+
+def logical_device_id(i):
+    return 'ld%04d' % i
+
+
+class Meter(object):
+    """Collects the latency of the packets arriving at one end"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.latencies = []
+        self.done = Event()
+
+    def received(self, data):
+        self.latencies.append(time.time() - TIMESTAMP.unpack(data[:8])[0])
+        if len(self.latencies) == self.expected:
+            self.done.set()
+
+    def report(self, name, direction, elapsed):
+        latencies = sorted(self.latencies)
+        n = len(latencies)
+        if not n:
+            print '%-8s %-10s no packets received' % (name, direction)
+            return
+        print '%-8s %-10s %6d/%d packets: %8.0f pps, latency p50 %7.2f ms, ' \
+              'p99 %7.2f ms' % (
+                name, direction, n, self.expected, n / elapsed,
+                latencies[n // 2] * 1e3,
+                latencies[min(n - 1, int(n * 0.99))] * 1e3)
+
+
+class LogicalDeviceAgent(object):
+
+    def __init__(self, meter):
+        self.meter = meter
+
+    def packet_out(self, ofp_packet_out):
+        self.meter.received(ofp_packet_out.data)
+
+
+class Core(object):
+    """The parts of VolthaCore the packet path relies on"""
+
+    def __init__(self, devices, meter):
+        self.packet_in_queue = FairBatchQueue(1 << 20)
+        self.change_event_queue = FairBatchQueue()
+        self.logical_device_agents = dict(
+            (logical_device_id(i), LogicalDeviceAgent(meter))
+            for i in xrange(devices))
+
+
+class LegacyLocalHandler(LocalHandler):
+    """The packet path as implemented before the batched stream"""
+
+    def __init__(self, core):
+        super(LegacyLocalHandler, self).__init__(core)
+        self.legacy_queue = Queue()
+
+    def StreamPacketsOut(self, request_iterator, context):
+
+        @twisted_async
+        def forward_packet_out(packet_out):
+            agent = self.core.logical_device_agents[packet_out.id]
+            agent.packet_out(packet_out.packet_out)
+
+        for request in request_iterator:
+            forward_packet_out(packet_out=request)
+
+        return EmptyMessage()
+
+    def ReceivePacketsIn(self, request, context):
+        while 1:
+            try:
+                packet_in = self.legacy_queue.get(timeout=1)
+                yield packet_in
+            except Empty:
+                if self.stopped:
+                    break
+
+    def send_packet_in(self, device_id, ofp_packet_in):
+        packet_in = PacketIn(id=device_id, packet_in=ofp_packet_in)
+        self.legacy_queue.put(packet_in)
+
+
+def start_server(handler, port):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    add_VolthaLocalServiceServicer_to_server(handler, server)
+    server.add_insecure_port('127.0.0.1:%d' % port)
+    server.start()
+    return server
+
+
+def legacy_client(stub, packet_in_meter, stopped):
+    """The ofagent side: one stream per direction, one packet per message"""
+    packet_out_queue = Queue()
+
+    def packet_generator():
+        while 1:
+            try:
+                packet = packet_out_queue.get(block=True, timeout=1.0)
+            except Empty:
+                if stopped.is_set():
+                    return
+            else:
+                yield packet
+
+    def stream_packets_out():
+        try:
+            stub.StreamPacketsOut(packet_generator())
+        except grpc.RpcError:
+            pass
+
+    def receive_packets_in():
+        try:
+            for packet_in in stub.ReceivePacketsIn(EmptyMessage()):
+                reactor.callFromThread(packet_in_meter.received,
+                                       packet_in.packet_in.data)
+        except grpc.RpcError:
+            pass
+
+    Thread(target=stream_packets_out).start()
+    Thread(target=receive_packets_in).start()
+
+    def send_packet_out(device_id, ofp_packet_out):
+        packet_out_queue.put(PacketOut(id=device_id, packet_out=ofp_packet_out))
+
+    return send_packet_out, lambda: None
+
+
+def stream_client(stub, packet_in_meter, stopped):
+    """The ofagent side, as implemented by GrpcClient"""
+    packet_out_queue = FairBatchQueue(1 << 20)
+
+    def packet_generator():
+        while 1:
+            packets = packet_out_queue.get_batch(BATCH_SIZE)
+            if not packets:
+                return
+            yield PacketsOut(items=packets)
+
+    def forward_packets_in(packets_in):
+        for packet_in in packets_in:
+            packet_in_meter.received(packet_in.packet_in.data)
+
+    def stream_packets():
+        try:
+            for packets_in in stub.StreamPackets(packet_generator()):
+                reactor.callFromThread(forward_packets_in, packets_in.items)
+        except grpc.RpcError:
+            pass
+
+    Thread(target=stream_packets).start()
+
+    def send_packet_out(device_id, ofp_packet_out):
+        packet_out_queue.put(device_id, PacketOut(
+            id=device_id, packet_out=ofp_packet_out))
+
+    return send_packet_out, packet_out_queue.close
+
+
+def inject(send, n, devices, rate, make_packet):
+    """
+    Call send() from the reactor n times, spreading the packets over the
+    logical devices; at the given rate (packets per second) if any, or in
+    chunks as fast as possible otherwise.
+    """
+    chunk = 1 if rate else 100
+
+    def send_chunk(count):
+        for i in xrange(count):
+            data = TIMESTAMP.pack(time.time()) + '\x00' * 56
+            send(logical_device_id(i % devices), make_packet(data))
+
+    t0 = time.time()
+    for i in xrange(0, n, chunk):
+        reactor.callFromThread(send_chunk, min(chunk, n - i))
+        if rate:
+            delay = t0 + float(i) / rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        elif i % 10000 == 0:
+            time.sleep(0)  # let the reactor breathe
+
+
+def run(name, args, port):
+    packet_in_meter = Meter(args.packets)
+    packet_out_meter = Meter(args.packets)
+    core = Core(args.devices, packet_out_meter)
+    if name == 'legacy':
+        handler = LegacyLocalHandler(core)
+        make_client = legacy_client
+    else:
+        handler = LocalHandler(core)
+        make_client = stream_client
+    server = start_server(handler, port)
+    channel = grpc.insecure_channel('127.0.0.1:%d' % port)
+    stopped = Event()
+    send_packet_out, close = make_client(
+        VolthaLocalServiceStub(channel), packet_in_meter, stopped)
+    time.sleep(0.5)  # let the streams come up
+
+    for direction, meter, send, make_packet in (
+            ('packet-in', packet_in_meter, handler.send_packet_in,
+             lambda data: ofp_packet_in(data=data)),
+            ('packet-out', packet_out_meter, send_packet_out,
+             lambda data: ofp_packet_out(data=data))):
+        t0 = time.time()
+        inject(send, args.packets, args.devices, args.rate, make_packet)
+        meter.done.wait(args.timeout)
+        meter.report(name, direction, time.time() - t0)
+
+    stopped.set()
+    close()
+    handler.stop()
+    server.stop(0)
+    channel.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--packets', type=int, default=20000,
+                        help='packets to send in each direction '
+                             '(default: 20000)')
+    parser.add_argument('-d', '--devices', type=int, default=4,
+                        help='number of logical devices (default: 4)')
+    parser.add_argument('-r', '--rate', type=int, default=0,
+                        help='send at this rate (pps) to measure latency '
+                             'without queueing; as fast as possible if 0 '
+                             '(default)')
+    parser.add_argument('-t', '--timeout', type=float, default=60,
+                        help='give up waiting for packets after this many '
+                             'seconds (default: 60)')
+    parser.add_argument('-p', '--port', type=int, default=50099,
+                        help='first gRPC port to use (default: 50099)')
+    parser.add_argument('-m', '--mode', action='append',
+                        choices=('legacy', 'stream'),
+                        help='run only the given mode(s)')
+    args = parser.parse_args()
+
+    reactor_thread = Thread(target=reactor.run,
+                            kwargs=dict(installSignalHandlers=False))
+    reactor_thread.daemon = True
+    reactor_thread.start()
+
+    try:
+        for i, name in enumerate(args.mode or ('legacy', 'stream')):
+            run(name, args, args.port + i)
+    finally:
+        reactor.callFromThread(reactor.stop)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import socket
+from unittest import TestCase, main, skipUnless
+
+from common.frameio.batch_recv import BatchReceiver, recvmmsg_supported
+
+
+@skipUnless(recvmmsg_supported(), 'recvmmsg not available')
+class TestBatchReceiver(TestCase):
+
+    def setUp(self):
+        self.tx, self.rx = socket.socketpair(socket.AF_UNIX,
+                                             socket.SOCK_DGRAM)
+        self.receiver = BatchReceiver(self.rx, 128, batch_size=4)
+
+    def tearDown(self):
+        self.tx.close()
+        self.rx.close()
+
+    def test_nothing_pending(self):
+        self.assertEqual(self.receiver.recv(), [])
+
+    def test_drains_in_bursts(self):
+        frames = ['frame-%d' % i for i in xrange(6)]
+        for frame in frames:
+            self.tx.send(frame)
+        self.assertEqual(self.receiver.recv(), frames[:4])
+        self.assertEqual(self.receiver.recv(), frames[4:])
+        self.assertEqual(self.receiver.recv(), [])
+
+    def test_buffers_are_reused(self):
+        self.tx.send('a' * 100)
+        first = self.receiver.recv()
+        self.tx.send('b' * 10)
+        second = self.receiver.recv()
+        self.assertEqual(first, ['a' * 100])
+        self.assertEqual(second, ['b' * 10])
+
+    def test_oversized_frames_are_truncated(self):
+        self.tx.send('x' * 200)
+        self.assertEqual(self.receiver.recv(), ['x' * 128])
+
+
+if __name__ == '__main__':
+    main()
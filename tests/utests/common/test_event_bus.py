@@ -195,3 +195,32 @@ class TestEventBus(TestCase):
             msg = yield queue.get()
             self.assertEqual(msg, i)
         self.assertEqual(len(queue.pending), 0)
+
+    def test_regexp_subscribers_are_not_registered_under_topic(self):
+
+        ebc = EventBusClient(EventBus())
+        topic_sub = Mock()
+        regexp_sub = Mock()
+        ebc.subscribe('news', topic_sub)
+        ebc.subscribe(re.compile('n.*'), regexp_sub)
+
+        for i in xrange(3):
+            ebc.publish('news', i)
+
+        self.assertEqual(topic_sub.call_count, 3)
+        self.assertEqual(regexp_sub.call_count, 3)
+        self.assertEqual(len(ebc.list_subscribers('news')), 1)
+
+    def test_publish_counters(self):
+
+        bus = EventBus()
+        ebc = EventBusClient(bus)
+        ebc.subscribe('news', Mock())
+        ebc.subscribe('news', Mock(), lambda msg: msg > 0)
+
+        for i in xrange(3):
+            ebc.publish('news', i)
+        ebc.publish('other', 0)
+
+        self.assertEqual(bus.published, 4)
+        self.assertEqual(bus.delivered, 5)
@@ -0,0 +1,101 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from threading import Thread
+from unittest import TestCase, main
+
+from common.utils.fair_queue import FairBatchQueue
+
+
+class TestFairBatchQueue(TestCase):
+
+    def setUp(self):
+        self.queue = FairBatchQueue(max_per_key=3)
+
+    def consume_in_thread(self, max_messages=64):
+        batches = []
+        thread = Thread(target=lambda: batches.append(
+            self.queue.get_batch(max_messages)))
+        thread.daemon = True
+        thread.start()
+        return thread, batches
+
+    def test_batches_are_fifo_for_a_single_key(self):
+        for i in xrange(3):
+            self.queue.put('ld1', i)
+        self.assertEqual(self.queue.get_batch(2), [0, 1])
+        self.assertEqual(self.queue.get_batch(2), [2])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_keys_take_turns(self):
+        for i in xrange(3):
+            self.queue.put('busy', 'b%d' % i)
+        self.queue.put('quiet', 'q0')
+        self.queue.put('other', 'o0')
+        self.assertEqual(self.queue.get_batch(4), ['b0', 'q0', 'o0', 'b1'])
+        self.assertEqual(self.queue.get_batch(4), ['b2'])
+
+    def test_full_key_drops_and_counts(self):
+        for i in xrange(5):
+            self.queue.put('busy', i)
+        self.assertFalse(self.queue.put('busy', 5))
+        self.assertTrue(self.queue.put('quiet', 'q0'))
+        stats = self.queue.statistics()
+        self.assertEqual(stats['queued'], 4)
+        self.assertEqual(stats['dropped'], 3)
+        self.assertEqual(stats['queued_per_key'], {'busy': 3, 'quiet': 1})
+        self.assertEqual(stats['dropped_per_key'], {'busy': 3})
+        self.assertEqual(self.queue.get_batch(), [0, 'q0', 1, 2])
+
+    def test_put_wakes_up_blocked_consumer(self):
+        thread, batches = self.consume_in_thread()
+        thread.join(0.05)
+        self.assertTrue(thread.is_alive())
+        self.queue.put('ld1', 'hello')
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(batches, [['hello']])
+
+    def test_wake_releases_consumers_with_empty_batch(self):
+        thread, batches = self.consume_in_thread()
+        thread.join(0.05)
+        self.queue.wake()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(batches, [[]])
+        # the queue is still usable
+        self.queue.put('ld1', 'hello')
+        self.assertEqual(self.queue.get_batch(), ['hello'])
+
+    def test_cancelled_consumers_do_not_block(self):
+        # e.g. woken up before they came to wait, which does not count
+        self.queue.wake()
+        self.assertEqual(self.queue.get_batch(cancelled=lambda: True), [])
+        self.queue.put('ld1', 'hello')
+        self.assertEqual(self.queue.get_batch(cancelled=lambda: True),
+                         ['hello'])
+
+    def test_close_releases_consumers_and_rejects_messages(self):
+        self.queue.put('ld1', 'pending')
+        self.queue.close()
+        self.assertEqual(self.queue.get_batch(), [])
+        self.assertFalse(self.queue.put('ld1', 'late'))
+        thread, batches = self.consume_in_thread()
+        thread.join(5)
+        self.assertEqual(batches, [[]])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import socket
+import struct
+import subprocess
+import time
+from unittest import TestCase, main, skipUnless
+
+from mock import Mock, patch
+
+from common.frameio import frameio
+from common.frameio.frameio import BpfProgramFilter, FrameIOPortProxy, \
+    LinuxFrameIOPort
+from common.frameio.kernel_filter import kernel_program
+from tests.utests.common.test_kernel_filter import ETHER_DST, ETHER_TCI, \
+    LENGTH
+
+# the in-band filter of ponsim_olt, for VLAN 1000
+PONSIM_INBAND = '(ether[14:2] & 0xfff) = 0x{:03x}'.format(1000)
+
+# the programs the filters of the tests compile into
+PROGRAMS = {
+    '(ether dst 00:0c:e2:31:25:00)': ETHER_DST,
+    '(ether dst 00:0c:e2:31:25:00) or (ether dst 00:0c:e2:31:25:01)':
+        ETHER_DST * 2,
+    '(ether dst 00:0c:e2:31:25:00) or ((ether[14:2] & 0xfff) = 0x3e8)':
+        ETHER_DST + ETHER_TCI,
+    '(ether dst 00:0c:e2:31:25:00) or (greater 100)': ETHER_DST + LENGTH,
+    '({})'.format(PONSIM_INBAND): ETHER_TCI,
+}
+
+
+class Port(LinuxFrameIOPort):
+    """A linux port without a socket, recording the filters attached"""
+
+    def __init__(self, *args, **kw):
+        self.attached = []
+        self.kernel_stats = (0, 0)
+        LinuxFrameIOPort.__init__(self, *args, **kw)
+
+    def open_socket(self, iface_name):
+        return Mock()
+
+    def attach_filter(self, instructions):
+        self.attached.append(instructions)
+
+    def detach_filter(self):
+        self.attached.append(None)
+
+    def kernel_statistics(self):
+        return self.kernel_stats
+
+    def rcv_frames(self):
+        return self.frames
+
+
+def patch_programs(test):
+    for patcher in (
+            patch.object(BpfProgramFilter, 'instructions',
+                         lambda f: PROGRAMS[f.program_string]),
+            patch.object(frameio, 'reactor', Mock(
+                callFromThread=lambda f, *a: f(*a)))):
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+class TestFrameIOPort(TestCase):
+
+    def setUp(self):
+        patch_programs(self)
+        self.port = Port('eth0', kernel_filter=True)
+        self.received = []
+
+    def proxy(self, name, program_string=None):
+        proxy = FrameIOPortProxy(
+            self.port, lambda _, frame: self.received.append((name, frame)),
+            BpfProgramFilter(program_string) if program_string else None,
+            name)
+        self.port.add_proxy(proxy)
+        return proxy
+
+    def test_union_of_the_proxy_filters_is_attached(self):
+        self.proxy('a', 'ether dst 00:0c:e2:31:25:00')
+        self.assertEqual(self.port.attached, [ETHER_DST])
+        b = self.proxy('b', 'ether dst 00:0c:e2:31:25:01')
+        self.assertEqual(self.port.attached[-1], ETHER_DST * 2)
+        self.port.del_proxy(b)
+        self.assertEqual(self.port.attached[-1], ETHER_DST)
+        self.assertTrue(self.port.statistics()['kernel_filter'])
+
+    def test_detached_when_a_proxy_has_no_bpf_filter(self):
+        self.proxy('a', 'ether dst 00:0c:e2:31:25:00')
+        self.proxy('all')
+        self.assertEqual(self.port.attached, [ETHER_DST, None])
+        self.assertFalse(self.port.statistics()['kernel_filter'])
+
+    def test_vlan_filters_are_adapted_to_untagged_frames(self):
+        self.proxy('a', 'ether dst 00:0c:e2:31:25:00')
+        self.proxy('b', PONSIM_INBAND)
+        self.assertEqual(self.port.attached,
+                         [ETHER_DST, kernel_program(ETHER_DST + ETHER_TCI)])
+        self.assertTrue(self.port.statistics()['kernel_filter'])
+
+    def test_not_attached_when_filters_cannot_be_adapted(self):
+        self.proxy('a', 'ether dst 00:0c:e2:31:25:00')
+        self.proxy('b', 'greater 100')
+        # detached, tagged frames being shorter in the kernel
+        self.assertEqual(self.port.attached, [ETHER_DST, None])
+        self.assertFalse(self.port.statistics()['kernel_filter'])
+
+    def test_disabled(self):
+        self.port = Port('eth0')
+        self.proxy('a', 'ether dst 00:0c:e2:31:25:00')
+        self.assertEqual(self.port.attached, [])
+
+    def test_statistics(self):
+        self.port.kernel_filter = False
+        self.proxy('a', 'ether dst 00:0c:e2:31:25:00').filter = \
+            lambda frame: frame.startswith('a')
+        self.proxy('b', 'ether dst 00:0c:e2:31:25:01').filter = \
+            lambda frame: frame.startswith('ab')
+        self.port.frames = ['abc', 'ac', 'x']
+        self.port.recv()
+        self.port.kernel_stats = (3, 1)
+        self.port.statistics()
+        self.port.kernel_stats = (2, 0)
+        self.assertEqual(self.port.statistics(), dict(
+            received=3, discarded=1, proxies=dict(a=2, b=1),
+            kernel_filter=False, kernel_received=5, kernel_dropped=1))
+        self.assertEqual(self.received,
+                         [('a', 'abc'), ('b', 'abc'), ('a', 'ac')])
+
+
+def veth_supported():
+    return os.geteuid() == 0 and subprocess.call(
+        'ip link add vt-tx type veth peer name vt-rx && '
+        'ip link del vt-tx', shell=True,
+        stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT) == 0
+
+
+@skipUnless(veth_supported(), 'cannot create veth interfaces')
+class TestLinuxKernelFilter(TestCase):
+    """The filters as run by the kernel, on a veth pair"""
+
+    SRC = '\x00\x0c\xe2\x31\x25\xff'
+
+    def setUp(self):
+        patch_programs(self)
+        subprocess.check_call('ip link add vt-tx type veth peer name vt-rx',
+                              shell=True)
+        self.addCleanup(subprocess.call, 'ip link del vt-tx', shell=True)
+        for iface in ('vt-tx', 'vt-rx'):
+            subprocess.call('sysctl -qw net.ipv6.conf.{}.disable_ipv6=1 && '
+                            'ip link set {} up'.format(iface, iface),
+                            shell=True)
+        self.tx = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+        self.tx.bind(('vt-tx', 0))
+        self.addCleanup(self.tx.close)
+        self.port = LinuxFrameIOPort('vt-rx', kernel_filter=True)
+        self.addCleanup(self.port.socket.close)
+
+    def frame(self, vid=None, payload='\x03\xe8'):
+        tag = '' if vid is None else struct.pack('!HH', 0x8100, vid)
+        return '\xff' * 6 + self.SRC + tag + '\x08\x00' + payload + \
+               '\x00' * 44
+
+    def passed_by_the_kernel(self, frames):
+        self.port.rcv_frames()
+        for frame in frames:
+            self.tx.send(frame)
+        time.sleep(0.1)
+        return [f for f in self.port.rcv_frames() if f[6:12] == self.SRC]
+
+    def test_ponsim_inband_filter_drops_other_vlans(self):
+        self.port.add_proxy(FrameIOPortProxy(self.port, None,
+                                             BpfProgramFilter(PONSIM_INBAND),
+                                             'ponsim'))
+        self.assertTrue(self.port.kernel_filter_attached)
+        inband = self.frame(vid=1000)
+        # with 0x3e8 where the TCI would be, once the tag is taken out
+        other_vlan = self.frame(vid=1001)
+        untagged = self.frame(payload='\x03\xe9')
+        self.assertEqual(
+            self.passed_by_the_kernel([other_vlan, untagged, inband]),
+            [inband])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import socket
+from unittest import TestCase, main
+
+from common.frameio.kernel_filter import attach_filter, detach_filter, \
+    kernel_program, reads_past_mac_addresses
+
+BPF_RET_K = 0x06
+DROP_ALL = [(BPF_RET_K, 0, 0, 0)]
+ACCEPT_ALL = [(BPF_RET_K, 0, 0, 0xffffffff)]
+
+# as compiled by tcpdump -dd
+ETHER_DST = [  # ether dst 00:0c:e2:31:25:00
+    (0x20, 0, 0, 0x00000002), (0x15, 0, 3, 0xe2312500),
+    (0x28, 0, 0, 0x00000000), (0x15, 0, 1, 0x0000000c),
+    (0x6, 0, 0, 0x00040000), (0x6, 0, 0, 0x00000000)]
+ETHER_TCI = [  # (ether[14:2] & 0xfff) = 1000
+    (0x28, 0, 0, 0x0000000e), (0x54, 0, 0, 0x00000fff),
+    (0x15, 0, 1, 0x000003e8), (0x6, 0, 0, 0x00040000),
+    (0x6, 0, 0, 0x00000000)]
+ETHER_TYPE = [  # ether proto 0x888e
+    (0x28, 0, 0, 0x0000000c), (0x15, 0, 1, 0x0000888e),
+    (0x6, 0, 0, 0x00040000), (0x6, 0, 0, 0x00000000)]
+VLAN_ANCILLARY = [  # vlan, with the tag present auxiliary data
+    (0x30, 0, 0, 0xfffff030), (0x15, 0, 1, 0x00000001),
+    (0x6, 0, 0, 0x00040000), (0x6, 0, 0, 0x00000000)]
+IP_IND = [  # ip[0] & 0xf = 5, through an indirect load
+    (0x01, 0, 0, 0x0000000e), (0x50, 0, 0, 0x00000000),
+    (0x6, 0, 0, 0x00040000)]
+LENGTH = [  # greater 100
+    (0x80, 0, 0, 0x00000000), (0x35, 0, 1, 0x00000064),
+    (0x6, 0, 0, 0x00040000), (0x6, 0, 0, 0x00000000)]
+UNTAGGED_OR_TAGGED = [  # the prologue kernel_program puts in front
+    (0x30, 0, 0, 0xfffff030), (0x15, 1, 0, 0x00000000)]
+
+
+class TestKernelFilter(TestCase):
+
+    def setUp(self):
+        self.tx, self.rx = socket.socketpair(socket.AF_UNIX,
+                                             socket.SOCK_DGRAM)
+        self.rx.setblocking(0)
+
+    def tearDown(self):
+        self.tx.close()
+        self.rx.close()
+
+    def pending(self):
+        frames = []
+        while True:
+            try:
+                frames.append(self.rx.recv(128))
+            except socket.error:
+                return frames
+
+    def test_drop_all(self):
+        attach_filter(self.rx, DROP_ALL)
+        self.tx.send('dropped')
+        self.assertEqual(self.pending(), [])
+
+    def test_replace_and_detach(self):
+        attach_filter(self.rx, DROP_ALL)
+        attach_filter(self.rx, ACCEPT_ALL)
+        self.tx.send('accepted')
+        self.assertEqual(self.pending(), ['accepted'])
+        attach_filter(self.rx, DROP_ALL)
+        detach_filter(self.rx)
+        self.tx.send('unfiltered')
+        self.assertEqual(self.pending(), ['unfiltered'])
+
+    def test_reads_past_mac_addresses(self):
+        self.assertFalse(reads_past_mac_addresses(ETHER_DST))
+        self.assertFalse(reads_past_mac_addresses(VLAN_ANCILLARY))
+        self.assertFalse(reads_past_mac_addresses(ACCEPT_ALL))
+        self.assertTrue(reads_past_mac_addresses(ETHER_TCI))
+        self.assertTrue(reads_past_mac_addresses(ETHER_TYPE))
+        self.assertTrue(reads_past_mac_addresses(IP_IND))
+        self.assertTrue(reads_past_mac_addresses(LENGTH))
+
+    def test_kernel_program(self):
+        self.assertEqual(kernel_program(ETHER_DST), ETHER_DST)
+        self.assertEqual(kernel_program(VLAN_ANCILLARY), VLAN_ANCILLARY)
+        # the TCI from the ancillary data, on tagged frames
+        self.assertEqual(kernel_program(ETHER_TCI), UNTAGGED_OR_TAGGED + [
+            (0x05, 0, 0, 5)] + ETHER_TCI + [
+            (0x28, 0, 0, 0xfffff02c)] + ETHER_TCI[1:])
+        # the 802.1Q ethertype, as put back in user space
+        self.assertEqual(kernel_program(ETHER_TYPE), UNTAGGED_OR_TAGGED + [
+            (0x05, 0, 0, 4)] + ETHER_TYPE + [
+            (0x00, 0, 0, 0x00008100)] + ETHER_TYPE[1:])
+        # past the tag
+        self.assertEqual(kernel_program(ETHER_DST + [(0x30, 0, 0, 20)])[-1],
+                         (0x30, 0, 0, 16))
+        self.assertIsNone(kernel_program(IP_IND))
+        self.assertIsNone(kernel_program(LENGTH))
+        self.assertIsNone(kernel_program([(0x30, 0, 0, 15)]))  # TCI[1]
+
+    def test_detach_without_filter(self):
+        detach_filter(self.rx)
+        self.tx.send('unfiltered')
+        self.assertEqual(self.pending(), ['unfiltered'])
+
+
+if __name__ == '__main__':
+    main()
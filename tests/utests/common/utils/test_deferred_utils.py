@@ -0,0 +1,70 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from twisted.internet.defer import Deferred, DeferredList, succeed, \
+    CancelledError
+
+from common.utils.deferred_utils import DeferredCounter
+
+
+class TestDeferredCounter(TestCase):
+
+    def setUp(self):
+        self.counter = DeferredCounter()
+        self.counter.install()
+        self.addCleanup(self.counter.uninstall)
+
+    def test_pending_deferreds(self):
+        deferreds = [Deferred() for _ in xrange(5)]
+        self.assertEqual(self.counter.pending, 5)
+        deferreds[0].callback(None)
+        deferreds[1].errback(Exception('boom'))
+        deferreds[1].addErrback(lambda _: None)
+        self.assertEqual(self.counter.pending, 3)
+
+    def test_fired_deferreds_are_counted_once(self):
+        d = Deferred()
+        d.addErrback(lambda f: f.trap(CancelledError))
+        d.cancel()
+        d.callback(None)  # suppressed after cancellation
+        self.assertEqual((self.counter.created, self.counter.fired), (1, 1))
+
+    def test_subclasses_and_helpers_are_counted(self):
+        d = Deferred()
+        dl = DeferredList([d, succeed(1)])
+        self.assertEqual(self.counter.created, 3)
+        self.assertEqual(self.counter.pending, 2)
+        d.callback(None)
+        self.assertTrue(dl.called)
+        self.assertEqual(self.counter.pending, 0)
+
+    def test_deferreds_created_before_install_are_ignored(self):
+        self.counter.uninstall()
+        d = Deferred()
+        self.counter.install()
+        d.callback(None)
+        self.assertEqual(self.counter.fired, 0)
+
+    def test_uninstall_restores_deferred(self):
+        self.counter.uninstall()
+        Deferred().callback(None)
+        self.assertEqual(self.counter.created, 0)
+        self.assertFalse(hasattr(Deferred(), '_counted'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from concurrent.futures import Future
+from mock import Mock, patch
+from twisted.internet.defer import CancelledError
+
+from common.utils import grpc_utils
+from common.utils.grpc_utils import future_to_deferred
+
+
+class TestFutureToDeferred(TestCase):
+
+    def setUp(self):
+        self.from_thread = []  # calls the reactor was handed
+        reactor = Mock()
+        reactor.callFromThread = lambda f, *a: self.from_thread.append(
+            lambda: f(*a))
+        patcher = patch.object(grpc_utils, 'reactor', reactor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_reactor(self):
+        while self.from_thread:
+            self.from_thread.pop(0)()
+
+    def outcome(self, d):
+        results = []
+        d.addBoth(results.append)
+        return results
+
+    def test_result_is_delivered_on_the_reactor(self):
+        future = Future()
+        results = self.outcome(future_to_deferred(future))
+        future.set_result('spam')
+        self.assertEqual(results, [])
+        self.run_reactor()
+        self.assertEqual(results, ['spam'])
+
+    def test_error(self):
+        future = Future()
+        results = self.outcome(future_to_deferred(future))
+        future.set_exception(ValueError('boom'))
+        self.run_reactor()
+        self.assertTrue(results[0].check(ValueError))
+
+    def test_already_done(self):
+        future = Future()
+        future.set_result('spam')
+        results = self.outcome(future_to_deferred(future))
+        self.run_reactor()
+        self.assertEqual(results, ['spam'])
+
+    def test_cancel(self):
+        future = Future()
+        d = future_to_deferred(future)
+        results = self.outcome(d)
+        d.cancel()
+        self.assertTrue(future.cancelled())
+        self.run_reactor()
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0].check(CancelledError))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+from unittest import TestCase, main
+
+from dashd.dash_template import DashTemplate
+
+
+# A template dashboard, as returned by Grafana
+TEMPLATE = {'meta': {'slug': 'template'}, 'dashboard': {
+    'id': 12, 'title': 'template', 'version': 3, 'refresh': '5s',
+    'rows': [{
+        'title': '%port% bytes', 'height': '100px',
+        'panels': [{
+            'id': 1, 'title': '%port% throughput', 'span': 12,
+            'type': 'graph', 'targets': [
+                {'refId': 'A', 'target': 'voltha.%device%.%deviceId%.'
+                                         '%port%.rx_bytes'},
+                {'refId': 'B', 'target': 'voltha.%device%.%deviceId%.'
+                                         '%port%.tx_bytes'},
+                {'refId': 'C', 'target': 'sum(voltha.*.*.*.rx_bytes)'}]}]
+    }]}}
+
+
+class TestDashTemplate(TestCase):
+
+    def setUp(self):
+        self.template = DashTemplate('http://localhost:8882/api')
+
+    def test_render(self):
+        board = self.template.compiled().render('ponsim_olt', '0001beef', {
+            'pon': ['rx_64_pkts', 'tx_64_pkts'],
+            'nni': ['tx_1519_9k_pkts', 'rx_65_127_pkts', 'rx_64_pkts',
+                    'rx_bytes']})
+        dashboard = board['dashboard']
+        self.assertEqual(dashboard['title'], 'ponsim_olt.0001beef')
+        self.assertIsNone(dashboard['id'])
+        self.assertEqual([row['title'] for row in dashboard['rows']],
+                         ['nni packet statistics', 'pon packet statistics'])
+        rx, tx = dashboard['rows'][0]['panels']
+        self.assertEqual((rx['id'], rx['title'], tx['id'], tx['title']),
+                         (1, 'NNI Packet Receive Statistics',
+                          2, 'NNI Packet Send Statistics'))
+        self.assertEqual(rx['targets'], [
+            {'refId': 'A', 'target':
+                "alias(perSecond(voltha.ponsim_olt.0001beef.nni.rx_64_pkts),"
+                " '64b pkts/sec')"},
+            {'refId': 'B', 'target':
+                "alias(perSecond("
+                "voltha.ponsim_olt.0001beef.nni.rx_65_127_pkts),"
+                "  '65-127b pkts/sec')"}])
+        self.assertEqual([t['refId'] for t in tx['targets']], ['A'])
+        self.assertEqual(json.loads(json.dumps(board)), board)
+
+    def test_renders_do_not_share_what_differs(self):
+        compiled = self.template.compiled()
+        first = compiled.render('ponsim_olt', 'a', {'nni': ['rx_64_pkts']})
+        compiled.render('maple_olt', 'b', {'pon': ['tx_64_pkts']})
+        self.assertEqual(first['dashboard']['title'], 'ponsim_olt.a')
+        panel = first['dashboard']['rows'][0]['panels'][0]
+        self.assertEqual(panel['targets'][0]['target'],
+                         "alias(perSecond(voltha.ponsim_olt.a.nni.rx_64_pkts),"
+                         " '64b pkts/sec')")
+        self.assertEqual(compiled.board['dashboard']['rows'], [])
+        self.assertEqual(compiled.panel['targets'], [])
+
+    def test_compiled_once_per_template(self):
+        compiled = self.template.compiled()
+        self.assertIs(self.template.compiled(), compiled)
+        self.assertTrue(self.template.apply_template(TEMPLATE))
+        self.assertIsNot(self.template.compiled(), compiled)
+        compiled = self.template.compiled()
+        self.assertFalse(self.template.apply_template(TEMPLATE))
+        self.assertIs(self.template.compiled(), compiled)
+
+    def test_render_with_a_grafana_template(self):
+        self.template.apply_template(TEMPLATE)
+        board = self.template.compiled().render('ponsim_olt', 'a', {
+            'nni': ['rx_bytes', 'tx_bytes'], 'pon': ['rx_bytes']})
+        dashboard = board['dashboard']
+        self.assertEqual((dashboard['title'], dashboard['id'],
+                          dashboard['refresh']), ('ponsim_olt.a', None, '5s'))
+        self.assertEqual([row['title'] for row in dashboard['rows']],
+                         ['nni bytes', 'pon bytes'])
+        nni, pon = dashboard['rows']
+        self.assertEqual(nni['height'], '100px')
+        panel, = nni['panels']
+        self.assertEqual((panel['title'], panel['span'], panel['targets']),
+                         ('NNI throughput', 12, [
+                             {'refId': 'A',
+                              'target': 'voltha.ponsim_olt.a.nni.rx_bytes'},
+                             {'refId': 'B',
+                              'target': 'voltha.ponsim_olt.a.nni.tx_bytes'}]))
+        self.assertEqual([t['target'] for t in pon['panels'][0]['targets']],
+                         ['voltha.ponsim_olt.a.pon.rx_bytes'])
+
+    def test_unsupported_templates_are_not_applied(self):
+        compiled = self.template.compiled()
+        fixed_rows = {'dashboard': dict(TEMPLATE['dashboard'], version=4,
+                                        rows=[{'title': 'nni'},
+                                              {'title': 'pon'}])}
+        self.assertFalse(self.template.apply_template(fixed_rows))
+        self.assertFalse(self.template.apply_template({'dashboard': {}}))
+        self.assertIs(self.template.compiled(), compiled)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from concurrent.futures import Future
+from google.protobuf.empty_pb2 import Empty
+from mock import Mock, patch
+
+from common.utils import grpc_utils
+from netconf.grpc_client import grpc_client
+from netconf.grpc_client.grpc_client import GrpcClient
+
+
+class Call(Future):
+
+    def trailing_metadata(self):
+        return ()
+
+
+class TestInvoke(TestCase):
+
+    def setUp(self):
+        self.calls = []  # (method name, request, timeout, Call)
+        calls = self.calls
+
+        class FakeStub(object):
+
+            def __init__(self, channel):
+                pass
+
+            def __getattr__(self, method_name):
+
+                def future(request, metadata=None, timeout=None):
+                    call = Call()
+                    calls.append((method_name, request, timeout, call))
+                    return call
+
+                return Mock(future=future)
+
+        self.stub = FakeStub
+
+        # deliver the results right away rather than through the reactor
+        reactor = Mock()
+        reactor.callFromThread = lambda f, *a: f(*a)
+        patcher = patch.object(grpc_utils, 'reactor', reactor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.now = 1000.0
+        patcher = patch.object(grpc_client, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = GrpcClient(None, '/tmp', config=dict(
+            max_concurrent_calls=2, deadline=5,
+            deadlines=dict(ListDevices=30), cache_ttl=2,
+            max_cached_responses=2))
+        self.client.connected = True
+
+    def invoke(self, method_name, request=None):
+        results = []
+        self.client.invoke(self.stub, method_name, request or Empty(),
+                           []).addBoth(results.append)
+        return results
+
+    def complete(self, index, response):
+        self.calls[index][3].set_result(response)
+
+    def test_calls_do_not_block(self):
+        first = self.invoke('GetDevice')
+        second = self.invoke('GetDevice')
+        self.assertEqual((first, second), ([], []))
+        self.complete(1, 'second')
+        self.assertEqual(second, [('second', ())])
+        self.complete(0, 'first')
+        self.assertEqual(first, [('first', ())])
+
+    def test_concurrency_is_bounded(self):
+        results = [self.invoke('GetDevice') for _ in xrange(3)]
+        self.assertEqual(len(self.calls), 2)
+        self.complete(0, 'first')
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(results[0], [('first', ())])
+
+    def test_deadlines(self):
+        self.invoke('GetDevice')
+        self.invoke('ListDevices')
+        self.assertEqual([timeout for _, _, timeout, _ in self.calls],
+                         [5, 30])
+
+    def test_list_responses_are_cached(self):
+        self.invoke('ListDevices')
+        self.complete(0, 'devices')
+        self.assertEqual(self.invoke('ListDevices'), [('devices', ())])
+        self.assertEqual(len(self.calls), 1)
+        self.now += 3  # past the ttl
+        self.invoke('ListDevices')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_other_responses_are_not_cached(self):
+        for i in xrange(2):
+            self.invoke('GetDevice')
+            self.complete(i, 'device')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_cache_key_includes_request(self):
+        self.invoke('ListDevices')
+        self.complete(0, 'devices')
+        self.invoke('ListDevices', Mock(SerializeToString=lambda: 'other'))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_other_calls_invalidate_cache(self):
+        self.invoke('ListDevices')
+        self.complete(0, 'devices')
+        self.invoke('DeleteDevice')
+        self.invoke('ListDevices')
+        self.assertEqual(len(self.calls), 3)
+
+    def test_cache_is_bounded(self):
+        for i, method_name in enumerate(
+                ('ListDevices', 'ListAdapters', 'ListLogicalDevices')):
+            self.invoke(method_name)
+            self.complete(i, method_name)
+        self.assertEqual(len(self.client.response_cache), 2)
+        self.invoke('ListDevices')  # the oldest one was evicted
+        self.assertEqual(len(self.calls), 4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from netconf.grpc_client.grpc_client import GrpcClient
+from netconf.grpc_client.nc_rpc_mapper import NetconfRPCMapper
+
+
+def field(name, module='.', type_name=None, repeated=False):
+    return {'name': name, 'module': module, 'type': type_name,
+            'type_ref': type_name is not None, 'repeated': repeated}
+
+
+# in the form of the message_definitions of the generated yang_message_defs
+MESSAGE_DEFINITIONS = {
+    'openflow_13-Flows': [
+        field('items', 'openflow_13', 'ofp_flow_stats', repeated=True)],
+    'openflow_13-ofp_flow_stats': [
+        field('id'), field('priority'),
+        field('match', 'openflow_13', 'ofp_match'),
+        field('instructions', 'openflow_13', 'ofp_instruction',
+              repeated=True)],
+    'openflow_13-ofp_match': [
+        field('type'),
+        field('oxm_fields', 'openflow_13', 'ofp_oxm_field', repeated=True)],
+    'openflow_13-ofp_oxm_field': [field('oxm_class'), field('ofb_field')],
+    'meta-Tree': [
+        field('name'), field('children', 'meta', 'Tree', repeated=True)],
+}
+
+
+class TestFieldPlans(TestCase):
+
+    def setUp(self):
+        self.mapper = NetconfRPCMapper(None, None)
+        self.mapper.message_definitions = MESSAGE_DEFINITIONS
+        for full_name in MESSAGE_DEFINITIONS:
+            self.mapper.get_field_plan(*full_name.split('-', 1))
+        self.client = GrpcClient(None, '/tmp')
+
+    def test_plans(self):
+        plan = self.mapper.get_field_plan('openflow_13', 'ofp_flow_stats')
+        self.assertEqual([(name, repeated) for name, repeated, _, _ in plan],
+                         [('id', False), ('priority', False),
+                          ('match', False), ('instructions', True)])
+        self.assertIsNone(plan[0][2])
+        self.assertIs(plan[2][2],
+                      self.mapper.get_field_plan('openflow_13', 'ofp_match'))
+        self.assertEqual(plan[3][2], [])  # not in the definitions
+        self.assertIsNone(self.mapper.get_field_plan('openflow_13', 'nope'))
+
+        tree = self.mapper.get_field_plan('meta', 'Tree')
+        self.assertIs(tree[1][2], tree)
+
+    def test_rearrange(self):
+        flows = {'items': [
+            {'priority': 1000, 'id': 7, 'cookie': 1,
+             'match': {'oxm_fields': [{'ofb_field': {'type': 'IN_PORT'},
+                                       'oxm_class': 'OFPXMC_OPENFLOW_BASIC'}],
+                       'type': 'OFPMT_OXM'},
+             'instructions': [{'type': 4}]}]}
+        result = self.client.rearrange_dict(
+            flows, self.mapper.get_field_plan('openflow_13', 'Flows'))
+        flow, = result['items']
+        self.assertEqual(flow.keys(),
+                         ['id', 'priority', 'match', 'instructions'])
+        self.assertEqual(flow['match'].keys(), ['type', 'oxm_fields'])
+        self.assertEqual(flow['match']['oxm_fields'][0].items(),
+                         [('oxm_class', 'OFPXMC_OPENFLOW_BASIC'),
+                          ('ofb_field', {'type': 'IN_PORT'})])
+        self.assertEqual(flow['instructions'], [{}])
+
+        tree = {'children': [{'name': 'b', 'children': [{'name': 'c'}]}],
+                'name': 'a'}
+        self.assertEqual(self.client.rearrange_dict(
+            tree, self.mapper.get_field_plan('meta', 'Tree')), tree)
+        self.assertEqual(self.client.rearrange_dict(tree, None), {})
+
+
+if __name__ == '__main__':
+    main()
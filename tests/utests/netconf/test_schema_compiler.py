@@ -0,0 +1,126 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+from zlib import compress
+
+from mock import patch
+
+from netconf.grpc_client.grpc_client import GrpcClient
+from netconf.grpc_client.schema_compiler import SchemaCompiler
+from netconf.protos.schema_pb2 import Schemas
+
+PROTOS = {
+    'a.proto': 'syntax = "proto3";\npackage test;\n'
+               'message A { int32 x = 1; }\n',
+    'b.proto': 'syntax = "proto3";\npackage test;\n'
+               'message B { int32 y = 1; }\n',
+    'c.proto': 'syntax = "proto3";\npackage test;\nimport "b.proto";\n'
+               'message C { B b = 1; }\n',
+}
+
+
+def schemas(**changes):
+    protos = dict(PROTOS, **dict(
+        (name.replace('_', '.'), proto) for name, proto in changes.items()))
+    result = Schemas()
+    for fname in sorted(protos):
+        result.protos.add(file_name=fname, proto=protos[fname],
+                          descriptor=compress(''))
+    return result
+
+
+class TestSchemaCompiler(TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.compiler = self.new_compiler()
+
+    def new_compiler(self, **kw):
+        plugin_dir = GrpcClient(None, self.work_dir).plugin_dir
+        compiler = SchemaCompiler(self.work_dir, plugin_dir, **kw)
+        self.compiled = []
+        compile = compiler._compile
+
+        def spy(fname, key, need_yang):
+            self.compiled.append(fname)
+            return compile(fname, key, need_yang)
+
+        patcher = patch.object(compiler, '_compile', spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return compiler
+
+    def update(self, **changes):
+        del self.compiled[:]
+        return self.compiler.update(schemas(**changes))
+
+    def test_compiles_once(self):
+        self.assertTrue(self.update())
+        self.assertEqual(sorted(self.compiled), sorted(PROTOS))
+        for name in ('a', 'b', 'c'):
+            self.assertTrue(os.path.isfile(
+                os.path.join(self.work_dir, name + '_pb2.py')))
+
+        mtime = os.path.getmtime(os.path.join(self.work_dir, 'a_pb2.py'))
+        self.assertFalse(self.update())
+        self.assertEqual(self.compiled, [])
+        self.assertEqual(
+            os.path.getmtime(os.path.join(self.work_dir, 'a_pb2.py')), mtime)
+
+    def test_compiles_what_changed_and_what_imports_it(self):
+        self.update()
+        changed = PROTOS['b.proto'].replace('}', 'int32 z = 2; }')
+        self.assertTrue(self.update(b_proto=changed))
+        self.assertEqual(sorted(self.compiled), ['b.proto', 'c.proto'])
+        with open(os.path.join(self.work_dir, 'b_pb2.py')) as f:
+            self.assertIn("name='z'", f.read())
+
+        # back to the previous schema, from the cache
+        self.assertTrue(self.update())
+        self.assertEqual(self.compiled, [])
+        with open(os.path.join(self.work_dir, 'b_pb2.py')) as f:
+            self.assertNotIn("name='z'", f.read())
+
+    def test_tries_again_what_failed_to_compile(self):
+        self.assertTrue(self.update(a_proto='message {'))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.work_dir, 'a_pb2.py')))
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.work_dir, 'b_pb2.py')))
+        self.assertTrue(self.update(a_proto='message {'))
+        self.assertEqual(self.compiled, ['a.proto'])
+        self.assertEqual(
+            [f for f in os.listdir(self.compiler.cache_dir)
+             if f.startswith('tmp-')], [])
+
+    def test_prunes_the_least_recently_used(self):
+        self.compiler = self.new_compiler(max_cached=4)
+        self.update()
+        self.update(a_proto=PROTOS['a.proto'].replace(' x ', ' x1 '))
+        self.update(a_proto=PROTOS['a.proto'].replace(' x ', ' x2 '))
+        self.assertEqual(len(os.listdir(self.compiler.cache_dir)), 4)
+        self.update(a_proto=PROTOS['a.proto'].replace(' x ', ' x1 '))
+        self.assertEqual(self.compiled, [])  # still cached
+        self.update()
+        self.assertEqual(self.compiled, ['a.proto'])  # evicted
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import re
+from unittest import TestCase, main
+
+from mock import Mock, patch
+from twisted.internet.defer import succeed
+from twisted.test.proto_helpers import StringTransport
+
+from netconf.constants import Constants as C
+from netconf.grpc_client.nc_rpc_mapper import NetconfRPCMapper
+from netconf.nc_rpc.yang_xml_writer import YangXmlWriter, IGNORE
+from netconf.session import nc_connection
+from netconf.session.nc_connection import NetconfConnection
+from voltha.protos import third_party
+from voltha.protos.device_pb2 import Device, Devices
+from voltha.protos.openflow_13_pb2 import ofp_group_entry, ofp_group_desc, \
+    ofp_group_stats, ofp_bucket, OFPGT_ALL
+
+_ = third_party
+
+
+def field(name, module='.', type_name=None, repeated=False):
+    return {'name': name, 'module': module, 'type': type_name,
+            'type_ref': type_name is not None, 'repeated': repeated}
+
+
+# YANG field definitions, in the form of the generated yang_message_defs
+MESSAGE_DEFINITIONS = {
+    'device-Devices': [
+        field('items', 'device', 'Device', repeated=True)],
+    'device-Device': [
+        field('type'), field('id'), field('root'), field('serial_number'),
+        field('mac_address'), field('ipv4_address'),
+        field('proxy_address', 'device', 'Device-ProxyAddress'),
+        field('admin_state'), field('vlan')],
+    'device-Device-ProxyAddress': [
+        field('device_id'), field('channel_id')],
+    'openflow_13-ofp_group_entry': [
+        field('type'), field('group_id'),
+        field('buckets', 'openflow_13', 'ofp_bucket', repeated=True),
+        field('stats', 'openflow_13', 'ofp_group_stats')],
+    'openflow_13-ofp_bucket': [field('weight')],
+    'openflow_13-ofp_group_stats': [field('ref_count')],
+}
+
+
+class TestYangXmlWriter(TestCase):
+
+    def setUp(self):
+        mapper = NetconfRPCMapper(None, None)
+        mapper.message_definitions = MESSAGE_DEFINITIONS
+        self.writer = YangXmlWriter(mapper)
+
+    def xml(self, message, module, type_name, list_tag=None):
+        return ''.join(self.writer.iter_response(
+            message, module, type_name, list_tag))
+
+    def test_fields_are_in_yang_order(self):
+        device = Device(id='1', type='onu', root=True, vlan=100,
+                        admin_state=3, serial_number='',
+                        ipv4_address='10.0.0.1', parent_id='not-in-yang')
+        self.assertEqual(
+            self.xml(device, 'device', 'Device'),
+            '<type>onu</type><id>1</id><root>true</root><serial_number/>'
+            '<ipv4_address>10.0.0.1</ipv4_address>'
+            '<admin_state>ENABLED</admin_state><vlan>100</vlan>')
+
+    def test_layouts_follow_the_loaded_schema(self):
+        device = Device(id='1', type='onu', vlan=100)
+        self.assertIn('<vlan>100</vlan>', self.xml(device, 'device', 'Device'))
+
+        # as when the mapper loads the modules of another schema
+        self.writer.mapper.message_definitions = {
+            'device-Device': [field('id'), field('type')]}
+        self.writer.mapper.field_plans = {}
+        self.assertEqual(self.xml(device, 'device', 'Device'),
+                         '<id>1</id><type>onu</type>')
+
+    def test_layouts_are_made_once(self):
+        devices = Devices(items=[Device(id='1'), Device(id='2')])
+        self.xml(devices, 'device', 'Devices')
+        self.xml(Device(), 'device', 'Unknown')
+        layouts = dict(self.writer.layouts)
+        self.xml(devices, 'device', 'Devices')
+        self.xml(Device(), 'device', 'Unknown')
+        self.assertEqual(self.writer.layouts, layouts)
+
+    def test_unset_messages_are_skipped_and_defaults_are_not(self):
+        device = Device(id='<&>')
+        self.assertEqual(
+            self.xml(device, 'device', 'Device'),
+            '<type/><id>&lt;&amp;&gt;</id><root>false</root><serial_number/>'
+            '<admin_state>UNKNOWN</admin_state><vlan>0</vlan>')
+
+        device.proxy_address.channel_id = 3
+        self.assertIn(
+            '<proxy_address><device_id/><channel_id>3</channel_id>'
+            '</proxy_address>', self.xml(device, 'device', 'Device'))
+
+    def test_items_are_generated_one_at_a_time(self):
+        devices = Devices(items=[Device(id='1'), Device(id='2')])
+        pieces = list(self.writer.iter_response(devices, 'device', 'Devices'))
+        self.assertEqual(len(pieces), 2)
+        self.assertTrue(pieces[0].startswith('<items><type/><id>1</id>'))
+        self.assertTrue(pieces[1].startswith('<items><type/><id>2</id>'))
+
+    def test_list_response(self):
+        devices = Devices(items=[Device(id='1')])
+        self.assertTrue(
+            self.writer.is_list_response(devices, 'device', 'Devices'))
+        self.assertFalse(
+            self.writer.is_list_response(Device(), 'device', 'Device'))
+        self.assertTrue(
+            self.xml(devices, 'device', 'Devices', 'devices').startswith(
+                '<devices><type/><id>1</id>'))
+        self.assertTrue(
+            self.xml(devices, 'device', 'Devices', IGNORE).startswith(
+                '<type/><id>1</id>'))
+
+    def test_inline_node_fields_are_moved_up(self):
+        entry = ofp_group_entry(
+            desc=ofp_group_desc(type=OFPGT_ALL, group_id=4,
+                                buckets=[ofp_bucket(weight=1)]),
+            stats=ofp_group_stats(ref_count=2))
+        self.assertEqual(
+            self.xml(entry, 'openflow_13', 'ofp_group_entry'),
+            '<type>OFPGT_ALL</type><group_id>4</group_id>'
+            '<buckets><weight>1</weight></buckets>'
+            '<stats><ref_count>2</ref_count></stats>')
+        self.assertEqual(
+            self.xml(ofp_group_entry(), 'openflow_13', 'ofp_group_entry'), '')
+
+
+def cooperate(iterator):
+    """Run a cooperative task to completion right away"""
+    for _ in iterator:
+        pass
+    return Mock(whenDone=lambda: succeed(None))
+
+
+class TestSendMsgStream(TestCase):
+
+    def setUp(self):
+        patcher = patch.object(nc_connection, 'cooperate', cooperate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conn = NetconfConnection(avatar=Mock(), max_chunk=64 + 10)
+        self.conn.transport = StringTransport()
+        self.pieces = [u'<a>', u'0123456789abc', u'</a>', u'\xe9']
+
+    def test_chunked_framing(self):
+        self.conn.send_msg_stream(iter(self.pieces), True)
+        data = self.conn.transport.value()
+        self.assertTrue(data.endswith('\n##\n'))
+        chunks = re.findall(r'\n#(\d+)\n', data)
+        self.assertEqual(chunks, ['10', '10', '2'])
+        self.assertEqual(re.sub(r'\n#\d+\n|\n##\n', '', data),
+                         u''.join(self.pieces).encode('utf-8'))
+
+    def test_end_of_message_framing(self):
+        self.conn.send_msg_stream(iter(self.pieces), False)
+        self.assertEqual(self.conn.transport.value(),
+                         u''.join(self.pieces).encode('utf-8') + C.DELIMITER)
+
+    def test_stops_when_connection_is_lost(self):
+
+        def pieces():
+            yield u'0123456789'
+            self.conn.connected = False
+            yield u'0123456789'
+
+        self.conn.send_msg_stream(pieces(), True)
+        self.assertEqual(self.conn.transport.value(), '\n#10\n0123456789')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+import loxi
+from loxi import of13
+from loxi.of13 import fastpath
+
+
+def mk_match():
+    return of13.match([
+        of13.oxm.in_port(2),
+        of13.oxm.eth_dst([0, 1, 2, 3, 4, 5]),
+        of13.oxm.eth_src_masked([0, 1, 2, 3, 4, 5], [255] * 3 + [0] * 3),
+        of13.oxm.eth_type(0x800),
+        of13.oxm.vlan_vid(0x1000 | 100),
+        of13.oxm.vlan_pcp(3),
+        of13.oxm.ip_proto(17),
+        of13.oxm.ipv4_dst_masked(0xe0000000, 0xf0000000),
+        of13.oxm.ipv6_src('\x20\x01' + '\x00' * 14),
+        of13.oxm.udp_src(68),
+        of13.oxm.udp_dst(67),
+        of13.oxm.metadata(0x1234567890),
+        of13.oxm.bsn_vrf(10),  # not a basic OXM, parsed by generated code
+    ])
+
+
+def mk_instructions():
+    return [
+        of13.instruction.apply_actions([
+            of13.action.push_vlan(ethertype=0x8100),
+            of13.action.set_field(of13.oxm.vlan_vid(0x1000 | 4000)),
+            of13.action.output(port=1)]),
+        of13.instruction.goto_table(1),
+    ]
+
+
+def mk_messages():
+    msgs = [
+        of13.message.packet_in(
+            xid=1, buffer_id=of13.OFP_NO_BUFFER, total_len=64,
+            reason=of13.OFPR_ACTION, table_id=0, cookie=7,
+            match=of13.match([of13.oxm.in_port(1)]), data='\xaa' * 64),
+        of13.message.packet_out(
+            xid=2, buffer_id=of13.OFP_NO_BUFFER, in_port=of13.OFPP_CONTROLLER,
+            actions=[of13.action.output(port=1)], data='\xbb' * 80),
+        of13.message.packet_out(
+            xid=3, buffer_id=of13.OFP_NO_BUFFER, in_port=1, actions=[],
+            data=''),
+        of13.message.flow_stats_reply(xid=4, entries=[
+            of13.flow_stats_entry(
+                table_id=1, duration_sec=2, duration_nsec=3, priority=4,
+                idle_timeout=5, hard_timeout=6, flags=7, cookie=8,
+                packet_count=9, byte_count=10, match=mk_match(),
+                instructions=mk_instructions()),
+            of13.flow_stats_entry(match=of13.match())]),
+    ]
+    for i, cls in enumerate([of13.message.flow_add,
+                             of13.message.flow_modify,
+                             of13.message.flow_modify_strict,
+                             of13.message.flow_delete,
+                             of13.message.flow_delete_strict]):
+        msgs.append(cls(
+            xid=10 + i, cookie=1, cookie_mask=2, table_id=3, idle_timeout=4,
+            hard_timeout=5, priority=6, buffer_id=of13.OFP_NO_BUFFER,
+            out_port=of13.OFPP_ANY, out_group=of13.OFPG_ANY, flags=1,
+            match=mk_match(), instructions=mk_instructions()))
+    return msgs
+
+
+def pack_and_parse(msgs):
+    packed = [msg.pack() for msg in msgs]
+    return packed, [of13.message.parse_message(buf) for buf in packed]
+
+
+class TestLoxiFastPath(TestCase):
+
+    def setUp(self):
+        fastpath.install()
+
+    tearDown = setUp
+
+    def assertSameAsGenerated(self, msgs):
+        self.assertTrue(fastpath.installed())
+        fast = pack_and_parse(msgs)
+        fastpath.uninstall()
+        generated = pack_and_parse(msgs)
+        self.assertEqual(fast[0], generated[0])
+        self.assertEqual(fast[1], generated[1])
+        self.assertEqual(fast[1], msgs)
+
+    def test_messages(self):
+        self.assertSameAsGenerated(mk_messages())
+
+    def test_every_basic_oxm(self):
+        oxms = []
+        for type_len, cls in sorted(of13.oxm.oxm.subtypes.iteritems()):
+            if type_len >> 16 != fastpath.OFPXMC_OPENFLOW_BASIC:
+                continue
+            oxm = cls()
+            size = (type_len & 0xff) >> ((type_len >> 8) & 1)
+            if size == 6:
+                oxm.value = [1, 2, 3, 4, 5, 6]
+            elif size == 16:
+                oxm.value = 'x' * 16
+            else:
+                oxm.value = 1
+            if hasattr(oxm, 'value_mask'):
+                oxm.value_mask = oxm.value
+            oxms.append(oxm)
+        self.assertSameAsGenerated([of13.message.flow_add(
+            xid=1, match=of13.match(oxms))])
+
+    def test_truncated(self):
+        for msg in mk_messages():
+            buf = msg.pack()
+            for cut in xrange(8, len(buf), 3):
+                # fix up the length, so the message body is cut short
+                short = buf[:2] + of13.message.struct.pack('!H', cut) + \
+                    buf[4:cut]
+                try:
+                    of13.message.parse_message(short)
+                except (loxi.ProtocolError, AssertionError):
+                    pass
+                except Exception as e:
+                    self.fail('{}: {!r}'.format(type(msg).__name__, e))
+
+
+if __name__ == '__main__':
+    main()
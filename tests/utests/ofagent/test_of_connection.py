@@ -0,0 +1,104 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from loxi import of13
+from ofagent import of_connection
+from ofagent.of_connection import OpenFlowConnection, OpenFlowFramer
+
+
+def mk_messages():
+    return [
+        of13.message.hello(xid=1),
+        of13.message.packet_out(
+            xid=2, buffer_id=0xffffffff, in_port=of13.OFPP_CONTROLLER,
+            actions=[of13.action.output(port=1)], data='\x01' * 100),
+        of13.message.flow_add(
+            xid=3, priority=1000, cookie=1,
+            match=of13.match([of13.oxm.in_port(1),
+                              of13.oxm.vlan_vid(0x1000 | 100)]),
+            instructions=[of13.instruction.apply_actions(
+                [of13.action.pop_vlan(), of13.action.output(port=2)])]),
+        of13.message.barrier_request(xid=4),
+    ]
+
+
+class TestOpenFlowFramer(TestCase):
+
+    def setUp(self):
+        self.msgs = mk_messages()
+        self.stream = ''.join(msg.pack() for msg in self.msgs)
+        self.framer = OpenFlowFramer()
+
+    def assertFramed(self, framed, msgs):
+        self.assertEqual([raw.tobytes() for _, raw in framed],
+                         [msg.pack() for msg in msgs])
+        self.assertEqual([version for version, _ in framed],
+                         [msg.version for msg in msgs])
+
+    def test_whole_chunk(self):
+        self.assertFramed(self.framer.feed(self.stream), self.msgs)
+        self.assertEqual(len(self.framer), 0)
+
+    def test_byte_by_byte(self):
+        framed = []
+        for c in self.stream:
+            framed.extend(self.framer.feed(c))
+        self.assertFramed(framed, self.msgs)
+        self.assertEqual(len(self.framer), 0)
+
+    def test_split_chunks(self):
+        for cut in xrange(1, len(self.stream)):
+            framer = OpenFlowFramer()
+            framed = framer.feed(self.stream[:cut])
+            framed += framer.feed(self.stream[cut:])
+            self.assertFramed(framed, self.msgs)
+            self.assertEqual(len(framer), 0)
+
+    def test_views_survive_later_chunks(self):
+        first = self.msgs[0].pack()
+        second = self.msgs[1].pack()
+        framed = self.framer.feed(first + second[:10])
+        framed += self.framer.feed(second[10:] + first[:4])
+        framed += self.framer.feed(first[4:])
+        self.assertFramed(framed, [self.msgs[0], self.msgs[1], self.msgs[0]])
+
+    def test_invalid_length(self):
+        self.assertRaises(of_connection.loxi.ProtocolError, self.framer.feed,
+                          '\x04\x00\x00\x04\x00\x00\x00\x01')
+
+
+class TestOpenFlowConnection(TestCase):
+
+    def test_data_received(self):
+        msgs = mk_messages()
+        stream = ''.join(msg.pack() for msg in msgs)
+        connection = OpenFlowConnection(agent=None)
+        for i in xrange(0, len(stream), 7):
+            connection.dataReceived(stream[i:i + 7])
+        received = []
+        for _ in msgs:
+            connection.rx.get().addCallback(received.append)
+        # note: messages are parsed with of_connection's own loxi import
+        self.assertEqual([type(msg).__name__ for msg in received],
+                         [type(msg).__name__ for msg in msgs])
+        self.assertEqual([msg.pack() for msg in received],
+                         [msg.pack() for msg in msgs])
+        self.assertIsInstance(received[1].data, str)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from mock import Mock, patch
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from loxi import of13
+from ofagent import of_protocol_handler
+from ofagent.of_protocol_handler import OpenFlowProtocolHandler, \
+    MOD_BATCH_DELAY, MOD_BATCH_SIZE
+
+
+class TestModBatching(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        for name, value in (('reactor', self.clock),
+                            # identify the converted mods by their xid
+                            ('to_grpc', lambda req: req.xid)):
+            patcher = patch.object(of_protocol_handler, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.calls = []  # (mods, deferred) per update_flow_tables call
+
+        def update_flow_tables(device_id, mods):
+            d = Deferred()
+            self.calls.append((mods, d))
+            return d
+
+        self.rpc = Mock()
+        self.rpc.update_flow_tables = update_flow_tables
+        self.cxn = Mock()
+        self.handler = OpenFlowProtocolHandler(
+            1, 'ld1', Mock(), self.cxn, self.rpc)
+
+    def handle(self, *msgs):
+        for msg in msgs:
+            self.handler.main_handlers[msg.type](self.handler, msg)
+
+    def barrier_replies(self):
+        return [args[0].xid for args, _ in self.cxn.send.call_args_list
+                if type(args[0]).__name__ == 'barrier_reply']
+
+    def test_mods_are_sent_after_a_short_delay(self):
+        self.handle(of13.message.flow_add(xid=1),
+                    of13.message.group_add(xid=2),
+                    of13.message.flow_delete(xid=3))
+        self.assertEqual(self.calls, [])
+        self.clock.advance(MOD_BATCH_DELAY)
+        self.assertEqual([mods for mods, _ in self.calls], [[1, 2, 3]])
+
+    def test_full_batch_is_sent_right_away(self):
+        self.handle(*[of13.message.flow_add(xid=i)
+                      for i in xrange(MOD_BATCH_SIZE + 1)])
+        self.assertEqual([mods for mods, _ in self.calls],
+                         [range(MOD_BATCH_SIZE)])
+        self.clock.advance(MOD_BATCH_DELAY)
+        self.calls[0][1].callback(None)
+        self.assertEqual([mods for mods, _ in self.calls],
+                         [range(MOD_BATCH_SIZE), [MOD_BATCH_SIZE]])
+
+    def test_barrier_waits_for_mods_to_be_applied(self):
+        self.handle(of13.message.flow_add(xid=1),
+                    of13.message.group_add(xid=2),
+                    of13.message.barrier_request(xid=3))
+        self.assertEqual([mods for mods, _ in self.calls], [[1, 2]])
+        self.assertEqual(self.barrier_replies(), [])
+        self.calls[0][1].callback(None)
+        self.assertEqual(self.barrier_replies(), [3])
+        # the flush timer was cancelled
+        self.clock.advance(MOD_BATCH_DELAY)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_batches_are_applied_in_order(self):
+        self.handle(of13.message.flow_add(xid=1),
+                    of13.message.barrier_request(xid=2),
+                    of13.message.flow_add(xid=3),
+                    of13.message.barrier_request(xid=4))
+        # the second batch is only sent once the first one is applied
+        self.assertEqual([mods for mods, _ in self.calls], [[1]])
+        self.calls[0][1].callback(None)
+        self.assertEqual(self.barrier_replies(), [2])
+        self.assertEqual([mods for mods, _ in self.calls], [[1], [3]])
+        self.calls[1][1].callback(None)
+        self.assertEqual(self.barrier_replies(), [2, 4])
+
+    def test_barrier_without_mods_is_answered_right_away(self):
+        self.handle(of13.message.barrier_request(xid=1))
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.barrier_replies(), [1])
+
+    def test_failed_batch_does_not_block_barrier(self):
+        self.handle(of13.message.flow_add(xid=1),
+                    of13.message.barrier_request(xid=2),
+                    of13.message.flow_add(xid=3),
+                    of13.message.barrier_request(xid=4))
+        self.calls[0][1].errback(Exception('boom'))
+        self.calls[1][1].callback(None)
+        self.assertEqual(self.barrier_replies(), [2, 4])
+
+
+if __name__ == '__main__':
+    main()
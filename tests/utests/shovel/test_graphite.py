@@ -0,0 +1,184 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pickle
+import socket
+import struct
+import time
+from threading import Condition, Thread
+from unittest import TestCase, main
+
+from shovel.graphite import ConsistentHash, GraphiteWriter
+
+
+class CarbonServer(Thread):
+    """Local stand-in for the pickle receiver of carbon"""
+
+    def __init__(self, port=0, max_messages=None):
+        Thread.__init__(self)
+        self.daemon = True
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.max_messages = max_messages  # per connection, then hang up
+        self.condition = Condition()
+        self.messages = []  # lists of data points
+        self.conn = None
+        self.hang_ups = 0
+
+    @property
+    def points(self):
+        with self.condition:
+            return [point for message in self.messages for point in message]
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            self.conn = conn
+            self.serve(conn)
+
+    def serve(self, conn):
+        f = conn.makefile('rb')
+        received = 0
+        while self.max_messages is None or received < self.max_messages:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            size, = struct.unpack('!L', header)
+            with self.condition:
+                self.messages.append(pickle.loads(f.read(size)))
+                self.condition.notify_all()
+            received += 1
+        f.close()
+        conn.close()
+        with self.condition:
+            self.hang_ups += 1
+            self.condition.notify_all()
+
+    def close(self):
+        for sock in (self.sock, self.conn):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, socket.error):
+                pass
+        self.sock.close()
+        self.join(1)
+
+    def wait_for(self, points, hang_ups=0, timeout=5):
+        deadline = time.time() + timeout
+        with self.condition:
+            while (sum(len(m) for m in self.messages) < points or
+                   self.hang_ups < hang_ups) and time.time() < deadline:
+                self.condition.wait(0.05)
+        return self.points
+
+
+def points(n, prefix='voltha.olt.0001.pon'):
+    return [('{}{}.rx_bytes'.format(prefix, i), (1500000000 + i, float(i)))
+            for i in xrange(n)]
+
+
+class TestGraphiteWriter(TestCase):
+
+    def server(self, **kw):
+        server = CarbonServer(**kw)
+        server.start()
+        self.addCleanup(server.close)
+        return server
+
+    def writer(self, servers, **kw):
+        kw.setdefault('delay', 0.05)
+        writer = GraphiteWriter(
+            [('127.0.0.1', server.port) for server in servers], **kw).start()
+        self.addCleanup(writer.stop, 1)
+        return writer
+
+    def test_batches_by_size_and_time(self):
+        server = self.server()
+        writer = self.writer([server], max_batch=3, max_delay=10)
+        writer.add(points(2))
+        writer.add(points(5, prefix='voltha.onu.0002.uni'))
+        self.assertEqual(len(server.wait_for(6)), 6)
+        writer.poll()
+        time.sleep(0.1)
+        self.assertEqual(len(server.points), 6)  # 1 left, not due yet
+        writer.poll(now=time.time() + 10)
+        self.assertEqual(len(server.wait_for(7)), 7)
+        self.assertEqual([len(m) for m in server.messages], [3, 3, 1])
+        self.assertEqual(server.points[:2], points(2))
+
+    def test_reconnects_and_resends(self):
+        server = self.server(max_messages=1)
+        writer = self.writer([server], max_batch=2)
+        for i in xrange(3):
+            writer.add(points(2))
+            server.wait_for(2 * (i + 1), hang_ups=i + 1)
+        self.assertEqual(len(server.points), 6)
+        stats = writer.statistics()
+        self.assertEqual((stats['reconnects'], stats['dropped']), (2, 0))
+        self.assertGreater(stats['sent-per-sec'], 0)
+
+    def test_waits_for_the_server_and_drops_the_oldest(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()  # nobody listens there for now
+
+        writer = GraphiteWriter([('127.0.0.1', port)], max_batch=1,
+                                max_queued=2, delay=0.05).start()
+        self.addCleanup(writer.stop, 1)
+        for i in xrange(4):
+            writer.add(points(1, prefix='p{}.'.format(i)))
+        time.sleep(0.1)
+        stats = writer.statistics()
+        self.assertEqual((stats['dropped'], stats['queued']), (2, 2))
+
+        server = self.server(port=port)
+        self.assertEqual([path for path, _ in server.wait_for(2)],
+                         ['p2.0.rx_bytes', 'p3.0.rx_bytes'])
+
+    def test_sharding(self):
+        servers = [self.server() for _ in xrange(3)]
+        writer = self.writer(servers, max_batch=1000)
+        writer.add(points(300))
+        writer.add(points(300))
+        writer.flush()
+        deadline = time.time() + 5
+        while sum(len(server.points) for server in servers) < 600 and \
+                time.time() < deadline:
+            time.sleep(0.05)
+        received = [set(path for path, _ in server.points)
+                    for server in servers]
+        # spread over the servers, each path always going to the same one
+        self.assertTrue(all(len(paths) > 50 for paths in received))
+        self.assertEqual(sum(len(paths) for paths in received), 300)
+        self.assertEqual(sum(len(server.points) for server in servers), 600)
+
+    def test_consistent_hash_moves_only_the_keys_of_a_removed_node(self):
+        keys = ['voltha.olt.{}.nni.rx_bytes'.format(i) for i in xrange(1000)]
+        before = ConsistentHash(['a:2004', 'b:2004', 'c:2004'])
+        after = ConsistentHash(['a:2004', 'c:2004'])
+        for key in keys:
+            if before.get(key) != 'b:2004':
+                self.assertEqual(after.get(key), before.get(key))
+
+
+if __name__ == '__main__':
+    main()
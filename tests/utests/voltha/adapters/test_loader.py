@@ -0,0 +1,109 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+from unittest import TestCase, main
+
+from mock import MagicMock, patch
+from twisted.internet.defer import Deferred
+
+from voltha.adapters import loader
+from voltha.adapters.loader import AdapterLoader
+from voltha.adapters.manifest import AdapterManifestEntry
+from voltha.protos.device_pb2 import DeviceType
+
+
+class FakeAgent(object):
+
+    started = []  # Deferreds of the agents being started
+
+    def __init__(self, adapter_name, adapter_class):
+        self.adapter_name = adapter_name
+        self.adapter_class = adapter_class
+
+    def start(self):
+        d = Deferred()
+        self.started.append(d)
+        return d
+
+
+class TestAdapterLoader(TestCase):
+
+    def setUp(self):
+        FakeAgent.started = []
+        self.root_proxy = MagicMock()
+        self.root_proxy.get.side_effect = KeyError
+        self.manifest = OrderedDict([
+            ('eager_olt', AdapterManifestEntry(
+                'eager_olt', [DeviceType(id='eager_olt', adapter='eager_olt')],
+                eager=True)),
+            ('lazy_onu', AdapterManifestEntry(
+                'lazy_onu', [DeviceType(id='lazy_onu', adapter='lazy_onu')])),
+        ])
+        self.patches = [
+            patch.object(loader, 'AdapterAgent', FakeAgent),
+            patch.object(loader, 'load_manifest', lambda: self.manifest),
+            patch.object(loader, 'registry', MagicMock()),
+            patch.object(AdapterLoader, '_load_adapter_class',
+                         lambda _, name: name + '_class'),
+        ]
+        for p in self.patches:
+            p.start()
+        loader.registry.return_value.get_proxy.return_value = self.root_proxy
+        self.loader = AdapterLoader(config=dict(lazy=True))
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_lazy_start(self):
+        started = []
+        self.loader.start().addCallback(started.append)
+        # only the eager adapter is loaded at startup ...
+        self.assertEqual(len(FakeAgent.started), 1)
+        FakeAgent.started[0].callback(None)
+        self.assertEqual(started, [self.loader])
+        self.assertEqual(self.loader.adapter_agents.keys(), ['eager_olt'])
+        # ... the device types of the others are registered
+        self.root_proxy.add.assert_called_once_with(
+            '/device_types', self.manifest['lazy_onu'].device_types[0])
+
+    def test_load_agent_once(self):
+        agents = []
+        for _ in xrange(3):
+            self.loader.load_agent('lazy_onu').addCallback(agents.append)
+        self.assertEqual(len(FakeAgent.started), 1)
+        self.assertEqual(agents, [])
+        FakeAgent.started[0].callback(None)
+        self.assertEqual(len(agents), 3)
+        agent = self.loader.get_agent('lazy_onu')
+        self.assertEqual(agents, [agent] * 3)
+        self.assertEqual(agent.adapter_class, 'lazy_onu_class')
+        self.loader.load_agent('lazy_onu').addCallback(agents.append)
+        self.assertEqual(agents, [agent] * 4)
+        self.assertEqual(len(FakeAgent.started), 1)
+
+    def test_load_agent_failure(self):
+        errors = []
+        for _ in xrange(2):
+            self.loader.load_agent('lazy_onu').addErrback(errors.append)
+        FakeAgent.started[0].errback(RuntimeError('boom'))
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(self.loader.adapter_agents, {})
+        self.assertEqual(self.loader.loading, {})
+
+
+if __name__ == '__main__':
+    main()
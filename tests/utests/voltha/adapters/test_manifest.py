@@ -0,0 +1,64 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import importlib
+import os
+from unittest import TestCase, main
+
+from voltha.adapters.manifest import MANIFEST_FILE, load_manifest
+
+adapters_dir = os.path.dirname(MANIFEST_FILE)
+
+
+def adapter_names():
+    return sorted(
+        name for name in os.listdir(adapters_dir)
+        if os.path.isfile(os.path.join(adapters_dir, name, name + '.py')))
+
+
+class TestAdapterManifest(TestCase):
+
+    def setUp(self):
+        self.manifest = load_manifest()
+
+    def test_lists_all_adapters(self):
+        self.assertEqual(self.manifest.keys(), adapter_names())
+
+    def test_device_types(self):
+        for name, entry in self.manifest.iteritems():
+            self.assertEqual(entry.name, name)
+            self.assertTrue(entry.device_types)
+            for device_type in entry.device_types:
+                self.assertEqual(device_type.adapter, name)
+        self.assertTrue(self.manifest['simulated_olt'].eager)
+        self.assertFalse(self.manifest['ponsim_olt'].eager)
+
+    def test_matches_adapter_classes(self):
+        for name, entry in self.manifest.iteritems():
+            try:
+                module = importlib.import_module(
+                    'voltha.adapters.{0}.{0}'.format(name))
+            except ImportError:
+                continue  # adapter dependencies not available here
+            classes = [cls for cls in vars(module).itervalues()
+                       if getattr(cls, 'name', None) == name and
+                       hasattr(cls, 'supported_device_types')]
+            self.assertEqual(len(classes), 1, name)
+            self.assertEqual(entry.device_types,
+                             list(classes[0].supported_device_types), name)
+
+
+if __name__ == '__main__':
+    main()
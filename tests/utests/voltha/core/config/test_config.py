@@ -18,7 +18,8 @@ from voltha.core.config.config_root import ConfigRoot, MergeConflictException
 from voltha.core.config.config_txn import ClosedTransactionError
 from voltha.protos import third_party
 from voltha.protos.events_pb2 import ConfigEvent, ConfigEventType
-from voltha.protos.openflow_13_pb2 import ofp_port
+from voltha.protos.openflow_13_pb2 import ofp_port, Flows, FlowGroups, \
+    ofp_flow_stats, ofp_group_entry, ofp_group_desc
 from voltha.protos.voltha_pb2 import VolthaInstance, Adapter, HealthStatus, \
     AdapterConfig, LogicalDevice, LogicalPort
 
@@ -1209,5 +1210,116 @@ class TestTransactionalLogic(DeepTestsBase):
         post_remove.assert_called_once_with(ad)
 
 
+class TestFlowTables(TestCase):
+
+    def setUp(self):
+        self.kv_store = dict()
+        self.node = ConfigRoot(
+            VolthaInstance(logical_devices=[LogicalDevice(id='ld')]),
+            kv_store=self.kv_store)
+        self.flows_proxy = self.node.get_proxy('/logical_devices/ld/flows')
+        self.groups_proxy = self.node.get_proxy(
+            '/logical_devices/ld/flow_groups')
+        self.flows = Flows(items=[
+            ofp_flow_stats(id=i, priority=i) for i in xrange(1, 6)])
+
+    def test_tables_are_read_whole(self):
+        self.flows_proxy.update('/', self.flows)
+        self.assertEqual(self.flows_proxy.get('/'), self.flows)
+        self.assertEqual(self.node.get('/logical_devices/ld/flows'),
+                         self.flows)
+        self.assertEqual(self.node.get('/logical_devices/ld/flows/items/3'),
+                         ofp_flow_stats(id=3, priority=3))
+        self.assertEqual(self.node.get(deep=1).logical_devices[0].flows,
+                         self.flows)
+
+    def test_only_changed_flows_are_stored(self):
+        self.flows_proxy.update('/', self.flows)
+        before = set(self.kv_store)
+        flows = Flows()
+        flows.CopyFrom(self.flows)
+        flows.items[2].cookie = 42
+        self.flows_proxy.update('/', flows)
+        self.assertEqual(self.flows_proxy.get('/'), flows)
+        # the config and revision of the changed flow, and the revisions of
+        # the table, the logical device and the root
+        stored = [k for k in set(self.kv_store) - before if k != 'root']
+        self.assertEqual(len(stored), 5)
+
+        # no change, no new revision
+        latest = self.node.latest.hash
+        self.flows_proxy.update('/', flows)
+        self.assertEqual(self.node.latest.hash, latest)
+
+    def test_flow_changes_are_announced(self):
+        events = []
+        for callback_type in (CallbackType.POST_ADD, CallbackType.POST_REMOVE,
+                              CallbackType.POST_UPDATE):
+            self.flows_proxy.register_callback(
+                callback_type,
+                lambda data, t=callback_type: events.append((t, data)))
+
+        self.flows_proxy.update('/', Flows(items=self.flows.items[:2]))
+        self.assertEqual(events, [
+            (CallbackType.POST_ADD, self.flows.items[0]),
+            (CallbackType.POST_ADD, self.flows.items[1]),
+            (CallbackType.POST_UPDATE, Flows(items=self.flows.items[:2]))])
+
+        del events[:]
+        changed = ofp_flow_stats(id=2, priority=20)
+        flows = Flows(items=[changed, self.flows.items[2]])
+        self.flows_proxy.update('/', flows)
+        self.assertEqual(events, [
+            (CallbackType.POST_REMOVE, self.flows.items[1]),
+            (CallbackType.POST_REMOVE, self.flows.items[0]),
+            (CallbackType.POST_ADD, changed),
+            (CallbackType.POST_ADD, self.flows.items[2]),
+            (CallbackType.POST_UPDATE, flows)])
+
+    def test_flow_changes_are_announced_on_commit(self):
+        self.flows_proxy.update('/', Flows(items=self.flows.items[:2]))
+        events = []
+        for callback_type in (CallbackType.POST_ADD, CallbackType.POST_REMOVE,
+                              CallbackType.POST_UPDATE):
+            self.flows_proxy.register_callback(
+                callback_type,
+                lambda data, t=callback_type: events.append((t, data)))
+
+        tx = self.flows_proxy.open_transaction()
+        changed = ofp_flow_stats(id=2, priority=20)
+        flows = Flows(items=[changed, self.flows.items[2]])
+        tx.update('/', flows)
+        self.assertEqual(events, [])
+        tx.commit()
+        self.assertEqual(self.flows_proxy.get('/'), flows)
+        self.assertEqual(events, [
+            (CallbackType.POST_ADD, self.flows.items[2]),
+            (CallbackType.POST_REMOVE, self.flows.items[0]),
+            (CallbackType.POST_REMOVE, self.flows.items[1]),
+            (CallbackType.POST_ADD, changed),
+            (CallbackType.POST_UPDATE, flows)])
+
+    def test_duplicate_flow_ids_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.flows_proxy.update(
+                '/', Flows(items=[ofp_flow_stats(id=1),
+                                  ofp_flow_stats(id=1, priority=2)]))
+
+    def test_groups_are_keyed_by_group_id(self):
+        groups = FlowGroups(items=[
+            ofp_group_entry(desc=ofp_group_desc(group_id=i))
+            for i in (1, 2)])
+        self.groups_proxy.update('/', groups)
+        self.assertEqual(self.groups_proxy.get('/'), groups)
+        self.assertEqual(
+            self.node.get('/logical_devices/ld/flow_groups/items/2'),
+            groups.items[1])
+
+    def test_tables_are_reloaded_from_persistence(self):
+        self.flows_proxy.update('/', self.flows)
+        root = ConfigRoot.load(VolthaInstance, kv_store=self.kv_store)
+        self.assertEqual(root.get('/logical_devices/ld/flows'), self.flows)
+
+
 if __name__ == '__main__':
     main()
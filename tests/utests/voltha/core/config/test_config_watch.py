@@ -0,0 +1,144 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from voltha.core.config.config_root import ConfigRoot
+from voltha.protos import third_party
+from voltha.protos.device_pb2 import Device, Port
+from voltha.protos.voltha_pb2 import VolthaInstance, ConfigChange
+
+_ = third_party
+
+
+class TestConfigWatch(TestCase):
+
+    def setUp(self):
+        self.root = ConfigRoot(VolthaInstance(
+            devices=[Device(id='d1'), Device(id='d2')]))
+
+    def changes(self, watch):
+        self.assertTrue(watch.wait())
+        return [(change.type, change.key) for change in watch.changes()]
+
+    def update(self, device_id, **kw):
+        device = self.root.get('/devices/' + device_id)
+        for name, value in kw.iteritems():
+            setattr(device, name, value)
+        self.root.update('/devices/' + device_id, device)
+
+    def test_new_watch_starts_with_reset(self):
+        watch = self.root.watch('/devices')
+        changes = watch.changes()
+        self.assertEqual(
+            [(change.type, change.key) for change in changes],
+            [(ConfigChange.RESET, ''), (ConfigChange.ADDED, 'd1'),
+             (ConfigChange.ADDED, 'd2')])
+        device = Device()
+        changes[1].data.Unpack(device)
+        self.assertEqual(device, Device(id='d1'))
+        self.assertEqual([change.hash for change in changes],
+                         ['', '', self.root.latest.hash])
+
+    def test_deltas(self):
+        watch = self.root.watch('/devices')
+        watch.changes()
+        self.assertFalse(watch.pending)
+
+        self.root.add('/devices', Device(id='d3'))
+        self.update('d1', vlan=100)
+        self.root.remove('/devices/d2')
+        self.assertEqual(self.changes(watch), [
+            (ConfigChange.UPDATED, 'd1'), (ConfigChange.ADDED, 'd3'),
+            (ConfigChange.REMOVED, 'd2')])
+        self.assertEqual(watch.changes(), [])
+
+    def test_changes_are_coalesced(self):
+        watch = self.root.watch('/devices')
+        watch.changes()
+        for vlan in xrange(10):
+            self.update('d2', vlan=vlan)
+        changes = watch.changes()
+        self.assertEqual(len(changes), 1)
+        device = Device()
+        changes[0].data.Unpack(device)
+        self.assertEqual(device.vlan, 9)
+
+        # changed and changed back: nothing to report
+        self.update('d2', vlan=1)
+        self.update('d2', vlan=9)
+        self.assertEqual(watch.changes(), [])
+
+    def test_children_only_count_with_depth(self):
+        watches = [self.root.watch('/devices', depth=depth)
+                   for depth in (0, 1)]
+        for watch in watches:
+            watch.changes()
+        self.root.add('/devices/d1/ports', Port(port_no=1))
+        self.assertEqual(watches[0].changes(), [])
+        change, = watches[1].changes()
+        device = Device()
+        change.data.Unpack(device)
+        self.assertEqual(device.ports[0].port_no, 1)
+
+    def test_resume(self):
+        watch = self.root.watch('/devices')
+        since_hash = watch.changes()[-1].hash
+        self.root.unwatch(watch)
+        self.update('d1', vlan=100)
+        self.root.add('/devices', Device(id='d3'))
+
+        watch = self.root.watch('/devices', since_hash)
+        self.assertEqual(self.changes(watch), [
+            (ConfigChange.UPDATED, 'd1'), (ConfigChange.ADDED, 'd3')])
+
+        watch = self.root.watch('/devices', 'unknown')
+        self.assertEqual(watch.changes()[0].type, ConfigChange.RESET)
+
+    def test_watched_node_removal_closes_watch(self):
+        watch = self.root.watch('/devices/d1')
+        self.assertEqual(self.changes(watch), [
+            (ConfigChange.RESET, ''), (ConfigChange.ADDED, '')])
+        self.update('d1', vlan=100)
+        self.update('d2', vlan=100)
+        self.assertEqual(self.changes(watch), [(ConfigChange.UPDATED, '')])
+        self.root.remove('/devices/d1')
+        self.assertEqual(self.changes(watch), [(ConfigChange.REMOVED, '')])
+        self.assertTrue(watch.closed)
+        self.assertFalse(watch.wait())
+
+    def test_wake_releases_watcher(self):
+        watch = self.root.watch('/devices')
+        watch.changes()
+        watch.wake()
+        # a wake up before the wait does not count
+        self.root.add('/devices', Device(id='d3'))
+        self.assertTrue(watch.wait())
+
+    def test_cancelled_watcher_does_not_block(self):
+        watch = self.root.watch('/devices')
+        watch.changes()
+        watch.wake()  # cancelled before it came to wait
+        self.assertFalse(watch.wait(cancelled=lambda: True))
+        self.update('d1', vlan=100)
+        self.assertTrue(watch.wait(cancelled=lambda: True))
+
+    def test_bad_paths(self):
+        self.assertRaises(KeyError, self.root.watch, '/devices/d3')
+        self.assertRaises(KeyError, self.root.watch, '/nonexistent')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from mock import patch
+from twisted.internet.defer import Deferred, fail
+from twisted.internet.task import Clock
+
+from voltha.core import activation_scheduler
+from voltha.core.activation_scheduler import ActivationScheduler, \
+    ActivationFailed
+from voltha.protos import third_party
+from voltha.protos.common_pb2 import OperStatus
+from voltha.protos.device_pb2 import Device
+
+_ = third_party
+
+
+class TestActivationScheduler(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch.object(activation_scheduler, 'reactor', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = ActivationScheduler(dict(
+            max_per_parent=2, max_per_adapter=3, timeout=10, max_retries=2,
+            backoff=1, max_backoff=1.5))
+        self.adopted = []  # device ids, in the order they were adopted
+
+    def submit(self, device_id, parent_id='olt1', adapter='onu',
+               oper_status=OperStatus.UNKNOWN, adopt=None):
+        device = Device(id=device_id, parent_id=parent_id,
+                        oper_status=oper_status)
+        return self.scheduler.submit(
+            device, adapter, adopt or (lambda: self.adopted.append(device_id)))
+
+    def report(self, device_id, oper_status=OperStatus.ACTIVE):
+        self.scheduler.device_updated(
+            Device(id=device_id, oper_status=oper_status))
+
+    def test_parent_limit(self):
+        for i in xrange(3):
+            self.submit('onu%d' % i)
+        self.submit('onu3', parent_id='olt2')
+        self.assertEqual(self.adopted, ['onu0', 'onu1', 'onu3'])
+        self.report('onu1', OperStatus.ACTIVATING)
+        self.assertEqual(self.adopted, ['onu0', 'onu1', 'onu3'])
+        self.report('onu1')
+        self.assertEqual(self.adopted, ['onu0', 'onu1', 'onu3', 'onu2'])
+
+    def test_adapter_limit(self):
+        for parent_id in ('olt1', 'olt2', 'olt3', 'olt4'):
+            self.submit('onu-' + parent_id, parent_id=parent_id)
+        self.submit('other', adapter='other')
+        self.assertEqual(self.adopted,
+                         ['onu-olt1', 'onu-olt2', 'onu-olt3', 'other'])
+        self.report('onu-olt2')
+        self.assertEqual(self.adopted[-1], 'onu-olt4')
+
+    def test_recovering_devices_go_first(self):
+        for i in xrange(4):
+            self.submit('onu%d' % i,
+                        oper_status=OperStatus.ACTIVE if i == 3
+                        else OperStatus.UNKNOWN)
+        self.assertEqual(self.adopted, ['onu0', 'onu1'])
+        self.report('onu0')
+        self.assertEqual(self.adopted, ['onu0', 'onu1', 'onu3'])
+
+    def failing_adopt(self, device_id, failures):
+        def adopt():
+            self.adopted.append(device_id)
+            if len(self.adopted) <= failures:
+                return fail(ValueError())
+        return adopt
+
+    def test_adopt_errors_are_retried_with_backoff(self):
+        results = []
+        self.submit('onu0', adopt=self.failing_adopt('onu0', 2)).addBoth(
+            results.append)
+        self.assertEqual(self.scheduler.statistics()['backing-off'], 1)
+        self.clock.advance(1)
+        self.assertEqual(self.adopted, ['onu0', 'onu0'])
+        self.clock.advance(1)
+        self.assertEqual(len(self.adopted), 2)  # 1.5s backoff
+        self.clock.advance(0.5)
+        self.assertEqual(len(self.adopted), 3)
+        self.report('onu0')
+        self.assertEqual(results, ['onu0'])
+        stats = self.scheduler.statistics()
+        self.assertEqual((stats['activated'], stats['retries']), (1, 2))
+
+    def test_adopt_errors_up_to_max_retries(self):
+        results = []
+        self.submit('onu0', adopt=self.failing_adopt('onu0', 10)).addBoth(
+            results.append)
+        self.clock.advance(1)
+        self.clock.advance(1.5)
+        self.assertEqual(len(self.adopted), 3)
+        self.assertEqual(results[0].type, ActivationFailed)
+        stats = self.scheduler.statistics()
+        self.assertEqual((stats['failed'], stats['retries']), (1, 2))
+        self.assertEqual(self.scheduler.activations, {})
+
+        # submitted again, the device gets all its attempts again
+        self.submit('onu0', adopt=self.failing_adopt('onu0', 5))
+        self.clock.advance(1)
+        self.clock.advance(1.5)
+        self.assertEqual(len(self.adopted), 6)
+        self.report('onu0')
+        self.assertEqual(self.scheduler.activated, 1)
+
+    def test_failed_devices_are_not_adopted_again(self):
+        results = []
+        self.submit('onu0').addBoth(results.append)
+        self.report('onu0', OperStatus.FAILED)
+        self.clock.advance(60)
+        self.assertEqual(self.adopted, ['onu0'])
+        self.assertEqual(results[0].type, ActivationFailed)
+        self.assertEqual(self.scheduler.statistics()['failed'], 1)
+
+    def test_timeouts_are_not_adopted_again(self):
+        results = []
+        self.submit('onu0', adopt=lambda: (self.adopted.append('onu0'),
+                                           Deferred())[1]
+                    ).addBoth(results.append)  # adoption still going on
+        self.submit('onu1')
+        self.submit('onu2')
+        self.assertEqual(self.adopted, ['onu0', 'onu1'])
+        self.clock.advance(10)  # both time out, freeing their slots
+        self.clock.advance(5)
+        self.assertEqual(self.adopted, ['onu0', 'onu1', 'onu2'])
+        self.assertEqual(results[0].type, ActivationFailed)
+        stats = self.scheduler.statistics()
+        self.assertEqual((stats['failed'], stats['retries']), (2, 0))
+        self.report('onu1')  # too late
+        self.assertEqual(self.scheduler.activated, 0)
+
+    def test_cancel_frees_the_slot(self):
+        for i in xrange(3):
+            self.submit('onu%d' % i)
+        self.scheduler.cancel('onu0')
+        self.assertEqual(self.adopted, ['onu0', 'onu1', 'onu2'])
+        self.scheduler.cancel('onu2')
+        self.submit('onu3')
+        self.assertEqual(self.adopted[-1], 'onu3')
+        self.assertEqual(self.scheduler.statistics()['in-progress'], 2)
+
+    def test_statistics(self):
+        results = []
+        for i in xrange(3):
+            self.submit('onu%d' % i).addCallback(results.append)
+        self.clock.advance(2)
+        self.report('onu0')
+        self.clock.advance(1)
+        self.report('onu2')
+        stats = self.scheduler.statistics()
+        self.assertEqual(results, ['onu0', 'onu2'])
+        self.assertEqual(
+            (stats['queued'], stats['in-progress'], stats['activated']),
+            (0, 1, 2))
+        self.assertEqual(stats['wait-max-ms'], 2000.0)
+        self.assertEqual(stats['activation-avg-ms'], 1500.0)
+        self.assertEqual(stats['activation-max-ms'], 2000.0)
+        self.assertEqual(self.scheduler.statistics()['wait-max-ms'], 0.0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from threading import Thread
+from unittest import TestCase, main
+
+from mock import Mock
+
+from common.utils.fair_queue import FairBatchQueue
+from voltha.core.local_handler import LocalHandler
+
+
+class Context(object):
+    """Stream context getting cancelled right after its first check"""
+
+    def __init__(self):
+        self.callbacks = []
+        self.active = True
+        self.checks = 0
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+        return True
+
+    def is_active(self):
+        active = self.active
+        self.checks += 1
+        if self.checks == 1:
+            self.cancel()
+        return active
+
+    def cancel(self):
+        self.active = False
+        for callback in self.callbacks:
+            callback()
+
+
+class TestDrain(TestCase):
+
+    def setUp(self):
+        self.handler = LocalHandler(Mock())
+        self.queue = FairBatchQueue()
+
+    def drain_in_thread(self, context):
+        batches = []
+        thread = Thread(target=lambda: batches.extend(
+            self.handler._drain(self.queue, context)))
+        thread.daemon = True
+        thread.start()
+        return thread, batches
+
+    def test_cancel_before_reading_releases_the_reader(self):
+        # cancelled between the is_active() check and get_batch(): the
+        # wake() comes before the reader blocks
+        thread, batches = self.drain_in_thread(Context())
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(batches, [])
+
+        # the next packets are left to the next reader
+        self.queue.put('ld1', 'packet-in')
+        self.assertEqual(len(self.queue), 1)
+
+    def test_batches_until_cancelled(self):
+        context = Context()
+        context.checks = 1  # no cancellation on its own
+        self.queue.put('ld1', 'packet-in')
+        thread, batches = self.drain_in_thread(context)
+        thread.join(0.1)
+        self.assertEqual(batches, [['packet-in']])
+        self.assertTrue(thread.is_alive())
+        context.cancel()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    main()
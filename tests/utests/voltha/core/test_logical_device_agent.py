@@ -370,6 +370,66 @@ class test_logical_device_agent(FlowHelpers):
         ))
         self.assertEqual(len(self.groups.items), 9)
 
+    # ~~~~~~~~~~~~~~~~~~~~~~~~ TEST BULK TABLE UPDATES ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def test_bulk_update_writes_each_table_once(self):
+        writes = []
+        update_flows = self.flows_proxy.update
+        update_groups = self.groups_proxy.update
+        def record_flows(path, flows):
+            writes.append('flows')
+            update_flows(path, flows)
+        def record_groups(path, groups):
+            writes.append('groups')
+            update_groups(path, groups)
+        self.flows_proxy.update = record_flows
+        self.groups_proxy.update = record_groups
+
+        group_mod = mk_multicast_group_mod(
+            group_id=2,
+            buckets=[ofp.ofp_bucket(actions=[pop_vlan(), output(1)])]
+        )
+        flow_mods = [
+            mk_simple_flow_mod(
+                match_fields=[in_port(i)],
+                actions=[output(i + 1)]
+            ) for i in range(5)
+        ]
+        self.lda.update_tables([group_mod] + flow_mods + [
+            mk_simple_flow_mod(
+                command=ofp.OFPFC_DELETE_STRICT,
+                match_fields=[in_port(2)],
+                actions=[]
+            )
+        ])
+
+        self.assertEqual(writes, ['groups', 'flows'])
+        self.assertEqual(len(self.groups.items), 1)
+        self.assertEqual(len(self.flows.items), 4)
+
+    def test_bulk_update_matches_one_by_one_updates(self):
+        flow_mods = [
+            mk_simple_flow_mod(
+                match_fields=[in_port(i % 3)],
+                actions=[output(i + 1)]
+            ) for i in range(6)
+        ]
+        for flow_mod in flow_mods:
+            self.lda.update_flow_table(flow_mod)
+        expected_flows = self.flows
+
+        self.flows = Flows(items=[])
+        self.lda.update_tables(flow_mods)
+        self.assertFlowsEqual(self.flows, expected_flows)
+
+    def test_bulk_update_skips_failing_mods(self):
+        self.lda.update_tables([
+            mk_simple_flow_mod(command=ofp.OFPFC_MODIFY,
+                               match_fields=[], actions=[]),
+            mk_simple_flow_mod(match_fields=[in_port(1)], actions=[])
+        ])
+        self.assertEqual(len(self.flows.items), 1)
+
     # ~~~~~~~~~~~~~~~~~~~~ DEFAULT RULES AND ROUTES ~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     def test_default_rules(self):
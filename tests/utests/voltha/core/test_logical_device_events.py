@@ -0,0 +1,114 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from voltha.core.logical_device_events import LogicalDeviceEvents
+from voltha.protos.logical_device_pb2 import LogicalDevice, \
+    LogicalDeviceEvent
+
+
+def ld(i):
+    return LogicalDevice(id='ld%d' % i, datapath_id=i,
+                         root_device_id='olt%d' % i)
+
+
+class TestLogicalDeviceEvents(TestCase):
+
+    def setUp(self):
+        self.events = LogicalDeviceEvents(history=4, queue_depth=3)
+        self.current = [ld(1), ld(2)]
+
+    def watch(self, resync_token=''):
+        return self.events.watch(resync_token, lambda: self.current)
+
+    def assertEvent(self, event, event_type, *ids):
+        self.assertEqual(event.type, event_type)
+        self.assertEqual([d.id for d in event.logical_devices], list(ids))
+
+    def test_new_watcher_gets_snapshot(self):
+        queue = self.watch()
+        snapshot, = queue.get_batch()
+        self.assertEvent(snapshot, LogicalDeviceEvent.SNAPSHOT, 'ld1', 'ld2')
+        self.assertEqual(snapshot.logical_devices[1].datapath_id, 2)
+        self.assertEqual(snapshot.resync_token, self.events.resync_token())
+
+    def test_watchers_get_deltas(self):
+        queues = [self.watch(), self.watch()]
+        for queue in queues:
+            queue.get_batch()
+        self.events.added(ld(3))
+        self.events.removed(ld(1))
+        for queue in queues:
+            added, removed = queue.get_batch()
+            self.assertEvent(added, LogicalDeviceEvent.ADDED, 'ld3')
+            self.assertEvent(removed, LogicalDeviceEvent.REMOVED, 'ld1')
+            self.assertNotEqual(added.resync_token, removed.resync_token)
+
+    def test_only_summary_is_sent(self):
+        queue = self.watch()
+        queue.get_batch()
+        device = ld(3)
+        device.desc.mfr_desc = 'acme'
+        self.events.added(device)
+        added, = queue.get_batch()
+        self.assertEqual(added.logical_devices[0], ld(3))
+
+    def test_resume_with_token_replays_missed_events(self):
+        queue = self.watch()
+        token = queue.get_batch()[0].resync_token
+        self.events.unwatch(queue)
+        self.events.added(ld(3))
+        self.events.removed(ld(2))
+        added, removed = self.watch(token).get_batch()
+        self.assertEvent(added, LogicalDeviceEvent.ADDED, 'ld3')
+        self.assertEvent(removed, LogicalDeviceEvent.REMOVED, 'ld2')
+
+    def test_resume_with_current_token_sends_nothing(self):
+        self.events.added(ld(3))
+        queue = self.watch(self.events.resync_token())
+        self.assertEqual(len(queue), 0)
+
+    def test_resume_with_expired_token_sends_snapshot(self):
+        token = self.events.resync_token()
+        for i in xrange(5):  # history only keeps 4 events
+            self.events.added(ld(10 + i))
+        snapshot, = self.watch(token).get_batch()
+        self.assertEvent(snapshot, LogicalDeviceEvent.SNAPSHOT, 'ld1', 'ld2')
+
+    def test_resume_with_foreign_token_sends_snapshot(self):
+        other = LogicalDeviceEvents()
+        other.added(ld(3))
+        for token in (other.resync_token(), 'garbage', '{}:99'.format(
+                self.events.epoch)):
+            snapshot, = self.watch(token).get_batch()
+            self.assertEqual(snapshot.type, LogicalDeviceEvent.SNAPSHOT)
+
+    def test_slow_watcher_is_cut_loose(self):
+        queue = self.watch()
+        for i in xrange(3):
+            self.events.added(ld(10 + i))
+        self.assertTrue(queue.closed)
+        self.assertNotIn(queue, self.events.watchers)
+
+    def test_close_releases_watchers(self):
+        queue = self.watch()
+        self.events.close()
+        self.assertTrue(queue.closed)
+        self.assertEqual(self.events.watchers, set())
+
+
+if __name__ == '__main__':
+    main()
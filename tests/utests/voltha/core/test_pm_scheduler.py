@@ -0,0 +1,162 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from mock import patch
+from twisted.internet.defer import Deferred, fail
+from twisted.internet.task import Clock
+
+from voltha.core import pm_scheduler
+from voltha.core.pm_scheduler import PmScheduler
+from voltha.protos import third_party
+from voltha.protos.device_pb2 import PmConfigs, PmConfig, PmGroupConfig
+
+_ = third_party
+
+
+class TestPmScheduler(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch.object(pm_scheduler, 'reactor', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.events = []
+        self.scheduler = PmScheduler(dict(tick=1),
+                                     submit=self.events.append).start()
+        self.addCleanup(self.scheduler.stop)
+        self.collections = []  # (device id, time) of the collections
+
+    def collector(self, result=None):
+        def collect(device_id):
+            self.collections.append((device_id, self.clock.seconds()))
+            return result if result is not None else \
+                {'': {'cpu': 1.0}, 'nni': {'rx': 2.0, 'tx': 3.0}}
+        return collect
+
+    def register(self, device_id, phase, collect=None, **kw):
+        with patch.object(pm_scheduler.random, 'uniform',
+                          lambda a, b: phase):
+            self.scheduler.register('olt', device_id,
+                                    collect or self.collector(), **kw)
+
+    def advance(self, seconds):
+        for _ in xrange(seconds):
+            self.clock.advance(1)
+
+    def test_collections_are_spread_over_the_interval(self):
+        self.register('d1', phase=2)
+        self.register('d2', phase=7)
+        self.advance(30)
+        self.assertEqual(self.collections, [
+            ('d1', 2), ('d2', 7), ('d1', 17), ('d2', 22)])
+
+    def test_one_event_per_tick_per_adapter(self):
+        self.register('d1', phase=1)
+        self.register('d2', phase=1)
+        self.scheduler.register('onu', 'd3', self.collector(),
+                                PmConfigs(default_freq=10))
+        self.advance(1)
+        self.assertEqual(len(self.events), 2)
+        olt_event, = [event for event in self.events
+                      if 'voltha.olt.d1' in event.prefixes]
+        self.assertEqual(sorted(olt_event.prefixes), [
+            'voltha.olt.d1', 'voltha.olt.d1.nni',
+            'voltha.olt.d2', 'voltha.olt.d2.nni'])
+        self.assertEqual(
+            dict(olt_event.prefixes['voltha.olt.d2.nni'].metrics),
+            {'rx': 2.0, 'tx': 3.0})
+
+    def test_pm_configs_are_honored(self):
+        self.register('d1', phase=1, pm_configs=PmConfigs(
+            default_freq=50, metrics=[PmConfig(name='rx', enabled=False),
+                                      PmConfig(name='tx', enabled=True)]))
+        self.register('d2', phase=1, pm_configs=PmConfigs(
+            default_freq=50, grouped=True, groups=[
+                PmGroupConfig(group_name='nni', enabled=False)]))
+        self.advance(6)
+        self.assertEqual([t for _, t in self.collections], [1, 1, 6, 6])
+        prefixes = self.events[0].prefixes
+        self.assertEqual(sorted(prefixes), [
+            'voltha.olt.d1', 'voltha.olt.d1.nni', 'voltha.olt.d2'])
+        self.assertEqual(dict(prefixes['voltha.olt.d1.nni'].metrics),
+                         {'tx': 3.0})
+
+        # new frequency, new phase; 0 stops the collection
+        with patch.object(pm_scheduler.random, 'uniform', lambda a, b: 3):
+            self.scheduler.update('d1', PmConfigs(default_freq=200))
+        self.scheduler.update('d2', PmConfigs(default_freq=0))
+        del self.collections[:]
+        self.advance(30)
+        self.assertEqual(self.collections, [('d1', 9), ('d1', 29)])
+
+    def test_slow_collections_are_not_stacked(self):
+        pending = []
+
+        def collect(device_id):
+            pending.append(Deferred())
+            return pending[-1]
+
+        self.register('d1', phase=0, collect=collect,
+                      pm_configs=PmConfigs(default_freq=10))
+        self.advance(3)
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(self.scheduler.statistics()['overruns'], 2)
+        pending[0].callback({'': {'cpu': 1.0}})
+        self.advance(1)
+        self.assertEqual(len(pending), 2)
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.scheduler.statistics()['collected'], 1)
+
+    def test_errors_and_unregistration(self):
+        self.register('d1', phase=0, collect=lambda _: fail(ValueError()))
+        self.register('d2', phase=0)
+        self.advance(1)
+        self.scheduler.unregister('d2')
+        self.advance(30)
+        stats = self.scheduler.statistics()
+        self.assertEqual((stats['devices'], stats['errors'],
+                          stats['collected']), (1, 3, 1))
+        self.assertEqual(self.collections, [('d2', 1)])
+
+    def test_malformed_metrics(self):
+        self.register('d1', phase=0, collect=self.collector(
+            {'nni': {'rx': 2.0}, 'pon': None}))
+        self.register('d2', phase=0, collect=self.collector({'nni': 5}))
+        self.advance(1)
+        self.assertEqual(self.events[0].prefixes.keys(), ['voltha.olt.d1.nni'])
+        stats = self.scheduler.statistics()
+        self.assertEqual((stats['errors'], stats['collected']), (1, 1))
+        # and d2 is not stuck as busy
+        self.advance(15)
+        self.assertEqual(self.scheduler.statistics()['overruns'], 0)
+
+    def test_blocking_collectors_run_on_the_thread_pool(self):
+        done = Deferred()
+        self.register('d1', phase=0, blocking=True)
+        with patch.object(pm_scheduler, 'deferToThreadPool') as defer:
+            defer.return_value = done
+            self.advance(1)
+            _, thread_pool, collect, device_id = defer.call_args[0]
+        self.assertIs(thread_pool, self.scheduler.thread_pool)
+        self.assertEqual(self.collections, [])
+        done.callback(collect(device_id))
+        self.advance(1)
+        self.assertEqual(len(self.events), 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import threading
+from time import sleep
+from unittest import TestCase, main
+
+from concurrent import futures
+from mock import patch
+
+from voltha.core import profiler
+from voltha.core.profiler import SamplingProfiler
+
+
+def spin(stop):
+    while not stop.is_set():
+        for _ in xrange(10000):
+            pass
+
+
+class TestSamplingProfiler(TestCase):
+
+    def setUp(self):
+        self.profiler = SamplingProfiler(interval=0.001)
+        self.stop = threading.Event()
+        self.addCleanup(self.stop.set)
+
+    def spin_in(self, thread_name):
+        thread = threading.Thread(target=spin, args=(self.stop,),
+                                  name=thread_name)
+        thread.daemon = True
+        thread.start()
+
+        def stop():
+            self.stop.set()
+            thread.join()
+
+        self.addCleanup(stop)
+        sleep(0.01)  # for it to get to spin()
+        return thread
+
+    def test_profile_before_start(self):
+        profile = self.profiler.profile()
+        self.assertFalse(profile.running)
+        self.assertEqual(profile.ticks, 0)
+
+    def test_stacks_and_functions(self):
+        self.spin_in('spinner')
+        for _ in xrange(20):
+            self.profiler.sample()
+        profile = self.profiler.profile()
+        self.assertEqual(profile.ticks, 20)
+
+        # the spinner is sometimes caught in Event.is_set()
+        spinner = [s for s in profile.stacks if '(spin)' in s.frames]
+        self.assertEqual(sum(s.samples for s in spinner), 20)
+        for stack in spinner:
+            self.assertEqual(stack.thread_group, 'other')
+            self.assertIn('(__bootstrap)', stack.frames.split(';')[0])
+
+        spin_function, = [f for f in profile.functions
+                          if f.function.endswith('(spin)')]
+        self.assertGreater(spin_function.self_ms, 0)
+        self.assertGreaterEqual(spin_function.total_ms, spin_function.self_ms)
+        bootstrap = [f for f in profile.functions
+                     if f.function.endswith('(__bootstrap)')]
+        self.assertTrue(all(f.self_ms == 0 for f in bootstrap))
+
+    def test_thread_groups(self):
+        pool = futures.ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown, False)
+        pool.submit(spin, self.stop)
+        sleep(0.05)
+        with patch.object(profiler.threadable, 'ioThread',
+                          threading.current_thread().ident):
+            self.profiler.sample()
+        groups = set(s.thread_group for s in self.profiler.profile().stacks)
+        self.assertEqual(groups, {'reactor', 'grpc'})
+
+    def test_start_and_stop(self):
+        self.spin_in('spinner')
+        self.assertTrue(self.profiler.start())
+        self.assertFalse(self.profiler.start())
+        sleep(0.05)
+        self.assertTrue(self.profiler.profile().running)
+        profile = self.profiler.stop()
+        self.assertFalse(profile.running)
+        self.assertFalse(self.profiler.running)
+        self.assertGreater(profile.ticks, 0)
+        self.assertEqual(profile.interval_ms, 1)
+
+    def test_stops_after_max_duration(self):
+        self.profiler.start(max_duration=0.02)
+        self.profiler.thread.join(1)
+        self.assertFalse(self.profiler.running)
+        self.assertFalse(self.profiler.profile().running)
+
+    def test_max_stacks(self):
+        self.profiler.max_stacks = 1
+        self.spin_in('spinner')
+        self.spin_in('spinner')
+        self.profiler.sample()
+        self.assertEqual(len(self.profiler.samples), 1)
+        self.assertGreater(self.profiler.dropped, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+In-memory stand-in for the consul k/v store, as used through
+consul.twisted.Consul().kv, for the coordination tests
+"""
+from twisted.internet.defer import Deferred, succeed
+
+
+class FakeConsulKv(object):
+    """
+    Answers the queries like consul does, blocking queries included, but
+    only after an induced latency, on the given (fake) twisted clock. A
+    query is answered with the data as it is when the answer is sent.
+    """
+
+    def __init__(self, clock, latency=0.05):
+        self.clock = clock
+        self.latency = latency
+        self.index = 1  # X-Consul-Index
+        self.data = {}  # key -> entry
+        self.blocked = []  # (key, recurse, deferred) of the blocking queries
+        self.queries = 0  # number of get() calls
+
+    def get(self, key, index=None, recurse=False):
+        self.queries += 1
+        d = Deferred()
+        if index and index >= self.index:
+            self.blocked.append((key, recurse, d))
+        else:
+            self._answer(key, recurse, d)
+        return d
+
+    def put(self, key, value):
+        self.index += 1
+        entry = self.data.get(key)
+        self.data[key] = dict(
+            Key=key, Value=value,
+            CreateIndex=entry['CreateIndex'] if entry else self.index,
+            ModifyIndex=self.index)
+        self._changed(key)
+        return succeed(True)
+
+    def delete(self, key, recurse=False):
+        keys = [k for k in self.data
+                if k == key or (recurse and k.startswith(key))]
+        if keys:
+            self.index += 1
+            for k in keys:
+                del self.data[k]
+                self._changed(k)
+        return succeed(True)
+
+    def _answer(self, key, recurse, d):
+
+        def answer():
+            if recurse:
+                result = [dict(entry) for k, entry in sorted(
+                    self.data.iteritems()) if k.startswith(key)] or None
+            else:
+                entry = self.data.get(key)
+                result = dict(entry) if entry is not None else None
+            d.callback((self.index, result))
+
+        self.clock.callLater(self.latency, answer)
+
+    def _changed(self, changed_key):
+        """Release the blocking queries watching changed_key"""
+        blocked = []
+        for key, recurse, d in self.blocked:
+            if changed_key == key or (recurse and changed_key.startswith(key)):
+                self._answer(key, recurse, d)
+            else:
+                blocked.append((key, recurse, d))
+        self.blocked = blocked
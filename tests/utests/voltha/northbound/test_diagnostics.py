@@ -0,0 +1,56 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from twisted.internet.task import Clock
+
+from voltha.northbound.diagnostics import ReactorLagProbe
+
+
+class TestReactorLagProbe(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.probe = ReactorLagProbe(interval=0.1, clock=self.clock)
+        self.probe.start()
+
+    def test_no_lag(self):
+        for _ in xrange(10):
+            self.clock.advance(0.1)
+        self.assertEqual(self.probe.samples, 10)
+        self.assertEqual(self.probe.statistics(),
+                         {'avg-ms': 0.0, 'max-ms': 0.0})
+
+    def test_lag(self):
+        self.clock.advance(0.1)
+        self.clock.advance(0.3)  # the reactor was blocked for 200ms
+        stats = self.probe.statistics()
+        self.assertAlmostEqual(stats['max-ms'], 200)
+        self.assertAlmostEqual(stats['avg-ms'], 100)
+
+    def test_statistics_start_over(self):
+        self.clock.advance(0.5)
+        self.probe.statistics()
+        self.assertEqual(self.probe.statistics(),
+                         {'avg-ms': 0.0, 'max-ms': 0.0})
+
+    def test_stop(self):
+        self.probe.stop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from google.protobuf.json_format import MessageToDict
+from mock import patch
+from simplejson import dumps, loads
+from twisted.internet.task import Clock
+
+from common.utils.kpi_decoder import KpiDecoder
+from voltha.northbound.kafka import kpi_compactor
+from voltha.northbound.kafka.kpi_compactor import KpiCompactor
+from voltha.protos import third_party
+from voltha.protos.events_pb2 import KpiEvent, KpiEventType, \
+    MetricValuePairs
+
+_ = third_party
+
+
+def kpi_slice(ts, **prefixes):
+    return KpiEvent(type=KpiEventType.slice, ts=ts, prefixes=dict(
+        (prefix, MetricValuePairs(metrics=metrics))
+        for prefix, metrics in prefixes.iteritems()))
+
+
+def as_json(kpi_event):
+    # as done by the event bus publisher and then by the consumers
+    return loads(dumps(MessageToDict(kpi_event, True, True)))
+
+
+class TestKpiCompactor(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch.object(kpi_compactor, 'reactor', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.events = []
+        self.compactor = KpiCompactor(self.events.append, dict(
+            flush_interval=60, max_samples=3, schema_refresh=2)).start()
+        self.addCleanup(self.compactor.stop)
+        self.decoder = KpiDecoder()
+
+    def decode(self):
+        slices = []
+        for kpi_event in self.events:
+            slices.extend(self.decoder.decode(as_json(kpi_event)))
+        del self.events[:]
+        return [(s['ts'], dict((prefix, pairs['metrics'])
+                               for prefix, pairs in s['prefixes'].iteritems()))
+                for s in slices]
+
+    def test_round_trip(self):
+        self.compactor.add(kpi_slice(
+            10, olt={'cpu': 1.0}, nni={'rx': 1.0, 'tx': 2.0}))
+        self.compactor.add(kpi_slice(
+            20, olt={'cpu': 1.0}, nni={'rx': 5.0, 'tx': 2.0}))
+        self.compactor.add(kpi_slice(30, nni={'rx': 5.0, 'tx': 2.0}))
+        self.assertEqual(len(self.events), 1)  # 3 samples of nni
+        kpi_event = self.events[0]
+        self.assertEqual(kpi_event.type, KpiEventType.ts)
+        schemas = dict((s.prefix, s) for s in kpi_event.schemas)
+        self.assertEqual(sorted(schemas), ['nni', 'olt'])
+        self.assertEqual(list(schemas['nni'].metrics), ['rx', 'tx'])
+        nni, = [series for series in kpi_event.series
+                if series.schema == schemas['nni'].id]
+        self.assertEqual([(list(s.changed), list(s.values))
+                          for s in nni.samples],
+                         [([], [1.0, 2.0]), ([0], [5.0]), ([], [])])
+        self.assertEqual(self.decode(), [
+            (10, {'olt': {'cpu': 1.0}, 'nni': {'rx': 1.0, 'tx': 2.0}}),
+            (20, {'olt': {'cpu': 1.0}, 'nni': {'rx': 5.0, 'tx': 2.0}}),
+            (30, {'nni': {'rx': 5.0, 'tx': 2.0}})])
+
+    def test_full_series_and_schema_refresh(self):
+        for ts in xrange(7):
+            self.compactor.add(kpi_slice(ts, olt={'cpu': float(ts)}))
+        self.assertEqual(len(self.events), 2)  # 3 samples each
+        self.compactor.stop()
+        self.assertEqual([len(e.schemas) for e in self.events], [1, 0, 1])
+        self.assertEqual([len(e.series[0].samples) for e in self.events],
+                         [3, 3, 1])
+
+        # a consumer joining late waits for the schema
+        decoder = KpiDecoder()
+        self.assertEqual(decoder.decode(as_json(self.events[1])), [])
+        self.assertEqual(decoder.dropped, 3)
+        self.assertEqual(len(decoder.decode(as_json(self.events[2]))), 1)
+
+    def test_new_schema_when_the_metrics_change(self):
+        self.compactor.add(kpi_slice(1, nni={'rx': 1.0, 'tx': 2.0}))
+        self.compactor.add(kpi_slice(2, nni={'tx': 3.0}))  # rx disabled
+        self.assertEqual(len(self.events), 1)
+        self.clock.advance(60)
+        self.assertEqual([e.series[0].schema for e in self.events], [1, 2])
+        self.assertEqual(self.decode(), [
+            (1, {'nni': {'rx': 1.0, 'tx': 2.0}}), (2, {'nni': {'tx': 3.0}})])
+
+    def test_slices_are_left_to_consumers_as_they_are(self):
+        decoder = KpiDecoder()
+        msg = as_json(kpi_slice(1, olt={'cpu': 1.0}))
+        self.assertEqual(decoder.decode(msg), [msg])
+        self.assertRaises(ValueError, decoder.decode, {'type': 'gauge'})
+
+    def test_prefixes_without_the_values(self):
+        self.compactor.add(kpi_slice(1, nni={'rx': 1.0, 'tx': 2.0}))
+        self.compactor.flush()
+        self.assertEqual(self.decoder.prefixes(as_json(self.events[0])),
+                         {'nni': ['rx', 'tx']})
+        msg = as_json(kpi_slice(1, olt={'cpu': 1.0}))
+        self.assertEqual(self.decoder.prefixes(msg), {'olt': ['cpu']})
+
+    def test_fewer_bytes_than_slices(self):
+        compactor = KpiCompactor(self.events.append, dict(max_samples=8))
+        slices = [kpi_slice(ts, **dict(
+            ('voltha.olt.0001.pon%d' % pon, {'rx_bytes': float(pon * ts),
+                                             'tx_bytes': 1.0e6,
+                                             'rx_packets': float(ts),
+                                             'tx_packets': 1.0e3})
+            for pon in xrange(16))) for ts in xrange(8)]
+        for kpi_slice_ in slices:
+            compactor.add(kpi_slice_)
+        self.assertEqual(len(self.events), 1)
+        self.assertLess(self.events[0].ByteSize() * 2,
+                        sum(s.ByteSize() for s in slices))
+        self.assertLess(
+            len(dumps(MessageToDict(self.events[0], True, True))) * 3 / 2,
+            sum(len(dumps(MessageToDict(s, True, True))) for s in slices))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from unittest import TestCase, main
+
+from mock import Mock, patch
+from twisted.internet.defer import succeed, fail, Deferred
+from twisted.internet.task import Clock, deferLater
+
+from tests.utests.voltha.fake_consul import FakeConsulKv
+from voltha import consul_watcher, worker
+from voltha.consul_watcher import ConsulWatcher
+from voltha.worker import Worker
+
+LATENCY = 0.05
+WORK = 'service/voltha/work/'
+
+
+class TestConsulWatcher(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch.object(
+            consul_watcher, 'asleep',
+            lambda dt: deferLater(self.clock, dt, lambda: None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.kv = FakeConsulKv(self.clock, LATENCY)
+        self.watcher = ConsulWatcher(self.kv.get)
+        for i in xrange(3):
+            self.kv.put(WORK + 'w%d' % i, 'work %d' % i)
+
+    def subscribe(self, prefix=WORK):
+        calls = []
+        self.watcher.subscribe(
+            prefix, lambda updated, removed: calls.append((updated, removed)))
+        return calls
+
+    def settle(self):
+        self.clock.advance(LATENCY)
+
+    def test_subscribers_share_queries(self):
+        calls = [self.subscribe(), self.subscribe()]
+        self.settle()
+        for c in calls:
+            self.assertEqual(c, [({'w0': 'work 0', 'w1': 'work 1',
+                                   'w2': 'work 2'}, set())])
+        self.assertEqual(self.kv.queries, 2)  # the initial one and a blocking
+        self.assertEqual(len(self.kv.blocked), 1)
+
+    def test_only_deltas_are_delivered(self):
+        calls = self.subscribe()
+        self.settle()
+        del calls[:]
+        self.kv.put(WORK + 'w3', 'work 3')
+        self.settle()
+        self.kv.put(WORK + 'w0', 'new work 0')
+        self.settle()
+        self.kv.delete(WORK + 'w1')
+        self.settle()
+        self.kv.put('service/voltha/members/m1', 'alive')
+        self.settle()
+        self.assertEqual(calls, [
+            ({'w3': 'work 3'}, set()),
+            ({'w0': 'new work 0'}, set()),
+            ({}, {'w1'})])
+        self.assertEqual(self.watcher.get(WORK)['w0'], 'new work 0')
+
+    def test_changes_during_latency_are_coalesced(self):
+        calls = self.subscribe()
+        self.settle()
+        del calls[:]
+        self.kv.put(WORK + 'w3', 'work 3')
+        self.clock.advance(LATENCY / 2)
+        self.kv.put(WORK + 'w4', 'work 4')
+        self.kv.delete(WORK + 'w0')
+        self.settle()
+        self.assertEqual(calls, [
+            ({'w3': 'work 3', 'w4': 'work 4'}, {'w0'})])
+
+    def test_late_subscriber_gets_the_mirror(self):
+        self.subscribe()
+        self.settle()
+        queries = self.kv.queries
+        calls = self.subscribe()
+        self.assertEqual(calls, [({'w0': 'work 0', 'w1': 'work 1',
+                                   'w2': 'work 2'}, set())])
+        self.assertEqual(self.kv.queries, queries)
+
+    def test_empty_prefix(self):
+        calls = self.subscribe('service/voltha/members/')
+        self.settle()
+        self.assertEqual(calls, [({}, set())])
+
+    def test_watch_ends_with_last_subscriber(self):
+        callback = Mock()
+        self.watcher.subscribe(WORK, callback)
+        self.settle()
+        self.watcher.unsubscribe(WORK, callback)
+        self.kv.put(WORK + 'w3', 'work 3')
+        self.settle()
+        self.assertEqual(callback.call_count, 1)
+        self.assertEqual(self.kv.blocked, [])
+        self.assertEqual(self.watcher.get(WORK), None)
+
+    def test_errors_are_retried(self):
+        results = [fail(Exception('boom')), succeed((5, [])), Deferred()]
+        calls = []
+        watcher = ConsulWatcher(lambda *args, **kw: results.pop(0),
+                                error_delay=2)
+        watcher.subscribe(WORK, lambda *args: calls.append(args))
+        self.assertEqual(calls, [])
+        self.clock.advance(2)
+        self.assertEqual(calls, [({}, set())])
+        watcher.stop()
+
+
+class TestWorker(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        for module in (consul_watcher, worker):
+            patcher = patch.object(
+                module, 'asleep',
+                lambda dt: deferLater(self.clock, dt, lambda: None))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(worker, 'reactor', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.kv = FakeConsulKv(self.clock, LATENCY)
+        self.watcher = ConsulWatcher(self.kv.get)
+        self.coord = Mock(
+            assignment_prefix='service/voltha/assignments/',
+            worker_config={'time_to_let_leader_update': 5},
+            watch=self.watcher.subscribe,
+            unwatch=self.watcher.unsubscribe,
+            wait_for_a_leader=lambda: succeed('leader'))
+        self.worker = Worker('me', self.coord)
+
+    def assign(self, member, work):
+        self.kv.put(self.coord.assignment_prefix + member + '/' + work, '')
+
+    def test_assignments_are_tracked(self):
+        self.assign('me', 'w1')
+        self.assign('me', 'w2')
+        self.assign('mem', 'w3')  # not a prefix match
+        self.worker.start()
+        self.clock.advance(0)
+        self.clock.advance(LATENCY)
+        self.clock.advance(self.worker.soak_time)
+        self.assertEqual(self.worker.my_workload, {'w1', 'w2'})
+
+        self.kv.delete(self.coord.assignment_prefix + 'me/w1')
+        self.assign('me', 'w4')
+        self.clock.advance(LATENCY)
+        self.clock.advance(self.worker.soak_time)
+        self.assertEqual(self.worker.my_workload, {'w2', 'w4'})
+
+        self.worker.stop()
+        self.assign('me', 'w5')
+        self.clock.advance(LATENCY)
+        self.clock.advance(self.worker.soak_time)
+        self.assertEqual(self.worker.my_workload, {'w2', 'w4'})
+
+
+if __name__ == '__main__':
+    main()
@@ -143,11 +143,16 @@ class IAdapterInterface(Interface):
 
     def update_flows_incrementally(device, flow_changes, group_changes):
         """
-        [This mode is not supported yet.]
+        Called after any flow table change, but only if the device supports
+        incremental mode, which is expressed by the
+        'accepts_add_remove_flow_updates' capability attribute of the device
+        type. Only the flows and groups removed and added since the previous
+        call are passed. A changed flow or group is passed as removed and
+        then added back, so removals shall be applied first.
         :param device: A Voltha.Device object.
-        :param flow_changes:
-        :param group_changes:
-        :return:
+        :param flow_changes: An openflow_v13.FlowChanges object
+        :param group_changes: An openflow_v13.FlowGroupChanges object
+        :return: (Deferred or None)
         """
 
     def update_pm_config(device, pm_configs):
@@ -20,18 +20,27 @@ In this initial simple implementation we scan all subdirs in this directory,
 look for a python module with the same name as the subdir, and if module
 has a class that implements the IAdapterInterface, instantiate class and
 add it to plugins.
+
+If the loader is configured to be lazy, it only registers the device types
+listed in the adapter manifest (see manifest.yml) at startup, and imports
+and starts an adapter when the first device of one of its types is
+provisioned (see load_agent). This keeps the adapters, and everything they
+pull in, out of the startup path.
 """
 import os
 
 import structlog
-from twisted.internet.defer import inlineCallbacks, returnValue
+from twisted.internet.defer import Deferred, inlineCallbacks, returnValue, \
+    succeed
+from twisted.python.failure import Failure
 from zope.interface import implementer
 from zope.interface.verify import verifyClass
 
 from voltha.adapters.interface import IAdapterInterface
+from voltha.adapters.manifest import load_manifest
 from voltha.core.adapter_agent import AdapterAgent
 from voltha.protos import third_party
-from voltha.registry import IComponent
+from voltha.registry import IComponent, registry
 
 log = structlog.get_logger()
 
@@ -44,15 +53,22 @@ class AdapterLoader(object):
 
     def __init__(self, config):
         self.config = config
+        self.lazy = config.get('lazy', False)
         self.adapter_agents = {}  # adapter-name -> adapter instance
+        self.loading = {}  # adapter-name -> [Deferred] waiting for agent
 
     @inlineCallbacks
     def start(self):
-        log.debug('starting')
-        for adapter_name, adapter_class in self._find_adapters():
-            agent = AdapterAgent(adapter_name, adapter_class)
-            yield agent.start()
-            self.adapter_agents[adapter_name] = agent
+        log.debug('starting', lazy=self.lazy)
+        if self.lazy:
+            for entry in load_manifest().itervalues():
+                if entry.eager:
+                    yield self.load_agent(entry.name)
+                else:
+                    self._register_device_types(entry.device_types)
+        else:
+            for adapter_name, adapter_class in self._find_adapters():
+                yield self._start_agent(adapter_name, adapter_class)
         log.info('started')
         returnValue(self)
 
@@ -67,6 +83,67 @@ class AdapterLoader(object):
     def get_agent(self, adapter_name):
         return self.adapter_agents[adapter_name]
 
+    def load_agent(self, adapter_name):
+        """
+        Get the agent of an adapter, loading and starting the adapter if
+        it is not running yet.
+        :param adapter_name: name of the adapter
+        :return: Deferred firing with the AdapterAgent
+        """
+        agent = self.adapter_agents.get(adapter_name)
+        if agent is not None:
+            return succeed(agent)
+
+        d = Deferred()
+        waiting = self.loading.get(adapter_name)
+        if waiting is not None:
+            waiting.append(d)  # adapter is being loaded already
+        else:
+            self.loading[adapter_name] = [d]
+            self._start_agent(adapter_name).addBoth(
+                self._agent_loaded, adapter_name)
+        return d
+
+    def _agent_loaded(self, result, adapter_name):
+        for d in self.loading.pop(adapter_name):
+            if isinstance(result, Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+    @inlineCallbacks
+    def _start_agent(self, adapter_name, adapter_class=None):
+        if adapter_class is None:
+            log.info('loading-adapter', adapter_name=adapter_name)
+            adapter_class = self._load_adapter_class(adapter_name)
+        agent = AdapterAgent(adapter_name, adapter_class)
+        yield agent.start()
+        self.adapter_agents[adapter_name] = agent
+        returnValue(agent)
+
+    def _register_device_types(self, device_types):
+        root_proxy = registry('core').get_proxy('/')
+        for device_type in device_types:
+            path = '/device_types/' + device_type.id
+            try:
+                root_proxy.get(path)
+                root_proxy.update(path, device_type)
+            except KeyError:
+                root_proxy.add('/device_types', device_type)
+
+    def _load_adapter_class(self, adapter_name):
+        package_name = __package__ + '.' + adapter_name
+        pkg = __import__(package_name, None, None, [adapter_name])
+        module = getattr(pkg, adapter_name)
+        for attr_name in dir(module):
+            cls = getattr(module, attr_name)
+            if isinstance(cls, type) and \
+                    IAdapterInterface.implementedBy(cls):
+                verifyClass(IAdapterInterface, cls)
+                return cls
+        raise ImportError(
+            'no adapter class in {}'.format(module.__name__))
+
     def _find_adapters(self):
         subdirs = os.walk(mydir).next()[1]
         for subdir in subdirs:
@@ -75,18 +152,10 @@ class AdapterLoader(object):
                 py_file = os.path.join(mydir, subdir, subdir + '.py')
                 if os.path.isfile(py_file):
                     try:
-                        package_name = __package__ + '.' + subdir
-                        pkg = __import__(package_name, None, None, [adapter_name])
-                        module = getattr(pkg, adapter_name)
+                        cls = self._load_adapter_class(adapter_name)
                     except ImportError, e:
                         log.exception('cannot-load', file=py_file, e=e)
                         continue
-
-                    for attr_name in dir(module):
-                        cls = getattr(module, attr_name)
-                        if isinstance(cls, type) and \
-                                IAdapterInterface.implementedBy(cls):
-                            verifyClass(IAdapterInterface, cls)
-                            yield adapter_name, cls
+                    yield adapter_name, cls
             except Exception, e:
                 log.exception('failed', e=e)
@@ -0,0 +1,61 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Adapter manifest: what the AdapterLoader needs to know about an adapter
+before importing it.
+"""
+import os
+from collections import OrderedDict
+
+import yaml
+
+from voltha.protos import third_party
+from voltha.protos.device_pb2 import DeviceType
+
+_ = third_party
+
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'manifest.yml')
+
+
+class AdapterManifestEntry(object):
+
+    def __init__(self, name, device_types, eager=False):
+        """
+        :param name: adapter name, same as its package under voltha/adapters
+        :param device_types: list of DeviceType the adapter handles
+        :param eager: if True, the adapter is loaded at startup
+        """
+        self.name = name
+        self.device_types = device_types
+        self.eager = eager
+
+
+def load_manifest(path=MANIFEST_FILE):
+    """
+    :return: OrderedDict of adapter name -> AdapterManifestEntry
+    """
+    with open(path) as f:
+        data = yaml.safe_load(f) or {}
+    manifest = OrderedDict()
+    for name in sorted(data):
+        spec = data[name]
+        device_types = [DeviceType(adapter=name, **device_type)
+                        for device_type in spec.get('device_types', [])]
+        manifest[name] = AdapterManifestEntry(
+            name, device_types, bool(spec.get('eager', False)))
+    return manifest
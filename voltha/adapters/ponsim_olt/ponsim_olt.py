@@ -19,7 +19,6 @@ Fully simulated OLT/ONU adapter.
 """
 from uuid import uuid4
 
-import arrow
 import grpc
 import json
 import structlog
@@ -31,7 +30,6 @@ from zope.interface import implementer
 
 from common.frameio.frameio import BpfProgramFilter, hexify
 from common.utils.asleep import asleep
-from twisted.internet.task import LoopingCall
 from voltha.adapters.interface import IAdapterInterface
 from voltha.core.logical_device_agent import mac_str_to_tuple
 from voltha.protos import third_party
@@ -42,7 +40,6 @@ from voltha.protos.common_pb2 import LogLevel, OperStatus, ConnectStatus, \
     AdminState
 from voltha.protos.device_pb2 import DeviceType, DeviceTypes, Port, Device, \
     PmConfig, PmConfigs
-from voltha.protos.events_pb2 import KpiEvent, KpiEventType, MetricValuePairs
 from voltha.protos.health_pb2 import HealthStatus
 from google.protobuf.empty_pb2 import Empty
 
@@ -81,7 +78,6 @@ class AdapterPmMetrics:
         self.freq_override = False
         self.pon_metrics_config = dict()
         self.nni_metrics_config = dict()
-        self.lc = None
         for m in self.pm_names:
             self.pon_metrics_config[m] = PmConfig(name=m,
                                                   type=PmConfig.COUNTER,
@@ -91,11 +87,9 @@ class AdapterPmMetrics:
                                                   enabled=True)
 
     def update(self, pm_config):
-        if self.default_freq != pm_config.default_freq:
-            # Update the callback to the new frequency.
-            self.default_freq = pm_config.default_freq
-            self.lc.stop()
-            self.lc.start(interval=self.default_freq / 10)
+        # the collection itself is scheduled (and its metrics filtered) by
+        # the core, as per the device PmConfigs
+        self.default_freq = pm_config.default_freq
         for m in pm_config.metrics:
             self.pon_metrics_config[m.name].enabled = m.enabled
             self.nni_metrics_config[m.name].enabled = m.enabled
@@ -126,8 +120,7 @@ class AdapterPmMetrics:
         for m in stats.metrics:
             if m.port_name == "pon":
                 for p in m.packets:
-                    if self.pon_metrics_config[p.name].enabled:
-                        rtrn_pon_metrics[p.name] = p.value
+                    rtrn_pon_metrics[p.name] = p.value
                 return rtrn_pon_metrics
 
     def extract_nni_metrics(self, stats):
@@ -135,17 +128,9 @@ class AdapterPmMetrics:
         for m in stats.metrics:
             if m.port_name == "nni":
                 for p in m.packets:
-                    if self.pon_metrics_config[p.name].enabled:
-                        rtrn_pon_metrics[p.name] = p.value
+                    rtrn_pon_metrics[p.name] = p.value
                 return rtrn_pon_metrics
 
-    def start_collector(self, callback):
-        log.info("starting-pm-collection", device_name=self.name,
-                 device_id=self.device.id)
-        prefix = 'voltha.{}.{}'.format(self.name, self.device.id)
-        self.lc = LoopingCall(callback, self.device.id, prefix)
-        self.lc.start(interval=self.default_freq / 10)
-
 
 class AdapterAlarms:
     def __init__(self, adapter, device):
@@ -656,34 +641,9 @@ class PonSimOltHandler(object):
         self.log.info('deleted', device_id=self.device_id)
 
     def start_kpi_collection(self, device_id):
-
-        def _collect(device_id, prefix):
-
-            try:
-                # Step 1: gather metrics from device
-                port_metrics = \
-                    self.pm_metrics.collect_port_metrics(self.get_channel())
-
-                # Step 2: prepare the KpiEvent for submission
-                # we can time-stamp them here (or could use time derived from OLT
-                ts = arrow.utcnow().timestamp
-                kpi_event = KpiEvent(
-                    type=KpiEventType.slice,
-                    ts=ts,
-                    prefixes={
-                        # OLT NNI port
-                        prefix + '.nni': MetricValuePairs(
-                            metrics=port_metrics['nni']),
-                        # OLT PON port
-                        prefix + '.pon': MetricValuePairs(
-                            metrics=port_metrics['pon'])
-                    }
-                )
-
-                # Step 3: submit
-                self.adapter_agent.submit_kpis(kpi_event)
-
-            except Exception as e:
-                log.exception('failed-to-submit-kpis', e=e)
-
-        self.pm_metrics.start_collector(_collect)
+        # GetStats is a blocking gRPC call, hence on the core's thread pool
+        self.adapter_agent.register_for_pm_collection(
+            device_id,
+            lambda _: self.pm_metrics.collect_port_metrics(self.get_channel()),
+            pm_configs=self.pm_metrics.make_proto(),
+            blocking=True)
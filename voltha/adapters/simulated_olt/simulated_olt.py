@@ -19,13 +19,12 @@ Mock device adapter for testing.
 """
 from uuid import uuid4
 
-import arrow
 import structlog
 from klein import Klein
 from scapy.layers.l2 import Ether, EAPOL, Padding
 from twisted.internet import endpoints
 from twisted.internet import reactor
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.internet.task import LoopingCall
 from twisted.web.server import Site
 from zope.interface import implementer
@@ -37,7 +36,6 @@ from voltha.core.logical_device_agent import mac_str_to_tuple
 from voltha.protos.adapter_pb2 import Adapter, AdapterConfig
 from voltha.protos.device_pb2 import DeviceType, DeviceTypes, Device, Port, \
 PmConfigs, PmConfig, PmGroupConfig
-from voltha.protos.events_pb2 import KpiEvent, KpiEventType, MetricValuePairs
 from voltha.protos.health_pb2 import HealthStatus
 from voltha.protos.common_pb2 import LogLevel, OperStatus, ConnectStatus, \
     AdminState
@@ -95,7 +93,6 @@ class AdapterPmMetrics:
         self.freq_override = False
         self.pon_metrics = dict()
         self.nni_metrics = dict()
-        self.lc = None
         for m in self.pm_names:
             self.pon_metrics[m] = \
                     self.Metrics(config = PmConfig(name=m,
@@ -107,11 +104,9 @@ class AdapterPmMetrics:
                                                    enabled=True), value = 0)
 
     def update(self, pm_config):
-        if self.default_freq != pm_config.default_freq:
-            # Update the callback to the new frequency.
-            self.default_freq = pm_config.default_freq
-            self.lc.stop()
-            self.lc.start(interval=self.default_freq/10)
+        # the collection itself is scheduled (and its metrics filtered) by
+        # the core, as per the device PmConfigs
+        self.default_freq = pm_config.default_freq
         for m in pm_config.metrics:
             self.pon_metrics[m.name].config.enabled = m.enabled
             self.nni_metrics[m.name].config.enabled = m.enabled
@@ -149,11 +144,6 @@ class AdapterPmMetrics:
                 rtrn_nni_metrics[m] = self.nni_metrics[m].value
         return rtrn_nni_metrics
 
-    def start_collector(self, device_name, device_id, callback):
-        prefix = 'voltha.{}.{}'.format(device_name, device_id)
-        self.lc = LoopingCall(callback, device_id, prefix)
-        self.lc.start(interval=self.default_freq/10)
-
 
 @implementer(IAdapterInterface)
 class SimulatedOltAdapter(object):
@@ -673,48 +663,29 @@ class SimulatedOltAdapter(object):
         import random
 
         @inlineCallbacks  # pretend that we need to do async calls
-        def _collect(device_id, prefix):
-
-            try:
-                # Step 1: gather metrics from device (pretend it here) - examples
-                # upgraded the metrics to include packet statistics for
-                # testing.
-                nni_port_metrics = self.pm_metrics.collect_nni_metrics()
-                pon_port_metrics = self.pm_metrics.collect_pon_metrics()
-
-                olt_metrics = yield dict(
-                    cpu_util=20 + 5 * random.random(),
-                    buffer_util=10 + 10 * random.random()
-                )
-
-                # Step 2: prepare the KpiEvent for submission
-                # we can time-stamp them here (or could use time derived from OLT
-                ts = arrow.utcnow().timestamp
-                kpi_event = KpiEvent(
-                    type=KpiEventType.slice,
-                    ts=ts,
-                    prefixes={
-                        # OLT-level
-                        prefix: MetricValuePairs(metrics=olt_metrics),
-                        # OLT NNI port
-                        prefix + '.nni': MetricValuePairs(
-                            metrics=nni_port_metrics),
-                        # OLT PON port
-                        prefix + '.pon': MetricValuePairs(
-                            metrics=pon_port_metrics)
-                    }
-                )
-
-                # Step 3: submit
-                self.adapter_agent.submit_kpis(kpi_event)
-
-            except Exception as e:
-                log.exception('failed-to-submit-kpis', e=e)
+        def _collect(device_id):
+            # gather metrics from device (pretend it here) - examples
+            # upgraded the metrics to include packet statistics for
+            # testing. The core takes care of the KpiEvents.
+            nni_port_metrics = self.pm_metrics.collect_nni_metrics()
+            pon_port_metrics = self.pm_metrics.collect_pon_metrics()
+
+            olt_metrics = yield dict(
+                cpu_util=20 + 5 * random.random(),
+                buffer_util=10 + 10 * random.random()
+            )
 
-        self.pm_metrics.start_collector(self.name, device_id ,_collect)
-        #prefix = 'voltha.{}.{}'.format(self.name, device_id)
-        #lc = LoopingCall(_collect, device_id, prefix)
-        #lc.start(interval=15)  # TODO make this configurable
+            returnValue({
+                # OLT-level
+                '': olt_metrics,
+                # OLT NNI port
+                'nni': nni_port_metrics,
+                # OLT PON port
+                'pon': pon_port_metrics
+            })
+
+        self.adapter_agent.register_for_pm_collection(
+            device_id, _collect, pm_configs=self.pm_metrics.make_proto())
 
     def start_alarm_simulation(self, device_id):
 
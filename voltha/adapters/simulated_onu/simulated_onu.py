@@ -63,7 +63,9 @@ class SimulatedOnuAdapter(object):
             version='0.1',
             config=AdapterConfig(log_level=LogLevel.INFO)
         )
-        self.incoming_messages = DeferredQueue()
+        # incoming proxied messages, per ONU, as ONUs get activated in
+        # parallel
+        self.incoming_messages = {}  # (olt id, channel id) -> DeferredQueue
 
     def start(self):
         log.debug('starting')
@@ -352,7 +354,14 @@ class SimulatedOnuAdapter(object):
 
     def receive_proxied_message(self, proxy_address, msg):
         # just place incoming message to a list
-        self.incoming_messages.put((proxy_address, msg))
+        self._incoming_messages(proxy_address).put((proxy_address, msg))
+
+    def _incoming_messages(self, proxy_address):
+        key = (proxy_address.device_id, proxy_address.channel_id)
+        queue = self.incoming_messages.get(key)
+        if queue is None:
+            queue = self.incoming_messages[key] = DeferredQueue()
+        return queue
 
     @inlineCallbacks
     def _simulate_message_exchange(self, device):
@@ -361,8 +370,9 @@ class SimulatedOnuAdapter(object):
         self.adapter_agent.register_for_proxied_messages(device.proxy_address)
 
         # reset incoming message queue
-        while self.incoming_messages.pending:
-            _ = yield self.incoming_messages.get()
+        incoming_messages = self._incoming_messages(device.proxy_address)
+        while incoming_messages.pending:
+            _ = yield incoming_messages.get()
 
         # construct message
         msg = 'test message'
@@ -371,7 +381,7 @@ class SimulatedOnuAdapter(object):
         self.adapter_agent.send_proxied_message(device.proxy_address, msg)
 
         # wait till we detect incoming message
-        yield self.incoming_messages.get()
+        yield incoming_messages.get()
 
         # by returning we allow the device to be shown as active, which
         # indirectly verified that message passing works
@@ -22,14 +22,13 @@ import time
 from uuid import uuid4
 import struct
 
-import arrow
 import structlog
 from scapy.fields import StrField
 from scapy.layers.l2 import Ether, Dot1Q
 from scapy.packet import Packet, bind_layers
 from twisted.internet import reactor
-from twisted.internet.defer import DeferredQueue, inlineCallbacks
-from twisted.internet.task import LoopingCall
+from twisted.internet.defer import DeferredQueue, inlineCallbacks, \
+    returnValue
 from zope.interface import implementer
 
 from common.frameio.frameio import BpfProgramFilter, hexify
@@ -58,8 +57,6 @@ from voltha.protos.common_pb2 import LogLevel, ConnectStatus
 from voltha.protos.common_pb2 import OperStatus, AdminState
 from voltha.protos.device_pb2 import Device, Port
 from voltha.protos.device_pb2 import DeviceType, DeviceTypes
-from voltha.protos.events_pb2 import KpiEvent, MetricValuePairs
-from voltha.protos.events_pb2 import KpiEventType
 from voltha.protos.health_pb2 import HealthStatus
 from voltha.protos.logical_device_pb2 import LogicalDevice, LogicalPort
 from voltha.protos.openflow_13_pb2 import ofp_desc, ofp_port, OFPPF_10GB_FD, \
@@ -926,33 +923,17 @@ class TibitOltAdapter(object):
         # This is setup (for now) to be called from the adapter.  Push
         # architectures should be explored in the near future.
         @inlineCallbacks
-        def _collect(device_id, prefix):
+        def _collect(device_id):
 
             pon_port_metrics = {}
             links = []
             olt_mac = next((mac for mac, device in self.device_ids.iteritems() if device == device_id), None)
             links   = [v[TIBIT_ONU_LINK_INDEX] for _,v,_ in self.vlan_to_device_ids.iteritems()]
 
-            try:
-                # Step 1: gather metrics from device
-                log.info('link stats frame', links=links)
-                for link in links:
-                    stats_frame = self._make_stats_frame(mac_address=olt_mac, itype='olt', link=link)
-                    self.io_port.send(stats_frame)
-
-                    ## Add timeout mechanism so we can signal if we cannot reach
-                    ## device
-                    while True:
-                        response = yield self.incoming_queues[olt_mac].get()
-                        jdict = json.loads(response.payload.payload.body.load)
-                        pon_port_metrics[link] = {k: int(v,16) for k,v in jdict['results'].iteritems()}
-                        # verify response and if not the expected response
-                        if 1: # TODO check if it is really what we expect, and wait if not
-                            break
-
-                log.info('nni stats frame')
-                olt_nni_link = ''.join(l for l in olt_mac.split(':'))
-                stats_frame = self._make_stats_frame(mac_address=olt_mac, itype='eth', link=olt_nni_link)
+            # Step 1: gather metrics from device
+            log.info('link stats frame', links=links)
+            for link in links:
+                stats_frame = self._make_stats_frame(mac_address=olt_mac, itype='olt', link=link)
                 self.io_port.send(stats_frame)
 
                 ## Add timeout mechanism so we can signal if we cannot reach
@@ -960,45 +941,47 @@ class TibitOltAdapter(object):
                 while True:
                     response = yield self.incoming_queues[olt_mac].get()
                     jdict = json.loads(response.payload.payload.body.load)
-                    nni_port_metrics = {k: int(v,16) for k,v in jdict['results'].iteritems()}
+                    pon_port_metrics[link] = {k: int(v,16) for k,v in jdict['results'].iteritems()}
                     # verify response and if not the expected response
                     if 1: # TODO check if it is really what we expect, and wait if not
                         break
 
-                olt_metrics = dict(
-                    cpu_util=20 + 5 * random.random(),
-                    buffer_util=10 + 10 * random.random()
-                )
+            log.info('nni stats frame')
+            olt_nni_link = ''.join(l for l in olt_mac.split(':'))
+            stats_frame = self._make_stats_frame(mac_address=olt_mac, itype='eth', link=olt_nni_link)
+            self.io_port.send(stats_frame)
 
-                # Step 2: prepare the KpiEvent for submission
-                # we can time-stamp them here (or could use time derived from OLT
-                ts = arrow.utcnow().timestamp
-                prefixes = {
-                    # CPU Metrics (example)
-                    prefix: MetricValuePairs(metrics=olt_metrics),
-                    # OLT NNI port
-                    prefix + '.nni': MetricValuePairs(metrics=nni_port_metrics)
-                    }
-
-                for link in links:
-                    # PON link ports
-                    prefixes[prefix + '.pon.{}'.format(link)] = MetricValuePairs(metrics=pon_port_metrics[link])
-
-                kpi_event = KpiEvent(
-                    type=KpiEventType.slice,
-                    ts=ts,
-                    prefixes=prefixes
-                )
+            ## Add timeout mechanism so we can signal if we cannot reach
+            ## device
+            while True:
+                response = yield self.incoming_queues[olt_mac].get()
+                jdict = json.loads(response.payload.payload.body.load)
+                nni_port_metrics = {k: int(v,16) for k,v in jdict['results'].iteritems()}
+                # verify response and if not the expected response
+                if 1: # TODO check if it is really what we expect, and wait if not
+                    break
+
+            olt_metrics = dict(
+                cpu_util=20 + 5 * random.random(),
+                buffer_util=10 + 10 * random.random()
+            )
+
+            # Step 2: hand them to the core, which submits the KpiEvents
+            port_metrics = {
+                # CPU Metrics (example)
+                '': olt_metrics,
+                # OLT NNI port
+                'nni': nni_port_metrics
+                }
 
-                # Step 3: submit
-                self.adapter_agent.submit_kpis(kpi_event)
+            for link in links:
+                # PON link ports
+                port_metrics['pon.{}'.format(link)] = pon_port_metrics[link]
 
-            except Exception as e:
-                log.exception('failed-to-submit-kpis', e=e)
+            returnValue(port_metrics)
 
-        prefix = 'voltha.{}.{}'.format(self.name, device_id)
-        lc = LoopingCall(_collect, device_id, prefix)
-        lc.start(interval=15)  # TODO make this configurable
+        # the collection period comes from the (default) PmConfigs
+        self.adapter_agent.register_for_pm_collection(device_id, _collect)
 
     def _voltha_get_oam_msg_type(self, frame):
         respType = RxedOamMsgTypeEnum["Unknown"]
@@ -0,0 +1,140 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+""" Shared watches of consul key prefixes """
+
+from structlog import get_logger
+from twisted.internet.defer import inlineCallbacks
+
+from common.utils.asleep import asleep
+
+log = get_logger()
+
+
+class PrefixWatch(object):
+    """State of the watch of one key prefix"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.subscribers = []
+        self.mirror = None  # key -> (ModifyIndex, value), once synced
+        self.index = 0  # consul index to block on
+
+    def snapshot(self):
+        return dict((key, value)
+                    for key, (_, value) in self.mirror.iteritems())
+
+
+class ConsulWatcher(object):
+    """
+    Multiplex the watches of consul key prefixes. A single blocking query
+    loop runs per prefix, whatever the number of subscribers to it. Each
+    loop keeps a mirror of the keys under its prefix and only hands the
+    subscribers the keys that were added, modified (as per their
+    ModifyIndex) or removed since the previous query.
+
+    Subscribers are called with (updated, removed): a dict of the added and
+    modified keys to their value and a set of the removed keys, the keys
+    being relative to the prefix. They are first called with all current
+    keys, once known.
+    """
+
+    def __init__(self, kv_get, error_delay=1):
+        """
+        :param kv_get: consul kv get function, returning a Deferred; it is
+        expected to retry on connection errors, as Coordinator.kv_get does
+        :param error_delay: seconds to wait before querying again after an
+        error
+        """
+        self.kv_get = kv_get
+        self.error_delay = error_delay
+        self.watches = {}  # prefix -> PrefixWatch
+        self.stopped = False
+
+    def subscribe(self, prefix, callback):
+        watch = self.watches.get(prefix)
+        if watch is None:
+            watch = self.watches[prefix] = PrefixWatch(prefix)
+            watch.subscribers.append(callback)
+            self._watch(watch)
+        else:
+            watch.subscribers.append(callback)
+            if watch.mirror is not None:
+                self._notify(watch, [callback], watch.snapshot(), set())
+
+    def unsubscribe(self, prefix, callback):
+        """The watch of a prefix ends with its last subscriber"""
+        watch = self.watches.get(prefix)
+        if watch is not None and callback in watch.subscribers:
+            watch.subscribers.remove(callback)
+            if not watch.subscribers:
+                del self.watches[prefix]
+
+    def get(self, prefix):
+        """
+        :return: dict of the keys (relative to prefix) to their value, as
+        last seen by the watch of prefix, or None if not known (yet)
+        """
+        watch = self.watches.get(prefix)
+        if watch is None or watch.mirror is None:
+            return None
+        return watch.snapshot()
+
+    def stop(self):
+        self.stopped = True
+        self.watches.clear()
+
+    @inlineCallbacks
+    def _watch(self, watch):
+        while not self.stopped and self.watches.get(watch.prefix) is watch:
+            try:
+                index, entries = yield self.kv_get(
+                    watch.prefix, index=watch.index, recurse=True)
+                if self.watches.get(watch.prefix) is not watch:
+                    break
+                # as per the consul documentation, start over if the index
+                # goes backwards
+                watch.index = index if index >= watch.index else 0
+                self._apply(watch, entries or [])
+            except Exception, e:
+                log.exception('consul-watch-error', prefix=watch.prefix, e=e)
+                yield asleep(self.error_delay)
+
+    def _apply(self, watch, entries):
+        offset = len(watch.prefix)
+        old = watch.mirror or {}
+        mirror = {}
+        updated = {}
+        for entry in entries:
+            key = entry['Key'][offset:]
+            value = (entry['ModifyIndex'], entry['Value'])
+            mirror[key] = value
+            previous = old.get(key)
+            if previous is None or previous[0] != value[0]:
+                updated[key] = value[1]
+        removed = set(old).difference(mirror)
+        first = watch.mirror is None
+        watch.mirror = mirror
+        if updated or removed or first:
+            self._notify(watch, list(watch.subscribers), updated, removed)
+
+    def _notify(self, watch, subscribers, updated, removed):
+        for callback in subscribers:
+            try:
+                callback(updated, removed)
+            except Exception, e:
+                log.exception('consul-watch-subscriber-error',
+                              prefix=watch.prefix, e=e)
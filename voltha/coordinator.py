@@ -27,6 +27,7 @@ from zope.interface import implementer
 
 from leader import Leader
 from common.utils.asleep import asleep
+from voltha.consul_watcher import ConsulWatcher
 from voltha.registry import IComponent
 from worker import Worker
 
@@ -104,6 +105,9 @@ class Coordinator(object):
         # TODO need to handle reconnect events properly
         self.consul = Consul(host=host, port=port)
 
+        # shared watches of the key prefixes the leader and worker track
+        self.watcher = ConsulWatcher(self.kv_get)
+
         self.wait_for_leader_deferreds = []
 
     def start(self):
@@ -117,6 +121,7 @@ class Coordinator(object):
         log.debug('stopping')
         self.shutting_down = True
         self.session_renew_timer.stop()
+        self.watcher.stop()
         yield self._delete_session()  # this will delete the leader lock too
         yield self.worker.stop()
         if self.leader is not None:
@@ -149,6 +154,18 @@ class Coordinator(object):
     def kv_delete(self, *args, **kw):
         return self._retry(self.consul.kv.delete, *args, **kw)
 
+    # Shared watches of key prefixes
+
+    def watch(self, prefix, callback):
+        """
+        Call callback(updated, removed) on every change under a key prefix,
+        starting with all current keys; see ConsulWatcher.
+        """
+        self.watcher.subscribe(prefix, callback)
+
+    def unwatch(self, prefix, callback):
+        self.watcher.unsubscribe(prefix, callback)
+
     # Methods exposing key membership information
 
     @inlineCallbacks
@@ -0,0 +1,289 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Scheduling of the device activations (adapter adopt_device calls), so that
+the ONUs of an OLT are brought up a bounded number at a time, per OLT and
+per adapter, instead of all at once (or one by one).
+"""
+from heapq import heappush, heappop
+from itertools import count
+
+import structlog
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, maybeDeferred
+
+from voltha.protos.common_pb2 import OperStatus
+
+log = structlog.get_logger()
+
+# activation priorities, lower first
+RECOVERING = 0  # the device was active before, e.g. its OLT rebooted
+DISCOVERED = 1
+
+
+class ActivationFailed(Exception): pass
+
+
+class Activation(object):
+    """One device waiting for, or going through, activation"""
+
+    def __init__(self, device_id, parent_id, adapter, adopt, priority, seq):
+        self.device_id = device_id
+        self.parent_id = parent_id
+        self.adapter = adapter
+        self.adopt = adopt
+        self.priority = priority
+        self.seq = seq
+        self.attempts = 0
+        self.submitted_at = reactor.seconds()
+        self.started_at = None  # set while in progress
+        self.timer = None  # timeout or retry delayed call
+        self.cancelled = False
+        self.deferred = Deferred()
+
+    def __cmp__(self, other):
+        return cmp((self.priority, self.seq), (other.priority, other.seq))
+
+
+class ActivationScheduler(object):
+    """
+    Queue the devices to activate and hand them to their adapter as long as
+    the number of activations in progress stays under the limits set for
+    their parent device and for their adapter. The devices that were active
+    before are brought back first, the others in the order they came.
+
+    An activation is in progress from the time the adapter is asked to adopt
+    the device until the device reaches the ACTIVE oper status, as reported
+    by device_updated(). If the adoption itself fails, it is tried again
+    after an exponential backoff, up to max_retries times. If the device
+    turns FAILED, or takes longer than the timeout, the activation fails
+    right away: the adapter may still be working on the first adoption, and
+    adopting the device again would have it set up twice.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.max_per_parent = config.get('max_per_parent', 16)
+        self.max_per_adapter = config.get('max_per_adapter', 64)
+        self.timeout = config.get('timeout', 60.0)
+        self.max_retries = config.get('max_retries', 3)
+        self.backoff = config.get('backoff', 1.0)
+        self.max_backoff = config.get('max_backoff', 30.0)
+
+        self.queue = []  # heap of the Activations ready to start
+        self.activations = {}  # device id -> Activation, until done
+        self.parent_load = {}  # parent id -> activations in progress
+        self.adapter_load = {}  # adapter name -> activations in progress
+        self.seq = count()
+
+        self.activated = 0
+        self.failed = 0
+        self.retries = 0
+        self._wait_times = []  # since last statistics() call
+        self._activation_times = []
+
+    def submit(self, device, adapter, adopt):
+        """
+        Schedule the activation of a device.
+        :param device: the Device to activate; it is seen as recovering if
+        it was ACTIVE
+        :param adapter: name of the adapter of the device
+        :param adopt: callable starting the activation, i.e. calling the
+        adapter's adopt_device; may return a Deferred
+        :return: Deferred fired with the device id once it is active, or
+        failed with ActivationFailed
+        """
+        previous = self.activations.get(device.id)
+        if previous is not None:
+            # e.g. the device was disabled and re-enabled meanwhile; it
+            # starts over, with all its attempts
+            self.cancel(device.id)
+        activation = Activation(
+            device.id,
+            None if device.root else device.parent_id or None,
+            adapter,
+            adopt,
+            RECOVERING if device.oper_status == OperStatus.ACTIVE
+            else DISCOVERED,
+            next(self.seq))
+        self.activations[device.id] = activation
+        heappush(self.queue, activation)
+        log.debug('activation-queued', device_id=device.id,
+                  priority=activation.priority, queued=len(self.queue))
+        self._dispatch()
+        return activation.deferred
+
+    def device_updated(self, device):
+        """To be called each time a device changes, to follow activations"""
+        activation = self.activations.get(device.id)
+        if activation is None or activation.started_at is None:
+            return
+        if device.oper_status == OperStatus.ACTIVE:
+            self._succeeded(activation)
+        elif device.oper_status == OperStatus.FAILED:
+            self._failed(activation, 'device-failed')
+
+    def cancel(self, device_id):
+        """Forget about a device, e.g. when it gets deleted"""
+        activation = self.activations.pop(device_id, None)
+        if activation is None:
+            return
+        activation.cancelled = True  # lazily dropped from the queue
+        self._cancel_timer(activation)
+        if activation.started_at is not None:
+            self._release(activation)
+            self._dispatch()
+
+    def statistics(self):
+        """
+        Return the number of activations queued, in progress and backing off,
+        the counts of activated and failed devices and of retries, and the
+        average and maximum times (in ms) devices waited in the queue and
+        took to activate since the previous call.
+        """
+        in_progress = sum(1 for activation in self.activations.itervalues()
+                          if activation.started_at is not None)
+        queued = sum(1 for activation in self.queue
+                     if not activation.cancelled)
+        stats = {
+            'queued': queued,
+            'in-progress': in_progress,
+            'backing-off': len(self.activations) - queued - in_progress,
+            'activated': self.activated,
+            'failed': self.failed,
+            'retries': self.retries
+        }
+        for name, samples in (('wait', self._wait_times),
+                              ('activation', self._activation_times)):
+            stats[name + '-avg-ms'] = \
+                1e3 * sum(samples) / len(samples) if samples else 0.0
+            stats[name + '-max-ms'] = 1e3 * max(samples) if samples else 0.0
+        self._wait_times, self._activation_times = [], []
+        return stats
+
+    def _dispatch(self):
+        """Start as many of the queued activations as the limits allow"""
+        blocked = []
+        while self.queue:
+            activation = heappop(self.queue)
+            if activation.cancelled:
+                continue
+            if not self._has_room(activation):
+                blocked.append(activation)
+                continue
+            self._start(activation)
+        for activation in blocked:
+            heappush(self.queue, activation)
+
+    def _has_room(self, activation):
+        if self.adapter_load.get(activation.adapter, 0) >= \
+                self.max_per_adapter:
+            return False
+        return activation.parent_id is None or \
+            self.parent_load.get(activation.parent_id, 0) < \
+            self.max_per_parent
+
+    def _start(self, activation):
+        activation.attempts += 1
+        activation.started_at = reactor.seconds()
+        if activation.attempts == 1:
+            self._wait_times.append(
+                activation.started_at - activation.submitted_at)
+        self.adapter_load[activation.adapter] = \
+            self.adapter_load.get(activation.adapter, 0) + 1
+        if activation.parent_id is not None:
+            self.parent_load[activation.parent_id] = \
+                self.parent_load.get(activation.parent_id, 0) + 1
+        activation.timer = reactor.callLater(
+            self.timeout, self._failed, activation, 'timeout')
+        log.debug('activation-started', device_id=activation.device_id,
+                  attempt=activation.attempts)
+
+        attempt = activation.attempts
+
+        def adopt_failed(failure):
+            log.error('adopt-failed', device_id=activation.device_id,
+                      failure=failure)
+            # unless the activation timed out or was cancelled meanwhile
+            if self.activations.get(activation.device_id) is activation \
+                    and activation.attempts == attempt:
+                self._failed(activation, 'adopt-failed', retry=True)
+
+        maybeDeferred(activation.adopt).addErrback(adopt_failed)
+
+    def _release(self, activation):
+        activation.started_at = None
+        self._decrement(self.adapter_load, activation.adapter)
+        if activation.parent_id is not None:
+            self._decrement(self.parent_load, activation.parent_id)
+
+    @staticmethod
+    def _decrement(load, key):
+        if load[key] == 1:
+            del load[key]
+        else:
+            load[key] -= 1
+
+    def _cancel_timer(self, activation):
+        if activation.timer is not None and activation.timer.active():
+            activation.timer.cancel()
+        activation.timer = None
+
+    def _succeeded(self, activation):
+        self._activation_times.append(
+            reactor.seconds() - activation.started_at)
+        self._cancel_timer(activation)
+        self._release(activation)
+        del self.activations[activation.device_id]
+        self.activated += 1
+        log.info('device-activated', device_id=activation.device_id,
+                 attempts=activation.attempts)
+        activation.deferred.callback(activation.device_id)
+        self._dispatch()
+
+    def _failed(self, activation, reason, retry=False):
+        """
+        :param retry: whether the activation may be tried again, i.e. the
+        adapter is known not to be working on the device anymore
+        """
+        if activation.started_at is None:
+            return
+        self._cancel_timer(activation)
+        self._release(activation)
+        if not retry or activation.attempts > self.max_retries:
+            del self.activations[activation.device_id]
+            self.failed += 1
+            log.error('device-activation-failed',
+                      device_id=activation.device_id, reason=reason,
+                      attempts=activation.attempts)
+            activation.deferred.errback(ActivationFailed(
+                '{}: {}'.format(activation.device_id, reason)))
+        else:
+            self.retries += 1
+            delay = min(self.max_backoff,
+                        self.backoff * 2 ** (activation.attempts - 1))
+            log.warn('device-activation-retry',
+                     device_id=activation.device_id, reason=reason,
+                     attempts=activation.attempts, delay=delay)
+            activation.timer = reactor.callLater(
+                delay, self._requeue, activation)
+        self._dispatch()
+
+    def _requeue(self, activation):
+        activation.timer = None
+        heappush(self.queue, activation)
+        self._dispatch()
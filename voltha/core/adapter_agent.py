@@ -174,7 +174,7 @@ class AdapterAgent(object):
         return self.adapter.update_flows_bulk(device, flows, groups)
 
     def update_flows_incrementally(self, device, flow_changes, group_changes):
-        return self.update_flows_incrementally(
+        return self.adapter.update_flows_incrementally(
             device, flow_changes, group_changes)
 
     # def update_pm_collection(self, device, pm_collection_config):
@@ -214,9 +214,11 @@ class AdapterAgent(object):
         # does not loop back to the adapter unnecessarily
         device_agent = self.core.get_device_agent(device_pm_config.id)
         device_agent.update_device_pm_config(device_pm_config, init)
+        self.core.pm_scheduler.update(device_pm_config.id, device_pm_config)
 
     def update_adapter_pm_config(self, device_id, device_pm_config):
         device = self.get_device(device_id)
+        self.core.pm_scheduler.update(device_id, device_pm_config)
         self.adapter.update_pm_config(device, device_pm_config)
 
     def _add_peer_reference(self, device_id, port):
@@ -521,6 +523,18 @@ class AdapterAgent(object):
 
     # ~~~~~~~~~~~~~~~~~~~ Handling KPI metric submissions ~~~~~~~~~~~~~~~~~~~~~
 
+    def register_for_pm_collection(self, device_id, collect, pm_configs=None,
+                                   blocking=False):
+        """
+        Have the core collect the KPIs of a device periodically, as per its
+        PmConfigs, and submit them. See PmScheduler.register.
+        """
+        self.core.pm_scheduler.register(
+            self.adapter_name, device_id, collect, pm_configs, blocking)
+
+    def unregister_from_pm_collection(self, device_id):
+        self.core.pm_scheduler.unregister(device_id)
+
     def submit_kpis(self, kpi_event_msg):
         try:
             assert isinstance(kpi_event_msg, KpiEvent)
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from time import time
+
 from consul import Consul
 
 
@@ -30,6 +32,9 @@ class ConsulStore(object):
         self._consul = Consul(host=host, port=port)
         self._path_prefix = path_prefix
         self._cache = {}
+        self._ops = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
 
     def make_path(self, key):
         return '{}/{}'.format(self._path_prefix, key)
@@ -37,7 +42,7 @@ class ConsulStore(object):
     def __getitem__(self, key):
         if key in self._cache:
             return self._cache[key]
-        index, value = self._consul.kv.get(self.make_path(key))
+        index, value = self._timed(self._consul.kv.get, key)
         if value is not None:
             # consul turns empty strings to None, so we do the reverse here
             self._cache[key] = value['Value'] or ''
@@ -48,7 +53,7 @@ class ConsulStore(object):
     def __contains__(self, key):
         if key in self._cache:
             return True
-        index, value = self._consul.kv.get(self.make_path(key))
+        index, value = self._timed(self._consul.kv.get, key)
         if value is not None:
             self._cache[key] = value['Value']
             return True
@@ -58,11 +63,34 @@ class ConsulStore(object):
     def __setitem__(self, key, value):
         assert isinstance(value, basestring)
         self._cache[key] = value
-        self._consul.kv.put(self.make_path(key), value)
+        self._timed(self._consul.kv.put, key, value)
 
     def __delitem__(self, key):
         self._cache.pop(key, None)
-        self._consul.kv.delete(self.make_path(key))
+        self._timed(self._consul.kv.delete, key)
+
+    def _timed(self, op, key, *args):
+        t0 = time()
+        try:
+            return op(self.make_path(key), *args)
+        finally:
+            latency = time() - t0
+            self._ops += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def latency_statistics(self):
+        """
+        Return the number of consul operations since the previous call along
+        with their average and maximum latency (in ms), and start over.
+        """
+        ops, total, peak = self._ops, self._total_latency, self._max_latency
+        self._ops, self._total_latency, self._max_latency = 0, 0.0, 0.0
+        return {
+            'ops': ops,
+            'avg-ms': 1e3 * total / ops if ops else 0.0,
+            'max-ms': 1e3 * peak
+        }
 
 
 def load_backend(args):
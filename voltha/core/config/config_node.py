@@ -13,7 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from collections import OrderedDict
 from copy import copy
+from operator import attrgetter
 
 from jsonpatch import JsonPatch
 from jsonpatch import make_patch
@@ -23,7 +25,7 @@ from voltha.core.config.config_branch import ConfigBranch
 from voltha.core.config.config_event_bus import ConfigEventBus
 from voltha.core.config.config_proxy import CallbackType, ConfigProxy
 from voltha.core.config.config_rev import is_proto_message, children_fields, \
-    ConfigRevision, access_rights
+    ConfigRevision, access_rights, table_field
 from voltha.core.config.config_rev_persisted import PersistedConfigRevision
 from voltha.core.config.merge_3way import merge_3way
 from voltha.protos import third_party
@@ -48,8 +50,9 @@ def check_access_violation(new_msg, old_msg):
 
 
 def find_rev_by_key(revs, keyname, value):
+    key_of = attrgetter(keyname)
     for i, rev in enumerate(revs):
-        if getattr(rev._config._data, keyname) == value:
+        if key_of(rev._config._data) == value:
             return i, rev
     raise KeyError('key {}={} not found'.format(keyname, value))
 
@@ -110,7 +113,7 @@ class ConfigNode(object):
                     children[field_name] = lst = []
                     for v in field_value:
                         rev = self._mknode(v, txid=txid).latest
-                        key = getattr(v, field.key)
+                        key = field.key_of(v)
                         if key in keys_seen:
                             raise ValueError('Duplicate key "{}"'.format(key))
                         lst.append(rev)
@@ -226,7 +229,7 @@ class ConfigNode(object):
             branch = mk_branch(self)
 
         if not path:
-            return self._do_update(branch, data, strict)
+            return self._do_update(branch, data, strict, txid, mk_branch)
 
         rev = branch._latest  # change is always made to the latest
         name, _, path = path.partition('/')
@@ -245,7 +248,7 @@ class ConfigNode(object):
                 if new_child_rev.hash == child_rev.hash:
                     # no change, we can return
                     return branch._latest
-                if getattr(new_child_rev.data, field.key) != key:
+                if field.key_of(new_child_rev.data) != key:
                     raise ValueError('Cannot change key field')
                 children[idx] = new_child_rev
                 rev = rev.update_children(name, children, branch)
@@ -263,11 +266,15 @@ class ConfigNode(object):
             self._make_latest(branch, rev)
             return rev
 
-    def _do_update(self, branch, data, strict):
+    def _do_update(self, branch, data, strict, txid=None, mk_branch=None):
         if not isinstance(data, self._type):
             raise ValueError(
                 '"{}" is not a valid data type for this node'.format(
                     data.__class__.__name__))
+        field_name = table_field(self._type)
+        if field_name is not None:
+            return self._do_update_table(
+                branch, data, field_name, strict, txid, mk_branch)
         self._test_no_children(data)
         if self._proxy is not None:
             self._proxy.invoke_callbacks(CallbackType.PRE_UPDATE, data)
@@ -283,6 +290,55 @@ class ConfigNode(object):
         else:
             return branch._latest
 
+    def _do_update_table(self, branch, data, name, strict, txid, mk_branch):
+        """
+        Update a table node (see table_field()) as a whole. Each entry being
+        a node of its own, only the entries that were added or changed get a
+        new revision. They are announced one by one, a change as a removal
+        followed by an addition, before the whole table gets announced as
+        updated.
+        """
+        if self._proxy is not None:
+            self._proxy.invoke_callbacks(CallbackType.PRE_UPDATE, data)
+
+        field = children_fields(self._type)[name]
+        rev = branch._latest
+        old_children = OrderedDict(
+            (field.key_of(child_rev.data), child_rev)
+            for child_rev in rev._children[name])
+        children = []
+        added = []
+        removed = []
+        keys_seen = set()
+        for item in getattr(data, name):
+            key = field.key_of(item)
+            if key in keys_seen:
+                raise ValueError('Duplicate key "{}"'.format(key))
+            keys_seen.add(key)
+            child_rev = old_children.pop(key, None)
+            if child_rev is None:
+                child_rev = self._mknode(item).latest
+                added.append(item)
+            elif child_rev.data != item:
+                removed.append(child_rev.data)
+                child_rev = child_rev.node.update(
+                    '', item, strict, txid, mk_branch)
+                added.append(item)
+            children.append(child_rev)
+        removed.extend(child_rev.data for child_rev in old_children.values())
+
+        if [r.hash for r in children] == \
+                [r.hash for r in rev._children[name]]:
+            return rev
+
+        rev = rev.update_children(name, children, branch)
+        self._make_latest(
+            branch, rev,
+            [(CallbackType.POST_REMOVE, item) for item in removed] +
+            [(CallbackType.POST_ADD, item) for item in added] +
+            [(CallbackType.POST_UPDATE, rev.get(0))])
+        return rev
+
     def _make_latest(self, branch, rev, change_announcements=()):
         branch._latest = rev
         if rev.hash not in branch._revs:
@@ -336,7 +392,7 @@ class ConfigNode(object):
                         self._proxy.invoke_callbacks(
                             CallbackType.PRE_ADD, data)
                     children = copy(rev._children[name])
-                    key = getattr(data, field.key)
+                    key = field.key_of(data)
                     try:
                         find_rev_by_key(children, field.key, key)
                     except KeyError:
@@ -24,6 +24,7 @@ classes directly must obey the rules.
 import weakref
 from copy import copy
 from hashlib import md5
+from operator import attrgetter
 
 from google.protobuf.descriptor import Descriptor
 from simplejson import dumps
@@ -64,6 +65,7 @@ class _ChildType(object):
         '_type',
         '_is_container',
         '_key',
+        '_key_of',
         '_key_from_str'
     )
 
@@ -73,6 +75,7 @@ class _ChildType(object):
         self._type = type
         self._is_container = is_container
         self._key = key
+        self._key_of = attrgetter(key) if key else None
         self._key_from_str = key_from_str
 
     @property
@@ -83,6 +86,11 @@ class _ChildType(object):
     def key(self):
         return self._key
 
+    @property
+    def key_of(self):
+        """Function returning the key of a child (the key can be a path)"""
+        return self._key_of
+
     @property
     def key_from_str(self):
         return self._key_from_str
@@ -121,7 +129,12 @@ def children_fields(cls):
                     key_from_str = None
 
                     if meta.key:
-                        key_field = field.message_type.fields_by_name[meta.key]
+                        # the key may be a field of a nested message, as in
+                        # "desc.group_id"
+                        key_msg = field.message_type
+                        for name in meta.key.split('.'):
+                            key_field = key_msg.fields_by_name[name]
+                            key_msg = key_field.message_type
                         key_type = key_field.type
 
                         if key_type == key_field.TYPE_STRING:
@@ -157,6 +170,31 @@ def children_fields(cls):
     return names
 
 
+_table_field_cache = {}  # to memoize table field names
+
+
+def table_field(cls):
+    """
+    Return the name of the child field of a "table" message type, i.e. of a
+    message made of a keyed container child field and nothing else (like
+    Flows), or None if cls is not one. Though each entry of a table is a
+    node of its own, a table node is read and updated as a whole, just as
+    if its entries were stored in it.
+    """
+    try:
+        return _table_field_cache[cls]
+    except KeyError:
+        pass
+    name = None
+    fields = children_fields(cls)
+    if len(fields) == 1 and len(cls.DESCRIPTOR.fields) == 1:
+        (field_name, field), = fields.items()
+        if field.is_container and field.key:
+            name = field_name
+    _table_field_cache[cls] = name
+    return name
+
+
 _access_right_cache = {}  # to memoize field access right restrictions
 
 
@@ -307,6 +345,12 @@ class ConfigRevision(object):
                     child_data = rev.get(depth=depth - 1)
                     child_data_holder = getattr(data, field_name)
                     child_data_holder.MergeFrom(child_data)
+        else:
+            # the entries of a table are always part of it
+            field_name = table_field(self.type)
+            if field_name is not None:
+                getattr(data, field_name).extend(
+                    rev.get(depth=0) for rev in self._children[field_name])
         return data
 
     def update_data(self, data, branch):
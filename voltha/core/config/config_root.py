@@ -21,6 +21,7 @@ from simplejson import dumps, loads
 from voltha.core.config.config_node import ConfigNode
 from voltha.core.config.config_rev import ConfigRevision
 from voltha.core.config.config_rev_persisted import PersistedConfigRevision
+from voltha.core.config.config_watch import ConfigWatch
 from voltha.core.config.merge_3way import MergeConflictException
 
 log = structlog.get_logger()
@@ -34,7 +35,8 @@ class ConfigRoot(ConfigNode):
         '_loading',
         '_rev_cls',
         '_deferred_callback_queue',
-        '_notification_deferred_callback_queue'
+        '_notification_deferred_callback_queue',
+        '_watches'
     )
 
     def __init__(self, initial_data, kv_store=None, rev_cls=ConfigRevision):
@@ -47,6 +49,7 @@ class ConfigRoot(ConfigNode):
         self._rev_cls = rev_cls
         self._deferred_callback_queue = []
         self._notification_deferred_callback_queue = []
+        self._watches = set()
         super(ConfigRoot, self).__init__(self, initial_data, False)
 
     @property
@@ -142,6 +145,28 @@ class ConfigRoot(ConfigNode):
             self.execute_deferred_callbacks()
         return res
 
+    def revision_counts(self):
+        """
+        Return the number of root revisions held per branch, the committed
+        branch being keyed by None and each open transaction by its txid.
+        Cheap enough to be polled, as opposed to walking the whole tree.
+        """
+        return dict((txid, len(branch._revs))
+                    for txid, branch in self._branches.iteritems())
+
+    def watch(self, path, since_hash='', depth=0):
+        """
+        Start watching a path for changes (see ConfigWatch)
+        :return: the ConfigWatch
+        """
+        watch = ConfigWatch(self, path, since_hash, depth)
+        self._watches.add(watch)
+        return watch
+
+    def unwatch(self, watch):
+        watch.close()
+        self._watches.discard(watch)
+
     def check_callback_queue(self):
         assert len(self._deferred_callback_queue) == 0
 
@@ -195,6 +220,9 @@ class ConfigRoot(ConfigNode):
 
     def _make_latest(self, branch, *args, **kw):
         super(ConfigRoot, self)._make_latest(branch, *args, **kw)
+        if branch._txid is None and not self._loading:
+            for watch in list(self._watches):
+                watch.latest_changed(branch._latest)
         # only persist the committed branch
         if self._kv_store is not None and branch._txid is None:
             root_data = dict(
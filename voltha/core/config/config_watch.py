@@ -0,0 +1,205 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Watching a path of the config tree for changes, as done by the watchers of
+the WatchConfig gRPC method.
+"""
+from collections import OrderedDict
+from threading import Condition
+
+import structlog
+from google.protobuf.any_pb2 import Any
+
+from voltha.core.config.config_node import find_rev_by_key
+from voltha.core.config.config_rev import children_fields, table_field
+from voltha.protos import third_party
+from voltha.protos.voltha_pb2 import ConfigChange
+
+log = structlog.get_logger()
+_ = third_party
+
+
+def lookup_revs(rev, path):
+    """
+    Find what a path points to in the tree under a (root) revision.
+    :return: (key_of, revs) where revs is the list of revisions of a keyed
+    list, along with the function returning the key of an item, or a list
+    holding the single revision of a node, along with None
+    """
+    path = path.strip('/')
+    while path:
+        name, _, path = path.partition('/')
+        field = children_fields(rev.type)[name]
+        revs = rev._children[name]
+        if field.is_container:
+            if not field.key:
+                raise ValueError('Cannot watch a container with no key')
+            if not path:
+                return field.key_of, revs
+            key, _, path = path.partition('/')
+            _, rev = find_rev_by_key(revs, field.key, field.key_from_str(key))
+        else:
+            rev = revs[0]
+    return None, [rev]
+
+
+class ConfigWatch(object):
+    """
+    Report the changes made to a node or to a keyed list of the config tree
+    since a given revision of the tree, one item at a time.
+
+    Changes are not queued. Each time the tree changes, the watch is merely
+    flagged; the changes are worked out when the watcher comes to read them,
+    by comparing the revision it was last told about with the latest one.
+    The watch state is thus bounded to one revision whatever the rate of
+    changes, and a burst of changes to an item gets coalesced into one.
+    Comparing revision hashes, only the subtrees that changed are visited.
+
+    Must be created and read with changes() on the twisted thread, while the
+    watcher waits for changes with wait() on its own thread.
+    """
+
+    def __init__(self, root, path, since_hash='', depth=0):
+        self.root = root
+        self.path = path
+        self.depth = depth
+        self.condition = Condition()
+        self.pending = True  # changes since last_rev are yet to be read
+        self.generation = 0  # bumped by wake()
+        self.closed = False
+
+        # revision of the tree the watcher is known to be in sync with, or
+        # None if it has to start over
+        self.last_rev = None
+        if since_hash:
+            try:
+                self.last_rev = root[since_hash]
+            except KeyError:
+                log.debug('watch-revision-unknown', since_hash=since_hash)
+
+        # fail now if the path is bad
+        self.key_of, _ = lookup_revs(root.latest, path)
+
+    def latest_changed(self, rev):
+        """Called by the config root when the tree has changed"""
+        with self.condition:
+            self.pending = True
+            self.condition.notify_all()
+
+    def wait(self, cancelled=None):
+        """
+        Block until there are changes to read.
+        :param cancelled: optional predicate telling whether the watcher is
+        gone, checked under the lock before each wait, as with
+        FairBatchQueue.get_batch()
+        :return: False if the watch was closed, released with wake() or
+        the watcher was cancelled
+        """
+        with self.condition:
+            generation = self.generation
+            while not self.pending:
+                if self.closed or self.generation != generation or \
+                        (cancelled is not None and cancelled()):
+                    return False
+                self.condition.wait()
+            return not self.closed
+
+    def wake(self):
+        """Release the blocked watcher, to let it notice it's been cancelled"""
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def changes(self):
+        """
+        :return: the list of ConfigChange messages bringing the watcher from
+        the revision it was last told about to the latest one. Only the last
+        change of the list carries the hash of the latest revision.
+        """
+        with self.condition:
+            self.pending = False
+        rev = self.root.latest
+        if self.last_rev is not None and self.last_rev.hash == rev.hash:
+            return []
+
+        try:
+            _, new_revs = lookup_revs(rev, self.path)
+        except KeyError:
+            # the watched node is gone, and so is the watch
+            new_revs = []
+            self.close()
+
+        changes = []
+        if self.last_rev is None:
+            changes.append(ConfigChange(type=ConfigChange.RESET))
+            old_revs = []
+        else:
+            try:
+                _, old_revs = lookup_revs(self.last_rev, self.path)
+            except KeyError:
+                old_revs = []
+
+        if self.key_of is None:
+            self._diff_node(changes, old_revs, new_revs)
+        else:
+            self._diff_list(changes, old_revs, new_revs)
+
+        self.last_rev = rev
+        if changes:
+            changes[-1].hash = rev.hash
+        return changes
+
+    def _diff_node(self, changes, old_revs, new_revs):
+        if not old_revs:
+            if new_revs:
+                changes.append(self._change(ConfigChange.ADDED, new_revs[0]))
+        elif not new_revs:
+            changes.append(self._change(ConfigChange.REMOVED, old_revs[0]))
+        elif self._changed(old_revs[0], new_revs[0]):
+            changes.append(self._change(ConfigChange.UPDATED, new_revs[0]))
+
+    def _diff_list(self, changes, old_revs, new_revs):
+        key_of = self.key_of
+        old = OrderedDict((key_of(rev.data), rev) for rev in old_revs)
+        for rev in new_revs:
+            key = key_of(rev.data)
+            old_rev = old.pop(key, None)
+            if old_rev is None:
+                changes.append(self._change(ConfigChange.ADDED, rev, key))
+            elif self._changed(old_rev, rev):
+                changes.append(self._change(ConfigChange.UPDATED, rev, key))
+        for key, rev in old.iteritems():
+            changes.append(self._change(ConfigChange.REMOVED, rev, key))
+
+    def _changed(self, old_rev, new_rev):
+        if self.depth == 0 and table_field(new_rev.type) is None:
+            # the children are not sent, so they don't count
+            return old_rev._config.hash != new_rev._config.hash
+        return old_rev.hash != new_rev.hash
+
+    def _change(self, change_type, rev, key=None):
+        data = Any()
+        data.Pack(rev.get(self.depth))
+        return ConfigChange(
+            type=change_type,
+            key='' if key is None else str(key),
+            data=data)
@@ -19,9 +19,10 @@
 """
 from collections import OrderedDict
 from copy import copy
+from operator import attrgetter
 
 from voltha.core.config.config_proxy import CallbackType, OperationContext
-from voltha.core.config.config_rev import children_fields
+from voltha.core.config.config_rev import children_fields, table_field
 
 
 class MergeConflictException(Exception):
@@ -54,9 +55,10 @@ def merge_3way(fork_rev, src_rev, dst_rev, merge_child_func, dry_run=False):
 
     class AnalyzeChanges(object):
         def __init__(self, lst1, lst2, keyname):
-            self.keymap1 = OrderedDict((getattr(rev._config._data, keyname), i)
+            key_of = attrgetter(keyname)
+            self.keymap1 = OrderedDict((key_of(rev._config._data), i)
                                        for i, rev in enumerate(lst1))
-            self.keymap2 = OrderedDict((getattr(rev._config._data, keyname), i)
+            self.keymap2 = OrderedDict((key_of(rev._config._data), i)
                                        for i, rev in enumerate(lst2))
             self.added_keys = [
                 k for k in self.keymap2.iterkeys() if k not in self.keymap1]
@@ -85,6 +87,11 @@ def merge_3way(fork_rev, src_rev, dst_rev, merge_child_func, dry_run=False):
     new_children = dst_rev._children.copy()
     _children_fields = children_fields(fork_rev.data.__class__)
 
+    # the entries of a table are announced when they change, as a removal
+    # followed by an addition, and so is the table itself (see
+    # ConfigNode._do_update_table())
+    is_table = table_field(fork_rev.data.__class__) is not None
+
     for field_name, field in _children_fields.iteritems():
 
         fork_list = fork_rev._children[field_name]
@@ -158,6 +165,12 @@ def merge_3way(fork_rev, src_rev, dst_rev, merge_child_func, dry_run=False):
                     new_rev = merge_child_func(new_list[idx])
                     new_list[idx] = new_rev
                     # updated child gets its own change event
+                    if is_table:
+                        changes.append((
+                            CallbackType.POST_REMOVE,
+                            fork_list[src.keymap1[key]].data))
+                        changes.append((CallbackType.POST_ADD,
+                                        src_list[idx].data))
 
                 new_children[field_name] = new_list
 
@@ -233,6 +246,13 @@ def merge_3way(fork_rev, src_rev, dst_rev, merge_child_func, dry_run=False):
                         new_rev = merge_child_func(src_list[src.keymap2[key]])
                         new_list[dst.keymap2[key]] = new_rev
                         # no announcement for child update
+                        if is_table:
+                            changes.append((
+                                CallbackType.POST_REMOVE,
+                                dst_list[dst.keymap2[key]].data))
+                            changes.append((
+                                CallbackType.POST_ADD,
+                                src_list[src.keymap2[key]].data))
 
                 for key in reversed(src.removed_keys):  # we go from highest
                                                         # index to lowest
@@ -261,6 +281,8 @@ def merge_3way(fork_rev, src_rev, dst_rev, merge_child_func, dry_run=False):
         rev = rev.update_all_children(new_children, dst_rev._branch)
         if config_changed:
             changes.append((CallbackType.POST_UPDATE, rev.data))
+        elif is_table and changes:
+            changes.append((CallbackType.POST_UPDATE, rev.get(0)))
         return rev, changes
 
     else:
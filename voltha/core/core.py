@@ -18,18 +18,19 @@
 Voltha's CORE components.
 """
 
-from Queue import Queue
-
 import structlog
 from twisted.internet.defer import inlineCallbacks, returnValue
 from zope.interface import implementer
 
+from common.utils.fair_queue import FairBatchQueue
+from voltha.core.activation_scheduler import ActivationScheduler
 from voltha.core.config.config_proxy import CallbackType
 from voltha.core.device_agent import DeviceAgent
 from voltha.core.dispatcher import Dispatcher
 from voltha.core.global_handler import GlobalHandler
 from voltha.core.local_handler import LocalHandler
 from voltha.core.logical_device_agent import LogicalDeviceAgent
+from voltha.core.pm_scheduler import PmScheduler
 from voltha.protos.voltha_pb2 import \
     VolthaLocalServiceStub, \
     Device, LogicalDevice
@@ -37,11 +38,17 @@ from voltha.registry import IComponent
 
 log = structlog.get_logger()
 
+# max number of packet-ins / change events queued per logical device, before
+# they are dropped, while waiting for the ofagent to pick them up
+PACKET_IN_QUEUE_DEPTH = 1024
+CHANGE_EVENT_QUEUE_DEPTH = 4096
+
 
 @implementer(IComponent)
 class VolthaCore(object):
 
-    def __init__(self, instance_id, version, log_level):
+    def __init__(self, instance_id, version, log_level, config=None):
+        config = config or {}
         self.instance_id = instance_id
         self.stopped = False
         self.dispatcher = Dispatcher(self, instance_id)
@@ -58,8 +65,11 @@ class VolthaCore(object):
         self.local_root_proxy = None
         self.device_agents = {}
         self.logical_device_agents = {}
-        self.packet_in_queue = Queue()
-        self.change_event_queue = Queue()
+        self.packet_in_queue = FairBatchQueue(PACKET_IN_QUEUE_DEPTH)
+        self.change_event_queue = FairBatchQueue(CHANGE_EVENT_QUEUE_DEPTH)
+        self.activation_scheduler = ActivationScheduler(
+            config.get('activation', {}))
+        self.pm_scheduler = PmScheduler(config.get('pm_collection', {}))
 
     @inlineCallbacks
     def start(self, config_backend=None):
@@ -67,6 +77,7 @@ class VolthaCore(object):
         yield self.dispatcher.start()
         yield self.global_handler.start()
         yield self.local_handler.start(config_backend=config_backend)
+        self.pm_scheduler.start()
         self.local_root_proxy = self.get_proxy('/')
         self.local_root_proxy.register_callback(
             CallbackType.POST_ADD, self._post_add_callback)
@@ -78,6 +89,7 @@ class VolthaCore(object):
     def stop(self):
         log.debug('stopping')
         self.stopped = True
+        self.pm_scheduler.stop()
         log.info('stopped')
 
     def get_local_handler(self):
@@ -132,12 +144,14 @@ class VolthaCore(object):
         assert logical_device.id not in self.logical_device_agents
         agent = yield LogicalDeviceAgent(self, logical_device).start()
         self.logical_device_agents[logical_device.id] = agent
+        self.local_handler.logical_device_events.added(logical_device)
 
     @inlineCallbacks
     def _handle_remove_logical_device(self, logical_device):
         if logical_device.id in self.logical_device_agents:
             yield self.logical_device_agents[logical_device.id].stop()
             del self.logical_device_agents[logical_device.id]
+            self.local_handler.logical_device_events.removed(logical_device)
 
     def get_logical_device_agent(self, logical_device_id):
         return self.logical_device_agents[logical_device_id]
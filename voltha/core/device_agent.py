@@ -25,7 +25,8 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 from voltha.core.config.config_proxy import CallbackType
 from voltha.protos.common_pb2 import AdminState, OperStatus
 from voltha.registry import registry
-from voltha.protos.openflow_13_pb2 import Flows, FlowGroups
+from voltha.protos.openflow_13_pb2 import Flows, FlowGroups, FlowChanges, \
+    FlowGroupChanges
 
 class InvalidStateTransition(Exception): pass
 
@@ -65,13 +66,27 @@ class DeviceAgent(object):
         self.device_type = core.get_proxy(
             '/device_types/{}'.format(initial_data.type)).get()
 
+        # flows and groups added and removed since the last table update,
+        # for the devices taking incremental updates
+        self.flow_changes = FlowChanges()
+        self.group_changes = FlowGroupChanges()
+        if self.device_type.accepts_add_remove_flow_updates:
+            self.flows_proxy.register_callback(
+                CallbackType.POST_ADD, self._flow_added)
+            self.flows_proxy.register_callback(
+                CallbackType.POST_REMOVE, self._flow_removed)
+            self.groups_proxy.register_callback(
+                CallbackType.POST_ADD, self._group_added)
+            self.groups_proxy.register_callback(
+                CallbackType.POST_REMOVE, self._group_removed)
+
         self.adapter_agent = None
         self.log = structlog.get_logger(device_id=initial_data.id)
 
     @inlineCallbacks
     def start(self):
         self.log.debug('starting')
-        self._set_adapter_agent()
+        yield self._set_adapter_agent()
         yield self._process_update(self._tmp_initial_data)
         del self._tmp_initial_data
         self.log.info('started')
@@ -80,6 +95,8 @@ class DeviceAgent(object):
     @inlineCallbacks
     def stop(self, device):
         self.log.debug('stopping', device=device)
+        self.core.activation_scheduler.cancel(device.id)
+        self.core.pm_scheduler.unregister(device.id)
 
         # First, propagate this request to the device agents
         yield self._delete_device(device)
@@ -102,6 +119,7 @@ class DeviceAgent(object):
         if not dry_run:
             yield self.adapter_agent.get_device_details(device)
 
+    @inlineCallbacks
     def _set_adapter_agent(self):
         adapter_name = self._tmp_initial_data.adapter
         if adapter_name == '':
@@ -111,7 +129,8 @@ class DeviceAgent(object):
             device_type = known_device_types[self._tmp_initial_data.type]
             adapter_name = device_type.adapter
         assert adapter_name != ''
-        self.adapter_agent = registry('adapter_loader').get_agent(adapter_name)
+        self.adapter_agent = yield registry('adapter_loader').load_agent(
+            adapter_name)
 
     @inlineCallbacks
     def _validate_update(self, device):
@@ -132,6 +151,7 @@ class DeviceAgent(object):
         adapter
         """
         self.log.debug('device-post-update', device=device)
+        self.core.activation_scheduler.device_updated(device)
 
         # first, process any potential state transition
         yield self._process_state_transitions(device)
@@ -156,13 +176,22 @@ class DeviceAgent(object):
             assert callable(transition_handler)
             yield transition_handler(self, device, dry_run)
 
-    @inlineCallbacks
     def _activate_device(self, device, dry_run=False):
         self.log.info('activate-device', device=device, dry_run=dry_run)
         if not dry_run:
-            device.oper_status = OperStatus.ACTIVATING
-            self.update_device(device)
-            yield self.adapter_agent.adopt_device(device)
+            # the adapter gets to adopt the device when the scheduler lets
+            # it, not to have all the ONUs of an OLT activated at once
+            d = self.core.activation_scheduler.submit(
+                device, self.adapter_agent.adapter_name, self._adopt_device)
+            d.addErrback(lambda failure: self.log.error(
+                'activation-abandoned', reason=failure.getErrorMessage()))
+
+    @inlineCallbacks
+    def _adopt_device(self):
+        device = self.proxy.get('/')
+        device.oper_status = OperStatus.ACTIVATING
+        self.update_device(device)
+        yield self.adapter_agent.adopt_device(device)
 
     def update_device(self, device):
         self.last_data = device  # so that we don't propagate back
@@ -261,11 +290,31 @@ class DeviceAgent(object):
             # see https://jira.opencord.org/browse/CORD-839
 
         elif self.device_type.accepts_add_remove_flow_updates:
-            raise NotImplementedError()
+            yield self._update_flows_incrementally()
 
         else:
             raise NotImplementedError()
 
+    def _flow_added(self, flow):
+        self.flow_changes.to_add.items.extend([flow])
+
+    def _flow_removed(self, flow):
+        self.flow_changes.to_remove.items.extend([flow])
+
+    def _update_flows_incrementally(self):
+        """
+        Hand the flows and groups added and removed since the last table
+        update over to the adapter. A changed flow or group is passed as
+        removed and then added back.
+        """
+        flow_changes, self.flow_changes = self.flow_changes, FlowChanges()
+        group_changes, self.group_changes = \
+            self.group_changes, FlowGroupChanges()
+        return self.adapter_agent.update_flows_incrementally(
+            device=self.last_data,
+            flow_changes=flow_changes,
+            group_changes=group_changes)
+
     ## <======================= GROUP TABLE UPDATE HANDLING ===================
 
     @inlineCallbacks
@@ -285,8 +334,14 @@ class DeviceAgent(object):
             # see https://jira.opencord.org/browse/CORD-839
 
         elif self.device_type.accepts_add_remove_flow_updates:
-            raise NotImplementedError()
+            yield self._update_flows_incrementally()
 
         else:
             raise NotImplementedError()
 
+    def _group_added(self, group):
+        self.group_changes.to_add.items.extend([group])
+
+    def _group_removed(self, group):
+        self.group_changes.to_remove.items.extend([group])
+
@@ -12,18 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from Queue import Empty as QueueEmpty
+from threading import Thread
 from uuid import uuid4
 
 import structlog
 from google.protobuf.empty_pb2 import Empty
 from grpc import StatusCode
+from twisted.internet import reactor
 
 from common.utils.grpc_utils import twisted_async
 from voltha.core.config.config_root import ConfigRoot
 from voltha.core.config.config_backend import ConsulStore
-from voltha.protos.openflow_13_pb2 import PacketIn, Flows, FlowGroups, \
-    ofp_port_status
+from voltha.core.logical_device_events import LogicalDeviceEvents
+from voltha.core.profiler import SamplingProfiler
+from voltha.protos.openflow_13_pb2 import PacketIn, PacketsIn, Flows, \
+    FlowGroups, ofp_port_status
 from voltha.protos.voltha_pb2 import \
     add_VolthaLocalServiceServicer_to_server, VolthaLocalServiceServicer, \
     VolthaInstance, Adapters, LogicalDevices, LogicalDevice, Ports, \
@@ -35,6 +38,9 @@ from voltha.registry import registry
 
 log = structlog.get_logger()
 
+# max number of packets carried by a single PacketsIn message
+PACKET_IN_BATCH_SIZE = 64
+
 
 class LocalHandler(VolthaLocalServiceServicer):
     def __init__(self, core, **init_kw):
@@ -42,6 +48,8 @@ class LocalHandler(VolthaLocalServiceServicer):
         self.init_kw = init_kw
         self.root = None
         self.stopped = False
+        self.logical_device_events = LogicalDeviceEvents()
+        self.profiler = SamplingProfiler()
 
     def start(self, config_backend=None):
         log.debug('starting')
@@ -66,6 +74,11 @@ class LocalHandler(VolthaLocalServiceServicer):
     def stop(self):
         log.debug('stopping')
         self.stopped = True
+        self.core.packet_in_queue.close()
+        self.core.change_event_queue.close()
+        self.logical_device_events.close()
+        if self.profiler.running:
+            self.profiler.stop()
         log.info('stopped')
 
     def get_proxy(self, path, exclusive=False):
@@ -98,6 +111,53 @@ class LocalHandler(VolthaLocalServiceServicer):
         items = self.root.get('/logical_devices')
         return LogicalDevices(items=items)
 
+    def WatchLogicalDevices(self, request, context):
+        log.info('grpc-request', request=request)
+        queue = self._watch_logical_devices(request.resync_token)
+        try:
+            for batch in self._drain(queue, context):
+                for event in batch:
+                    yield event
+        finally:
+            reactor.callFromThread(self.logical_device_events.unwatch, queue)
+
+    @twisted_async
+    def _watch_logical_devices(self, resync_token):
+        return self.logical_device_events.watch(
+            resync_token, lambda: self.root.get('/logical_devices'))
+
+    def WatchConfig(self, request, context):
+        log.info('grpc-request', request=request)
+        try:
+            watch = self._watch_config(request)
+        except (KeyError, ValueError), e:
+            context.set_details(
+                'Cannot watch \'{}\': {}'.format(request.path, e))
+            context.set_code(StatusCode.NOT_FOUND
+                             if isinstance(e, KeyError)
+                             else StatusCode.INVALID_ARGUMENT)
+            return
+
+        context.add_callback(watch.wake)
+        cancelled = lambda: self.stopped or not context.is_active()
+        try:
+            while not cancelled():
+                if watch.wait(cancelled):
+                    for change in self._config_changes(watch):
+                        yield change
+                elif watch.closed:
+                    break
+        finally:
+            reactor.callFromThread(self.root.unwatch, watch)
+
+    @twisted_async
+    def _watch_config(self, request):
+        return self.root.watch(request.path, request.since_hash, request.depth)
+
+    @twisted_async
+    def _config_changes(self, watch):
+        return watch.changes()
+
     @twisted_async
     def GetLogicalDevice(self, request, context):
         log.info('grpc-request', request=request)
@@ -178,6 +238,28 @@ class LocalHandler(VolthaLocalServiceServicer):
             context.set_code(StatusCode.NOT_FOUND)
             return Empty()
 
+    @twisted_async
+    def UpdateLogicalDeviceFlowTableBulk(self, request, context):
+        log.info('grpc-request', id=request.id, mods=len(request.mods))
+
+        if '/' in request.id:
+            context.set_details(
+                'Malformed logical device id \'{}\''.format(request.id))
+            context.set_code(StatusCode.INVALID_ARGUMENT)
+            return Empty()
+
+        try:
+            agent = self.core.get_logical_device_agent(request.id)
+        except KeyError:
+            context.set_details(
+                'Logical device \'{}\' not found'.format(request.id))
+            context.set_code(StatusCode.NOT_FOUND)
+            return Empty()
+
+        agent.update_tables([getattr(mod, mod.WhichOneof('mod'))
+                             for mod in request.mods if mod.WhichOneof('mod')])
+        return Empty()
+
     @twisted_async
     def ListLogicalDeviceFlowGroups(self, request, context):
         log.info('grpc-request', request=request)
@@ -550,45 +632,81 @@ class LocalHandler(VolthaLocalServiceServicer):
             return DeviceGroup()
 
     def StreamPacketsOut(self, request_iterator, context):
-
-        @twisted_async
-        def forward_packet_out(packet_out):
-            agent = self.core.get_logical_device_agent(packet_out.id)
-            agent.packet_out(packet_out.packet_out)
-
         for request in request_iterator:
-            forward_packet_out(packet_out=request)
+            reactor.callFromThread(self.forward_packets_out, [request])
 
         return Empty()
 
     def ReceivePacketsIn(self, request, context):
-        while 1:
-            try:
-                packet_in = self.core.packet_in_queue.get(timeout=1)
+        for batch in self._drain(self.core.packet_in_queue, context):
+            for packet_in in batch:
                 yield packet_in
-            except QueueEmpty:
-                if self.stopped:
-                    break
+
+    def StreamPackets(self, request_iterator, context):
+        """
+        Packet-outs and packet-ins travel in batches over the same stream.
+        The packet-outs are read on a dedicated thread, as this one is busy
+        writing the packet-ins; both directions are event driven.
+        """
+
+        def receive_packets_out():
+            try:
+                for packets_out in request_iterator:
+                    reactor.callFromThread(self.forward_packets_out,
+                                           packets_out.items)
+            except Exception, e:
+                # raised when the stream is cancelled by the client
+                log.debug('packet-out-stream-ended', e=e)
+
+        thread = Thread(target=receive_packets_out, name='packets-out')
+        thread.daemon = True
+        thread.start()
+
+        for batch in self._drain(self.core.packet_in_queue, context,
+                                 PACKET_IN_BATCH_SIZE):
+            yield PacketsIn(items=batch)
+
+    def forward_packets_out(self, packets_out):
+        """Must be called on the twisted thread"""
+        for packet_out in packets_out:
+            agent = self.core.logical_device_agents.get(packet_out.id)
+            if agent is None:
+                log.warn('packet-out-to-unknown-logical-device',
+                         id=packet_out.id)
+                continue
+            agent.packet_out(packet_out.packet_out)
+
+    def _drain(self, queue, context, batch_size=PACKET_IN_BATCH_SIZE):
+        """
+        Yield batches read from queue until the handler is stopped or the
+        stream goes away. A cancelled stream releases the blocked reader.
+        """
+        context.add_callback(queue.wake)
+        cancelled = lambda: self.stopped or not context.is_active()
+        while not cancelled():
+            batch = queue.get_batch(batch_size, cancelled)
+            if batch:
+                yield batch
+            elif queue.closed:
+                break
 
     def send_packet_in(self, device_id, ofp_packet_in):
         """Must be called on the twisted thread"""
         packet_in = PacketIn(id=device_id, packet_in=ofp_packet_in)
-        self.core.packet_in_queue.put(packet_in)
+        if not self.core.packet_in_queue.put(device_id, packet_in):
+            log.debug('packet-in-dropped', device_id=device_id)
 
     def ReceiveChangeEvents(self, request, context):
-        while 1:
-            try:
-                event = self.core.change_event_queue.get(timeout=1)
+        for batch in self._drain(self.core.change_event_queue, context):
+            for event in batch:
                 yield event
-            except QueueEmpty:
-                if self.stopped:
-                    break
 
     def send_port_change_event(self, device_id, port_status):
         """Must be called on the twisted thread"""
         assert isinstance(port_status, ofp_port_status)
         event = ChangeEvent(id=device_id, port_status=port_status)
-        self.core.change_event_queue.put(event)
+        if not self.core.change_event_queue.put(device_id, event):
+            log.warn('change-event-dropped', device_id=device_id)
 
 
     @twisted_async
@@ -673,3 +791,23 @@ class LocalHandler(VolthaLocalServiceServicer):
                 'Alarm filter \'{}\' not found'.format(request.id))
             context.set_code(StatusCode.NOT_FOUND)
             return AlarmFilter()
+
+    # The profiler methods deliberately stay off the twisted thread: they
+    # have to work while the reactor is busy, which is when they are needed.
+
+    def StartProfiling(self, request, context):
+        log.info('grpc-request', request=request)
+        if not self.profiler.start(
+                interval=request.interval_ms / 1000.0 or None,
+                max_duration=request.max_duration or None):
+            context.set_details('Profiler already running')
+            context.set_code(StatusCode.FAILED_PRECONDITION)
+        return Empty()
+
+    def StopProfiling(self, request, context):
+        log.info('grpc-request', request=request)
+        return self.profiler.stop()
+
+    def GetProfile(self, request, context):
+        log.info('grpc-request', request=request)
+        return self.profiler.profile()
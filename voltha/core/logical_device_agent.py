@@ -76,6 +76,10 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             self.log = structlog.get_logger(logical_device_id=logical_device.id)
 
             self._routes = None
+
+            # flow and group tables being updated by update_tables(), not
+            # yet written back to the model
+            self._pending_tables = None
         except Exception, e:
             self.log.exception('init-error', e=e)
 
@@ -160,6 +164,57 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             self.log.warn('unhandled-group-mod',
                           command=command, group_mod=group_mod)
 
+    def update_tables(self, mods):
+        """
+        Apply a batch of flow and group mods in order. Each table is written
+        back to the model once at the end, so the rules are decomposed and
+        pushed to the devices once per batch rather than once per mod.
+        :param mods: list of ofp_flow_mod and ofp_group_mod messages
+        :return: None
+        """
+        self._pending_tables = {}
+        try:
+            for mod in mods:
+                try:
+                    if isinstance(mod, ofp.ofp_flow_mod):
+                        self.update_flow_table(mod)
+                    else:
+                        self.update_group_table(mod)
+                except Exception, e:
+                    self.log.exception('table-update-failed', mod=mod, e=e)
+        finally:
+            pending, self._pending_tables = self._pending_tables, None
+            # groups first, as the new flows may refer to new groups
+            if 'groups' in pending:
+                self.groups_proxy.update(
+                    '/', FlowGroups(items=pending['groups']))
+            if 'flows' in pending:
+                self.flows_proxy.update('/', Flows(items=pending['flows']))
+
+    def _read_flows(self):
+        if self._pending_tables is not None and \
+                'flows' in self._pending_tables:
+            return self._pending_tables['flows']
+        return list(self.flows_proxy.get('/').items)
+
+    def _write_flows(self, flows):
+        if self._pending_tables is not None:
+            self._pending_tables['flows'] = flows
+        else:
+            self.flows_proxy.update('/', Flows(items=flows))
+
+    def _read_groups(self):
+        if self._pending_tables is not None and \
+                'groups' in self._pending_tables:
+            return self._pending_tables['groups']
+        return self.groups_proxy.get('/').items
+
+    def _write_groups(self, groups):
+        if self._pending_tables is not None:
+            self._pending_tables['groups'] = list(groups)
+        else:
+            self.groups_proxy.update('/', FlowGroups(items=groups))
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~ LOW LEVEL FLOW HANDLERS ~~~~~~~~~~~~~~~~~~~~~~~
 
     def flow_add(self, mod):
@@ -167,7 +222,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         assert mod.cookie_mask == 0
 
         # read from model
-        flows = list(self.flows_proxy.get('/').items)
+        flows = self._read_flows()
 
         changed = False
         check_overlap = mod.flags & ofp.OFPFF_CHECK_OVERLAP
@@ -201,13 +256,13 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
 
         # write back to model
         if changed:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._write_flows(flows)
 
     def flow_delete(self, mod):
         assert isinstance(mod, ofp.ofp_flow_mod)
 
         # read from model
-        flows = list(self.flows_proxy.get('/').items)
+        flows = self._read_flows()
 
         # build a list of what to keep vs what to delete
         to_keep = []
@@ -223,7 +278,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
 
         # write back
         if to_delete:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._write_flows(flows)
 
         # send notifications for discarded flow as required by OpenFlow
         self.announce_flows_deleted(to_delete)
@@ -232,7 +287,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         assert isinstance(mod, ofp.ofp_flow_mod)
 
         # read from model
-        flows = list(self.flows_proxy.get('/').items)
+        flows = self._read_flows()
         changed = False
 
         flow = flow_stats_entry_from_flow_mod_message(mod)
@@ -245,7 +300,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             self.log.warn('flow-cannot-delete', flow=flow)
 
         if changed:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._write_flows(flows)
 
     def flow_modify(self, mod):
         raise NotImplementedError()
@@ -393,7 +448,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
         assert isinstance(group_mod, ofp.ofp_group_mod)
 
         groups = OrderedDict((g.desc.group_id, g)
-                             for g in self.groups_proxy.get('/').items)
+                             for g in self._read_groups())
         changed = False
 
         if group_mod.group_id in groups:
@@ -404,13 +459,13 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             changed = True
 
         if changed:
-            self.groups_proxy.update('/', FlowGroups(items=groups.values()))
+            self._write_groups(groups.values())
 
     def group_delete(self, group_mod):
         assert isinstance(group_mod, ofp.ofp_group_mod)
 
         groups = OrderedDict((g.desc.group_id, g)
-                             for g in self.groups_proxy.get('/').items)
+                             for g in self._read_groups())
         groups_changed = False
         flows_changed = False
 
@@ -428,7 +483,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
                 pass
 
             else:
-                flows = list(self.flows_proxy.get('/').items)
+                flows = self._read_flows()
                 flows_changed, flows = self.flows_delete_by_group_id(
                     flows, group_id)
                 del groups[group_id]
@@ -436,15 +491,15 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
                 self.log.debug('group-deleted', group_id=group_id)
 
         if groups_changed:
-            self.groups_proxy.update('/', FlowGroups(items=groups.values()))
+            self._write_groups(groups.values())
         if flows_changed:
-            self.flows_proxy.update('/', Flows(items=flows))
+            self._write_flows(flows)
 
     def group_modify(self, group_mod):
         assert isinstance(group_mod, ofp.ofp_group_mod)
 
         groups = OrderedDict((g.desc.group_id, g)
-                             for g in self.groups_proxy.get('/').items)
+                             for g in self._read_groups())
         changed = False
 
         if group_mod.group_id not in groups:
@@ -457,7 +512,7 @@ class LogicalDeviceAgent(FlowDecomposer, DeviceGraph):
             changed = True
 
         if changed:
-            self.groups_proxy.update('/', FlowGroups(items=groups.values()))
+            self._write_groups(groups.values())
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ PACKET_OUT ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
@@ -0,0 +1,132 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Logical device additions and removals, as streamed to the watchers of the
+WatchLogicalDevices gRPC method (i.e., the ofagent).
+"""
+from collections import deque
+from uuid import uuid4
+
+import structlog
+
+from common.utils.fair_queue import FairBatchQueue
+from voltha.protos import third_party
+from voltha.protos.logical_device_pb2 import LogicalDevice, \
+    LogicalDeviceEvent
+
+log = structlog.get_logger()
+_ = third_party
+
+
+class LogicalDeviceEvents(object):
+    """
+    Fan out logical device events to the watchers, and keep the most recent
+    ones so that a watcher coming back with the resync token of the last
+    event it received is only sent what it missed. Watchers that are too far
+    behind (or were watching another voltha instance) get a snapshot of all
+    logical devices instead.
+
+    All methods must be called on the twisted thread; the watchers read
+    their queue on their own thread.
+    """
+
+    def __init__(self, history=1024, queue_depth=4096):
+        # tokens are only valid for the lifetime of this instance
+        self.epoch = uuid4().hex[:12]
+        self.seq = 0
+        self.history = deque(maxlen=history)  # (seq, event)
+        self.queue_depth = queue_depth
+        self.watchers = set()  # one FairBatchQueue per watcher
+
+    def resync_token(self):
+        return '{}:{}'.format(self.epoch, self.seq)
+
+    def added(self, logical_device):
+        self._publish(LogicalDeviceEvent.ADDED, logical_device)
+
+    def removed(self, logical_device):
+        self._publish(LogicalDeviceEvent.REMOVED, logical_device)
+
+    def watch(self, resync_token, get_logical_devices):
+        """
+        Register a new watcher.
+        :param resync_token: token of the last event the watcher received,
+        if any
+        :param get_logical_devices: callable returning all current logical
+        devices, in case a snapshot is needed
+        :return: FairBatchQueue the watcher will receive the events from,
+        starting with the ones it missed
+        """
+        queue = FairBatchQueue(self.queue_depth)
+        missed = self._events_since(resync_token)
+        if missed is None:
+            missed = [LogicalDeviceEvent(
+                type=LogicalDeviceEvent.SNAPSHOT,
+                logical_devices=[self._summary(logical_device)
+                                 for logical_device in get_logical_devices()],
+                resync_token=self.resync_token())]
+        for event in missed:
+            queue.put(None, event)
+        self.watchers.add(queue)
+        return queue
+
+    def unwatch(self, queue):
+        self.watchers.discard(queue)
+
+    def close(self):
+        for queue in self.watchers:
+            queue.close()
+        self.watchers.clear()
+
+    def _events_since(self, resync_token):
+        """
+        :return: the events that followed the one with the given token, or
+        None if they are not all known
+        """
+        epoch, _, seq = resync_token.partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.history or self.history[0][0] > seq + 1:
+            return None
+        return [event for event_seq, event in self.history if event_seq > seq]
+
+    def _publish(self, event_type, logical_device):
+        self.seq += 1
+        event = LogicalDeviceEvent(
+            type=event_type,
+            logical_devices=[self._summary(logical_device)],
+            resync_token=self.resync_token())
+        self.history.append((self.seq, event))
+        for queue in list(self.watchers):
+            if not queue.put(None, event):
+                # the watcher is not keeping up; cut it loose, it will come
+                # back with its last resync token
+                log.warn('logical-device-watcher-overrun')
+                queue.close()
+                self.watchers.discard(queue)
+
+    @staticmethod
+    def _summary(logical_device):
+        return LogicalDevice(
+            id=logical_device.id,
+            datapath_id=logical_device.datapath_id,
+            root_device_id=logical_device.root_device_id)
@@ -0,0 +1,273 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Periodic collection of the performance metrics (KPIs) of the devices, on
+behalf of their adapters.
+"""
+import random
+from heapq import heappush, heappop
+from itertools import count
+
+import arrow
+import structlog
+from twisted.internet import reactor
+from twisted.internet.defer import maybeDeferred
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+from common.event_bus import EventBusClient
+from voltha.protos import third_party
+from voltha.protos.events_pb2 import KpiEvent, KpiEventType, MetricValuePairs
+
+log = structlog.get_logger()
+_ = third_party
+
+# collection interval for devices with no PmConfigs, in 10ths of a second,
+# as PmConfigs.default_freq
+DEFAULT_FREQ = 150
+
+
+class PmCollection(object):
+    """What and when to collect for one device"""
+
+    def __init__(self, adapter, device_id, collect, blocking):
+        self.adapter = adapter
+        self.device_id = device_id
+        self.prefix = 'voltha.{}.{}'.format(adapter, device_id)
+        self.collect = collect
+        self.blocking = blocking
+        self.interval = DEFAULT_FREQ / 10.0  # seconds, 0 for none
+        self.metrics = {}  # metric name -> enabled, for the known metrics
+        self.groups = {}  # group name -> enabled
+        self.due = None  # time of next collection
+        self.busy = False  # a collection is under way
+
+    def configure(self, pm_configs):
+        self.interval = pm_configs.default_freq / 10.0
+        self.metrics = dict((m.name, m.enabled) for m in pm_configs.metrics)
+        self.groups = {}
+        for group in pm_configs.groups:
+            self.groups[group.group_name] = group.enabled
+            for m in group.metrics:
+                self.metrics[m.name] = m.enabled
+
+    def filter(self, port_metrics):
+        """
+        :param port_metrics: dict of a sub-prefix (e.g. 'nni', or '' for the
+        device as a whole) to a dict of metric names to values
+        :return: dict of prefixes to MetricValuePairs, with the disabled
+        groups and metrics left out
+        """
+        prefixes = {}
+        for name, metrics in port_metrics.iteritems():
+            if metrics is None:
+                continue  # e.g. a port the device did not report on
+            if not self.groups.get(name, True):
+                continue
+            enabled = dict((metric, value)
+                           for metric, value in metrics.iteritems()
+                           if self.metrics.get(metric, True))
+            if enabled:
+                prefix = self.prefix + '.' + name if name else self.prefix
+                prefixes[prefix] = MetricValuePairs(metrics=enabled)
+        return prefixes
+
+
+class PmScheduler(object):
+    """
+    Run the KPI collectors registered by the adapters, from a single timer.
+
+    The collections of the devices are spread over their interval, each
+    device being given a random phase when registered or when its interval
+    changes, so that hundreds of devices with the same interval do not all
+    get polled at once. Collectors that block (e.g. on synchronous gRPC
+    calls) run on a bounded thread pool instead of the reactor thread.
+
+    The timer ticks every tick seconds, starting the collections due and
+    submitting what was collected since the previous tick in one KpiEvent
+    per adapter.
+    """
+
+    def __init__(self, config=None, submit=None):
+        """
+        :param config: dict with the tick period (in seconds) and the
+        max_threads of the pool blocking collectors run on
+        :param submit: callable taking a KpiEvent, to publish it on the kpis
+        topic of the event bus if not given
+        """
+        config = config or {}
+        self.tick = config.get('tick', 1.0)
+        self.max_threads = config.get('max_threads', 4)
+        if submit is None:
+            event_bus = EventBusClient()
+            submit = lambda kpi_event: event_bus.publish('kpis', kpi_event)
+        self.submit = submit
+
+        self.collections = {}  # device id -> PmCollection
+        self.schedule = []  # heap of (due, seq, PmCollection)
+        self.seq = count()
+        self.results = {}  # adapter -> prefixes collected since last tick
+        self.thread_pool = None
+        self.lc = None
+
+        self.collected = 0
+        self.errors = 0
+        self.overruns = 0  # collections skipped, as still under way
+        self.events = 0
+
+    def start(self):
+        log.debug('starting')
+        self.thread_pool = ThreadPool(0, self.max_threads, 'pm-collection')
+        self.thread_pool.start()
+        self.lc = LoopingCall(self._tick)
+        self.lc.clock = reactor
+        self.lc.start(self.tick, now=False)
+        log.info('started')
+        return self
+
+    def stop(self):
+        log.debug('stopping')
+        if self.lc is not None and self.lc.running:
+            self.lc.stop()
+        if self.thread_pool is not None:
+            self.thread_pool.stop()
+        log.info('stopped')
+
+    def register(self, adapter, device_id, collect, pm_configs=None,
+                 blocking=False):
+        """
+        Collect the KPIs of a device periodically.
+        :param adapter: name of the adapter of the device, the KPI prefixes
+        of the device are voltha.<adapter>.<device id>[.<sub-prefix>]
+        :param collect: callable taking the device id and returning (or
+        returning a Deferred firing with) a dict of sub-prefixes, such as
+        port names ('' for the device itself), to dicts of metric names to
+        values
+        :param pm_configs: PmConfigs of the device, for the interval and the
+        metrics (or groups) that are enabled; unknown metrics are reported,
+        and the interval defaults to DEFAULT_FREQ
+        :param blocking: whether collect blocks, to run it on a thread
+        """
+        self.unregister(device_id)
+        collection = PmCollection(adapter, device_id, collect, blocking)
+        if pm_configs is not None:
+            collection.configure(pm_configs)
+        self.collections[device_id] = collection
+        self._reschedule(collection)
+
+    def update(self, device_id, pm_configs):
+        """Apply the new PmConfigs of a device, if its KPIs are collected"""
+        collection = self.collections.get(device_id)
+        if collection is None:
+            return
+        interval = collection.interval
+        collection.configure(pm_configs)
+        if collection.interval != interval:
+            self._reschedule(collection)
+
+    def unregister(self, device_id):
+        # its entry is dropped from the schedule when met
+        self.collections.pop(device_id, None)
+
+    def statistics(self):
+        """
+        Return the number of devices which KPIs are collected along with the
+        number of collections done, failed and skipped (as the previous one
+        was still under way) and of KpiEvents sent since the previous call.
+        """
+        stats = {
+            'devices': len(self.collections),
+            'collected': self.collected,
+            'errors': self.errors,
+            'overruns': self.overruns,
+            'events': self.events
+        }
+        self.collected = self.errors = self.overruns = self.events = 0
+        return stats
+
+    def _reschedule(self, collection):
+        if collection.interval <= 0:
+            collection.due = None
+            return
+        collection.due = reactor.seconds() + \
+            random.uniform(0, collection.interval)
+        heappush(self.schedule, (collection.due, next(self.seq), collection))
+
+    def _tick(self):
+        now = reactor.seconds()
+        while self.schedule and self.schedule[0][0] <= now:
+            due, _, collection = heappop(self.schedule)
+            if self.collections.get(collection.device_id) is not collection \
+                    or collection.due != due:
+                continue  # unregistered or rescheduled meanwhile
+            # keep the phase, unless late by more than an interval
+            collection.due = due + collection.interval
+            if collection.due <= now:
+                collection.due = now + collection.interval
+            heappush(self.schedule,
+                     (collection.due, next(self.seq), collection))
+            self._collect(collection)
+        self._flush()
+
+    def _collect(self, collection):
+        if collection.busy:
+            self.overruns += 1
+            log.warn('pm-collection-overrun',
+                     device_id=collection.device_id)
+            return
+        collection.busy = True
+
+        def collected(port_metrics):
+            collection.busy = False
+            prefixes = collection.filter(port_metrics)
+            self.collected += 1
+            if prefixes and \
+                    self.collections.get(collection.device_id) is collection:
+                self.results.setdefault(
+                    collection.adapter, {}).update(prefixes)
+
+        def failed(failure):
+            collection.busy = False
+            self.errors += 1
+            log.error('pm-collection-failed',
+                      device_id=collection.device_id, failure=failure)
+
+        if collection.blocking:
+            d = deferToThreadPool(reactor, self.thread_pool,
+                                  collection.collect, collection.device_id)
+        else:
+            d = maybeDeferred(collection.collect, collection.device_id)
+        # failed also gets what collected raises, e.g. on malformed metrics
+        d.addCallback(collected).addErrback(failed)
+
+    def _flush(self):
+        if not self.results:
+            return
+        results, self.results = self.results, {}
+        ts = arrow.utcnow().timestamp
+        for adapter, prefixes in results.iteritems():
+            kpi_event = KpiEvent(
+                type=KpiEventType.slice,
+                ts=ts,
+                prefixes=prefixes
+            )
+            try:
+                self.submit(kpi_event)
+                self.events += 1
+            except Exception, e:
+                log.exception('failed-to-submit-kpis', adapter=adapter, e=e)
@@ -0,0 +1,208 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+On-demand sampling profiler, started and stopped through the
+StartProfiling/StopProfiling gRPC methods of the local service.
+"""
+import sys
+import threading
+from collections import defaultdict
+from time import time
+
+import structlog
+from twisted.python import threadable
+
+from voltha.protos import third_party
+from voltha.protos.voltha_pb2 import Profile, ProfileStack, ProfileFunction
+
+log = structlog.get_logger()
+_ = third_party
+
+
+def thread_group(ident, codes):
+    """
+    Tell which group of threads a thread belongs to: the reactor thread, the
+    gRPC thread pool, the FrameIO select loop or anything else.
+    :param ident: the thread ident
+    :param codes: the code objects on its stack, outermost first
+    """
+    if ident == threadable.ioThread:
+        return 'reactor'
+    if type(threading._active.get(ident)).__name__ == 'FrameIOManager':
+        return 'frameio'
+    # the gRPC server runs on a concurrent.futures thread pool
+    for code in codes[:4]:
+        if code.co_name == '_worker' and \
+                'concurrent' in code.co_filename:
+            return 'grpc'
+    return 'other'
+
+
+class SamplingProfiler(object):
+    """
+    Periodically sample the stack of every thread of the process, from a
+    dedicated thread, and aggregate the samples per thread group and stack.
+    The samples are wall clock based: a thread blocked on a lock or in
+    select() is accounted for where it waits. Nothing runs while the
+    profiler is stopped.
+    """
+
+    def __init__(self, interval=0.005, max_duration=300, max_stacks=20000):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.max_stacks = max_stacks
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self.started = None
+        self.ended = None
+        self.ticks = 0
+        self.samples = defaultdict(int)  # (group, codes) -> samples
+        self.dropped = 0  # samples of stacks beyond max_stacks
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=None, max_duration=None):
+        """
+        Start sampling, discarding the previous profile.
+        :return: False if the profiler is already running
+        """
+        with self.lock:
+            if self.running:
+                return False
+            self._reset()
+            self.interval = interval or self.interval
+            self.max_duration = max_duration or self.max_duration
+            self.stopped.clear()
+            self.started = time()
+            self.thread = threading.Thread(target=self._run, name='profiler')
+            self.thread.daemon = True
+            self.thread.start()
+        log.info('profiler-started', interval=self.interval,
+                 max_duration=self.max_duration)
+        return True
+
+    def stop(self):
+        """Stop sampling and return the profile"""
+        thread = self.thread
+        self.stopped.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        return self.profile()
+
+    def _run(self):
+        me = threading.current_thread().ident
+        deadline = self.started + self.max_duration
+        try:
+            while not self.stopped.wait(self.interval):
+                self.sample(me)
+                if time() >= deadline:
+                    log.info('profiler-max-duration-reached')
+                    break
+        finally:
+            with self.lock:
+                self.ended = time()
+
+    def sample(self, skip=None):
+        """Take one sample of each thread but the one with ident skip"""
+        frames = sys._current_frames()
+        with self.lock:
+            self.ticks += 1
+            for ident, frame in frames.iteritems():
+                if ident == skip:
+                    continue
+                codes = self._codes(frame)
+                key = (thread_group(ident, codes), tuple(codes))
+                if key in self.samples or len(self.samples) < self.max_stacks:
+                    self.samples[key] += 1
+                else:
+                    self.dropped += 1
+
+    @staticmethod
+    def _codes(frame):
+        """Code objects from the outermost frame to the innermost"""
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return codes
+
+    @staticmethod
+    def _label(code):
+        return '{}:{}({})'.format(
+            code.co_filename, code.co_firstlineno, code.co_name)
+
+    def profile(self):
+        """Return the profile sampled so far as a Profile message"""
+        with self.lock:
+            samples = dict(self.samples)
+            ticks = self.ticks
+            started, ended = self.started, self.ended
+            running = self.running and ended is None
+
+        if not ticks:
+            return Profile(running=running,
+                           interval_ms=int(round(self.interval * 1e3)))
+        if started is not None:
+            duration = (ended or time()) - started
+            # the actual time between two ticks, which gets longer than the
+            # requested interval when the process is busy
+            ms_per_sample = 1e3 * duration / ticks
+        else:  # sampled by hand
+            duration = ticks * self.interval
+            ms_per_sample = 1e3 * self.interval
+
+        labels = {}  # code -> function label
+        self_samples = defaultdict(int)  # (group, function) -> samples
+        total_samples = defaultdict(int)
+        stacks = []
+        for (group, codes), count in samples.iteritems():
+            stack = []
+            for code in codes:
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = self._label(code)
+                stack.append(label)
+            stacks.append(ProfileStack(
+                thread_group=group, frames=';'.join(stack), samples=count))
+            if stack:
+                self_samples[(group, stack[-1])] += count
+            for function in set(stack):  # once per recursive function
+                total_samples[(group, function)] += count
+
+        functions = [
+            ProfileFunction(
+                thread_group=group, function=function,
+                self_ms=self_samples.get((group, function), 0) * ms_per_sample,
+                total_ms=count * ms_per_sample)
+            for (group, function), count in total_samples.iteritems()]
+        functions.sort(key=lambda f: (-f.self_ms, -f.total_ms))
+        stacks.sort(key=lambda s: -s.samples)
+
+        return Profile(
+            running=running,
+            interval_ms=int(round(self.interval * 1e3)),
+            duration=duration,
+            ticks=ticks,
+            stacks=stacks,
+            functions=functions)
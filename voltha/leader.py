@@ -22,8 +22,6 @@ from twisted.internet import reactor
 from twisted.internet.base import DelayedCall
 from twisted.internet.defer import inlineCallbacks, DeferredList
 
-from common.utils.asleep import asleep
-
 log = get_logger()
 
 
@@ -35,7 +33,6 @@ class Leader(object):
     method in cases it looses the leadership lock.
     """
 
-    ID_EXTRACTOR = '^(%s)([^/]+)$'
     ASSIGNMENT_EXTRACTOR = '^%s(?P<member_id>[^/]+)/(?P<work_id>[^/]+)$'
 
     # Public methods:
@@ -50,12 +47,6 @@ class Leader(object):
         self.members = []
         self.reassignment_soak_timer = None
 
-        self.workload_id_match = re.compile(
-             self.ID_EXTRACTOR % self.coord.workload_prefix).match
-
-        self.member_id_match = re.compile(
-            self.ID_EXTRACTOR % self.coord.membership_prefix).match
-
         self.assignment_match = re.compile(
             self.ASSIGNMENT_EXTRACTOR % self.coord.assignment_prefix).match
 
@@ -70,6 +61,8 @@ class Leader(object):
         """Suspend leadership duties immediately"""
         log.debug('stopping')
         self.halted = True
+        self.coord.unwatch(self.coord.workload_prefix, self._workload_changed)
+        self.coord.unwatch(self.coord.membership_prefix, self._members_changed)
 
         # any active cancellations, releases, etc., should happen here
         if isinstance(self.reassignment_soak_timer, DelayedCall):
@@ -103,66 +96,36 @@ class Leader(object):
         list. Upon change in either, we must rerun our sharding algorithm
         and reassign work as/if needed.
         """
-        reactor.callLater(0, self._track_workload, 0)
-        reactor.callLater(0, self._track_members, 0)
-
-    @inlineCallbacks
-    def _track_workload(self, index):
-
-        try:
-            (index, results) = yield self.coord.kv_get(
-                self.coord.workload_prefix, index=index, recurse=True)
-
-            matches = (self.workload_id_match(e['Key']) for e in results)
-            workload = [m.group(2) for m in matches if m is not None]
-
-            if workload != self.workload:
-                log.info('workload-changed',
-                              old_workload_count=len(self.workload),
-                              new_workload_count=len(workload))
-                self.workload = workload
-                self._restart_reassignment_soak_timer()
-
-        except Exception, e:
-            log.exception('workload-track-error', e=e)
-            yield asleep(
-                self.coord.leader_config.get(
-                    self.coord.leader_config[
-                        'workload_track_error_to_prevent_flood'], 1))
-            # to prevent flood
+        self.coord.watch(self.coord.workload_prefix, self._workload_changed)
+        self.coord.watch(self.coord.membership_prefix, self._members_changed)
 
-        finally:
-            if not self.halted:
-                reactor.callLater(0, self._track_workload, index)
-
-    @inlineCallbacks
-    def _track_members(self, index):
-
-        try:
-            (index, results) = yield self.coord.kv_get(
-                self.coord.membership_prefix, index=index, recurse=True)
-
-            matches = (self.member_id_match(e['Key']) for e in results or [])
-            members = [m.group(2) for m in matches if m is not None]
-
-            if members != self.members:
-                log.info('membership-changed',
-                              old_members_count=len(self.members),
-                              new_members_count=len(members))
-                self.members = members
-                self._restart_reassignment_soak_timer()
-
-        except Exception, e:
-            log.exception('members-track-error', e=e)
-            yield asleep(
-                self.coord.leader_config.get(
-                    self.coord.leader_config[
-                        'members_track_error_to_prevent_flood']), 1)
-            # to prevent flood
-
-        finally:
-            if not self.halted:
-                reactor.callLater(0, self._track_members, index)
+    @staticmethod
+    def _ids(ids, updated, removed):
+        """
+        :return: the sorted list of ids, as updated with the changes under a
+        prefix (the keys not directly under it are ignored)
+        """
+        ids = set(ids).difference(removed)
+        ids.update(key for key in updated if key and '/' not in key)
+        return sorted(ids)
+
+    def _workload_changed(self, updated, removed):
+        workload = self._ids(self.workload, updated, removed)
+        if workload != self.workload:
+            log.info('workload-changed',
+                          old_workload_count=len(self.workload),
+                          new_workload_count=len(workload))
+            self.workload = workload
+            self._restart_reassignment_soak_timer()
+
+    def _members_changed(self, updated, removed):
+        members = self._ids(self.members, updated, removed)
+        if members != self.members:
+            log.info('membership-changed',
+                          old_members_count=len(self.members),
+                          new_members_count=len(members))
+            self.members = members
+            self._restart_reassignment_soak_timer()
 
     def _restart_reassignment_soak_timer(self):
 
@@ -310,13 +310,14 @@ class Main(object):
                 VolthaCore(
                     instance_id=self.args.instance_id,
                     version=VERSION,
-                    log_level=LogLevel.INFO
+                    log_level=LogLevel.INFO,
+                    config=self.config.get('core', {})
                 )
             ).start(config_backend=load_backend(self.args))
 
             yield registry.register(
                 'frameio',
-                FrameIOManager()
+                FrameIOManager(config=self.config.get('frameio', {}))
             ).start()
 
             yield registry.register(
@@ -20,25 +20,78 @@ Voltha internal diagnostics
 """
 
 import arrow
-import gc
 import structlog
 import resource
 
 import sys
-from simplejson import dumps
-from twisted.internet.defer import Deferred
+from twisted.internet import reactor
 from twisted.internet.task import LoopingCall
 from zope.interface import implementer
 
 from common.event_bus import EventBusClient
+from common.utils.deferred_utils import DeferredCounter
 from voltha.protos.events_pb2 import KpiEvent, KpiEventType, MetricValuePairs
 from voltha.registry import IComponent, registry
 
 log = structlog.get_logger()
 
 
+class ReactorLagProbe(object):
+    """
+    Measure how late the reactor runs its timed calls, by rescheduling a
+    no-op call every interval seconds and comparing when it was due with
+    when it actually ran.
+    """
+
+    def __init__(self, interval=0.1, clock=None):
+        self.interval = interval
+        self.clock = clock or reactor
+        self.call = None
+        self.due = None
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        self._schedule()
+
+    def stop(self):
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+    def _schedule(self):
+        self.due = self.clock.seconds() + self.interval
+        self.call = self.clock.callLater(self.interval, self._fired)
+
+    def _fired(self):
+        lag = max(0.0, self.clock.seconds() - self.due)
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self._schedule()
+
+    def statistics(self):
+        """
+        Return the average and maximum lag (in ms) since the previous call,
+        and start over.
+        """
+        samples, total, peak = self.samples, self.total_lag, self.max_lag
+        self.samples, self.total_lag, self.max_lag = 0, 0.0, 0.0
+        return {
+            'avg-ms': 1e3 * total / samples if samples else 0.0,
+            'max-ms': 1e3 * peak
+        }
+
+
 @implementer(IComponent)
 class Diagnostics(object):
+    """
+    Periodically publish internal health metrics as a KpiEvent. Everything
+    reported is read from counters maintained along the way, so that a
+    check costs next to nothing regardless of the size of the heap or of
+    the config tree.
+    """
 
     def __init__(self, config):
         self.config = config
@@ -47,9 +100,17 @@ class Diagnostics(object):
         self.periodic_checks = None
         self.event_bus = EventBusClient()
         self.instance_id = registry('main').get_args().instance_id
+        self.deferred_counter = DeferredCounter() \
+            if config.get('count_deferreds', True) else None
+        self.lag_probe = ReactorLagProbe(
+            config.get('reactor_lag_probe_interval', 0.1))
+        self.published = self.delivered = 0  # event bus, at last check
 
     def start(self):
         log.debug('starting')
+        if self.deferred_counter is not None:
+            self.deferred_counter.install()
+        self.lag_probe.start()
         self.periodic_checks = LoopingCall(self.run_periodic_checks)
         self.periodic_checks.start(self.periodic_check_interval)
         log.info('started')
@@ -59,32 +120,101 @@ class Diagnostics(object):
         log.debug('stopping')
         if self.periodic_checks is not None:
             self.periodic_checks.stop()
+        self.lag_probe.stop()
+        if self.deferred_counter is not None:
+            self.deferred_counter.uninstall()
         log.info('stopped')
 
     def run_periodic_checks(self):
 
         ts = arrow.utcnow().timestamp
 
-        def deferreds():
-            return len(gc.get_referrers(Deferred))
-
         def rss_mb():
             rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
             if sys.platform.startswith('darwin'):
                 rss /= 1024
             return rss
 
+        metrics = {'rss-mb': rss_mb()}
+        for collect in (self.deferred_metrics,
+                        self.reactor_metrics,
+                        self.event_bus_metrics,
+                        self.core_metrics,
+                        self.grpc_metrics):
+            try:
+                metrics.update(collect())
+            except Exception, e:
+                log.exception('periodic-check-failed', e=e)
+
         kpi_event = KpiEvent(
             type=KpiEventType.slice,
             ts=ts,
             prefixes={
                 'voltha.internal.{}'.format(self.instance_id):
-                    MetricValuePairs(metrics={
-                        'deferreds': deferreds(),
-                        'rss-mb': rss_mb(),
-                    })
+                    MetricValuePairs(metrics=metrics)
             }
         )
 
         self.event_bus.publish('kpis', kpi_event)
         log.debug('periodic-check', ts=ts)
+
+    def deferred_metrics(self):
+        if self.deferred_counter is None:
+            return {}
+        return {'deferreds': self.deferred_counter.pending}
+
+    def reactor_metrics(self):
+        lag = self.lag_probe.statistics()
+        return {
+            'reactor-lag-avg-ms': lag['avg-ms'],
+            'reactor-lag-max-ms': lag['max-ms']
+        }
+
+    def event_bus_metrics(self):
+        # the event bus delivers synchronously, so rather than queue depths
+        # we report its traffic since the previous check
+        bus = self.event_bus.bus
+        metrics = {
+            'event-bus-subscriptions': sum(
+                len(subs) for subs in bus.subscriptions.itervalues()),
+            'event-bus-published': bus.published - self.published,
+            'event-bus-delivered': bus.delivered - self.delivered
+        }
+        self.published, self.delivered = bus.published, bus.delivered
+        return metrics
+
+    def core_metrics(self):
+        core = registry.components.get('core')
+        if core is None:
+            return {}
+        metrics = {
+            'packet-in-queue': len(core.packet_in_queue),
+            'change-event-queue': len(core.change_event_queue)
+        }
+        for name, value in \
+                core.activation_scheduler.statistics().iteritems():
+            metrics['activation-' + name] = value
+        for name, value in core.pm_scheduler.statistics().iteritems():
+            metrics['pm-' + name] = value
+        root = core.local_handler.root
+        if root is None:
+            return metrics
+
+        revs = root.revision_counts()
+        metrics.update({
+            'config-revs': revs.pop(None, 0),
+            'config-txbranches': len(revs),
+            'config-txbranch-revs': sum(revs.itervalues())
+        })
+
+        kv_store = root.kv_store
+        if hasattr(kv_store, 'latency_statistics'):
+            for name, value in kv_store.latency_statistics().iteritems():
+                metrics['kv-' + name] = value
+        return metrics
+
+    def grpc_metrics(self):
+        grpc_server = registry.components.get('grpc_server')
+        if grpc_server is None:
+            return {}
+        return {'grpc-in-flight': grpc_server.thread_pool.in_flight}
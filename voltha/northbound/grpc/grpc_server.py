@@ -20,6 +20,7 @@ import uuid
 from Queue import Queue
 from collections import OrderedDict
 from os.path import abspath, basename, dirname, join, walk
+from threading import Lock
 import grpc
 from concurrent import futures
 from structlog import get_logger
@@ -191,13 +192,46 @@ class VolthaLogicalLayer(voltha_pb2.VolthaLogicalLayerServicer):
         self.packet_in_queue.put(packet_in)
 '''
 
+
+class CountingThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """
+    Thread pool keeping track of the gRPC calls it is serving (streaming
+    calls occupy a worker for their whole duration), for diagnostics.
+    """
+
+    def __init__(self, max_workers):
+        super(CountingThreadPoolExecutor, self).__init__(max_workers)
+        self.submitted = 0
+        self.completed = 0
+        self._count_lock = Lock()
+
+    @property
+    def in_flight(self):
+        with self._count_lock:
+            return max(0, self.submitted - self.completed)
+
+    def submit(self, fn, *args, **kwargs):
+
+        def run():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._count_lock:
+                    self.completed += 1
+
+        future = super(CountingThreadPoolExecutor, self).submit(run)
+        with self._count_lock:
+            self.submitted += 1
+        return future
+
+
 @implementer(IComponent)
 class VolthaGrpcServer(object):
 
     def __init__(self, port=50055):
         self.port = port
         log.info('init-grpc-server', port=self.port)
-        self.thread_pool = futures.ThreadPoolExecutor(max_workers=10)
+        self.thread_pool = CountingThreadPoolExecutor(max_workers=10)
         self.server = grpc.server(self.thread_pool)
         self.services = []
 
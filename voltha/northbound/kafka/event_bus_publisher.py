@@ -26,6 +26,7 @@ from google.protobuf.message import Message
 from simplejson import dumps
 
 from common.event_bus import EventBusClient
+from voltha.northbound.kafka.kpi_compactor import KpiCompactor
 
 log = structlog.get_logger()
 
@@ -38,6 +39,7 @@ class EventBusPublisher(object):
         self.topic_mappings = config.get('topic_mappings', {})
         self.event_bus = EventBusClient()
         self.subscriptions = None
+        self.compactors = []
 
     def start(self):
         log.debug('starting')
@@ -52,6 +54,8 @@ class EventBusPublisher(object):
             if self.subscriptions:
                 for subscription in self.subscriptions:
                     self.event_bus.unsubscribe(subscription)
+            for compactor in self.compactors:
+                compactor.stop()
             log.info('stopped-event-bus')
         except Exception, e:
             log.exception('failed-stopping-event-bus', e=e)
@@ -69,14 +73,26 @@ class EventBusPublisher(object):
                           mapping=mapping)
                 continue
 
-            self.subscriptions.append(self.event_bus.subscribe(
-                event_bus_topic,
-                # to avoid Python late-binding to the last registered
-                # kafka_topic, we force instant binding with the default arg
-                lambda _, m, k=kafka_topic: self.forward(k, m)))
+            compaction = mapping.get('compaction', None)
+            if compaction is not None:
+                # KPI slices get buffered and sent as time-series
+                compactor = KpiCompactor(
+                    lambda m, k=kafka_topic: self.forward(k, m),
+                    compaction).start()
+                self.compactors.append(compactor)
+                self.subscriptions.append(self.event_bus.subscribe(
+                    event_bus_topic, lambda _, m, c=compactor: c.add(m)))
+            else:
+                self.subscriptions.append(self.event_bus.subscribe(
+                    event_bus_topic,
+                    # to avoid Python late-binding to the last registered
+                    # kafka_topic, we force instant binding with the
+                    # default arg
+                    lambda _, m, k=kafka_topic: self.forward(k, m)))
 
             log.info('event-to-kafka', kafka_topic=kafka_topic,
-                     event_bus_topic=event_bus_topic)
+                     event_bus_topic=event_bus_topic,
+                     compaction=compaction is not None)
 
     def forward(self, kafka_topic, msg):
         try:
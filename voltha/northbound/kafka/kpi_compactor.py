@@ -0,0 +1,150 @@
+#
+# Copyright 2017 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Compaction of the KPI slices published on the event bus into time-series
+KpiEvents, before they leave for Kafka. See common/utils/kpi_decoder.py for
+the way back.
+"""
+from itertools import count
+from uuid import uuid4
+
+import structlog
+from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
+
+from voltha.protos import third_party
+from voltha.protos.events_pb2 import KpiEvent, KpiEventType, MetricSchema
+
+log = structlog.get_logger()
+_ = third_party
+
+
+class KpiCompactor(object):
+    """
+    Buffer KPI slices and turn them into time-series KpiEvents, where:
+
+    - the metric names of each prefix are sent once in a MetricSchema, and
+      then every so often for the consumers joining late;
+    - the values of a prefix are sent as a dense array of floats, or if
+      fewer of them changed since its previous sample, as the changed ones
+      along with their index;
+    - the samples of several intervals are sent in one event, every
+      flush_interval seconds or as soon as a series has max_samples samples.
+
+    Each event can be decoded on its own, given the schemas, as the first
+    sample of each series is a full one.
+    """
+
+    def __init__(self, forward, config=None):
+        """
+        :param forward: callable taking the time-series KpiEvents
+        :param config: dict of flush_interval (seconds), max_samples (per
+        series and event) and schema_refresh (number of events after which
+        a schema is sent again)
+        """
+        config = config or {}
+        self.forward = forward
+        self.flush_interval = config.get('flush_interval', 60)
+        self.max_samples = config.get('max_samples', 8)
+        self.schema_refresh = config.get('schema_refresh', 10)
+
+        self.source = uuid4().hex[:12]
+        self.ids = count(1)
+        self.schemas = {}  # prefix -> MetricSchema
+        self.schemas_by_id = {}  # id -> MetricSchema
+        self.schema_sent = {}  # schema id -> value of events when last sent
+        self.pending = {}  # schema id -> [(ts, values)]
+        self.events = 0
+        self.lc = None
+
+    def start(self):
+        self.lc = LoopingCall(self.flush)
+        self.lc.clock = reactor
+        self.lc.start(self.flush_interval, now=False)
+        return self
+
+    def stop(self):
+        if self.lc is not None and self.lc.running:
+            self.lc.stop()
+        self.flush()
+
+    def add(self, kpi_event):
+        """Buffer the content of a KpiEvent"""
+        if kpi_event.type != KpiEventType.slice:
+            self.forward(kpi_event)
+            return
+        full = False
+        for prefix, pairs in kpi_event.prefixes.iteritems():
+            metrics = pairs.metrics
+            schema = self._schema(prefix, metrics)
+            samples = self.pending.setdefault(schema.id, [])
+            samples.append(
+                (kpi_event.ts, [metrics[name] for name in schema.metrics]))
+            full = full or len(samples) >= self.max_samples
+        if full:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        kpi_event = KpiEvent(type=KpiEventType.ts, source=self.source)
+        for schema_id in sorted(pending):
+            last_sent = self.schema_sent.get(schema_id)
+            if last_sent is None or \
+                    self.events - last_sent >= self.schema_refresh:
+                kpi_event.schemas.extend([self.schemas_by_id[schema_id]])
+                self.schema_sent[schema_id] = self.events
+            series = kpi_event.series.add(schema=schema_id)
+            previous = None
+            for ts, values in pending[schema_id]:
+                sample = series.samples.add(ts=ts)
+                if previous is None:
+                    sample.values.extend(values)
+                else:
+                    changed = [i for i, (old, new) in
+                               enumerate(zip(previous, values)) if old != new]
+                    if len(changed) * 4 < len(values) * 3:
+                        sample.changed.extend(changed)
+                        sample.values.extend(values[i] for i in changed)
+                    else:
+                        sample.values.extend(values)
+                previous = values
+        self.events += 1
+        try:
+            self.forward(kpi_event)
+        except Exception, e:
+            log.exception('failed-to-forward-kpis', e=e)
+
+    def _schema(self, prefix, metrics):
+        schema = self.schemas.get(prefix)
+        if schema is not None and len(schema.metrics) == len(metrics) and \
+                all(name in metrics for name in schema.metrics):
+            return schema
+
+        # new prefix, or the set of metrics changed (e.g. some were
+        # disabled): new schema
+        if schema is not None:
+            if schema.id in self.pending:
+                self.flush()
+            del self.schemas_by_id[schema.id]
+            self.schema_sent.pop(schema.id, None)
+        schema = MetricSchema(
+            id=next(self.ids), prefix=prefix, metrics=sorted(metrics))
+        self.schemas[prefix] = self.schemas_by_id[schema.id] = schema
+        log.debug('new-kpi-schema', prefix=prefix, id=schema.id)
+        return schema
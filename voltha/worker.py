@@ -13,8 +13,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import re
-
 from structlog import get_logger
 from twisted.internet import reactor
 from twisted.internet.base import DelayedCall
@@ -32,8 +30,6 @@ class Worker(object):
     the leader. This is all done via consul.
     """
 
-    ASSIGNMENT_EXTRACTOR = '^%s(?P<member_id>[^/]+)/(?P<work_id>[^/]+)$'
-
     # Public methods:
 
     def __init__(self, instance_id, coordinator):
@@ -44,12 +40,13 @@ class Worker(object):
         self.soak_time = 0.5  # soak till assignment list settles
 
         self.my_workload = set()  # list of work_id's assigned to me
+        self.my_assignments = set()  # as currently seen in consul
 
         self.assignment_soak_timer = None
         self.my_candidate_workload = set()  # we stash here during soaking
 
-        self.assignment_match = re.compile(
-            self.ASSIGNMENT_EXTRACTOR % self.coord.assignment_prefix).match
+        self.my_assignment_prefix = \
+            self.coord.assignment_prefix + self.instance_id + '/'
 
     @inlineCallbacks
     def start(self):
@@ -60,6 +57,9 @@ class Worker(object):
 
     def stop(self):
         log.debug('stopping')
+        self.halted = True
+        self.coord.unwatch(self.my_assignment_prefix,
+                           self._my_assignments_changed)
         if isinstance(self.assignment_soak_timer, DelayedCall):
             if not self.assignment_soak_timer.called:
                 self.assignment_soak_timer.cancel()
@@ -68,47 +68,30 @@ class Worker(object):
     # Private methods:
 
     def _start_tracking_my_assignments(self):
-        reactor.callLater(0, self._track_my_assignments, 0)
+        reactor.callLater(0, self._track_my_assignments)
 
     @inlineCallbacks
-    def _track_my_assignments(self, index):
-
-        try:
-
-            # if there is no leader yet, wait for a stable leader
-            d = self.coord.wait_for_a_leader()
-            if not d.called:
-                yield d
-                # additional time to let leader update
-                # assignments, to minimize potential churn
-                yield asleep(self.coord.worker_config.get(
-                    self.coord.worker_config['time_to_let_leader_update'], 5))
-
-            (index, results) = yield self.coord.kv_get(
-                self.coord.assignment_prefix + self.instance_id,
-                index=index, recurse=True)
-
-            matches = [
-                (self.assignment_match(e['Key']), e) for e in results or []]
-
-            my_workload = set([
-                m.groupdict()['work_id'] for m, e in matches if m is not None
-            ])
-
-            if my_workload != self.my_workload:
-                self._stash_and_restart_soak_timer(my_workload)
-
-        except Exception, e:
-            log.exception('assignments-track-error', e=e)
-            yield asleep(
-                self.coord.worker_config.get(
-                    self.coord.worker_config[
-                        'assignments_track_error_to_avoid_flood'], 1))
-            # to prevent flood
-
-        finally:
-            if not self.halted:
-                reactor.callLater(0, self._track_my_assignments, index)
+    def _track_my_assignments(self):
+
+        # if there is no leader yet, wait for a stable leader
+        d = self.coord.wait_for_a_leader()
+        if not d.called:
+            yield d
+            # additional time to let leader update
+            # assignments, to minimize potential churn
+            yield asleep(self.coord.worker_config.get(
+                self.coord.worker_config['time_to_let_leader_update'], 5))
+
+        if not self.halted:
+            self.coord.watch(self.my_assignment_prefix,
+                             self._my_assignments_changed)
+
+    def _my_assignments_changed(self, updated, removed):
+        self.my_assignments.difference_update(removed)
+        self.my_assignments.update(
+            key for key in updated if key and '/' not in key)
+        if self.my_assignments != self.my_workload:
+            self._stash_and_restart_soak_timer(set(self.my_assignments))
 
     def _stash_and_restart_soak_timer(self, candidate_workload):
 